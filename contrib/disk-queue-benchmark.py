@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Compare the DiskQueue codecs: enqueue and drain throughput, and bytes on disk,
+for a backlog of HEC events like the ones queued during an indexer outage.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from hubblestack.hec.dq import DiskQueue, available_codecs
+
+
+def event(i):
+    return json.dumps({'host': 'web-{0}.example.com'.format(i % 50), 'time': 1612345678.123 + i,
+                       'sourcetype': 'hubble_audit', 'index': 'hubble',
+                       'event': {'check_id': 'CIS-5.2.{0}'.format(i % 30),
+                                 'check_result': 'Failure' if i % 3 else 'Success',
+                                 'description': 'Ensure SSH root login is disabled (Scored)',
+                                 'failure_reason': 'Could not find requested pattern in /etc/ssh/sshd_config',
+                                 'audit_profile': 'cis.centos-7-level-1-scored-v2-2-0',
+                                 'job_id': '2021020312121234{0:04d}'.format(i % 10000)}})
+
+
+def run(directory, events, **kwargs):
+    dq = DiskQueue(directory, size=1024 ** 3, fresh=True, **kwargs)
+    start = time.perf_counter()
+    for item in events:
+        dq.put(item, queued_to_disk=1)
+    if getattr(dq, 'codec', None) is not None:
+        dq.compact()
+    enqueue = time.perf_counter() - start
+    on_disk = dq.sz
+    start = time.perf_counter()
+    drained = 0
+    while True:
+        dat, _ = dq.getz()
+        if not dat:
+            break
+        drained += len(dat)
+    drain = time.perf_counter() - start
+    shutil.rmtree(directory)
+    return len(events) / enqueue, len(events) / drain, on_disk
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hubble disk queue codec benchmark')
+    parser.add_argument('-n', '--events', type=int, default=5000)
+    parser.add_argument('-l', '--level', type=int, default=0,
+                        help='compression level (0 for the codec default; legacy bz2 uses 5)')
+    args = parser.parse_args()
+
+    events = [event(i) for i in range(args.events)]
+    raw = sum(len(item) for item in events)
+    tmp = tempfile.mkdtemp()
+    try:
+        print('{0} events, {1} octets'.format(len(events), raw))
+        print('{0:<22} {1:>12} {2:>12} {3:>12} {4:>7}'.format('', 'enqueue/s', 'drain/s', 'on disk', 'ratio'))
+        cases = [('per item bz2 (legacy)', {'compression': args.level or 5})]
+        cases += [('batch ' + codec, {'codec': codec, 'compression': args.level}) for codec in available_codecs()]
+        for title, kwargs in cases:
+            enq, drain, on_disk = run(os.path.join(tmp, 'dq'), events, **kwargs)
+            print('{0:<22} {1:>12.0f} {2:>12.0f} {3:>12} {4:>6.1f}x'.format(
+                title, enq, drain, on_disk, raw / float(on_disk)))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
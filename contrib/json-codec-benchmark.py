@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Compare the JSON codec of hubblestack.utils.json with the standard library on
+the documents hubble encodes and decodes the most: HEC event payloads of the
+pulsar, nova and nebula returners, and osqueryi results.
+"""
+
+import argparse
+import json
+import time
+
+import hubblestack.utils.json
+
+
+def pulsar_event(i):
+    return {'host': 'web-{0}.example.com'.format(i % 50), 'time': 1612345678.123 + i, 'sourcetype': 'hubble_fim',
+            'index': 'hubble', 'event': {
+                'change': 'IN_MODIFY', 'path': '/etc/nginx/conf.d/site-{0}.conf'.format(i),
+                'tag': '/etc/nginx/conf.d', 'name': 'site-{0}.conf'.format(i), 'pulsar_config': 'hubblestack_pulsar_config.yaml',
+                'checksum': 'a' * 64, 'checksum_type': 'sha256', 'minion_id': 'web-{0}'.format(i % 50),
+                'dest_host': 'web-{0}'.format(i % 50), 'dest_ip': '10.0.{0}.{1}'.format(i % 255, i % 250),
+                'dest_fqdn': 'web-{0}.example.com'.format(i % 50), 'system_uuid': '4c4c4544-0042-3910-8039-b4c04f4e3632'},
+            'fields': {'hubble_version': '4.0.0', 'cloud_details': {'cloud_account_id': '123456789012',
+                                                                   'cloud_instance_id': 'i-0123456789abcdef0'}}}
+
+
+def nova_event(i):
+    return {'host': 'db-{0}'.format(i % 20), 'time': 1612345678.5, 'sourcetype': 'hubble_audit', 'index': 'hubble',
+            'event': {'check_id': 'CIS-5.2.{0}'.format(i % 30), 'check_result': 'Failure' if i % 3 else 'Success',
+                      'description': 'Ensure SSH root login is disabled (Scored)', 'tag': 'CIS-5.2.8',
+                      'failure_reason': 'Could not find requested pattern ^PermitRootLogin\\s+no in /etc/ssh/sshd_config',
+                      'audit_profile': 'cis.centos-7-level-1-scored-v2-2-0', 'job_id': '20210203121212345678',
+                      'compliance_percentage': 87.5, 'audit_tags': ['CIS', 'level-1', 'ssh']}}
+
+
+def osquery_rows(count):
+    return [{'pid': str(1000 + i), 'name': 'proc-{0}'.format(i), 'path': '/usr/sbin/proc-{0}'.format(i),
+             'cmdline': '/usr/sbin/proc-{0} --config /etc/proc-{0}.conf --verbose'.format(i), 'uid': '0',
+             'gid': '0', 'start_time': str(1612345678 + i), 'resident_size': str(1024 * i),
+             'state': 'S', 'parent': '1', 'on_disk': '1'} for i in range(count)]
+
+
+def run(func, docs, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for doc in docs:
+            func(doc)
+    return (time.perf_counter() - start) / (rounds * len(docs)) * 1e6
+
+
+def std_encode(doc):
+    return json.dumps(doc, default=hubblestack.utils.json._default, ensure_ascii=False, separators=(',', ':'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hubble JSON codec benchmark')
+    parser.add_argument('-r', '--rounds', type=int, default=20)
+    parser.add_argument('-n', '--events', type=int, default=1000)
+    args = parser.parse_args()
+
+    cases = [
+        ('encode pulsar event', 'encode', [pulsar_event(i) for i in range(args.events)]),
+        ('encode nova event', 'encode', [nova_event(i) for i in range(args.events)]),
+        ('decode osqueryi output (500 rows)', 'decode', [json.dumps(osquery_rows(500))] * 10),
+    ]
+    print('backend: {0}'.format(hubblestack.utils.json.BACKEND))
+    print('{0:<36} {1:>12} {2:>12} {3:>8}'.format('', 'json (us)', 'codec (us)', 'gain'))
+    for title, what, docs in cases:
+        if what == 'encode':
+            std = run(std_encode, docs, args.rounds)
+            codec = run(hubblestack.utils.json.encode, docs, args.rounds)
+        else:
+            std = run(json.loads, docs, args.rounds)
+            codec = run(hubblestack.utils.json.decode, docs, args.rounds)
+        print('{0:<36} {1:>12.2f} {2:>12.2f} {3:>7.1f}x'.format(title, std, codec, std / codec))
+
+
+if __name__ == '__main__':
+    main()
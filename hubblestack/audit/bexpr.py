@@ -177,6 +177,9 @@ from pyparsing import infixNotation, opAssoc, Keyword, Word, alphas, ParserEleme
 
 log = logging.getLogger(__name__)
 
+KEYWORDS = ['AND', 'OR', 'NOT', '(', ')']
+OPERANDS = ['AND', 'OR', 'NOT']
+
 
 def validate_params(block_id, block_dict, extra_args=None):
     """
@@ -231,26 +234,12 @@ def execute(block_id, block_dict, extra_args=None):
     """
     log.debug('Executing bexpr module for check-id: %s' % block_id)
     result_list = extra_args.get('extra_args')
-    keyword_list = ['AND', 'OR', 'NOT', '(', ')']
-    operand_list = ['AND', 'OR', 'NOT']
+    if not isinstance(result_list, runner_utils.CheckResultStore):
+        result_list = runner_utils.CheckResultStore(result_list or [])
     expression = runner_utils.get_param_for_module(block_id, block_dict, 'expr')
     original_expression = expression
-    # Separating keywords on the basis of space
-    expression = expression.replace('(', ' ( ')
-    expression = expression.replace(')', ' ) ')
-    # Parse the expression and evaluate the result
-    # Splitting the expression on the basis of spaces
-    expr_list = expression.split(" ")
-    # Filtering out empty spaces
-    expr_list = list(filter(None, expr_list))
-    referred_checks_list = []
+    expr_list, referred_checks_list, operand_present = _parse_expression(expression)
     referred_checks_result = {}
-    operand_present = 0
-    for expr in expr_list:
-        if expr.upper() not in keyword_list:
-            referred_checks_list.append(expr)
-        elif expr.upper() in operand_list:
-            operand_present += 1
     # Fetch the result of check from result list and store the result of referenced checks
     # In case a check is not present in result list or referred check result is not Success or Failure, raise an Error
     error = {}
@@ -264,29 +253,26 @@ def execute(block_id, block_dict, extra_args=None):
         raise HubbleCheckValidationError(error)
 
     for referred_check_id in referred_checks_list:
-        check_found = False
-        for result in result_list:
-            if result.get('check_unique_id', '') == referred_check_id:
-                check_found = True
-                check_result = result.get('check_result', '')
-                if check_result == "Success":
-                    referred_checks_result[referred_check_id] = "True"
-                elif check_result == "Failure":
-                    referred_checks_result[referred_check_id] = "False"
-                else:
-                    error[
-                        block_id] = "Referred check: %s result is %s. Setting boolean expression check result to error." % (
-                        referred_check_id, check_result)
-                break
-
-    if not check_found:
-        error[block_id] = "Referred check: %s is not available. Please verify correct check is referred." % (
-            referred_check_id)
+        result = result_list.find(referred_check_id)
+        if result is None:
+            error[block_id] = "Referred check: %s is not available. Please verify correct check is referred." % (
+                referred_check_id)
+            break
+        check_result = result.get('check_result', '')
+        if check_result == "Success":
+            referred_checks_result[referred_check_id] = "True"
+        elif check_result == "Failure":
+            referred_checks_result[referred_check_id] = "False"
+        else:
+            error[
+                block_id] = "Referred check: %s result is %s. Setting boolean expression check result to error." % (
+                referred_check_id, check_result)
+
     if error:
         raise HubbleCheckValidationError(error)
 
     try:
-        check_result = _evaluate_expression(expr_list, keyword_list, referred_checks_result)
+        check_result = _evaluate_expression(expr_list, KEYWORDS, referred_checks_result)
     except Exception as e:
         error[
             block_id] = "Error in evaluating boolean expression: %s Please verify the expression" % original_expression
@@ -322,6 +308,44 @@ def get_filtered_params_to_log(block_id, block_dict, extra_args=None):
     return {'expr': expr}
 
 
+def get_referred_checks(block_id, block_dict, extra_args=None):
+    """
+    Return the check ids referred in the boolean expression, so that the
+    audit runner can evaluate them before this check
+
+    :param block_id:
+        id of the block
+    :param block_dict:
+        parameter for this module
+    :param extra_args:
+        Extra argument dictionary, (If any)
+    """
+    expression = runner_utils.get_param_for_module(block_id, block_dict, 'expr')
+    if not isinstance(expression, str):
+        return []
+    return _parse_expression(expression)[1]
+
+
+def _parse_expression(expression):
+    """
+    Split a boolean expression into its tokens.
+    Returns the tokens, the referred check ids and the number of operands
+    """
+    # Separating keywords on the basis of space
+    expression = expression.replace('(', ' ( ')
+    expression = expression.replace(')', ' ) ')
+    # Splitting the expression on the basis of spaces, filtering out empty spaces
+    expr_list = list(filter(None, expression.split(" ")))
+    referred_checks_list = []
+    operand_present = 0
+    for expr in expr_list:
+        if expr.upper() not in KEYWORDS:
+            referred_checks_list.append(expr)
+        elif expr.upper() in OPERANDS:
+            operand_present += 1
+    return expr_list, referred_checks_list, operand_present
+
+
 def _evaluate_expression(expr_list, keyword_list, referred_checks_result):
     # Convert the expression now in the format to be parsed by pyparsing module
     parsed_list = []
@@ -221,11 +221,13 @@ Mandatory Params:
     url
 """
 import os
+import json
 import logging
 import requests
 
 import hubblestack.module_runner.runner_factory as runner_factory
 import hubblestack.module_runner.runner_utils as runner_utils
+import hubblestack.utils.probe
 from hubblestack.exceptions import HubbleCheckValidationError
 from hubblestack.exceptions import CommandExecutionError
 
@@ -297,6 +299,50 @@ def execute(block_id, block_dict, extra_args=None):
         log.warn('Chained value detected in curl.request module. Chained '
                  'values are unsupported in the curl module.')
 
+    function_name, url, kwargs = _get_request_args(block_id, block_dict)
+
+    decode_json = runner_utils.get_param_for_module(block_id, block_dict, 'decode_json')
+    if not decode_json:
+        decode_json = True
+
+    # Make the request
+    status, response = _make_request(function_name, url, **kwargs)
+    if not status:
+        return runner_utils.prepare_negative_result_for_module(block_id, response)
+
+    # Pull out the pieces we want
+    ret = _parse_response(response, decode_json)
+
+    # Status in the return is based on http status
+    try:
+        response.raise_for_status()
+        return runner_utils.prepare_positive_result_for_module(block_id, ret)
+    except requests.exceptions.HTTPError:
+        return runner_utils.prepare_negative_result_for_module(block_id, ret)
+
+
+def get_probes(block_id, block_dict, extra_args=None):
+    """
+    Return the request of this check if it is a GET, for the runner to
+    prefetch it concurrently with the probes of the other checks
+
+    :param block_id:
+        id of the block
+    :param block_dict:
+        parameter for this module
+    :param extra_args:
+        Extra argument dictionary, (If any)
+    """
+    function_name, url, kwargs = _get_request_args(block_id, block_dict)
+    if function_name != 'GET' or not url:
+        return []
+    return [(_request_key(url, kwargs), _get, (url, kwargs), 0)]
+
+
+def _get_request_args(block_id, block_dict):
+    """
+    Return the method, url and keyword arguments of the request of a check
+    """
     url = runner_utils.get_param_for_module(block_id, block_dict, 'url')
 
     kwargs = {}
@@ -324,25 +370,18 @@ def execute(block_id, block_dict, extra_args=None):
     if not timeout:
         timeout = 9
     kwargs['timeout'] = int(timeout)
+    return function_name, url, kwargs
 
-    decode_json = runner_utils.get_param_for_module(block_id, block_dict, 'decode_json')
-    if not decode_json:
-        decode_json = True
 
-    # Make the request
-    status, response = _make_request(function_name, url, **kwargs)
-    if not status:
-        return runner_utils.prepare_negative_result_for_module(block_id, response)
+def _request_key(url, kwargs):
+    """
+    The probe key of a GET request
+    """
+    return 'curl', url, json.dumps(kwargs, sort_keys=True, default=str)
 
-    # Pull out the pieces we want
-    ret = _parse_response(response, decode_json)
 
-    # Status in the return is based on http status
-    try:
-        response.raise_for_status()
-        return runner_utils.prepare_positive_result_for_module(block_id, ret)
-    except requests.exceptions.HTTPError:
-        return runner_utils.prepare_negative_result_for_module(block_id, ret)
+def _get(url, kwargs):
+    return requests.get(url, **kwargs)
 
 
 def _make_request(function, url, **kwargs):
@@ -351,7 +390,8 @@ def _make_request(function, url, **kwargs):
     """
     try:
         if function == 'GET':
-            response = requests.get(url, **kwargs)
+            # the response may have been prefetched by the runner
+            response = hubblestack.utils.probe.fetch(_request_key(url, kwargs), _get, url, kwargs)
         elif function == 'PUT':
             response = requests.put(url, **kwargs)
         elif function == 'POST':
@@ -111,6 +111,14 @@ Functions supported:
     Ensure firewall rule for all open ports
 - check_password_fields_not_empty
     Ensure password fields are not empty
+- ungrouped_files_or_dir, check_ungrouped_files
+    Ensure no ungrouped files or directories exist
+- unowned_files_or_dir, check_unowned_files
+    Ensure no unowned files or directories exist
+- world_writable_file
+    Ensure no world writable files exist
+- sticky_bit_on_world_writable_dirs
+    Ensure sticky bit is set on all world-writable directories
 - system_account_non_login
     Ensure system accounts are non-login
     Params:
@@ -212,6 +220,13 @@ Functions supported:
         attribute (Mandatory)
         check_type (Default 'hard')
 
+ungrouped_files_or_dir (check_ungrouped_files), unowned_files_or_dir
+(check_unowned_files), world_writable_file and
+sticky_bit_on_world_writable_dirs are answered from the filesystem inventory
+index (hubblestack.utils.fs_inventory), which walks the local filesystems in
+budgeted steps in the background. Until a pass has completed they error out;
+schedule fs_inventory.update to have the index ready before the audit runs.
+
 Module Output
 -------------
 It always return None for success and error message for failure
@@ -268,6 +283,11 @@ from hubblestack.exceptions import CommandExecutionError
 import hubblestack.module_runner.comparator
 from hubblestack.module_runner.runner import Caller
 import hubblestack.module_runner.runner_utils as runner_utils
+import hubblestack.utils.accounts
+import hubblestack.utils.files
+import hubblestack.utils.fs_inventory
+import hubblestack.utils.identity
+import hubblestack.utils.iptables
 from hubblestack.exceptions import HubbleCheckValidationError
 
 log = logging.getLogger(__name__)
@@ -428,13 +448,7 @@ def _check_all_ports_firewall_rules(block_id, block_dict, extra_args):
         )
     ).strip()
     open_ports = open_ports.split("\n") if open_ports != "" else []
-    firewall_ports = (
-        _execute_shell_command(
-            'iptables -L INPUT -v -n | awk \'FNR > 2 && $11 != "" && $11 ~ /^dpt:/ {print $11}\' | sed -e "s/.*://"',
-            python_shell=True,
-        )
-    ).strip()
-    firewall_ports = firewall_ports.split("\n") if firewall_ports != "" else []
+    firewall_ports = hubblestack.utils.iptables.dports(__mods__["iptables.ruleset"]())
     no_firewall_ports = []
 
     for open_port in open_ports:
@@ -449,12 +463,38 @@ def _check_password_fields_not_empty(block_id, block_dict, extra_args):
     Ensure password fields are not empty
     """
     result = ""
-    with open("/etc/shadow", "r") as shadow:
-        lines = shadow.readlines()
-        for line in lines:
-            if line.split(":")[1] is "":
-                result += f"{line.split(':')[0]} does not have a password \n"
-        return True if result == "" else result
+    for entry in hubblestack.utils.accounts.snapshot().shadow:
+        if entry.passwd == "":
+            result += f"{entry.name} does not have a password \n"
+    return True if result == "" else result
+
+
+def _ungrouped_files_or_dir(block_id, block_dict, extra_args):
+    """
+    Ensure no ungrouped files or directories exist
+    """
+    return hubblestack.utils.fs_inventory.check(__opts__, "nogroup")
+
+
+def _unowned_files_or_dir(block_id, block_dict, extra_args):
+    """
+    Ensure no unowned files or directories exist
+    """
+    return hubblestack.utils.fs_inventory.check(__opts__, "nouser")
+
+
+def _world_writable_file(block_id, block_dict, extra_args):
+    """
+    Ensure no world writable files exist
+    """
+    return hubblestack.utils.fs_inventory.check(__opts__, "world_writable")
+
+
+def _sticky_bit_on_world_writable_dirs(block_id, block_dict, extra_args):
+    """
+    Ensure sticky bit is set on all world-writable directories
+    """
+    return hubblestack.utils.fs_inventory.check(__opts__, "world_writable_dir_no_sticky")
 
 
 def _system_account_non_login(block_id, block_dict, extra_args=None):
@@ -470,15 +510,14 @@ def _system_account_non_login(block_id, block_dict, extra_args=None):
         if user.strip() != "":
             users_list.append(user.strip())
     result = []
-    cmd = __mods__["cmd.run_all"]('egrep -v "^\\+" /etc/passwd ')
-    for line in cmd["stdout"].split("\n"):
-        tokens = line.split(":")
+    for entry in hubblestack.utils.accounts.snapshot().passwd:
         if (
-            tokens[0] not in users_list
-            and int(tokens[2]) < int(max_system_uid)
-            and tokens[6] not in (non_login_shell, "/bin/false")
+            not entry.nis
+            and entry.name not in users_list
+            and int(entry.uid) < int(max_system_uid)
+            and entry.shell not in (non_login_shell, "/bin/false")
         ):
-            result.append(line)
+            result.append(entry.line)
     return True if result == [] else str(result)
 
 
@@ -486,24 +525,15 @@ def _default_group_for_root(block_id, block_dict, extra_args):
     """
     Ensure default group for the root account is GID 0
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if line[:3] == "root" and line.split(":")[3] == "0":
-                return True
-        return False
+    root = hubblestack.utils.accounts.snapshot().users_by_name.get("root", [])
+    return any(entry.gid == "0" for entry in root)
 
 
 def _root_is_only_uid_0_account(block_id, block_dict, extra_args):
     """
     Ensure root is the only UID 0 account
     """
-    uid0_accounts = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if line.split(":")[2] == "0":
-                uid0_accounts.append(line.split(":")[0])
+    uid0_accounts = [entry.name for entry in hubblestack.utils.accounts.snapshot().users_by_uid.get("0", [])]
     if "root" in uid0_accounts:
         return True if len(uid0_accounts) == 1 else False
     else:
@@ -546,7 +576,7 @@ def _check_path_integrity(block_id, block_dict, extra_args):
                 output += f"Group write permissions set on directory {path}\n"
             if bool(permissions & stat.S_IWOTH):
                 output += f"Other write permissions set on directory {path}\n"
-            if pathlib.Path(path).owner() != "root":
+            if hubblestack.utils.identity.user_name(permissions.st_uid) != "root":
                 output += f"{path} is not owned by root\n"
         else:
             output += f"{path} is not a directory\n"
@@ -558,48 +588,36 @@ def _check_duplicate_uids(block_id, block_dict, extra_args):
     """
     Return False if any duplicate user id exist in /etc/group file, else return True
     """
-    with open("/etc/passwd", "r") as passwd:
-        users = [item.split(":")[2] for item in passwd.readlines()]
-        duplicate_uids = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_uids is None or duplicate_uids == []:
-        return True
-    return str(duplicate_uids)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.users_by_uid)
+    return True if not duplicates else str(duplicates)
 
 
 def _check_duplicate_gids(block_id, block_dict, extra_args):
     """
     Return False if any duplicate group id exist in /etc/group file, else return True
     """
-    with open("/etc/group", "r") as group:
-        users = [item.split(":")[2] for item in group.readlines()]
-        duplicate_gids = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_gids is None or duplicate_gids == []:
-        return True
-    return str(duplicate_gids)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.groups_by_gid)
+    return True if not duplicates else str(duplicates)
 
 
 def _check_duplicate_unames(block_id, block_dict, extra_args):
     """
     Return False if any duplicate user names exist in /etc/group file, else return True
     """
-    with open("/etc/passwd", "r") as passwd:
-        users = [item.split(":")[0] for item in passwd.readlines()]
-        duplicate_unames = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_unames is None or duplicate_unames == []:
-        return True
-    return str(duplicate_unames)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.users_by_name)
+    return True if not duplicates else str(duplicates)
 
 
 def _check_duplicate_gnames(block_id, block_dict, extra_args):
     """
     Return False if any duplicate group names exist in /etc/group file, else return True
     """
-    with open("/etc/group", "r") as group:
-        groups = [item.split(":")[0] for item in group.readlines()]
-        duplicate_gnames = [item for item in set(groups) if groups.count(item) > 1]
-    if duplicate_gnames is None or duplicate_gnames == []:
-        return True
-    return str(duplicate_gnames)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.groups_by_name)
+    return True if not duplicates else str(duplicates)
 
 
 def _check_directory_files_permission(block_id, block_dict, extra_args=None):
@@ -705,34 +723,25 @@ def _check_all_users_home_directory(block_id, block_dict, extra_args=None):
     """
     Ensure all users' home directories exist
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        users_uids_dirs = [
-            " ".join([item.split(":")[0], item.split(":")[2], item.split(":")[5], item.split(":")[6].strip()])
-            for item in lines
-        ]
+    max_system_uid = runner_utils.get_param_for_module(block_id, block_dict, "max_system_uid")
+    max_system_uid = int(max_system_uid)
+
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_data in users_uids_dirs:
-        user_uid_dir = user_data.strip().split(" ")
-        if len(user_uid_dir) < 4:
-            user_uid_dir = user_uid_dir + [""] * (4 - len(user_uid_dir))
-        if user_uid_dir[1].isdigit():
+    for entry in accounts.passwd:
+        if entry.uid.isdigit():
             if (
-                not _is_valid_home_directory(user_uid_dir[2], True)
-                and int(user_uid_dir[1]) >= max_system_uid
-                and user_uid_dir[0] != "nfsnobody"
-                and "nologin" not in user_uid_dir[3]
-                and "false" not in user_uid_dir[3]
+                not accounts.is_valid_home(entry.home, True)
+                and int(entry.uid) >= max_system_uid
+                and entry.name != "nfsnobody"
+                and "nologin" not in entry.shell
+                and "false" not in entry.shell
             ):
                 error += [
-                    "Either home directory "
-                    + user_uid_dir[2]
-                    + " of user "
-                    + user_uid_dir[0]
-                    + " is invalid or does not exist."
+                    "Either home directory " + entry.home + " of user " + entry.name + " is invalid or does not exist."
                 ]
         else:
-            error += ["User " + user_uid_dir[0] + " has invalid uid " + user_uid_dir[1]]
+            error += ["User " + entry.name + " has invalid uid " + entry.uid]
     return True if not error else str(error)
 
 
@@ -748,36 +757,44 @@ def _check_users_home_directory_permissions(block_id, block_dict, extra_args=Non
         if user.strip() != "":
             users_list.append(user.strip())
 
-    users_dirs = []
-    cmd = __mods__["cmd.run_all"]('egrep -v "^\\+" /etc/passwd ')
-    for line in cmd["stdout"].split("\n"):
-        tokens = line.split(":")
-        if tokens[0] not in users_list and "nologin" not in tokens[6] and "false" not in tokens[6]:
-            users_dirs.append(tokens[0] + " " + tokens[5])
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split(" ")
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            result = _compare_file_stats(block_id, user_dir[1], max_allowed_permission, True)
+    for entry in accounts.passwd:
+        if entry.nis or entry.name in users_list or "nologin" in entry.shell or "false" in entry.shell:
+            continue
+        if accounts.is_valid_home(entry.home):
+            home_mode = accounts.home_stat(entry.home.strip()).st_mode
+            result = _compare_mode(block_id, home_mode, max_allowed_permission, True)
             if result is not True:
                 error += [
-                    "permission on home directory " + user_dir[1] + " of user " + user_dir[0] + " is wrong: " + result
+                    "permission on home directory " + entry.home + " of user " + entry.name + " is wrong: " + result
                 ]
 
     return True if error == [] else str(error)
 
 
-def _is_valid_home_directory(directory_path, check_slash_home=False):
-    directory_path = None if directory_path is None else directory_path.strip()
-    if directory_path is not None and directory_path != "" and os.path.isdir(directory_path):
-        if check_slash_home and directory_path == "/":
-            return False
-        else:
-            return True
+def _compare_mode(block_id, st_mode, permission, allow_more_strict=False):
+    """
+    _compare_file_stats for a mode that has already been stat'd
+    """
+    mode = hubblestack.utils.files.normalize_mode(oct(stat.S_IMODE(st_mode)))
+    comparator_args = {
+        "type": "file_permission",
+        "match": {"required_value": permission, "allow_more_strict": allow_more_strict},
+    }
 
-    return False
+    ret_status, ret_val = hubblestack.module_runner.comparator.run(block_id, comparator_args, mode)
+    return True if ret_status else mode
+
+
+def _find_dot_files(directory):
+    """
+    Paths below directory whose name starts with a dot, like ``find <directory> -name ".*"``
+    """
+    for root, dirs, files in os.walk(directory):
+        for name in dirs + files:
+            if name.startswith("."):
+                yield os.path.join(root, name)
 
 
 def _check_users_own_their_home(block_id, block_dict, extra_args=None):
@@ -787,49 +804,22 @@ def _check_users_own_their_home(block_id, block_dict, extra_args=None):
     max_system_uid = runner_utils.get_param_for_module(block_id, block_dict, "max_system_uid")
     max_system_uid = int(max_system_uid)
 
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        users_uids_dirs = [
-            " ".join([item.split(":")[0], item.split(":")[2], item.split(":")[5], item.split(":")[6].strip()])
-            for item in lines
-        ]
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_data in users_uids_dirs:
-        user_uid_dir = user_data.strip().split(" ")
-        if len(user_uid_dir) < 4:
-            user_uid_dir = user_uid_dir + [""] * (4 - len(user_uid_dir))
-        if user_uid_dir[1].isdigit():
-            if not _is_valid_home_directory(user_uid_dir[2]):
-                if (
-                    int(user_uid_dir[1]) >= max_system_uid
-                    and "nologin" not in user_uid_dir[3]
-                    and "false" not in user_uid_dir[3]
-                ):
-                    error += [
-                        "Either home directory "
-                        + user_uid_dir[2]
-                        + " of user "
-                        + user_uid_dir[0]
-                        + " is invalid or does not exist."
-                    ]
-            elif (
-                int(user_uid_dir[1]) >= max_system_uid
-                and user_uid_dir[0] != "nfsnobody"
-                and "nologin" not in user_uid_dir[3]
-                and "false" not in user_uid_dir[3]
-            ):
-                owner = __mods__["cmd.run"]('stat -L -c "%U" "' + user_uid_dir[2] + '"')
-                if owner != user_uid_dir[0]:
-                    error += [
-                        "The home directory "
-                        + user_uid_dir[2]
-                        + " of user "
-                        + user_uid_dir[0]
-                        + " is owned by "
-                        + owner
-                    ]
-        else:
-            error += ["User " + user_uid_dir[0] + " has invalid uid " + user_uid_dir[1]]
+    for entry in accounts.passwd:
+        if not entry.uid.isdigit():
+            error += ["User " + entry.name + " has invalid uid " + entry.uid]
+            continue
+        if int(entry.uid) < max_system_uid or "nologin" in entry.shell or "false" in entry.shell:
+            continue
+        if not accounts.is_valid_home(entry.home):
+            error += [
+                "Either home directory " + entry.home + " of user " + entry.name + " is invalid or does not exist."
+            ]
+        elif entry.name != "nfsnobody":
+            owner = accounts.owner_name(accounts.home_stat(entry.home.strip()).st_uid)
+            if owner != entry.name:
+                error += ["The home directory " + entry.home + " of user " + entry.name + " is owned by " + owner]
 
     return True if not error else str(error)
 
@@ -840,30 +830,22 @@ def _check_users_dot_files(block_id, block_dict, extra_args):
     """
 
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            dot_files = _execute_shell_command("find " + user_dir[1] + ' -name ".*"').strip()
-            dot_files = dot_files.split("\n") if dot_files != "" else []
-            for dot_file in dot_files:
-                if os.path.isfile(dot_file):
-                    path_details = __mods__["file.stats"](dot_file)
-                    given_permission = path_details.get("mode")
-                    file_permission = given_permission[-3:]
-                    if file_permission[1] in ["2", "3", "6", "7"]:
-                        error += ["Group Write permission set on file " + dot_file + " for user " + user_dir[0]]
-                    if file_permission[2] in ["2", "3", "6", "7"]:
-                        error += ["Other Write permission set on file " + dot_file + " for user " + user_dir[0]]
+    for entry in accounts.passwd:
+        if to_ignore(entry.line) or not accounts.is_valid_home(entry.home):
+            continue
+        for dot_file in _find_dot_files(entry.home.strip()):
+            try:
+                permissions = os.stat(dot_file).st_mode
+            except OSError:
+                continue
+            if not stat.S_ISREG(permissions):
+                continue
+            if permissions & stat.S_IWGRP:
+                error += ["Group Write permission set on file " + dot_file + " for user " + entry.name]
+            if permissions & stat.S_IWOTH:
+                error += ["Other Write permission set on file " + dot_file + " for user " + entry.name]
 
     return True if error == [] else str(error)
 
@@ -873,21 +855,14 @@ def _check_users_forward_files(block_id, block_dict, extra_args):
     Ensure no users have .forward files
     """
 
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            forward_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".forward"').strip()
-            if forward_file is not None and os.path.isfile(forward_file):
+    for entry in accounts.passwd:
+        if accounts.is_valid_home(entry.home):
+            forward_file = os.path.join(entry.home.strip(), ".forward")
+            if os.path.isfile(forward_file):
                 error += [
-                    "Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has " + forward_file + " file"
+                    "Home directory: " + entry.home + ", for user: " + entry.name + " has " + forward_file + " file"
                 ]
 
     return True if error == [] else str(error)
@@ -898,20 +873,11 @@ def _check_users_netrc_files(block_id, block_dict, extra_args):
     Ensure no users have .netrc files
     """
 
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            netrc_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".netrc"').strip()
-            if netrc_file is not None and os.path.isfile(netrc_file):
-                error += ["Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has .netrc file"]
+    for entry in accounts.passwd:
+        if accounts.is_valid_home(entry.home) and os.path.isfile(os.path.join(entry.home.strip(), ".netrc")):
+            error += ["Home directory: " + entry.home + ", for user: " + entry.name + " has .netrc file"]
 
     return True if error == [] else str(error)
 
@@ -920,13 +886,9 @@ def _check_groups_validity(block_id, block_dict, extra_args):
     """
     Ensure all groups in /etc/passwd exist in /etc/group
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        group_ids_in_passwd = set([line.split(":")[3] for line in lines])
-    with open("/etc/group", "r") as group:
-        lines = group.readlines()
-        group_ids_in_group = set([line.split(":")[2] for line in lines])
-    invalid_group_ids = group_ids_in_passwd.difference(group_ids_in_group)
+    accounts = hubblestack.utils.accounts.snapshot()
+    group_ids_in_passwd = set(entry.gid for entry in accounts.passwd)
+    invalid_group_ids = group_ids_in_passwd.difference(accounts.groups_by_gid)
     output_list = [f"Invalid groupid: {item} in /etc/passwd file" for item in invalid_group_ids]
 
     return True if output_list == [] else str(output_list)
@@ -965,21 +927,13 @@ def _check_users_rhosts_files(block_id, block_dict, extra_args):
     """
 
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            rhosts_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".rhosts"').strip()
-            if rhosts_file is not None and os.path.isfile(rhosts_file):
-                error += ["Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has .rhosts file"]
+    for entry in accounts.passwd:
+        if to_ignore(entry.line) or not accounts.is_valid_home(entry.home):
+            continue
+        if os.path.isfile(os.path.join(entry.home.strip(), ".rhosts")):
+            error += ["Home directory: " + entry.home + ", for user: " + entry.name + " has .rhosts file"]
     return True if error == [] else str(error)
 
 
@@ -989,12 +943,7 @@ def _check_netrc_files_accessibility(block_id, block_dict, extra_args):
     """
 
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(line.split(":")[5])
+    users_dirs = [entry.home for entry in hubblestack.utils.accounts.snapshot().passwd if not to_ignore(entry.line)]
 
     output = ""
     for user_dir in users_dirs:
@@ -1177,19 +1126,20 @@ def _ensure_max_password_expiration(block_id, block_dict, extra_args=None):
     if int(system_pass_max_days) > allow_max_days:
         return "PASS_MAX_DAYS must be less than or equal to " + str(allow_max_days)
 
-    # fetch all users with passwords
-    grep_args.append("-E")
-    all_users = _grep("/etc/shadow", "^[^:]+:[^\\!*]", *grep_args).get("stdout")
+    # all users with passwords
+    all_users = [
+        entry for entry in hubblestack.utils.accounts.snapshot().shadow if entry.passwd[:1] not in ("", "!", "*")
+    ]
 
     except_for_users_list = []
     for user in except_for_users.split(","):
         if user.strip() != "":
             except_for_users_list.append(user.strip())
     result = []
-    for line in all_users.split("\n"):
-        user = line.split(":")[0]
+    for entry in all_users:
+        user = entry.name
         # As per CIS doc, 5th field is the password max expiry days
-        user_passwd_expiry = line.split(":")[4]
+        user_passwd_expiry = entry.max
         if (
             not user in except_for_users_list
             and user_passwd_expiry.isnumeric()
@@ -1323,6 +1273,12 @@ def _execute_shell_command(cmd, python_shell=False):
 FUNCTION_MAP = {
     "check_all_ports_firewall_rules": _check_all_ports_firewall_rules,
     "check_password_fields_not_empty": _check_password_fields_not_empty,
+    "ungrouped_files_or_dir": _ungrouped_files_or_dir,
+    "unowned_files_or_dir": _unowned_files_or_dir,
+    "world_writable_file": _world_writable_file,
+    "sticky_bit_on_world_writable_dirs": _sticky_bit_on_world_writable_dirs,
+    "check_unowned_files": _unowned_files_or_dir,
+    "check_ungrouped_files": _ungrouped_files_or_dir,
     "system_account_non_login": _system_account_non_login,
     "default_group_for_root": _default_group_for_root,
     "root_is_only_uid_0_account": _root_is_only_uid_0_account,
@@ -182,10 +182,13 @@ import logging
 import fnmatch
 
 import hubblestack.module_runner.runner_utils as runner_utils
+import hubblestack.utils.pkg.inventory
 from hubblestack.exceptions import HubbleCheckValidationError
 
 log = logging.getLogger(__name__)
 
+__grains__ = {}
+
 
 def validate_params(block_id, block_dict, extra_args=None):
     """
@@ -240,11 +243,15 @@ def execute(block_id, block_dict, extra_args=None):
     if not name:
         name = runner_utils.get_param_for_module(block_id, block_dict, 'name')
 
-    installed_pkgs_dict = __mods__['pkg.list_pkgs']()
-    filtered_pkgs_list = fnmatch.filter(installed_pkgs_dict, name)
-    result_dict = {}
-    for package in filtered_pkgs_list:
-        result_dict[package] = installed_pkgs_dict[package]
+    inventory = hubblestack.utils.pkg.inventory.get(__grains__)
+    if inventory is not None:
+        result_dict = inventory.filter(name)
+    else:
+        installed_pkgs_dict = __mods__['pkg.list_pkgs']()
+        filtered_pkgs_list = fnmatch.filter(installed_pkgs_dict, name)
+        result_dict = {}
+        for package in filtered_pkgs_list:
+            result_dict[package] = installed_pkgs_dict[package]
 
     return runner_utils.prepare_positive_result_for_module(block_id, result_dict)
 
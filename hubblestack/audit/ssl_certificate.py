@@ -138,7 +138,12 @@ Module Arguments
     Only required if no endpoint (host, port) is provided
 - ssl_timeout (Optional, Default value - 3 seconds)
     timeout value in seconds to be honoured only if host_ip, host_port is given
-    
+
+Certificates fetched from an endpoint are cached per (host, port) for
+``probe_cert_ttl`` seconds (config option, default 300). In Audit, the
+endpoints of all checks in a profile are contacted concurrently before the
+checks run (see hubblestack.utils.probe).
+
 Module Output
 -------------
 {
@@ -212,12 +217,11 @@ main:
 """
 import logging
 import OpenSSL
-import ssl
 import time
 from datetime import datetime
-from socket import setdefaulttimeout
 
 import hubblestack.module_runner.runner_utils as runner_utils
+import hubblestack.utils.probe
 from hubblestack.exceptions import HubbleCheckValidationError
 
 log = logging.getLogger(__name__)
@@ -349,17 +353,47 @@ def get_filtered_params_to_log(block_id, block_dict, extra_args=None):
             'host_port': host_port}
 
 
+def get_probes(block_id, block_dict, extra_args=None):
+    """
+    Return the endpoint probe of this check, for the runner to prefetch it
+    concurrently with the probes of the other checks
+
+    :param block_id:
+        id of the block
+    :param block_dict:
+        parameter for this module
+    :param extra_args:
+        Extra argument dictionary, (If any)
+    """
+    if runner_utils.get_chained_param(extra_args):
+        return []
+    host_ip = runner_utils.get_param_for_module(block_id, block_dict, 'host_ip')
+    host_port = runner_utils.get_param_for_module(block_id, block_dict, 'host_port')
+    if not host_ip or not host_port:
+        return []
+    ssl_timeout = runner_utils.get_param_for_module(block_id, block_dict, 'ssl_timeout', 3)
+    return [_cert_probe(host_ip, host_port, ssl_timeout)]
+
+
 def _get_cert(source, port=443, ssl_timeout=3, from_file=False):
     cert = _get_cert_from_file(source) if from_file else _get_cert_from_endpoint(source, port, ssl_timeout)
     return cert
 
 
+def _cert_probe(server, port, ssl_timeout):
+    """
+    The probe fetching the certificate of an endpoint; certificates are cached
+    for ``probe_cert_ttl`` seconds
+    """
+    return (('ssl_certificate', str(server), int(port)), hubblestack.utils.probe.get_certificate,
+            (server, port, ssl_timeout), __opts__.get('probe_cert_ttl', 300))
+
+
 def _get_cert_from_endpoint(server, port=443, ssl_timeout=3):
     try:
         log.debug("ssl_certificate is checking for ssl cert on {0}:{1}".format(server, port))
-        hostport = (str(server), int(port))
-        setdefaulttimeout(ssl_timeout)
-        cert_details = ssl.get_server_certificate(hostport)
+        key, func, args, ttl = _cert_probe(server, port, ssl_timeout)
+        cert_details = hubblestack.utils.probe.fetch(key, func, *args, ttl=ttl)
     except Exception as e:
         log.error('Unable to retrieve certificate from {0}. Error: {1}'.format(server, e))
         cert_details = None
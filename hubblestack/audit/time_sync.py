@@ -205,6 +205,7 @@ import hubblestack.module_runner.runner_utils as runner_utils
 from hubblestack.exceptions import HubbleCheckValidationError
 
 import hubblestack.utils.platform
+import hubblestack.utils.probe
 
 if not hubblestack.utils.platform.is_windows():
     import ntplib
@@ -261,8 +262,9 @@ def execute(block_id, block_dict, extra_args=None):
 
     time_sync_result = []
 
-    for ntp_server in ntp_servers:
-        offset = _query_ntp_server(ntp_server)
+    # the servers are queried concurrently, results are in the order of ntp_servers
+    offsets = hubblestack.utils.probe.run_all([(_query_ntp_server, (ntp_server,)) for ntp_server in ntp_servers])
+    for ntp_server, offset in zip(ntp_servers, offsets):
         if not offset:
             time_sync_result.append({
                 'ntp_server': ntp_server,
@@ -218,7 +218,25 @@ VALID_OPTS = {
     # other non-salt hubble-specific things
     "fileserver_update_frequency": int,
     "grains_refresh_frequency": int,
-    "scheduler_sleep_frequency": float,
+    # Number of grain functions to run at the same time during a grains refresh
+    "grains_worker_threads": int,
+    # Seconds after which a single grain function is given up on (0 to wait forever)
+    "grains_timeout": (int, float),
+    # Map of grain function names (fnmatch globs allowed) to the number of
+    # seconds their last return is reused before the function is called again
+    "grains_cache_ttl": dict,
+    # Start the daemon on the cached grains and refresh them in the background
+    "grains_warm_start": bool,
+    # Oldest grains cache (in seconds) the warm start will use
+    "grains_warm_start_max_age": int,
+    # Grain functions that are always recomputed before cached grains are used
+    "grains_volatile": list,
+    # Number of worker threads shared by scheduled jobs (see hubblestack.scheduler)
+    "scheduler_pool_size": int,
+    # Longest the main loop sleeps between scheduler passes, in seconds
+    "scheduler_max_sleep": (int, float),
+    # Functions whose scheduled jobs get a worker thread of their own
+    "scheduler_dedicated_functions": list,
     "default_include": str,
     "logfile_maxbytes": int,
     "logfile_backups": int,
@@ -277,6 +295,53 @@ VALID_OPTS = {
     "ipv6": (type(None), bool),
     # The chunk size to use when streaming files with the file server
     "file_buffer_size": int,
+    # Sync cp.cache_dir against a manifest of the cached copies instead of
+    # hashing both sides of every file
+    "cache_dir_bulk": bool,
+    # Number of files cp.cache_dir hashes and fetches concurrently
+    "cache_dir_workers": int,
+    # Seconds the audit runner waits for the endpoints of a profile's checks
+    # (ssl_certificate, curl) it contacts concurrently before running them
+    "probe_deadline": (int, float),
+    # Seconds certificates fetched from an endpoint are cached for
+    "probe_cert_ttl": (int, float),
+    # Only send the audit checks whose result changed since the previous run
+    # (splunk_nova_return), with periodic full snapshots
+    "audit_changes_only": bool,
+    # Seconds between two full snapshots of the audit results, 0 for none
+    "audit_full_snapshot_interval": int,
+    # File of the last reported audit results, defaults to <cachedir>/audit_ledger.json
+    "audit_ledger": (type(None), str),
+    # Return only the rows added/removed since the previous run for every
+    # nebula query, not only those with differential: True
+    "nebula_differential": bool,
+    # Seconds between two full snapshots of the differential nebula queries
+    "nebula_snapshot_interval": int,
+    # Directory of the rows of the previous run of differential nebula queries,
+    # defaults to <cachedir>/nebula_snapshots
+    "nebula_snapshot_dir": (type(None), str),
+    # Keep parsed audit/FDG/nova profiles in memory, keyed by their content
+    "profile_cache": bool,
+    # Number of parsed profiles kept in memory
+    "profile_cache_size": int,
+    # Also keep the parsed profiles under <cachedir>/profile_cache
+    "profile_cache_disk": bool,
+    # Number of audit checks of a profile run at a time
+    "audit_workers": int,
+    # Number of audit checks run at a time per audit module, e.g. {"osquery": 1}
+    "audit_module_workers": dict,
+    # Audit checks run one at a time while the load average per CPU is above
+    # this: a new check waits until the checks in flight are done
+    "audit_max_load": (type(None), int, float),
+    # Read pulsar's inotify events with hubblestack.utils.inotify instead of
+    # pyinotify's Notifier
+    "pulsar_native_inotify": bool,
+    # Keep a baseline of the paths pulsar watches and report what changed while
+    # hubble was not running
+    "pulsar_baseline": bool,
+    # The sqlite database of the pulsar baseline, pulsar_baseline.sqlite in the
+    # cachedir when not set
+    "pulsar_baseline_db": (type(None), str),
     # The TCP port on which minion events should be published if ipc_mode is TCP
     "tcp_pub_port": int,
     # The TCP port on which minion events should be pulled if ipc_mode is TCP
@@ -521,6 +586,8 @@ VALID_OPTS = {
     "gitfs_ref_types": list,
     "gitfs_refspecs": list,
     "gitfs_disable_saltenv_mapping": bool,
+    # The number of gitfs remotes fetched at once
+    "gitfs_fetch_workers": int,
     "hgfs_remotes": list,
     "hgfs_mountpoint": str,
     "hgfs_root": str,
@@ -906,7 +973,34 @@ DEFAULT_OPTS = {
     "file_client": "local",
     "fileserver_update_frequency": 43200, # 12 hours
     "grains_refresh_frequency": 3600, # 1 hour
-    "scheduler_sleep_frequency": 0.5, # 500ms
+    "grains_worker_threads": 8,
+    "grains_timeout": 120,
+    "grains_cache_ttl": {
+        "cloud_details.get_cloud_details": 21600, # 6 hours
+        "systemuuid.get_system_uuid": 21600,
+        "disks.disks": 21600,
+        "mdadm.mdadm": 21600,
+        "zfs.zfs": 21600,
+    },
+    "grains_warm_start": False,
+    "grains_warm_start_max_age": 604800, # 1 week
+    "grains_volatile": [
+        "core.hostname",
+        "core.ip_fqdn",
+        "core.ip_interfaces",
+        "core.ip4_interfaces",
+        "core.ip6_interfaces",
+        "core.hwaddr_interfaces",
+        "default_gw.default_gateway",
+        "fqdn.fqdn",
+        "fqdn.dest_ip",
+        "hubble_process.grains",
+        "hubbleversion.hubble_version",
+        "hubbleversion.hubble_build_metadata",
+    ],
+    "scheduler_pool_size": 4,
+    "scheduler_max_sleep": 60,
+    "scheduler_dedicated_functions": ["pulsar.process", "win_pulsar.process"],
     "default_include": 'hubble.d/*.conf',
     "logfile_maxbytes": 100000000, # 100MB kindof
     "logfile_backups": 1, # max rotated logs
@@ -972,6 +1066,7 @@ DEFAULT_OPTS = {
     "gitfs_ref_types": ["branch", "tag", "sha"],
     "gitfs_refspecs": _DFLT_REFSPECS,
     "gitfs_disable_saltenv_mapping": False,
+    "gitfs_fetch_workers": 4,
     "unique_jid": False,
     "hash_type": "sha256",
     "optimization_order": [0, 1, 2],
@@ -1001,6 +1096,25 @@ DEFAULT_OPTS = {
     "ipc_write_buffer": _DFLT_IPC_WBUFFER,
     "ipv6": None,
     "file_buffer_size": 262144,
+    "cache_dir_bulk": True,
+    "cache_dir_workers": 4,
+    "probe_deadline": 30,
+    "probe_cert_ttl": 300,
+    "audit_changes_only": False,
+    "audit_full_snapshot_interval": 86400,
+    "audit_ledger": None,
+    "nebula_differential": False,
+    "nebula_snapshot_interval": 86400,
+    "nebula_snapshot_dir": None,
+    "profile_cache": True,
+    "profile_cache_size": 256,
+    "profile_cache_disk": False,
+    "audit_workers": 1,
+    "audit_module_workers": {"osquery": 1},
+    "audit_max_load": None,
+    "pulsar_native_inotify": True,
+    "pulsar_baseline": False,
+    "pulsar_baseline_db": None,
     "tcp_pub_port": 4510,
     "tcp_pull_port": 4511,
     "tcp_authentication_retries": 5,
@@ -1652,6 +1766,13 @@ def apply_config(overrides=None, defaults=None, cache_minion_id=False, minion_id
             )
             opts["saltenv"] = opts["environment"]
 
+    if "scheduler_sleep_frequency" in overrides:
+        log.warning(
+            "The 'scheduler_sleep_frequency' config option is no longer used, "
+            "the scheduler sleeps until the next job is due (at most "
+            "'scheduler_max_sleep' seconds). Ignoring it."
+        )
+
     for idx, val in enumerate(opts["fileserver_backend"]):
         if val in ("git", "hg", "svn", "minion"):
             new_val = val + "fs"
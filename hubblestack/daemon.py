@@ -5,20 +5,18 @@ Main entry point for the hubble daemon
 
 import argparse
 import copy
+import functools
 import json
 import logging
-import math
 import traceback
 import os
 import pprint
 import re
-import random
 import signal
-import socket
 import sys
+import threading
 import time
 import uuid
-from datetime import datetime
 
 import hubblestack.fileserver
 import hubblestack.fileserver.gitfs
@@ -28,7 +26,6 @@ import hubblestack.utils.platform
 import hubblestack.utils.jid
 import hubblestack.utils.gitfs
 import hubblestack.utils.path
-from croniter import croniter
 
 import hubblestack.loader
 import hubblestack.utils.signing
@@ -43,6 +40,7 @@ from hubblestack.hangtime import hangtime_wrapper
 import hubblestack.status
 import hubblestack.fileclient
 import hubblestack.saltoverrides
+import hubblestack.scheduler
 import hubblestack.module_runner.runner
 import hubblestack.module_runner.audit_runner
 import hubblestack.module_runner.fdg_runner
@@ -57,6 +55,16 @@ if not hubblestack.utils.platform.is_windows():
 __opts__ = {}
 # This should work fine until we go to multiprocessing
 SESSION_UUID = str(uuid.uuid4())
+# Grains computed by the background refresh after a warm start, waiting to be
+# swapped in by the main loop (see refresh_grains)
+BACKGROUND_GRAINS = {}
+BACKGROUND_GRAINS_LOCK = threading.Lock()
+# Decides when scheduled jobs are due and runs them; see hubblestack.scheduler,
+# _get_scheduler and _get_executor
+SCHEDULER = None
+EXECUTOR = None
+# Set to wake the main loop before its next deadline
+WAKEUP = threading.Event()
 
 
 def run():
@@ -108,10 +116,10 @@ def _clear_gitfs_locks():
             log.info("One or more gitfs locks were removed: %s", ret)
 
 
-def _emit_and_refresh_grains():
+def _emit_and_refresh_grains(new_grains=None):
     """When the grains refresh frequency has expired, refresh grains and emit to syslog"""
     log.info("Refreshing grains")
-    refresh_grains()
+    refresh_grains(new_grains=new_grains)
     last_grains_refresh = time.time()
     # Emit syslog at grains refresh frequency
     if not (hubblestack.utils.platform.is_windows()) and __opts__.get(
@@ -189,18 +197,26 @@ def main():
         run_function()
         sys.exit(0)
     last_grains_refresh = time.time() - __opts__["grains_refresh_frequency"]
+    if "thread" in BACKGROUND_GRAINS:
+        # we started on cached grains, the background refresh replaces the
+        # first regular refresh
+        last_grains_refresh = time.time()
     log.info("Starting main loop")
-    pidfile_count = 0
-    # pidfile_refresh in seconds, our scheduler deals in half-seconds
-    pidfile_refresh = int(__opts__.get("pidfile_refresh", 60)) * 2
+    last_pidfile_refresh = time.time()
+    pidfile_refresh = int(__opts__.get("pidfile_refresh", 60))
     while True:
         # Check if fileserver needs update
         if time.time() - last_fc_update >= __opts__["fileserver_update_frequency"]:
             last_fc_update = _update_fileserver(file_client)
-        pidfile_count += 1
-        if __opts__["daemonize"] and pidfile_count > pidfile_refresh:
-            pidfile_count = 0
+        if __opts__["daemonize"] and time.time() - last_pidfile_refresh >= pidfile_refresh:
+            last_pidfile_refresh = time.time()
             create_pidfile()
+        new_grains, failed = _take_background_grains()
+        if new_grains is not None:
+            last_grains_refresh = _emit_and_refresh_grains(new_grains=new_grains)
+        elif failed:
+            # the background refresh died, fall back to the regular refresh
+            last_grains_refresh = time.time() - __opts__["grains_refresh_frequency"]
         if time.time() - last_grains_refresh >= __opts__["grains_refresh_frequency"]:
             last_grains_refresh = _emit_and_refresh_grains()
         try:
@@ -210,72 +226,39 @@ def main():
             log.exception("Error executing schedule: %s", exc)
             if isinstance(exc, KeyboardInterrupt):
                 raise exc
-        time.sleep(__opts__.get("scheduler_sleep_frequency", 0.5))
-
-
-def getsecondsbycronexpression(base, cron_exp):
-    """
-    this function will return the seconds according to the cron
-    expression provided in the hubble config
-    """
-    cron_iter = croniter(cron_exp, base)
-    next_datetime = cron_iter.get_next(datetime)
-    epoch_base_datetime = time.mktime(base.timetuple())
-    epoch_datetime = time.mktime(next_datetime.timetuple())
-    seconds = int(epoch_datetime) - int(epoch_base_datetime)
-    return seconds
-
-
-def getlastrunbycron(base, seconds):
-    """
-    this function will use the cron_exp provided in the hubble config to
-    execute the hubble processes as per the scheduled cron time
-    """
-    epoch_base_datetime = time.mktime(base.timetuple())
-    epoch_datetime = epoch_base_datetime
-    current_time = time.time()
-    while (epoch_datetime + seconds) < current_time:
-        epoch_datetime = epoch_datetime + seconds
-    last_run = epoch_datetime
-    return last_run
+        # Sleep until the next job or housekeeping task is due, or until
+        # something (a signal, the background grains refresh) wakes us up
+        deadlines = [
+            last_fc_update + __opts__["fileserver_update_frequency"],
+            last_grains_refresh + __opts__["grains_refresh_frequency"],
+        ]
+        if __opts__["daemonize"]:
+            deadlines.append(last_pidfile_refresh + pidfile_refresh)
+        next_job = _get_scheduler().next_deadline()
+        if next_job is not None:
+            deadlines.append(next_job)
+        _sleep_until(min(deadlines))
 
 
-def getlastrunbybuckets(buckets, seconds):
+def _sleep_until(deadline):
     """
-    this function will use the host's ip to place the host in a bucket
-    where each bucket executes hubble processes at a different time
+    Sleep until ``deadline`` (at most ``scheduler_max_sleep`` seconds) or
+    until WAKEUP is set
     """
-    buckets = int(buckets) if int(buckets) != 0 else 256
-    host_ip = socket.gethostbyname(socket.gethostname())
-    ips = host_ip.split(".")
-    bucket_sum = (
-        (int(ips[0]) * 256 * 256 * 256)
-        + (int(ips[1]) * 256 * 256)
-        + (int(ips[2]) * 256)
-        + int(ips[3])
-    )
-    bucket = bucket_sum % buckets
-    log.debug("bucket number is %d out of %d", bucket, buckets)
-    current_time = time.time()
-    base_time = seconds * (math.floor(current_time / seconds))
-    splay = seconds / buckets
-    seconds_between_buckets = splay
-    random_int = random.randint(0, splay - 1) if splay != 0 else 0
-    bucket_execution_time = base_time + (seconds_between_buckets * bucket) + random_int
-    if bucket_execution_time < current_time:
-        last_run = bucket_execution_time
-    else:
-        last_run = bucket_execution_time - seconds
-    return last_run
+    timeout = min(deadline - time.time(), __opts__.get("scheduler_max_sleep", 60))
+    if timeout > 0:
+        WAKEUP.wait(timeout)
+    WAKEUP.clear()
 
 
 @HSS.watch
 def schedule():
     """
-    Rudimentary single-pass scheduler
+    Single-pass scheduler: dispatch the jobs that are due
 
-    If we find we miss some of the salt scheduler features we could potentially
-    pull in some of that code.
+    The jobs are kept in a heap by hubblestack.scheduler.Scheduler, so a pass
+    only looks at the jobs whose time has come, and the main loop sleeps until
+    the next one is due.
 
     Schedule data should be placed in the config with the following format:
 
@@ -302,9 +285,11 @@ def schedule():
     function
         Function to run in the format ``<module>.<function>``. Technically any
         salt module can be run in this way, but we recommend sticking to hubble
-        functions. For simplicity, functions are run in the main daemon thread,
-        so overloading the scheduler can result in functions not being run in
-        a timely manner.
+        functions. Functions are run by the JobExecutor in
+        ``hubblestack.scheduler``: ``pulsar.process`` gets a thread of its own
+        and everything else shares a pool of ``scheduler_pool_size`` threads.
+        A job never runs twice at the same time; if it is still running when it
+        comes due again, that run is skipped and counted as a missed deadline.
 
     seconds
         Frequency with which the job should be run, in seconds
@@ -320,6 +305,30 @@ def schedule():
         between <min_splay> and <splay> is chosen. If <min_splay> is not provided, it
         defaults to zero. Optional.
 
+    cron
+        Cron expression giving the times the job runs, instead of every
+        ``seconds``. With a splay, the job runs the (fixed) splay after each
+        cron time. Optional.
+
+    buckets
+        Spread the hosts over this many buckets (by IP) within each
+        ``seconds`` interval, so a fleet doesn't run the job all at once.
+        Optional.
+
+    priority
+        When several jobs are due at the same time (or waiting for a pool
+        thread), higher priorities go first. Defaults to 0. Optional.
+
+    lateness
+        What to do when runs were missed because the daemon fell behind:
+        ``coalesce`` (run once for all of them, the default), ``skip`` (don't
+        run if more than ``max_lateness`` seconds late) or ``catch_up`` (run
+        each missed run). Optional.
+
+    max_lateness
+        Seconds a ``skip`` job may be late and still run. Defaults to
+        ``seconds``. Optional.
+
     args
         List of arguments for the function. Optional.
 
@@ -332,77 +341,87 @@ def schedule():
 
     run_on_start
         Whether to run the scheduled job on daemon start. Defaults to False. Optional.
+
+    concurrency
+        Where the job runs: ``dedicated`` (a thread of its own), ``pool`` (the
+        shared worker pool) or ``inline`` (in the main loop). Defaults to
+        ``dedicated`` for the functions listed in
+        ``scheduler_dedicated_functions`` and ``pool`` for everything else.
+        Optional.
     """
     sf_count = 0
-    base = datetime(2018, 1, 1, 0, 0)
     schedule_config = __opts__.get("schedule", {})
     if "user_schedule" in __opts__ and isinstance(__opts__["user_schedule"], dict):
         schedule_config.update(__opts__["user_schedule"])
-    for jobname, jobdata in schedule_config.items():
+    scheduler = _get_scheduler()
+    scheduler.sync(schedule_config)
+    executor = _get_executor()
+    for job, due, run, missed in scheduler.due_jobs():
         try:
-            # Error handling galore
-            if not jobdata or not isinstance(jobdata, dict):
-                log.error("Scheduled job %s does not have valid data", jobname)
-                continue
-            if "function" not in jobdata or "seconds" not in jobdata:
-                log.error(
-                    "Scheduled job %s is missing a ``function`` or ``seconds`` argument",
-                    jobname,
+            for _ in range(missed):
+                executor.missed(job.name)
+            if not run:
+                log.warning(
+                    "Scheduled job %s is %ds late, skipping this run",
+                    job.name,
+                    time.time() - due,
                 )
                 continue
-            func = jobdata["function"]
-            if func not in __mods__:
+            if job.function not in __mods__:
                 log.error(
                     "Scheduled job %s has a function %s which could not be found.",
-                    jobname,
-                    func,
+                    job.name,
+                    job.function,
                 )
                 continue
-            try:
-                if "cron" in jobdata:
-                    seconds = getsecondsbycronexpression(base, jobdata["cron"])
-                else:
-                    seconds = int(jobdata["seconds"])
-                splay = int(jobdata.get("splay", 0))
-                min_splay = int(jobdata.get("min_splay", 0))
-            except ValueError:
-                log.error(
-                    "Scheduled job %s has an invalid value for seconds or splay.",
-                    jobname,
-                )
-            args = jobdata.get("args", [])
-            if not isinstance(args, list):
-                log.error(
-                    "Scheduled job %s has args not formed as a list: %s", jobname, args
-                )
-            kwargs = jobdata.get("kwargs", {})
-            if not isinstance(kwargs, dict):
-                log.error(
-                    "Scheduled job %s has kwargs not formed as a dict: %s",
-                    jobname,
-                    kwargs,
-                )
-            returners = jobdata.get("returner", [])
-            if not isinstance(returners, list):
-                returners = [returners]
-            # Actually process the job
-            run = _process_job(jobdata, splay, seconds, min_splay, base)
-            if run:
-                _execute_function(jobdata, func, returners, args, kwargs)
+            if job.lateness == "catch_up" and executor.is_running(job.name):
+                # hold on to the run until the previous one finishes
+                scheduler.retry(job, due)
+                continue
+            job.jobdata["last_run"] = time.time()
+            submitted = executor.submit(
+                job.name,
+                job.jobdata,
+                functools.partial(
+                    _execute_function, job.jobdata, job.function, job.returners, job.args, job.kwargs
+                ),
+                due=due,
+            )
+            if submitted:
                 sf_count += 1
         except:
             log.error(
                 "Exception in running job: %s; continuing with next job...",
-                jobname,
+                job.name,
                 exc_info=True,
             )
     return sf_count
 
 
+def _get_scheduler():
+    """Return the Scheduler, creating it on first use"""
+    global SCHEDULER
+    if SCHEDULER is None:
+        SCHEDULER = hubblestack.scheduler.Scheduler()
+    return SCHEDULER
+
+
+def _get_executor():
+    """Return the JobExecutor, creating it on first use"""
+    global EXECUTOR
+    if EXECUTOR is None:
+        EXECUTOR = hubblestack.scheduler.JobExecutor(
+            pool_size=__opts__.get("scheduler_pool_size", 4),
+            dedicated_functions=__opts__.get(
+                "scheduler_dedicated_functions", hubblestack.scheduler.DEFAULT_DEDICATED_FUNCTIONS
+            ),
+        )
+    return EXECUTOR
+
+
 def _execute_function(jobdata, func, returners, args, kwargs):
     """Run the scheduled function"""
     log.debug("Executing scheduled function %s", func)
-    jobdata["last_run"] = time.time()
 
     # Actually run the function
     ret = __mods__[func](*args, **kwargs)
@@ -425,41 +444,6 @@ def _execute_function(jobdata, func, returners, args, kwargs):
         __returners__[returner](returner_ret)
 
 
-def _process_job(jobdata, splay, seconds, min_splay, base):
-    run = False
-    if "last_run" not in jobdata:
-        if jobdata.get("run_on_start", False):
-            if splay:
-                # Run `splay` seconds in the future, by telling the scheduler we last ran it
-                # `seconds - splay` seconds ago.
-                jobdata["last_run"] = time.time() - (
-                    seconds - random.randint(min_splay, splay)
-                )
-            else:
-                # Run now
-                run = True
-                jobdata["last_run"] = time.time()
-        else:
-            if splay:
-                # Run `seconds + splay` seconds in the future by telling the scheduler we last
-                # ran it at now + `splay` seconds.
-                jobdata["last_run"] = time.time() + random.randint(min_splay, splay)
-            elif "buckets" in jobdata:
-                # Place the host in a bucket and fix the execution time.
-                jobdata["last_run"] = getlastrunbybuckets(jobdata["buckets"], seconds)
-                log.debug("last_run according to bucket is %s", jobdata["last_run"])
-            elif "cron" in jobdata:
-                # execute the hubble process based on cron expression
-                jobdata["last_run"] = getlastrunbycron(base, seconds)
-            else:
-                # Run in `seconds` seconds.
-                jobdata["last_run"] = time.time()
-    if jobdata["last_run"] < time.time() - seconds:
-        run = True
-
-    return run
-
-
 def run_function():
     """
     Run a single function requested by the user
@@ -796,9 +780,18 @@ def _setup_dirs():
 # hangtime_wrapper timers (if any)
 @hangtime_wrapper(timeout=600, repeats=True, tag="hubble:rg")
 @HSS.watch
-def refresh_grains(initial=False):
+def refresh_grains(initial=False, new_grains=None):
     """
     Refresh the grains, pillar, utils, modules, and returners
+
+    initial
+        True when called during startup. If ``grains_warm_start`` is set, the
+        cached grains (with the volatile grains recomputed) are used right
+        away and the full grains refresh is started in a background thread.
+
+    new_grains
+        Grains that were already computed (by the background refresh); they
+        are swapped in instead of running the grain functions again.
     """
     global __opts__
     global __grains__
@@ -840,7 +833,15 @@ def refresh_grains(initial=False):
         __opts__.pop("grains")
     if "pillar" in __opts__:
         __opts__.pop("pillar")
-    __grains__ = hubblestack.loader.grains(__opts__)
+    __grains__ = None
+    if new_grains is not None:
+        __grains__ = new_grains
+    elif initial and __opts__.get("grains_warm_start", False):
+        __grains__ = hubblestack.loader.cached_grains(__opts__)
+        if __grains__ is not None:
+            _start_background_grains_refresh()
+    if __grains__ is None:
+        __grains__ = hubblestack.loader.grains(__opts__)
     __grains__.update(persist)
     __grains__["session_uuid"] = SESSION_UUID
 
@@ -921,6 +922,51 @@ def refresh_grains(initial=False):
         hubblestack.log.emit_to_splunk(__grains__, "INFO", "hubblestack.grains_report")
 
 
+def _start_background_grains_refresh():
+    """
+    Compute a fresh set of grains in a background thread. The main loop picks
+    them up from BACKGROUND_GRAINS and swaps them in with refresh_grains.
+    Returns False, without starting another one, while a refresh is running.
+    """
+    # the grains loader writes to the opts it's handed; give it a copy so
+    # the main thread's __opts__ aren't changed underneath it
+    opts = dict(__opts__)
+
+    def _refresh():
+        try:
+            new_grains = hubblestack.loader.grains(opts)
+            with BACKGROUND_GRAINS_LOCK:
+                BACKGROUND_GRAINS["grains"] = new_grains
+        except Exception:
+            log.exception("Background grains refresh failed")
+        WAKEUP.set()
+
+    with BACKGROUND_GRAINS_LOCK:
+        if "thread" in BACKGROUND_GRAINS and BACKGROUND_GRAINS["thread"].is_alive():
+            log.debug("Background grains refresh already in progress")
+            return False
+        thread = threading.Thread(target=_refresh, name="grains-warm-start")
+        thread.daemon = True
+        BACKGROUND_GRAINS.clear()
+        BACKGROUND_GRAINS["thread"] = thread
+        thread.start()
+    return True
+
+
+def _take_background_grains():
+    """
+    Return ``(grains, failed)``: the grains of the background refresh if it
+    finished, else None, and whether it ended without producing any
+    """
+    with BACKGROUND_GRAINS_LOCK:
+        thread = BACKGROUND_GRAINS.get("thread")
+        new_grains = BACKGROUND_GRAINS.pop("grains", None)
+        if new_grains is None and (thread is None or thread.is_alive()):
+            return None, False
+        BACKGROUND_GRAINS.pop("thread", None)
+    return new_grains, new_grains is None
+
+
 def emit_to_syslog(grains_to_emit):
     """
     Emit grains and their values to syslog
@@ -1196,3 +1242,5 @@ def clean_up_process(received_signal, frame):
                     if os.path.isfile(__opts__["pidfile"]):
                         os.remove(__opts__["pidfile"])
             sys.exit(0)
+        # let the main loop take another look at its schedule
+        WAKEUP.set()
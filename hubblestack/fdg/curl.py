@@ -14,9 +14,11 @@ a system, we don't want an attacker to be able to send that data to arbitrary
 endpoints.
 """
 
+import json
 import logging
 import requests
 
+import hubblestack.utils.probe
 
 log = logging.getLogger(__name__)
 
@@ -141,7 +143,9 @@ def _make_request(function, url, **kwargs):
     """
     try:
         if function == 'GET':
-            response = requests.get(url, **kwargs)
+            # identical GETs of concurrent xpipe iterations share one request
+            response = hubblestack.utils.probe.fetch(
+                ('curl', url, json.dumps(kwargs, sort_keys=True, default=str)), _get, url, kwargs)
         elif function == 'PUT':
             response = requests.put(url, **kwargs)
         elif function == 'POST':
@@ -152,6 +156,10 @@ def _make_request(function, url, **kwargs):
     return True, response
 
 
+def _get(url, kwargs):
+    return requests.get(url, **kwargs)
+
+
 def _parse_response(response, decode_json):
     """
     Helper function that extracts the status code and
@@ -46,13 +46,16 @@ Testing -
         |___________________________________________________________________________________________________________________________|
 """
 import OpenSSL
-import ssl
 import time
-from socket import setdefaulttimeout
 import logging
 from datetime import datetime
+
+import hubblestack.utils.probe
+
 log = logging.getLogger(__name__)
 
+__opts__ = {}
+
 def _get_certificate_san(x509cert):
     san = ''
     trimmed_san_list = []
@@ -74,14 +77,14 @@ def _get_certificate_san(x509cert):
 def _load_certificate(ip, port, ssl_timeout):
     """
     fetch server certificate details and return Json with the first value being the
-    status of ssl.get_server_certificate function and second value being the actual
+    status of fetching the certificate and second value being the actual
     certificate data.
     """
     try:
         log.debug("FDG ssl_certificate is checking for ssl cert on {0}:{1}".format(ip,port))
-        hostport = (str(ip), int(port))
-        setdefaulttimeout(ssl_timeout)
-        cert_details = ssl.get_server_certificate(hostport)
+        cert_details = hubblestack.utils.probe.fetch(('ssl_certificate', str(ip), int(port)),
+                                                     hubblestack.utils.probe.get_certificate, ip, port, ssl_timeout,
+                                                     ttl=__opts__.get('probe_cert_ttl', 300))
     except Exception as e:
         message = "FDG ssl_certificate couldn't get cert on {0}:{1}, error : {2}".format(ip,port,e)
         log.debug(message)
@@ -154,7 +157,7 @@ def get_cert_details(params='', chained=None, chained_status=None):
         1. Connect to the port and fetch certificate details.
         2. Connect to the port and exit if no certificate is attached on the port.
     The first return value (status) will be False if the module encounters some
-    exception in python's ssl.get_server_certificate function.
+    exception while fetching the certificate.
 
     params
         :type dict
@@ -8,6 +8,7 @@ NTP servers for differences bigger than 15 minutes.
 
 import logging
 import hubblestack.utils.platform
+import hubblestack.utils.probe
 
 if not hubblestack.utils.platform.is_windows():
     import ntplib
@@ -56,9 +57,10 @@ def time_check(ntp_servers, max_offset=15, nb_servers=4,
         log.error("No NTP servers provided")
         return False, None
 
+    # the servers are queried concurrently, the offsets are checked in order
+    offsets = hubblestack.utils.probe.run_all([(_query_ntp_server, (ntp_server,)) for ntp_server in ntp_servers])
     checked_servers = 0
-    for ntp_server in ntp_servers:
-        offset = _query_ntp_server(ntp_server)
+    for offset in offsets:
         if not offset:
             continue
         # offset bigger than `max_offset` minutes
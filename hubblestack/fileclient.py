@@ -4,13 +4,16 @@ Classes that manage file clients
 """
 
 # Import python libs
+import concurrent.futures
 import contextlib
 import errno
+import json
 import logging
 import os
 import string
 import shutil
 import ftplib
+import threading
 from tornado.httputil import parse_response_start_line, HTTPHeaders, HTTPInputError
 from urllib.parse import urlparse, urlunparse
 from urllib.error import HTTPError, URLError
@@ -216,13 +219,19 @@ class Client(object):
         log.info("Caching directory '%s' for environment '%s'", path, saltenv)
         # go through the list of all files finding ones that are in
         # the target directory and caching them
+        wanted = []
         for fn_ in self.file_list(saltenv):
             fn_ = hubblestack.utils.data.decode(fn_)
             if fn_.strip() and fn_.startswith(path):
                 if hubblestack.utils.stringutils.check_include_exclude(fn_, include_pat, exclude_pat):
-                    fn_ = self.cache_file(hubblestack.utils.url.create(fn_), saltenv, cachedir=cachedir)
-                    if fn_:
-                        ret.append(fn_)
+                    wanted.append(fn_)
+        if self.opts.get("cache_dir_bulk", True):
+            ret.extend(self._cache_dir_bulk(path, wanted, saltenv, cachedir))
+        else:
+            for fn_ in wanted:
+                fn_ = self.cache_file(hubblestack.utils.url.create(fn_), saltenv, cachedir=cachedir)
+                if fn_:
+                    ret.append(fn_)
 
         if include_empty:
             # Break up the path into a list containing the bottom-level
@@ -263,6 +272,87 @@ class Client(object):
 
         return ret
 
+    def _cache_dir_manifest(self, path, saltenv, cachedir):
+        """
+        Location of the manifest cache_dir keeps for a directory: the hash,
+        size and mtime of each file it cached there
+        """
+        name = hubblestack.utils.hashutils.sha256_digest("{0}:{1}".format(saltenv, path))
+        return os.path.join(cachedir, "file_manifests", saltenv, name + ".json")
+
+    def _cache_dir_bulk(self, path, files, saltenv, cachedir=None):
+        """
+        Cache ``files`` (paths relative to the fileserver) for cache_dir.
+
+        The source hash of every file is compared to the manifest written by
+        the previous sync, so the cached copies are only re-hashed when their
+        size or mtime changed; only files whose hash differs are fetched.
+        The source hashes are looked up on ``cache_dir_workers`` threads,
+        which is where s3fs pulls changed objects from S3.
+        """
+        cachedir = self.get_cachedir(cachedir)
+        dest_root = hubblestack.utils.path.join(cachedir, "files", saltenv)
+        manifest_path = self._cache_dir_manifest(path, saltenv, cachedir)
+        try:
+            with hubblestack.utils.files.fopen(manifest_path, "r") as fh_:
+                manifest = json.load(fh_)
+        except (IOError, OSError, ValueError):
+            manifest = {}
+        new_manifest = {}
+        lock = threading.Lock()
+        fetch_lock = threading.Lock()
+
+        def _local_hash(dest, entry, hash_type):
+            try:
+                st = os.stat(dest)
+            except OSError:
+                return None
+            if entry and entry[1:] == [hash_type, st.st_size, st.st_mtime_ns]:
+                return entry[0]
+            return hubblestack.utils.hashutils.get_hash(dest, hash_type)
+
+        def _sync(fn_):
+            url = hubblestack.utils.url.create(fn_)
+            server = self.hash_file(url, saltenv)
+            if not server or not server.get("hsum"):
+                log.debug("Could not find file '%s' in saltenv '%s'", fn_, saltenv)
+                return None
+            hsum = hubblestack.utils.stringutils.to_unicode(server["hsum"])
+            hash_type = server.get("hash_type", "md5")
+            dest = hubblestack.utils.path.join(dest_root, fn_)
+            if _local_hash(dest, manifest.get(fn_), hash_type) != hsum:
+                log.debug("cache_dir(%s) fetching changed file %s", path, fn_)
+                # get_file changes the process umask while it creates the
+                # cache directories, so fetches must not overlap
+                with fetch_lock:
+                    dest = self.get_file(url, "", True, saltenv, cachedir=cachedir)
+                if not dest:
+                    return None
+            try:
+                st = os.stat(dest)
+            except OSError:
+                return None
+            with lock:
+                new_manifest[fn_] = [hsum, hash_type, st.st_size, st.st_mtime_ns]
+            return dest
+
+        workers = max(1, int(self.opts.get("cache_dir_workers", 4)))
+        if workers == 1 or len(files) < 2:
+            results = [_sync(fn_) for fn_ in files]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_sync, files))
+
+        if new_manifest != manifest:
+            manifest_dir = os.path.dirname(manifest_path)
+            if not os.path.isdir(manifest_dir):
+                os.makedirs(manifest_dir)
+            with hubblestack.utils.atomicfile.atomic_open(manifest_path, "w") as fh_:
+                json.dump(new_manifest, fh_)
+        log.debug("cache_dir(%s) synced %d files (%d changed)", path, len(new_manifest),
+                  sum(1 for fn_, entry in new_manifest.items() if manifest.get(fn_) != entry))
+        return [dest for dest in results if dest]
+
     def cache_local_file(self, path, **kwargs):
         """
         Cache a local file on the minion in the localfiles cache
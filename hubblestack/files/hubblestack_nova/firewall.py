@@ -35,6 +35,10 @@ firewall:
 A few words about the auditing logic
 The audit function uses the iptables.build_rule salt
 execution module to build the actual iptables rule to be checked.
+The rules are checked against a single iptables-save snapshot per family
+(iptables.ruleset), normalized so that equivalent spellings of a rule match.
+If iptables-save fails or prints nothing, the rules of that family are checked
+one by one with iptables -C instead.
 How the rules are built?
 The elements in the rule dictionary will be used to build the iptables rule.
 
@@ -83,6 +87,7 @@ import copy
 import hubblestack.utils
 import hubblestack.utils.platform
 import hubblestack.utils.path
+from hubblestack.exceptions import CommandExecutionError
 
 log = logging.getLogger(__name__)
 
@@ -132,6 +137,10 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
         log.debug(__tags__)
 
     ret = {'Success': [], 'Failure': [], 'Controlled': []}
+    # one iptables-save per family for the whole run instead of one
+    # iptables -C per rule; a family whose snapshot failed is checked rule by
+    # rule (None) rather than against an empty ruleset
+    rulesets = {}
     for tag in __tags__:
         if fnmatch.fnmatch(tag, tags):
             for tag_data in __tags__[tag]:
@@ -165,7 +174,14 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
                 tag_data['rule'] = rule
 
                 # checking the existence of the rule
-                salt_ret = __mods__['iptables.check'](table=table, chain=chain, rule=rule, family=family)
+                if family not in rulesets:
+                    try:
+                        rulesets[family] = __mods__['iptables.ruleset'](family=family)
+                    except CommandExecutionError as exc:
+                        log.error('falling back to iptables -C for %s rules: %s', family, exc)
+                        rulesets[family] = None
+                salt_ret = __mods__['iptables.check'](table=table, chain=chain, rule=rule, family=family,
+                                                      ruleset=rulesets[family])
 
                 if salt_ret not in (True, False):
                     log.error(salt_ret)
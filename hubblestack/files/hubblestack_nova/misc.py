@@ -48,6 +48,11 @@ import pathlib
 import re
 from pystemd.systemd1 import Manager
 from hubblestack.exceptions import CommandExecutionError
+import hubblestack.utils.accounts
+import hubblestack.utils.fs_inventory
+import hubblestack.utils.identity
+import hubblestack.utils.iptables
+import hubblestack.utils.pkg.inventory
 
 log = logging.getLogger(__name__)
 
@@ -198,17 +203,6 @@ def _execute_shell_command(cmd, python_shell=False):
     return __mods__["cmd.run"](cmd, python_shell=python_shell, shell="/bin/bash", ignore_retcode=True)
 
 
-def _is_valid_home_directory(directory_path, check_slash_home=False):
-    directory_path = None if directory_path is None else directory_path.strip()
-    if directory_path is not None and directory_path != "" and os.path.isdir(directory_path):
-        if check_slash_home and directory_path == "/":
-            return False
-        else:
-            return True
-
-    return False
-
-
 def _is_permission_in_limit(max_permission, given_permission):
     """
     Return true only if given_permission is not more lenient that max_permission. In other words, if
@@ -277,13 +271,7 @@ def check_all_ports_firewall_rules():
         )
     ).strip()
     open_ports = open_ports.split("\n") if open_ports != "" else []
-    firewall_ports = (
-        _execute_shell_command(
-            'iptables -L INPUT -v -n | awk \'FNR > 2 && $11 != "" && $11 ~ /^dpt:/ {print $11}\' | sed -e "s/.*://"',
-            python_shell=True,
-        )
-    ).strip()
-    firewall_ports = firewall_ports.split("\n") if firewall_ports != "" else []
+    firewall_ports = hubblestack.utils.iptables.dports(__mods__["iptables.ruleset"]())
     no_firewall_ports = []
 
     for open_port in open_ports:
@@ -298,33 +286,31 @@ def check_password_fields_not_empty():
     Ensure password fields are not empty
     """
     result = ""
-    with open("/etc/shadow", "r") as shadow:
-        lines = shadow.readlines()
-        for line in lines:
-            if line.split(":")[1] is "":
-                result += f"{line.split(':')[0]} does not have a password \n"
-        return True if result == "" else result
+    for entry in hubblestack.utils.accounts.snapshot().shadow:
+        if entry.passwd == "":
+            result += f"{entry.name} does not have a password \n"
+    return True if result == "" else result
 
 
 def ungrouped_files_or_dir():
     """
     Ensure no ungrouped files or directories exist
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "nogroup")
 
 
 def unowned_files_or_dir():
     """
     Ensure no unowned files or directories exist
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "nouser")
 
 
 def world_writable_file():
     """
     Ensure no world writable files exist
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "world_writable")
 
 
 def system_account_non_login(non_login_shell="/sbin/nologin", max_system_uid="500", except_for_users=""):
@@ -337,15 +323,14 @@ def system_account_non_login(non_login_shell="/sbin/nologin", max_system_uid="50
         if user.strip() != "":
             users_list.append(user.strip())
     result = []
-    cmd = __mods__["cmd.run_all"]('egrep -v "^\\+" /etc/passwd')
-    for line in cmd["stdout"].split("\n"):
-        tokens = line.split(":")
+    for entry in hubblestack.utils.accounts.snapshot().passwd:
         if (
-            tokens[0] not in users_list
-            and int(tokens[2]) < int(max_system_uid)
-            and tokens[6] not in (non_login_shell, "/bin/false")
+            not entry.nis
+            and entry.name not in users_list
+            and int(entry.uid) < int(max_system_uid)
+            and entry.shell not in (non_login_shell, "/bin/false")
         ):
-            result.append(line)
+            result.append(entry.line)
     return True if result == [] else str(result)
 
 
@@ -353,31 +338,22 @@ def sticky_bit_on_world_writable_dirs():
     """
     Ensure sticky bit is set on all world-writable directories
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "world_writable_dir_no_sticky")
 
 
 def default_group_for_root():
     """
     Ensure default group for the root account is GID 0
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if line[:3] == "root" and line.split(":")[3] == "0":
-                return True
-        return False
+    root = hubblestack.utils.accounts.snapshot().users_by_name.get("root", [])
+    return any(entry.gid == "0" for entry in root)
 
 
 def root_is_only_uid_0_account():
     """
     Ensure root is the only UID 0 account
     """
-    uid0_accounts = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if line.split(":")[2] == "0":
-                uid0_accounts.append(line.split(":")[0])
+    uid0_accounts = [entry.name for entry in hubblestack.utils.accounts.snapshot().users_by_uid.get("0", [])]
     if "root" in uid0_accounts:
         return True if len(uid0_accounts) == 1 else False
     else:
@@ -461,7 +437,7 @@ def check_path_integrity():
                 output += f"Group write permissions set on directory {path}\n"
             if bool(permissions & stat.S_IWOTH):
                 output += f"Other write permissions set on directory {path}\n"
-            if pathlib.Path(path).owner() != "root":
+            if hubblestack.utils.identity.user_name(permissions.st_uid) != "root":
                 output += f"{path} is not owned by root\n"
         else:
             output += f"{path} is not a directory\n"
@@ -473,48 +449,36 @@ def check_duplicate_uids():
     """
     Return False if any duplicate user id exist in /etc/group file, else return True
     """
-    with open("/etc/passwd", "r") as passwd:
-        users = [item.split(":")[2] for item in passwd.readlines()]
-        duplicate_uids = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_uids is None or duplicate_uids == []:
-        return True
-    return str(duplicate_uids)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.users_by_uid)
+    return True if not duplicates else str(duplicates)
 
 
 def check_duplicate_gids():
     """
     Return False if any duplicate group id exist in /etc/group file, else return True
     """
-    with open("/etc/group", "r") as group:
-        users = [item.split(":")[2] for item in group.readlines()]
-        duplicate_gids = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_gids is None or duplicate_gids == []:
-        return True
-    return str(duplicate_gids)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.groups_by_gid)
+    return True if not duplicates else str(duplicates)
 
 
 def check_duplicate_unames():
     """
     Return False if any duplicate user names exist in /etc/group file, else return True
     """
-    with open("/etc/passwd", "r") as passwd:
-        users = [item.split(":")[0] for item in passwd.readlines()]
-        duplicate_unames = [item for item in set(users) if users.count(item) > 1]
-    if duplicate_unames is None or duplicate_unames == []:
-        return True
-    return str(duplicate_unames)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.users_by_name)
+    return True if not duplicates else str(duplicates)
 
 
 def check_duplicate_gnames():
     """
     Return False if any duplicate group names exist in /etc/group file, else return True
     """
-    with open("/etc/group", "r") as group:
-        groups = [item.split(":")[0] for item in group.readlines()]
-        duplicate_gnames = [item for item in set(groups) if groups.count(item) > 1]
-    if duplicate_gnames is None or duplicate_gnames == []:
-        return True
-    return str(duplicate_gnames)
+    accounts = hubblestack.utils.accounts.snapshot()
+    duplicates = accounts.duplicates(accounts.groups_by_name)
+    return True if not duplicates else str(duplicates)
 
 
 def check_directory_files_permission(path, permission):
@@ -601,48 +565,37 @@ def check_unowned_files():
     """
     Ensure no unowned files or directories exist
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "nouser")
 
 
 def check_ungrouped_files():
     """
     Ensure no ungrouped files or directories exist
     """
-    raise CommandExecutionError("Module disabled due to performance concerns")
+    return hubblestack.utils.fs_inventory.check(__opts__, "nogroup")
 
 
 def check_all_users_home_directory(max_system_uid):
     """
     Ensure all users' home directories exist
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        users_uids_dirs = [
-            " ".join([item.split(":")[0], item.split(":")[2], item.split(":")[5], item.split(":")[6].strip()])
-            for item in lines
-        ]
+    max_system_uid = int(max_system_uid)
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_data in users_uids_dirs:
-        user_uid_dir = user_data.strip().split(" ")
-        if len(user_uid_dir) < 4:
-            user_uid_dir = user_uid_dir + [""] * (4 - len(user_uid_dir))
-        if user_uid_dir[1].isdigit():
+    for entry in accounts.passwd:
+        if entry.uid.isdigit():
             if (
-                not _is_valid_home_directory(user_uid_dir[2], True)
-                and int(user_uid_dir[1]) >= max_system_uid
-                and user_uid_dir[0] != "nfsnobody"
-                and "nologin" not in user_uid_dir[3]
-                and "false" not in user_uid_dir[3]
+                not accounts.is_valid_home(entry.home, True)
+                and int(entry.uid) >= max_system_uid
+                and entry.name != "nfsnobody"
+                and "nologin" not in entry.shell
+                and "false" not in entry.shell
             ):
                 error += [
-                    "Either home directory "
-                    + user_uid_dir[2]
-                    + " of user "
-                    + user_uid_dir[0]
-                    + " is invalid or does not exist."
+                    "Either home directory " + entry.home + " of user " + entry.name + " is invalid or does not exist."
                 ]
         else:
-            error += ["User " + user_uid_dir[0] + " has invalid uid " + user_uid_dir[1]]
+            error += ["User " + entry.name + " has invalid uid " + entry.uid]
     return True if not error else str(error)
 
 
@@ -655,22 +608,16 @@ def check_users_home_directory_permissions(max_allowed_permission="750", except_
         if user.strip() != "":
             users_list.append(user.strip())
 
-    users_dirs = []
-    cmd = __mods__["cmd.run_all"]('egrep -v "^\\+" /etc/passwd ')
-    for line in cmd["stdout"].split("\n"):
-        tokens = line.split(":")
-        if tokens[0] not in users_list and "nologin" not in tokens[6] and "false" not in tokens[6]:
-            users_dirs.append(tokens[0] + " " + tokens[5])
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split(" ")
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            result = restrict_permissions(user_dir[1], max_allowed_permission)
+    for entry in accounts.passwd:
+        if entry.nis or entry.name in users_list or "nologin" in entry.shell or "false" in entry.shell:
+            continue
+        if accounts.is_valid_home(entry.home):
+            result = _restrict_mode(accounts.home_stat(entry.home.strip()).st_mode, max_allowed_permission)
             if result is not True:
                 error += [
-                    "permission on home directory " + user_dir[1] + " of user " + user_dir[0] + " is wrong: " + result
+                    "permission on home directory " + entry.home + " of user " + entry.name + " is wrong: " + result
                 ]
 
     return True if error == [] else str(error)
@@ -682,50 +629,22 @@ def check_users_own_their_home(max_system_uid):
     """
 
     max_system_uid = int(max_system_uid)
-
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        users_uids_dirs = [
-            " ".join([item.split(":")[0], item.split(":")[2], item.split(":")[5], item.split(":")[6].strip()])
-            for item in lines
-        ]
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_data in users_uids_dirs:
-        user_uid_dir = user_data.strip().split(" ")
-        if len(user_uid_dir) < 4:
-            user_uid_dir = user_uid_dir + [""] * (4 - len(user_uid_dir))
-        if user_uid_dir[1].isdigit():
-            if not _is_valid_home_directory(user_uid_dir[2]):
-                if (
-                    int(user_uid_dir[1]) >= max_system_uid
-                    and "nologin" not in user_uid_dir[3]
-                    and "false" not in user_uid_dir[3]
-                ):
-                    error += [
-                        "Either home directory "
-                        + user_uid_dir[2]
-                        + " of user "
-                        + user_uid_dir[0]
-                        + " is invalid or does not exist."
-                    ]
-            elif (
-                int(user_uid_dir[1]) >= max_system_uid
-                and user_uid_dir[0] != "nfsnobody"
-                and "nologin" not in user_uid_dir[3]
-                and "false" not in user_uid_dir[3]
-            ):
-                owner = __mods__["cmd.run"]('stat -L -c "%U" "' + user_uid_dir[2] + '"')
-                if owner != user_uid_dir[0]:
-                    error += [
-                        "The home directory "
-                        + user_uid_dir[2]
-                        + " of user "
-                        + user_uid_dir[0]
-                        + " is owned by "
-                        + owner
-                    ]
-        else:
-            error += ["User " + user_uid_dir[0] + " has invalid uid " + user_uid_dir[1]]
+    for entry in accounts.passwd:
+        if not entry.uid.isdigit():
+            error += ["User " + entry.name + " has invalid uid " + entry.uid]
+            continue
+        if int(entry.uid) < max_system_uid or "nologin" in entry.shell or "false" in entry.shell:
+            continue
+        if not accounts.is_valid_home(entry.home):
+            error += [
+                "Either home directory " + entry.home + " of user " + entry.name + " is invalid or does not exist."
+            ]
+        elif entry.name != "nfsnobody":
+            owner = accounts.owner_name(accounts.home_stat(entry.home.strip()).st_uid)
+            if owner != entry.name:
+                error += ["The home directory " + entry.home + " of user " + entry.name + " is owned by " + owner]
 
     return True if not error else str(error)
 
@@ -736,30 +655,22 @@ def check_users_dot_files():
     """
 
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            dot_files = _execute_shell_command("find " + user_dir[1] + ' -name ".*"').strip()
-            dot_files = dot_files.split("\n") if dot_files != "" else []
-            for dot_file in dot_files:
-                if os.path.isfile(dot_file):
-                    path_details = __mods__["file.stats"](dot_file)
-                    given_permission = path_details.get("mode")
-                    file_permission = given_permission[-3:]
-                    if file_permission[1] in ["2", "3", "6", "7"]:
-                        error += ["Group Write permission set on file " + dot_file + " for user " + user_dir[0]]
-                    if file_permission[2] in ["2", "3", "6", "7"]:
-                        error += ["Other Write permission set on file " + dot_file + " for user " + user_dir[0]]
+    for entry in accounts.passwd:
+        if to_ignore(entry.line) or not accounts.is_valid_home(entry.home):
+            continue
+        for dot_file in _find_dot_files(entry.home.strip()):
+            try:
+                permissions = os.stat(dot_file).st_mode
+            except OSError:
+                continue
+            if not stat.S_ISREG(permissions):
+                continue
+            if permissions & stat.S_IWGRP:
+                error += ["Group Write permission set on file " + dot_file + " for user " + entry.name]
+            if permissions & stat.S_IWOTH:
+                error += ["Other Write permission set on file " + dot_file + " for user " + entry.name]
 
     return True if error == [] else str(error)
 
@@ -769,21 +680,14 @@ def check_users_forward_files():
     Ensure no users have .forward files
     """
 
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            forward_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".forward"').strip()
-            if forward_file is not None and os.path.isfile(forward_file):
+    for entry in accounts.passwd:
+        if accounts.is_valid_home(entry.home):
+            forward_file = os.path.join(entry.home.strip(), ".forward")
+            if os.path.isfile(forward_file):
                 error += [
-                    "Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has " + forward_file + " file"
+                    "Home directory: " + entry.home + ", for user: " + entry.name + " has " + forward_file + " file"
                 ]
 
     return True if error == [] else str(error)
@@ -794,20 +698,11 @@ def check_users_netrc_files():
     Ensure no users have .netrc files
     """
 
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            netrc_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".netrc"').strip()
-            if netrc_file is not None and os.path.isfile(netrc_file):
-                error += ["Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has .netrc file"]
+    for entry in accounts.passwd:
+        if accounts.is_valid_home(entry.home) and os.path.isfile(os.path.join(entry.home.strip(), ".netrc")):
+            error += ["Home directory: " + entry.home + ", for user: " + entry.name + " has .netrc file"]
 
     return True if error == [] else str(error)
 
@@ -816,13 +711,9 @@ def check_groups_validity():
     """
     Ensure all groups in /etc/passwd exist in /etc/group
     """
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        group_ids_in_passwd = set([line.split(":")[3] for line in lines])
-    with open("/etc/group", "r") as group:
-        lines = group.readlines()
-        group_ids_in_group = set([line.split(":")[2] for line in lines])
-    invalid_group_ids = group_ids_in_passwd.difference(group_ids_in_group)
+    accounts = hubblestack.utils.accounts.snapshot()
+    group_ids_in_passwd = set(entry.gid for entry in accounts.passwd)
+    invalid_group_ids = group_ids_in_passwd.difference(accounts.groups_by_gid)
     output_list = [f"Invalid groupid: {item} in /etc/passwd file" for item in invalid_group_ids]
 
     return True if output_list == [] else str(output_list)
@@ -861,21 +752,13 @@ def check_users_rhosts_files():
     """
 
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(" ".join([line.split(":")[0], line.split(":")[5]]))
+    accounts = hubblestack.utils.accounts.snapshot()
     error = []
-    for user_dir in users_dirs:
-        user_dir = user_dir.split()
-        if len(user_dir) < 2:
-            user_dir = user_dir + [""] * (2 - len(user_dir))
-        if _is_valid_home_directory(user_dir[1]):
-            rhosts_file = _execute_shell_command("find " + user_dir[1] + ' -maxdepth 1 -name ".rhosts"').strip()
-            if rhosts_file is not None and os.path.isfile(rhosts_file):
-                error += ["Home directory: " + user_dir[1] + ", for user: " + user_dir[0] + " has .rhosts file"]
+    for entry in accounts.passwd:
+        if to_ignore(entry.line) or not accounts.is_valid_home(entry.home):
+            continue
+        if os.path.isfile(os.path.join(entry.home.strip(), ".rhosts")):
+            error += ["Home directory: " + entry.home + ", for user: " + entry.name + " has .rhosts file"]
     return True if error == [] else str(error)
 
 
@@ -884,12 +767,7 @@ def check_netrc_files_accessibility():
     Ensure users' .netrc Files are not group or world accessible
     """
     to_ignore = lambda x: any([item in x for item in ["root", "halt", "sync", "shutdown", "/sbin/nologin"]])
-    users_dirs = []
-    with open("/etc/passwd", "r") as passwd:
-        lines = passwd.readlines()
-        for line in lines:
-            if not to_ignore(line):
-                users_dirs.append(line.split(":")[5])
+    users_dirs = [entry.home for entry in hubblestack.utils.accounts.snapshot().passwd if not to_ignore(entry.line)]
 
     output = ""
     for user_dir in users_dirs:
@@ -911,6 +789,31 @@ def check_netrc_files_accessibility():
     return True if output.strip() == "" else output
 
 
+def _restrict_mode(st_mode, permission):
+    """
+    restrict_permissions for a mode that has already been stat'd
+    """
+    given_permission = format(stat.S_IMODE(st_mode) & 0o777, "03o")
+    max_permission = str(permission)
+    if (
+        _is_permission_in_limit(max_permission[0], given_permission[0])
+        and _is_permission_in_limit(max_permission[1], given_permission[1])
+        and _is_permission_in_limit(max_permission[2], given_permission[2])
+    ):
+        return True
+    return given_permission
+
+
+def _find_dot_files(directory):
+    """
+    Paths below directory whose name starts with a dot, like ``find <directory> -name ".*"``
+    """
+    for root, dirs, files in os.walk(directory):
+        for name in dirs + files:
+            if name.startswith("."):
+                yield os.path.join(root, name)
+
+
 def _grep(path, pattern, *args):
     """
     Grep for a string in the specified file
@@ -1045,8 +948,12 @@ def check_if_any_pkg_installed(args):
     :param args: Comma separated list of packages those needs to be verified
     :return: True if any of the input package is installed else False
     """
+    inventory = hubblestack.utils.pkg.inventory.get(__grains__)
     for pkg in args.split(","):
-        if __mods__["pkg.version"](pkg):
+        if inventory is not None:
+            if inventory.installed(pkg):
+                return True
+        elif __mods__["pkg.version"](pkg):
             return True
     return False
 
@@ -1066,19 +973,20 @@ def ensure_max_password_expiration(allow_max_days, except_for_users=""):
     if int(system_pass_max_days) > allow_max_days:
         return "PASS_MAX_DAYS must be less than or equal to " + str(allow_max_days)
 
-    # fetch all users with passwords
-    grep_args.append("-E")
-    all_users = _grep("/etc/shadow", r"^[^:]+:[^\!*]", *grep_args).get("stdout")
+    # all users with passwords
+    all_users = [
+        entry for entry in hubblestack.utils.accounts.snapshot().shadow if entry.passwd[:1] not in ("", "!", "*")
+    ]
 
     except_for_users_list = []
     for user in except_for_users.split(","):
         if user.strip() != "":
             except_for_users_list.append(user.strip())
     result = []
-    for line in all_users.split("\n"):
-        user = line.split(":")[0]
+    for entry in all_users:
+        user = entry.name
         # As per CIS doc, 5th field is the password max expiry days
-        user_passwd_expiry = line.split(":")[4]
+        user_passwd_expiry = entry.max
         if (
             not user in except_for_users_list
             and user_passwd_expiry.isnumeric()
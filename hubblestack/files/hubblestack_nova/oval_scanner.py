@@ -52,6 +52,7 @@ import logging
 import os
 from os import path
 import hubblestack.utils.platform
+import hubblestack.utils.pkg.inventory
 
 def __virtual__():
     return not hubblestack.utils.platform.is_windows()
@@ -70,10 +71,14 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
             if distro_name not in (supported_dist):
                 logging.info('The oval CVE scanner does not currently support {0}'.format(distro_name.capitalize()))
                 return ret
-            local_pkgs = __mods__['pkg.list_pkgs']()
+            inventory = hubblestack.utils.pkg.inventory.get(__grains__)
+            local_pkgs = inventory.list_pkgs() if inventory is not None else __mods__['pkg.list_pkgs']()
             if distro_name in ('debian'):
-                logging.info('Referencing source packages to binary packages. This could take awhile...')
-                pkg_src_ref = build_pkg_src_ref(local_pkgs)
+                if inventory is not None:
+                    pkg_src_ref = inventory.sources()
+                else:
+                    logging.info('Referencing source packages to binary packages. This could take awhile...')
+                    pkg_src_ref = build_pkg_src_ref(local_pkgs)
             else:
                 pkg_src_ref = {}
             # Scanner options
@@ -194,7 +199,12 @@ def get_impact(local_ver, distro_name, **kargs):
     """Compare local package ver to vulnerability ver in rpm distros"""
     logging.debug('get_rpm_impact')
     impact = {}
-    if __mods__['pkg.version_cmp'](kargs['ver'], local_ver) > 0:
+    inventory = hubblestack.utils.pkg.inventory.get(__grains__)
+    if inventory is not None:
+        ret = inventory.compare(kargs['ver'], local_ver)
+    else:
+        ret = __mods__['pkg.version_cmp'](kargs['ver'], local_ver)
+    if ret is not None and ret > 0:
         impact = create_impact(impact, local_ver, **kargs)
     return impact
 
@@ -63,6 +63,7 @@ import fnmatch
 import copy
 import hubblestack.utils
 import hubblestack.utils.platform
+import hubblestack.utils.pkg.inventory
 
 from distutils.version import LooseVersion
 
@@ -111,6 +112,9 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
         log.debug('pkg audit __tags__:')
         log.debug(__tags__)
 
+    # the installed packages are read once, not once per comparison
+    inventory = hubblestack.utils.pkg.inventory.get(__grains__)
+
     ret = {'Success': [], 'Failure': [], 'Controlled': []}
     for tag in __tags__:
         if fnmatch.fnmatch(tag, tags):
@@ -123,7 +127,7 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
 
                 # Blacklisted packages (must not be installed)
                 if audittype == 'blacklist':
-                    if __mods__['pkg.version'](name):
+                    if _installed_version(inventory, name):
                         tag_data['failure_reason'] = "Found blacklisted package '{0}'" \
                                                      " installed on the system" \
                                                      .format(name)
@@ -140,8 +144,7 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
                             mod = ''
 
                         if mod == '<':
-                            if (LooseVersion(__mods__['pkg.version'](name)) <=
-                                    LooseVersion(version)):
+                            if _compare_installed(inventory, name, version) in (-1, 0):
                                 ret['Success'].append(tag_data)
                             else:
                                 tag_data['failure_reason'] = "Could not find requisite package '{0}' with" \
@@ -151,8 +154,7 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
                                 ret['Failure'].append(tag_data)
 
                         elif mod == '>':
-                            if (LooseVersion(__mods__['pkg.version'](name)) >=
-                                    LooseVersion(version)):
+                            if _compare_installed(inventory, name, version) in (0, 1):
                                 ret['Success'].append(tag_data)
                             else:
                                 tag_data['failure_reason'] = "Could not find requisite package '{0}' " \
@@ -163,7 +165,7 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
 
                         elif not mod:
                             # Just peg to the version, no > or <
-                            if __mods__['pkg.version'](name) == version:
+                            if _installed_version(inventory, name) == version:
                                 ret['Success'].append(tag_data)
                             else:
                                 tag_data['failure_reason'] = "Could not find the version '{0}' of requisite" \
@@ -184,7 +186,7 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
                             ret['Failure'].append(tag_data)
 
                     else:  # No version checking
-                        if __mods__['pkg.version'](name):
+                        if _installed_version(inventory, name):
                             ret['Success'].append(tag_data)
                         else:
                             tag_data['failure_reason'] = "Could not find requisite package '{0}' installed" \
@@ -194,6 +196,28 @@ def audit(data_list, tags, labels, debug=False, **kwargs):
     return ret
 
 
+def _installed_version(inventory, name):
+    """
+    Return the installed version(s) of a package like ``pkg.version``
+    """
+    if inventory is None:
+        return __mods__['pkg.version'](name)
+    return inventory.version(name)
+
+
+def _compare_installed(inventory, name, version):
+    """
+    cmp-style comparison of the installed version of a package (the newest
+    one, if several are installed) with ``version``, using the version rules
+    of the package manager; None if they cannot be compared
+    """
+    if inventory is None:
+        installed = LooseVersion(__mods__['pkg.version'](name))
+        version = LooseVersion(version)
+        return (installed > version) - (installed < version)
+    return inventory.compare(inventory.latest(name) or '', version)
+
+
 def _merge_yaml(ret, data, profile=None):
     """
     Merge two yaml dicts together at the pkg:blacklist and pkg:whitelist level
@@ -336,8 +336,7 @@ def file_hash(load, fnd):
         hash_cachedir, load["saltenv"], "{0}.hash.{1}".format(relpath, __opts__["hash_type"])
     )
     if not os.path.isfile(hashdest):
-        if not os.path.exists(os.path.dirname(hashdest)):
-            os.makedirs(os.path.dirname(hashdest))
+        os.makedirs(os.path.dirname(hashdest), exist_ok=True)
         ret["hsum"] = hubblestack.utils.hashutils.get_hash(path, __opts__["hash_type"])
         with hubblestack.utils.files.fopen(hashdest, "w+") as fp_:
             fp_.write(ret["hsum"])
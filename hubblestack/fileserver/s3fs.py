@@ -76,6 +76,15 @@ structure::
 
     More info here:
     https://docs.aws.amazon.com/AmazonS3/latest/API/RESTCommonResponseHeaders.html
+
+The bucket listings are cached in ``<cachedir>/s3cache/buckets_files.cache``
+for ``s3.cache_expire`` seconds, indexed by environment, bucket and path. When
+the cache expires the buckets are listed again, ``s3.list_workers`` (default
+8) buckets at a time. The ETag each cached file was last verified against is
+recorded with the file's size and mtime, so cached files that have not changed
+since are not hashed again on every lookup. On update the files that are
+missing or out of date are downloaded ``s3.download_workers`` (default 8) at a
+time.
 """
 
 import datetime
@@ -83,8 +92,11 @@ import os
 import time
 import pickle
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import hubblestack.fileserver as fs
+import hubblestack.utils.atomicfile
 import hubblestack.utils.files
 import hubblestack.utils.gzip_util
 import hubblestack.utils.hashutils
@@ -100,6 +112,15 @@ log = logging.getLogger(__name__)
 
 S3_CACHE_EXPIRE = 1800  # cache for 30 minutes
 S3_SYNC_ON_UPDATE = True  # sync cache on update rather than jit
+S3_LIST_WORKERS = 8  # buckets listed at the same time on refresh
+S3_DOWNLOAD_WORKERS = 8  # files downloaded at the same time on update
+S3_CACHE_VERSION = 2  # format of the buckets cache file
+
+# cache file -> (mtime, metadata), so the cache file is only unpickled when it changes
+_METADATA = {}
+# s3cache dir -> {cached file path: (etag, size, mtime_ns)} of the verified cached files
+_VERIFIED = {}
+_VERIFIED_LOCK = threading.Lock()
 
 
 def envs():
@@ -121,16 +142,30 @@ def update():
     if S3_SYNC_ON_UPDATE and metadata:
         # sync the buckets to the local cache
         log.info("Syncing local cache from S3...")
+        synced = set()
+        downloads = []
         for saltenv, env_meta in metadata.items():
-            for bucket_files in _find_files(env_meta):
-                for bucket, files in bucket_files.items():
-                    for file_path in files:
-                        cached_file_path = _get_cached_file_name(bucket, saltenv, file_path)
-                        log.info("%s - %s : %s", bucket, saltenv, file_path)
-
-                        # load the file from S3 if it's not in the cache or it's old
-                        _get_file_from_s3(metadata, saltenv, bucket, file_path, cached_file_path)
-
+            for bucket, files in _find_files(env_meta).items():
+                for file_path in files:
+                    cached_file_path = _get_cached_file_name(bucket, saltenv, file_path)
+                    log.info("%s - %s : %s", bucket, saltenv, file_path)
+
+                    # load the file from S3 if it's not in the cache or it's old
+                    download = _get_file_download(metadata, saltenv, bucket, file_path, cached_file_path)
+                    if download is not None:
+                        downloads.append(download)
+                    synced.add(cached_file_path)
+
+        if downloads:
+            log.info("Downloading %d files from S3", len(downloads))
+            workers = int(__opts__.get("s3.download_workers", S3_DOWNLOAD_WORKERS))
+            results = __utils__["s3.batch_get"](downloads, workers=workers, **_get_s3_query_kwargs())
+            for download, ret in zip(downloads, results):
+                # failed downloads are logged by s3.batch_get
+                if ret and not isinstance(ret, Exception):
+                    _downloaded(download)
+
+        _save_verified(keep=synced)
         log.info("Sync local cache from S3 completed.")
 
 
@@ -151,21 +186,17 @@ def find_file(path, saltenv="base", **kwargs):
     if not metadata or saltenv not in metadata:
         return fnd
 
-    env_files = _find_files(metadata[saltenv])
-
     if not _is_env_per_bucket():
         path = os.path.join(saltenv, path)
 
     # look for the files and check if they're ignored globally
-    for bucket in env_files:
-        for bucket_name, files in bucket.items():
-            if path in files and not fs.is_file_ignored(__opts__, path):
-                fnd["bucket"] = bucket_name
-                fnd["path"] = path
-                break
-        else:
-            continue  # only executes if we didn't break
-        break
+    if path.endswith("/") or fs.is_file_ignored(__opts__, path):
+        return fnd
+    for bucket_name, files in metadata[saltenv].items():
+        if path in files:
+            fnd["bucket"] = bucket_name
+            fnd["path"] = path
+            break
 
     if not fnd["path"] or not fnd["bucket"]:
         return fnd
@@ -201,7 +232,12 @@ def file_hash(load, fnd):
     cached_file_path = _get_cached_file_name(fnd["bucket"], load["saltenv"], fnd["path"])
 
     if os.path.isfile(cached_file_path):
-        ret["hsum"] = hubblestack.utils.hashutils.get_hash(cached_file_path)
+        # a cached file verified against its ETag has that ETag as md5
+        file_meta = _find_file_meta(_init(), fnd["bucket"], load["saltenv"], fnd["path"])
+        if file_meta and _is_verified(cached_file_path, file_meta.get("ETag")):
+            ret["hsum"] = file_meta["ETag"]
+        else:
+            ret["hsum"] = hubblestack.utils.hashutils.get_hash(cached_file_path)
         ret["hash_type"] = "md5"
 
     return ret
@@ -260,10 +296,9 @@ def file_list(load):
 
     if not metadata or saltenv not in metadata:
         return ret
-    for bucket in _find_files(metadata[saltenv]):
-        for buckets in bucket.values():
-            files = [f for f in buckets if not fs.is_file_ignored(__opts__, f)]
-            ret += _trim_env_off_path(files, saltenv)
+    for files in _find_files(metadata[saltenv]).values():
+        files = [f for f in files if not fs.is_file_ignored(__opts__, f)]
+        ret += _trim_env_off_path(files, saltenv)
 
     return ret
 
@@ -298,12 +333,11 @@ def dir_list(load):
         return ret
 
     # grab all the dirs from the buckets cache file
-    for bucket in _find_dirs(metadata[saltenv]):
-        for dirs in bucket.values():
-            # trim env and trailing slash
-            dirs = _trim_env_off_path(dirs, saltenv, trim_slash=True)
-            # remove empty string left by the base env dir in single bucket mode
-            ret += [_f for _f in dirs if _f]
+    for dirs in _find_dirs(metadata[saltenv]).values():
+        # trim env and trailing slash
+        dirs = _trim_env_off_path(dirs, saltenv, trim_slash=True)
+        # remove empty string left by the base env dir in single bucket mode
+        ret += [_f for _f in dirs if _f]
 
     return ret
 
@@ -389,8 +423,7 @@ def _get_cached_file_name(bucket_name, saltenv, path):
     file_path = os.path.join(_get_cache_dir(), saltenv, bucket_name, path)
 
     # make sure bucket and saltenv directories exist
-    if not os.path.exists(os.path.dirname(file_path)):
-        os.makedirs(os.path.dirname(file_path))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
     return file_path
 
@@ -401,8 +434,7 @@ def _get_buckets_cache_filename():
     Create the path if it does not exist.
     """
     cache_dir = _get_cache_dir()
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
 
     return os.path.join(cache_dir, "buckets_files.cache")
 
@@ -448,105 +480,83 @@ def _refresh_buckets_cache_file(cache_file):
             marker = tmp[-1]["Key"]
         return ret
 
-    def _parse_buckets(buckets, salt_env=None):
+    def _index_bucket(bucket_name, s3_meta):
         """
-        Go over each bucket in buckets, extract metadata and update the `metadata` dict.
-
-        ``buckets`` - list of bucket names
-
-        ``salt_env`` - salt_env from _get_buckets();
-                     - gets passed if there is a single environment per bucket
+        Return the ``{key: file metadata}`` index of a bucket listing, None if
+        the bucket is to be skipped and False on an S3 error
         """
-        bucket_files_list = []
-        for bucket_name in buckets:
-            s3_meta = __get_s3_meta(bucket_name)
-
-            # s3 query returned nothing
-            if not s3_meta:
-                continue
-
-            # grab only the files/dirs
-            files = [k for k in s3_meta if "Key" in k]
-            bucket_files_list.append({bucket_name: files})
-
-            # check to see if we added any keys, otherwise investigate possible error conditions
-            if not files:
-                meta_response = {}
-                for k in s3_meta:
-                    if "Code" in k or "Message" in k:
-                        # assumes no duplicate keys, consisdent with current error response.
-                        meta_response.update(k)
-                # attempt use of human readable output first.
-                try:
-                    log.warning("'%s' response for bucket '%s'", meta_response["Message"], bucket_name)
-                    continue
-                except KeyError:
-                    # no human readable error message provided
-                    if "Code" in meta_response:
-                        log.warning("'%s' response for bucket '%s'", meta_response["Code"], bucket_name)
-                        continue
-                    else:
-                        log.warning("S3 Error! Do you have any files in your S3 bucket?")
-                        return {}
-
-            # one environment per bucket, nothing left to parse
-            if salt_env:
-                continue
-
-            environments = set([(os.path.dirname(k["Key"]).split("/", 1))[0] for k in files])
-
-            # pull out the files for the environment
-            _parse_env(environments=environments, bucket_name=bucket_name, files=files)
-
-        if salt_env:
-            metadata[salt_env] = bucket_files_list
+        # s3 query returned nothing
+        if not s3_meta:
+            return None
+
+        # grab only the files/dirs
+        files = {}
+        for k in s3_meta:
+            if "Key" in k:
+                k = dict(k)
+                if "ETag" in k:
+                    # Get rid of quotes surrounding md5
+                    k["ETag"] = k["ETag"].strip('"')
+                files[k["Key"]] = k
+
+        # check to see if we added any keys, otherwise investigate possible error conditions
+        if not files:
+            meta_response = {}
+            for k in s3_meta:
+                if "Code" in k or "Message" in k:
+                    # assumes no duplicate keys, consisdent with current error response.
+                    meta_response.update(k)
+            # attempt use of human readable output first.
+            if "Message" in meta_response:
+                log.warning("'%s' response for bucket '%s'", meta_response["Message"], bucket_name)
+                return None
+            # no human readable error message provided
+            if "Code" in meta_response:
+                log.warning("'%s' response for bucket '%s'", meta_response["Code"], bucket_name)
+                return None
+            log.warning("S3 Error! Do you have any files in your S3 bucket?")
+            return False
 
-        return True
+        return files
 
-    def _parse_env(environments, bucket_name, files):
-        """
-        Go over each saltenv in environments, grab the files that
-        match the saltenv and add them to the metadata dict
-        """
-        for saltenv in environments:
-            # grab only files/dirs that match this saltenv
-            env_files = [k for k in files if k["Key"].startswith(saltenv)]
-
-            if saltenv not in metadata:
-                metadata[saltenv] = []
-
-            found = False
-            for bucket_files in metadata[saltenv]:
-                if bucket_name in bucket_files:
-                    bucket_files[bucket_name] += env_files
-                    found = True
-                    break
-            if not found:
-                metadata[saltenv].append({bucket_name: env_files})
+    buckets = _get_buckets()
+    env_per_bucket = _is_env_per_bucket()
+    if env_per_bucket:
+        bucket_names = [name for env_buckets in buckets.values() for name in env_buckets]
+    else:
+        bucket_names = list(buckets)
+    bucket_names = list(dict.fromkeys(bucket_names))
 
-    if _is_env_per_bucket():
-        # Single environment per bucket
-        for saltenv, buckets in _get_buckets().items():
-            ret = _parse_buckets(buckets=buckets, salt_env=saltenv)
-            # S3 error
-            if not ret:
-                return ret
+    # list the buckets concurrently, each one pages through its listing on its own
+    workers = max(1, min(len(bucket_names), int(__opts__.get("s3.list_workers", S3_LIST_WORKERS))))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        listings = list(pool.map(__get_s3_meta, bucket_names))
 
-    else:
-        # Multiple environments per buckets
-        ret = _parse_buckets(buckets=_get_buckets())
+    index = {}
+    for bucket_name, s3_meta in zip(bucket_names, listings):
+        files = _index_bucket(bucket_name, s3_meta)
         # S3 error
-        if not ret:
-            return ret
+        if files is False:
+            return {}
+        if files is not None:
+            index[bucket_name] = files
 
-    # write the metadata to disk
-    if os.path.isfile(cache_file):
-        os.remove(cache_file)
+    if env_per_bucket:
+        # Single environment per bucket
+        for saltenv, env_buckets in buckets.items():
+            metadata[saltenv] = {name: index[name] for name in env_buckets if name in index}
+    else:
+        # Multiple environments per buckets, the first directory is the environment
+        for bucket_name, files in index.items():
+            for key, meta in files.items():
+                saltenv = os.path.dirname(key).split("/", 1)[0]
+                metadata.setdefault(saltenv, {}).setdefault(bucket_name, {})[key] = meta
 
     log.debug("Writing buckets cache file")
 
-    with hubblestack.utils.files.fopen(cache_file, "wb") as fp_:
-        pickle.dump(metadata, fp_)
+    with hubblestack.utils.atomicfile.atomic_open(cache_file, "wb") as fp_:
+        pickle.dump({"version": S3_CACHE_VERSION, "metadata": metadata}, fp_)
+    _METADATA[cache_file] = (os.stat(cache_file).st_mtime_ns, metadata)
 
     return metadata
 
@@ -555,72 +565,63 @@ def _read_buckets_cache_file(cache_file):
     """
     Return the contents of the buckets cache file
     """
+    mtime = os.stat(cache_file).st_mtime_ns
+    cached = _METADATA.get(cache_file)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
     log.debug("Reading buckets cache file")
 
     with hubblestack.utils.files.fopen(cache_file, "rb") as fp_:
         try:
             data = pickle.load(fp_)
-            # check for 'corrupted' cache data ex: {u'base':[]}
-            if not any(data.values()):
+            if not isinstance(data, dict) or data.get("version") != S3_CACHE_VERSION:
+                log.info("buckets cache file (%s) is in an older format, ignoring it", cache_file)
                 data = None
+            else:
+                data = data["metadata"]
+                # check for 'corrupted' cache data ex: {u'base':{}}
+                if not any(data.values()):
+                    data = None
 
         except (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError, KeyError) as eobj:
             log.info("error unpickling buckets cache file (%s): %s", cache_file, repr(eobj))
             data = None
 
+    if data is not None:
+        _METADATA[cache_file] = (mtime, data)
     return data
 
 
 def _find_files(metadata):
     """
-    Looks for all the files in the S3 bucket cache metadata
+    Looks for all the files in the S3 bucket cache metadata of an environment,
+    returns ``{bucket: [file paths]}``
     """
-    ret = []
-    found = {}
-
-    for bucket_dict in metadata:
-        for bucket_name, data in bucket_dict.items():
-            file_paths = [k["Key"] for k in data]
-            file_paths = [k for k in file_paths if not k.endswith("/")]
-            if bucket_name not in found:
-                found[bucket_name] = True
-                ret.append({bucket_name: file_paths})
-            else:
-                for bucket in ret:
-                    if bucket_name in bucket:
-                        bucket[bucket_name] += file_paths
-                        break
-    return ret
+    return {
+        bucket_name: [k for k in files if not k.endswith("/")]
+        for bucket_name, files in metadata.items()
+    }
 
 
 def _find_dirs(metadata):
     """
-    Looks for all the directories in the S3 bucket cache metadata.
+    Looks for all the directories in the S3 bucket cache metadata of an
+    environment, returns ``{bucket: [directories]}``
 
     Supports trailing '/' keys (as created by S3 console) as well as
     directories discovered in the path of file keys.
     """
-    ret = []
-    found = {}
-
-    for bucket_dict in metadata:
-        for bucket_name, data in bucket_dict.items():
-            dir_paths = set()
-            for path in [k["Key"] for k in data]:
-                prefix = ""
-                for part in path.split("/")[:-1]:
-                    directory = prefix + part + "/"
-                    dir_paths.add(directory)
-                    prefix = directory
-            if bucket_name not in found:
-                found[bucket_name] = True
-                ret.append({bucket_name: list(dir_paths)})
-            else:
-                for bucket in ret:
-                    if bucket_name in bucket:
-                        bucket[bucket_name] += list(dir_paths)
-                        bucket[bucket_name] = list(set(bucket[bucket_name]))
-                        break
+    ret = {}
+    for bucket_name, files in metadata.items():
+        dir_paths = set()
+        for path in files:
+            prefix = ""
+            for part in path.split("/")[:-1]:
+                directory = prefix + part + "/"
+                dir_paths.add(directory)
+                prefix = directory
+        ret[bucket_name] = sorted(dir_paths)
     return ret
 
 
@@ -628,23 +629,75 @@ def _find_file_meta(metadata, bucket_name, saltenv, path):
     """
     Looks for a file's metadata in the S3 bucket cache file
     """
-    env_meta = metadata[saltenv] if saltenv in metadata else {}
-    bucket_meta = {}
-    for bucket in env_meta:
-        if bucket_name in bucket:
-            bucket_meta = bucket[bucket_name]
-    files_meta = list(list(filter((lambda k: "Key" in k), bucket_meta)))
+    return metadata.get(saltenv, {}).get(bucket_name, {}).get(path)
 
-    for item_meta in files_meta:
-        if "Key" in item_meta and item_meta["Key"] == path:
+
+def _get_verified_filename():
+    """
+    Return the filename of the record of verified cached files
+    """
+    return os.path.join(_get_cache_dir(), "verified_files.cache")
+
+
+def _verified():
+    """
+    Return the ``{cached file path: (etag, size, mtime_ns)}`` record of the
+    cached files whose md5 matched their ETag, loading it on first use
+    """
+    cache_dir = _get_cache_dir()
+    with _VERIFIED_LOCK:
+        if cache_dir not in _VERIFIED:
+            data = {}
             try:
-                # Get rid of quotes surrounding md5
-                item_meta["ETag"] = item_meta["ETag"].strip('"')
-            except KeyError:
-                pass
-            return item_meta
+                with hubblestack.utils.files.fopen(_get_verified_filename(), "rb") as fp_:
+                    data = pickle.load(fp_)
+            except (OSError, pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError) as eobj:
+                log.debug("not using the verified files record: %s", repr(eobj))
+            _VERIFIED[cache_dir] = data if isinstance(data, dict) else {}
+        return _VERIFIED[cache_dir]
 
-    return None
+
+def _is_verified(cached_file_path, etag):
+    """
+    True if the cached file was verified against ``etag`` and has not changed
+    (size and mtime) since
+    """
+    entry = _verified().get(cached_file_path)
+    if not etag or not entry or entry[0] != etag:
+        return False
+    try:
+        stat = os.stat(cached_file_path)
+    except OSError:
+        return False
+    return entry[1:] == (stat.st_size, stat.st_mtime_ns)
+
+
+def _set_verified(cached_file_path, etag):
+    """
+    Record that the cached file, as it is now, matches ``etag``
+    """
+    stat = os.stat(cached_file_path)
+    verified = _verified()
+    with _VERIFIED_LOCK:
+        verified[cached_file_path] = (etag, stat.st_size, stat.st_mtime_ns)
+
+
+def _save_verified(keep=None):
+    """
+    Write the record of verified cached files to disk, limited to the paths
+    in ``keep`` if it is given
+    """
+    verified = _verified()
+    with _VERIFIED_LOCK:
+        if keep is not None:
+            for path in set(verified) - set(keep):
+                del verified[path]
+        data = dict(verified)
+    try:
+        with hubblestack.utils.atomicfile.atomic_open(_get_verified_filename(), "wb") as fp_:
+            pickle.dump(data, fp_)
+    except OSError as exc:
+        log.warning("unable to write the verified files record: %s", exc)
 
 
 def _get_buckets():
@@ -655,12 +708,51 @@ def _get_buckets():
     return __opts__["s3.buckets"] if "s3.buckets" in __opts__ else {}
 
 
+def _get_s3_query_kwargs():
+    """
+    Return the s3.query arguments common to all queries
+    """
+    s3_key_kwargs = _get_s3_key()
+    return {
+        "key": s3_key_kwargs["key"],
+        "keyid": s3_key_kwargs["keyid"],
+        "kms_keyid": s3_key_kwargs["keyid"],
+        "service_url": s3_key_kwargs["service_url"],
+        "verify_ssl": s3_key_kwargs["verify_ssl"],
+        "location": s3_key_kwargs["location"],
+        "path_style": s3_key_kwargs["path_style"],
+        "https_enable": s3_key_kwargs["https_enable"],
+    }
+
+
 def _get_file_from_s3(metadata, saltenv, bucket_name, path, cached_file_path):
     """
     Checks the local cache for the file, if it's old or missing go grab the
     file from S3 and update the cache
     """
-    s3_key_kwargs = _get_s3_key()
+    download = _get_file_download(metadata, saltenv, bucket_name, path, cached_file_path)
+    if download is None:
+        return
+
+    query_kwargs = _get_s3_query_kwargs()
+    query_kwargs.update(download)
+    if __utils__["s3.query"](**query_kwargs):
+        _downloaded(download)
+
+
+def _downloaded(download):
+    """
+    Record a successful download, s3.query checked it against the md5 ETag
+    """
+    if download["expected_md5"]:
+        _set_verified(download["local_file"], download["expected_md5"])
+
+
+def _get_file_download(metadata, saltenv, bucket_name, path, cached_file_path):
+    """
+    Checks the local cache for the file. Returns None if the cached file is
+    current, otherwise the s3.query arguments that download the file.
+    """
 
     def _get_file():
         """
@@ -668,19 +760,12 @@ def _get_file_from_s3(metadata, saltenv, bucket_name, path, cached_file_path):
         Returns True if the file was downloaded and False if the download was skipped.
         """
         ret = __utils__["s3.query"](
-            key=s3_key_kwargs["key"],
-            keyid=s3_key_kwargs["keyid"],
-            kms_keyid=s3_key_kwargs["keyid"],
             method="HEAD",
             bucket=bucket_name,
-            service_url=s3_key_kwargs["service_url"],
-            verify_ssl=s3_key_kwargs["verify_ssl"],
-            location=s3_key_kwargs["location"],
             path=_quote(path),
             local_file=cached_file_path,
             full_headers=True,
-            path_style=s3_key_kwargs["path_style"],
-            https_enable=s3_key_kwargs["https_enable"],
+            **_get_s3_query_kwargs()
         )
         if ret:
             for header_name, header_value in ret["headers"].items():
@@ -700,16 +785,24 @@ def _get_file_from_s3(metadata, saltenv, bucket_name, path, cached_file_path):
                 return False
         return True
 
+    file_meta = _find_file_meta(metadata, bucket_name, saltenv, path)
+    # multipart uploads do not have an md5 ETag
+    md5_etag = file_meta["ETag"] if file_meta and file_meta["ETag"].find("-") == -1 else None
+
     # check the local cache...
     if os.path.isfile(cached_file_path):
-        file_meta = _find_file_meta(metadata, bucket_name, saltenv, path)
         if file_meta:
-            if file_meta["ETag"].find("-") == -1:
+            if md5_etag:
+                # unchanged since it was last verified against this ETag
+                if _is_verified(cached_file_path, md5_etag):
+                    return None
+
                 cached_md5 = hubblestack.utils.hashutils.get_hash(cached_file_path, "md5")
 
                 # hashes match we have a cache hit
-                if cached_md5 == file_meta["ETag"]:
-                    return
+                if cached_md5 == md5_etag:
+                    _set_verified(cached_file_path, md5_etag)
+                    return None
             else:
                 cached_file_stat = os.stat(cached_file_path)
                 cached_file_data = {
@@ -729,22 +822,15 @@ def _get_file_from_s3(metadata, saltenv, bucket_name, path, cached_file_path):
                     )
                     if not _get_file():
                         # skipped download
-                        return
+                        return None
 
     # ... or get the file from S3
-    __utils__["s3.query"](
-        key=s3_key_kwargs["key"],
-        keyid=s3_key_kwargs["keyid"],
-        kms_keyid=s3_key_kwargs["keyid"],
-        bucket=bucket_name,
-        service_url=s3_key_kwargs["service_url"],
-        verify_ssl=s3_key_kwargs["verify_ssl"],
-        location=s3_key_kwargs["location"],
-        path=_quote(path),
-        local_file=cached_file_path,
-        path_style=s3_key_kwargs["path_style"],
-        https_enable=s3_key_kwargs["https_enable"],
-    )
+    return {
+        "bucket": bucket_name,
+        "path": _quote(path),
+        "local_file": cached_file_path,
+        "expected_md5": md5_etag,
+    }
 
 
 def _trim_env_off_path(paths, saltenv, trim_slash=False):
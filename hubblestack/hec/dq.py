@@ -1,15 +1,41 @@
 # -*- encoding: utf-8 -*-
+"""
+Memory and disk queues for events that could not be delivered
+
+DiskQueue stores each item in its own file, bz2 compressed at the given
+``compression`` level (0 for none). With a ``codec`` (``none``, ``zlib``,
+``lzma``, ``bz2`` or, when the zstandard module is installed, ``zstd``) the
+items are still written one file each as they come, so that nothing queued is
+lost, but once about ``batch_size`` bytes are waiting they are compacted into
+a single batch file compressed as a whole; similar small events compress far
+better together than one by one. ``compression`` is then the codec's level (0
+for its default).
+
+A batch file starts with a header naming its codec and record count, and holds
+the data and meta data of every record. Files without the header are read as
+single items, so queues written by older versions (or without a codec) stay
+readable, and a queue may hold both kinds.
+"""
 
 import bz2
+import lzma
 import os
 import logging
+import struct
 import time
 import shutil
-import json
+import zlib
 from collections import deque
+import hubblestack.utils.json
 from hubblestack.utils.misc import numbered_file_split_key
 from hubblestack.utils.encoding import encode_something_to_bytes, decode_something_to_string
 
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
 __all__ = [
     'QueueTypeError', 'QueueCapacityError', 'MemQueue', 'DiskQueue',
     'DiskBackedQueue', 'DEFAULT_MEMORY_SIZE', 'DEFAULT_DISK_SIZE',
@@ -21,6 +47,39 @@ OK_TYPES = (str,)
 SPLUNK_MAX_MSG = 100000 # 100k
 DEFAULT_MEMORY_SIZE = SPLUNK_MAX_MSG * 5 # 500k
 DEFAULT_DISK_SIZE = DEFAULT_MEMORY_SIZE * 1000 # 0.5GB
+DEFAULT_BATCH_SIZE = SPLUNK_MAX_MSG # a batch is about what one getz() takes
+
+# magic, codec id, record count; then the compressed records, each of them the
+# lengths of its data and meta data (as '>II') followed by both
+BATCH_MAGIC = b'HQB1'
+_BATCH_HEADER = struct.Struct('>4sBI')
+_RECORD_HEADER = struct.Struct('>II')
+# files next to the queue items
+_SIDECARS = ('.meta', '.pos', '.tmp', '.bad')
+
+
+def _zstd_compress(dat, level):
+    return zstandard.ZstdCompressor(level=level or 3).compress(dat)
+
+
+def _zstd_decompress(dat):
+    return zstandard.ZstdDecompressor().decompress(dat)
+
+
+# name: (id, compress(data, level), decompress(data))
+CODECS = {
+    'none': (0, lambda dat, level: dat, lambda dat: dat),
+    'zlib': (1, lambda dat, level: zlib.compress(dat, level or 6), zlib.decompress),
+    'lzma': (2, lambda dat, level: lzma.compress(dat, preset=level or 6), lzma.decompress),
+    'bz2': (3, lambda dat, level: bz2.compress(dat, level or 9), bz2.decompress),
+    'zstd': (4, _zstd_compress, _zstd_decompress),
+}
+CODEC_NAMES = dict((v[0], k) for k, v in CODECS.items())
+
+
+def available_codecs():
+    """ the names of the codecs that can be used here """
+    return sorted(name for name in CODECS if name != 'zstd' or HAS_ZSTD)
 
 class QueueTypeError(Exception):
     pass
@@ -57,14 +116,24 @@ class DiskQueue(OKTypesMixin):
     sep = b' '
     cn = sz = 0
 
-    def __init__(self, directory, size=DEFAULT_DISK_SIZE, ok_types=OK_TYPES, fresh=False, compression=0):
+    def __init__(self, directory, size=DEFAULT_DISK_SIZE, ok_types=OK_TYPES, fresh=False, compression=0,
+                 codec=None, batch_size=DEFAULT_BATCH_SIZE):
         self.init_types(ok_types)
         self.init_dq(directory, size)
         self.compression = compression
-        log.debug('DiskQueue.__init__(%s, compression=%d)', directory, compression)
+        if codec is not None and codec not in available_codecs():
+            log.warning('DiskQueue codec %s is not available, using zlib', codec)
+            codec = 'zlib'
+        self.codec = codec
+        self.batch_size = batch_size
+        self._pending = list()
+        self._pending_sz = 0
+        self._head = None
+        log.debug('DiskQueue.__init__(%s, compression=%d, codec=%s)', directory, compression, codec)
         if fresh:
             self.clear()
         self._count()
+        self._seq = self._next_seq()
         self.double_check_cnsz = bool(os.environ.get('DOUBLE_CHECK_CNSZ'))
 
     def __bool__(self):
@@ -73,7 +142,8 @@ class DiskQueue(OKTypesMixin):
 
     def compress(self, dat):
         dat = encode_something_to_bytes(dat)
-        if not self.compression:
+        if not self.compression or self.codec is not None:
+            # with a codec, items are compressed when they're compacted into batches
             return dat
         def _bz2(x):
             b = bz2.BZ2Compressor(self.compression)
@@ -82,10 +152,12 @@ class DiskQueue(OKTypesMixin):
         return _bz2(dat)
 
     def unlink_(self, fname):
-        names = (fname, fname + '.meta')
+        names = (fname, fname + '.meta', fname + '.pos')
         for name in names:
             if os.path.isfile(name):
                 os.unlink(name)
+        if self._head is not None and self._head[0] == fname:
+            self._head = None
 
     def decompress(self, dat):
         dat = encode_something_to_bytes(dat)
@@ -110,6 +182,9 @@ class DiskQueue(OKTypesMixin):
 
     def clear(self):
         """ clear the queue """
+        self._pending = list()
+        self._pending_sz = 0
+        self._head = None
         if os.path.isdir(self.directory):
             shutil.rmtree(self.directory)
 
@@ -131,24 +206,68 @@ class DiskQueue(OKTypesMixin):
         bstr = self.compress(item)
         if not self.accept(bstr):
             raise QueueCapacityError('refusing to accept item due to size')
-        fanout, remainder = self._fanout('{0}.{1}'.format(int(time.time()), self.cn))
-        d = self._mkdir(fanout)
-        f = os.path.join(d, remainder)
+        while True:
+            # a sequence rather than the item count: the count goes down as
+            # items are taken, and a new name must not land on a queued file
+            fanout, remainder = self._fanout('{0}.{1}'.format(int(time.time()), self._seq))
+            self._seq += 1
+            d = self._mkdir(fanout)
+            f = os.path.join(d, remainder)
+            if not os.path.exists(f):
+                break
         with open(f, 'wb') as fh:
             log.debug('writing item to disk cache')
             fh.write(bstr)
+        mstr = b''
         if meta:
-            with open(f + '.meta', 'w') as fh:
-                json.dump(meta, fh)
+            mstr = hubblestack.utils.json.encode(meta).encode('utf-8')
+            with open(f + '.meta', 'wb') as fh:
+                fh.write(mstr)
         self.cn += 1
         self.sz += len(bstr)
+        if self.codec is not None:
+            # kept to be compacted without reading it back
+            self._pending.append((f, bstr, mstr))
+            self._pending_sz += len(bstr)
+            if self._pending_sz >= self.batch_size:
+                self.compact()
         if self.double_check_cnsz:
             self._count(double_check_only=True, tag='put')
 
+    def compact(self):
+        """ compress the items put since the last batch into one batch file
+            (which takes the place of the first of them in the queue)
+        """
+        # (items taken from the queue in the meantime are left out)
+        pending = [ p for p in self._pending if os.path.isfile(p[0]) ]
+        self._pending = list()
+        self._pending_sz = 0
+        if not pending or self.codec is None:
+            return
+        codec_id, compress, _ = CODECS[self.codec]
+        body = list()
+        for _, dat, mdat in pending:
+            body.append(_RECORD_HEADER.pack(len(dat), len(mdat)))
+            body.append(dat)
+            body.append(mdat)
+        bstr = _BATCH_HEADER.pack(BATCH_MAGIC, codec_id, len(pending))
+        bstr += compress(b''.join(body), self.compression)
+        first = pending[0][0]
+        with open(first + '.tmp', 'wb') as fh:
+            fh.write(bstr)
+        os.rename(first + '.tmp', first)
+        if os.path.isfile(first + '.meta'):
+            os.unlink(first + '.meta')
+        for fname, _, _ in pending[1:]:
+            self.unlink_(fname)
+        self.sz += len(bstr) - sum(len(dat) for _, dat, _ in pending)
+        log.debug('compacted %d items into a %s batch of %d octets',
+            len(pending), self.codec, len(bstr))
+
     def read_meta(self, fname):
         try:
             with open(fname + '.meta', 'r') as fh:
-                return json.load(fh)
+                return hubblestack.utils.json.decode(fh.read())
         except ValueError:
             # can't quite read the json
             pass
@@ -157,41 +276,90 @@ class DiskQueue(OKTypesMixin):
             pass
         return dict()
 
+    def _read_pos(self, fname):
+        try:
+            with open(fname + '.pos', 'r') as fh:
+                return int(fh.read())
+        except (IOError, ValueError):
+            return 0
+
+    def _load(self, fname):
+        """ the records of a queue file that are still queued, as a list of
+            (data_octets, meta_data_dict)
+        """
+        st = os.stat(fname)
+        if self._head is not None and self._head[0] == fname and self._head[1] == st.st_ino:
+            return self._head[3]
+        with open(fname, 'rb') as fh:
+            dat = fh.read()
+        if not dat.startswith(BATCH_MAGIC):
+            return [ (self.decompress(dat), self.read_meta(fname)) ]
+        try:
+            _, codec_id, count = _BATCH_HEADER.unpack_from(dat)
+            codec = CODEC_NAMES[codec_id]
+            if codec not in available_codecs():
+                raise ValueError('codec {0} is not available'.format(codec))
+            body = CODECS[codec][2](dat[_BATCH_HEADER.size:])
+            records = list()
+            offset = 0
+            for _ in range(count):
+                dlen, mlen = _RECORD_HEADER.unpack_from(body, offset)
+                offset += _RECORD_HEADER.size
+                mdat = body[offset + dlen:offset + dlen + mlen]
+                mdat = hubblestack.utils.json.decode(mdat) if mlen else dict()
+                records.append((body[offset:offset + dlen], mdat))
+                offset += dlen + mlen
+        except Exception as e:
+            # keep it for inspection, but out of the way of the rest of the queue
+            log.error('unable to read queue batch %s, moving it aside: %s', fname, e)
+            os.rename(fname, fname + '.bad')
+            self._count()
+            return list()
+        del records[:self._read_pos(fname)]
+        if not records:
+            # taken already, but not removed
+            self.unlink_(fname)
+            return records
+        self._head = (fname, st.st_ino, count, records)
+        return records
+
+    def _consume(self, fname, n):
+        """ remove the first n records of a queue file """
+        if n < 1:
+            return
+        if self._head is not None and self._head[0] == fname and len(self._head[3]) > n:
+            del self._head[3][:n]
+            with open(fname + '.pos', 'w') as fh:
+                fh.write(str(self._head[2] - len(self._head[3])))
+        else:
+            self.sz -= os.stat(fname).st_size
+            self.unlink_(fname)
+        self.cn -= n
+        if self.double_check_cnsz:
+            self._count(double_check_only=True, tag='consume')
+
     def peek(self):
         """ look at the next item in the queue, but don't actually remove it from the queue
             returns: data_octets, meta_data_dict
         """
         for fname in self.files:
-            with open(fname, 'rb') as fh:
-                return decode_something_to_string(self.decompress(fh.read())), self.read_meta(fname)
-
-    def iter_peek(self):
-        ''' iterate and return all items in the disk queue (without removing any) '''
-        for fname in self.files:
-            with open(fname, 'rb') as fh:
-                yield self.decompress(fh.read()), self.read_meta(fname)
+            for dat, mdat in self._load(fname):
+                return decode_something_to_string(dat), mdat
 
     def iter_peek(self):
         ''' iterate and return all items in the disk queue (without removing any) '''
         for fname in self.files:
-            with open(fname, 'rb') as fh:
-                yield self.decompress(fh.read()), self.read_meta(fname)
+            for dat, mdat in self._load(fname):
+                yield dat, mdat
 
     def get(self):
         """ get the next item from the queue
             returns: data_octets, meta_data_dict
         """
         for fname in self.files:
-            with open(fname, 'rb') as fh:
-                dat = self.decompress(fh.read())
-            mdat = self.read_meta(fname)
-            sz = os.stat(fname).st_size
-            self.unlink_(fname)
-            self.cn -= 1
-            self.sz -= sz
-            if self.double_check_cnsz:
-                self._count(double_check_only=True, tag='get')
-            return decode_something_to_string(dat), mdat
+            for dat, mdat in self._load(fname):
+                self._consume(fname, 1)
+                return decode_something_to_string(dat), mdat
 
     def getz(self, sz=SPLUNK_MAX_MSG):
         """ fetch items from the queue and concatenate them together using the
@@ -205,22 +373,28 @@ class DiskQueue(OKTypesMixin):
         """
         # Is it "dangerous" to unlink files during the os.walk (via generator)?
         # .oO( probably doesn't matter )
-        ret = b''
+        ret = list()
+        ret_sz = 0
         meta_data = dict()
+        full = False
         for fname in self.files:
-            with open(fname, 'rb') as fh:
-                partial_data = self.decompress(fh.read())
-            if ret:
-                if len(ret) + len(self.sep) + len(partial_data) > sz:
-                    break
-                ret += self.sep
-            ret += partial_data
-            _md = self.read_meta(fname)
-            for k in _md:
-                if k not in meta_data:
-                    meta_data[k] = list()
-                meta_data[k].append( _md[k] )
-            self.unlink_(fname)
+            taken = 0
+            for partial_data, _md in self._load(fname):
+                if ret:
+                    if ret_sz + len(self.sep) + len(partial_data) > sz:
+                        full = True
+                        break
+                    ret_sz += len(self.sep)
+                ret.append(partial_data)
+                ret_sz += len(partial_data)
+                taken += 1
+                for k in _md:
+                    if k not in meta_data:
+                        meta_data[k] = list()
+                    meta_data[k].append( _md[k] )
+            self._consume(fname, taken)
+            if full:
+                break
         self._count()
         for k in meta_data:
             # probably tracking the meta_data for each payload is more work
@@ -234,34 +408,50 @@ class DiskQueue(OKTypesMixin):
             #
             # occasionally this will return something pessimistic
             meta_data[k] = max(meta_data[k])
-        return decode_something_to_string(ret), meta_data
+        return decode_something_to_string(self.sep.join(ret)), meta_data
 
     def pop(self):
         """ remove the next item from the queue (do not return it); useful with .peek() """
         for fname in self.files:
-            sz = os.stat(fname).st_size
-            self.unlink_(fname)
-            self.cn -= 1
-            self.sz -= sz
-            if self.double_check_cnsz:
-                self._count(double_check_only=True, tag='pop')
-            break
+            if self._load(fname):
+                self._consume(fname, 1)
+                break
 
     @property
     def files(self):
         """ generate all filenames in the diskqueue (returns iterable) """
         for path, dirs, files in sorted(os.walk(self.directory)):
             for fname in [os.path.join(path, f) for f in sorted(files, key=numbered_file_split_key)]:
-                if fname.endswith('.meta'):
+                if fname.endswith(_SIDECARS):
                     continue
                 yield fname
 
+    def _next_seq(self):
+        """ the sequence number following the highest one in the queued filenames """
+        seq = -1
+        for fname in self.files:
+            # the name is split over the fanout directory and the file
+            name = os.path.basename(os.path.dirname(fname)) + os.path.basename(fname)
+            try:
+                seq = max(seq, int(name.rsplit('.', 1)[1]))
+            except (IndexError, ValueError):
+                pass
+        return seq + 1
+
+    def _file_count(self, fname):
+        """ the number of records still queued in a queue file """
+        with open(fname, 'rb') as fh:
+            header = fh.read(_BATCH_HEADER.size)
+        if len(header) < _BATCH_HEADER.size or not header.startswith(BATCH_MAGIC):
+            return 1
+        return _BATCH_HEADER.unpack(header)[2] - self._read_pos(fname)
+
     def _count(self, double_check_only=False, tag='unknown'):
         cn = 0
         sz = 0
         for fname in self.files:
             sz += os.stat(fname).st_size
-            cn += 1
+            cn += self._file_count(fname)
         if double_check_only:
             log.debug('disk cache sizes: [double check %s] presumed<cn=%d sz=%d> vs actual<cn=%d sz=%d>',
                 tag, self.cn, self.sz, cn, sz)
@@ -1,6 +1,5 @@
 # -*- encoding: utf-8 -*-
 
-import json
 import time
 import copy
 import os
@@ -14,6 +13,7 @@ import logging
 log = logging.getLogger(__name__)
 
 import hubblestack.status
+import hubblestack.utils.json
 
 hubble_status = hubblestack.status.HubbleStatus(__name__)
 
@@ -97,7 +97,7 @@ class Payload:
         self.sourcetype = dat.get("sourcetype", "hubble")
         self.time = dat.get("time", now)
 
-        self.dat = json.dumps(dat)
+        self.dat = hubblestack.utils.json.encode(dat)
 
     def __repr__(self):
         return "Payload({0})".format(self)
@@ -200,6 +200,7 @@ class HEC(object):
         disk_queue=False,
         disk_queue_size=MAX_DISKQUEUE_SIZE,
         disk_queue_compression=5,
+        disk_queue_codec=None,
         max_queue_cycles=80,
         max_bad_request_cycles=40,
         outage_recheck_time=300,
@@ -269,7 +270,7 @@ class HEC(object):
         self.headers = urllib3.make_headers(
             keep_alive=True, user_agent="hubble-hec/{0}".format(__version__), accept_encoding=True
         )
-        self.headers.update({"Content-Type": "application/json", "Authorization": "Splunk {0}".format(self.token)})
+        self.headers.update({"Content-Type": "application/json; charset=utf-8", "Authorization": "Splunk {0}".format(self.token)})
 
         # 2019-09-24: lowered retries from 3 (9s + 3*9s = 36s) to 1 (9s + 9s = 18s)
         # Each new event could potentially take half a minute with 3 retries.
@@ -309,7 +310,8 @@ class HEC(object):
                 md5.update(encode_something_to_bytes(url_))
             actual_disk_queue = os.path.join(disk_queue, md5.hexdigest())
             log.debug("disk_queue for %s: %s", uril, actual_disk_queue)
-            self.queue = DiskQueue(actual_disk_queue, size=disk_queue_size, compression=disk_queue_compression)
+            self.queue = DiskQueue(actual_disk_queue, size=disk_queue_size,
+                                   compression=disk_queue_compression, codec=disk_queue_codec)
         else:
             self.queue = NoQueue()
 
@@ -387,6 +389,9 @@ class HEC(object):
     def _send(self, *payload, **kwargs):
         now = time.time()
         data = " ".join([str(x) for x in payload])
+        # payloads keep non-ASCII characters; send them as UTF-8 rather than
+        # leave a str body to http.client, which encodes it as Latin-1
+        body = data.encode("utf-8")
 
         servers = [x for x in self.server_uri if not x.bad]
         if not servers:
@@ -432,7 +437,7 @@ class HEC(object):
 
         possible_queue = False
         for server in sorted(servers, key=lambda u: u.fails):
-            log.debug("trying to send %d octets to %s", len(data), server.uri)
+            log.debug("trying to send %d octets to %s", len(body), server.uri)
             if server.outage:
                 if server.outage.last_check_age < self.outage_recheck_time:
                     log.debug("flagged as having an outage, skipping send attempt")
@@ -444,7 +449,7 @@ class HEC(object):
             try:
                 # Remember that we tried to send this
                 meta_data["send_attempts"] += 1
-                res = self.pool_manager.request("POST", server.uri, body=data, headers=self.headers)
+                res = self.pool_manager.request("POST", server.uri, body=body, headers=self.headers)
                 server.fails = 0
                 if server.outage:
                     server.outage = False
@@ -17,8 +17,8 @@
 #
 # we just look in [config.get]('hubblestack:returner:splunk')
 #
-# Additionally, the defaults for disk_queue, disk_queue_size and
-# disk_queue_compression can be set in the top level configuration -- although,
+# Additionally, the defaults for disk_queue, disk_queue_size,
+# disk_queue_compression and disk_queue_codec can be set in the top level configuration -- although,
 # are still overridden by per-hec configs.
 
 
@@ -74,6 +74,7 @@ def _get_splunk_options(space, modality, **kw):
         'disk_queue': confg('disk_queue', False),
         'disk_queue_size': confg('disk_queue_size', 100 * (1024 ** 2)),
         'disk_queue_compression': confg('disk_queue_compression', 5),
+        'disk_queue_codec': confg('disk_queue_codec', None),
     }
 
     nicknames = kw.pop('_nick', {'sourcetype_log': 'sourcetype'})
@@ -171,6 +172,7 @@ def make_hec_args(opts):
         'disk_queue': opts['disk_queue'],
         'disk_queue_size': opts['disk_queue_size'],
         'disk_queue_compression': opts['disk_queue_compression'],
+        'disk_queue_codec': opts.get('disk_queue_codec'),
     }
 
     return (a, kw)
@@ -13,6 +13,8 @@ import yaml
 import logging
 import inspect
 import tempfile
+import copy
+import fnmatch
 import functools
 import threading
 import traceback
@@ -21,6 +23,7 @@ import types
 from zipimport import zipimporter
 
 import hubblestack.config
+import hubblestack.payload
 import hubblestack.syspaths
 import hubblestack.utils.args
 import hubblestack.utils.context
@@ -30,6 +33,7 @@ import hubblestack.utils.files
 import hubblestack.utils.lazy
 import hubblestack.utils.odict
 import hubblestack.utils.platform
+import hubblestack.utils.profile_cache
 import hubblestack.utils.versions
 
 from hubblestack.exceptions import LoaderError
@@ -295,6 +299,147 @@ def grain_funcs(opts):
     )
 
 
+# grain function name -> (timestamp, return value); see _GrainRunner
+GRAINS_TTL_CACHE = dict()
+
+# grain function name -> the _GrainJob given up on by its timeout; the grain
+# is skipped until that thread exits rather than starting another one
+GRAINS_ABANDONED = dict()
+
+
+class _GrainJob(threading.Thread):
+    """
+    A single grain function call, run in a daemon thread so that a hung grain
+    can be abandoned (python threads can't be killed) without holding up the
+    daemon or its shutdown.
+    """
+
+    def __init__(self, key, func, kwargs, slots):
+        super(_GrainJob, self).__init__(name="grain:{0}".format(key))
+        self.daemon = True
+        self.key = key
+        self.func = func
+        self.kwargs = kwargs
+        self.ret = None
+        self.ok = False
+        self.started = None
+        self.abandoned = False
+        self._slots = slots
+        self._slot_lock = threading.Lock()
+        self._slot_held = True
+
+    def run(self):
+        self.started = time.time()
+        try:
+            log.trace("Loading %s grain", self.key)
+            self.ret = self.func(**self.kwargs)
+            self.ok = True
+        except Exception:
+            log.critical(
+                "Failed to load grains defined in grain file %s in " "function %s, error:\n",
+                self.key,
+                self.func,
+                exc_info=True,
+            )
+        finally:
+            self.release()
+
+    def release(self):
+        """give back the worker slot (exactly once)"""
+        with self._slot_lock:
+            if self._slot_held:
+                self._slot_held = False
+                self._slots.release()
+
+
+class _GrainRunner(object):
+    """
+    Run grain functions concurrently, at most ``workers`` at a time, and give
+    up on any single grain that runs longer than ``timeout`` seconds (0
+    disables the timeout).
+
+    ``ttls`` maps grain function names (``module.function``, fnmatch globs are
+    allowed) to a number of seconds during which the last successful return
+    of that grain is reused instead of calling the function again.
+
+    A grain that timed out is skipped by later runs for as long as its
+    abandoned thread is still alive, so a hung grain costs one thread, not
+    one per refresh.
+    """
+
+    def __init__(self, funcs, workers=8, timeout=120, ttls=None):
+        self.funcs = funcs
+        self.workers = max(1, int(workers or 1))
+        self.timeout = float(timeout or 0)
+        self.ttls = ttls or {}
+        self._slots = threading.Semaphore(self.workers)
+
+    def ttl(self, key):
+        """return the cache ttl configured for the given grain function"""
+        if key in self.ttls:
+            return self.ttls[key]
+        for pattern, ttl in self.ttls.items():
+            if fnmatch.fnmatch(key, pattern):
+                return ttl
+        return 0
+
+    def _expired(self, job):
+        return bool(self.timeout and job.started and time.time() - job.started > self.timeout)
+
+    def _abandon(self, job):
+        job.abandoned = True
+        job.release()
+        GRAINS_ABANDONED[job.key] = job
+        log.error("Grain function %s did not return within %ss, skipping it", job.key, self.timeout)
+
+    def _acquire(self, running):
+        while not self._slots.acquire(timeout=0.1):
+            for job in running:
+                if job.is_alive() and not job.abandoned and self._expired(job):
+                    self._abandon(job)
+
+    def run(self, keys, **kwargs):
+        """
+        Call the grain functions named in ``keys`` with ``kwargs``.  Returns a
+        dict of key -> return value for the grains that finished.
+        """
+        results = {}
+        running = []
+        now = time.time()
+        for key in keys:
+            ttl = self.ttl(key)
+            if ttl and key in GRAINS_TTL_CACHE:
+                stamp, ret = GRAINS_TTL_CACHE[key]
+                if now - stamp < ttl:
+                    log.trace("Using cached %s grain", key)
+                    results[key] = copy.deepcopy(ret)
+                    continue
+            hung = GRAINS_ABANDONED.get(key)
+            if hung is not None:
+                if hung.is_alive():
+                    log.error("Grain function %s is still running since it timed out, skipping it", key)
+                    continue
+                GRAINS_ABANDONED.pop(key, None)
+            self._acquire(running)
+            job = _GrainJob(key, self.funcs[key], kwargs, self._slots)
+            running.append(job)
+            job.start()
+        for job in running:
+            while job.is_alive() and not job.abandoned:
+                if self.timeout and job.started:
+                    job.join(max(0, job.started + self.timeout - time.time()))
+                    if job.is_alive():
+                        self._abandon(job)
+                else:
+                    job.join(0.1)
+            if job.abandoned or not job.ok:
+                continue
+            results[job.key] = job.ret
+            if self.ttl(job.key):
+                GRAINS_TTL_CACHE[job.key] = (time.time(), copy.deepcopy(job.ret))
+        return results
+
+
 def grains(opts, force_refresh=False):
     """
     Return the functions for the dynamic grains and the values for the static
@@ -343,12 +488,39 @@ def grains(opts, force_refresh=False):
     funcs = grain_funcs(opts)
     if force_refresh:  # if we refresh, lets reload grain modules
         funcs.clear()
-    # Run core grains
+        GRAINS_TTL_CACHE.clear()
+
+    # Sort the grain functions into the ones that can run right away (core
+    # and anything that doesn't need the grains dict) and the ones that take a
+    # ``grains`` argument and therefore have to wait for the first group.
+    core_keys, independent_keys, dependent_keys = [], [], []
     for key in funcs:
-        if not key.startswith("core."):
+        if key == "_errors":
+            continue
+        if key.startswith("core."):
+            core_keys.append(key)
+            continue
+        try:
+            parameters = hubblestack.utils.args.get_function_argspec(funcs[key]).args
+        except Exception:
+            log.critical("Failed to inspect grain function %s, error:\n", key, exc_info=True)
             continue
-        log.trace("Loading %s grain", key)
-        ret = funcs[key]()
+        if "grains" in parameters:
+            dependent_keys.append(key)
+        else:
+            independent_keys.append(key)
+
+    runner = _GrainRunner(
+        funcs,
+        workers=opts.get("grains_worker_threads", 8),
+        timeout=opts.get("grains_timeout", 120),
+        ttls=opts.get("grains_cache_ttl", {}),
+    )
+    # core grains never took the grains dict, so they go out with the
+    # independent ones in a single batch
+    results = runner.run(core_keys + independent_keys)
+    for key in core_keys + independent_keys:
+        ret = results.get(key)
         if not isinstance(ret, dict):
             continue
         if grains_deep_merge:
@@ -356,25 +528,11 @@ def grains(opts, force_refresh=False):
         else:
             grains_data.update(ret)
 
-    # Run the rest of the grains
-    for key in funcs:
-        if key.startswith("core.") or key == "_errors":
-            continue
-        try:
-            log.trace("Loading %s grain", key)
-            parameters = hubblestack.utils.args.get_function_argspec(funcs[key]).args
-            kwargs = {}
-            if "grains" in parameters:
-                kwargs["grains"] = grains_data
-            ret = funcs[key](**kwargs)
-        except Exception:
-            log.critical(
-                "Failed to load grains defined in grain file %s in " "function %s, error:\n",
-                key,
-                funcs[key],
-                exc_info=True,
-            )
-            continue
+    # Run the grains that need to see the grains computed so far one at a
+    # time, each one sees what the ones before it merged. Each gets its own
+    # copy: a grain that times out keeps running and must not touch ours.
+    for key in dependent_keys:
+        ret = runner.run([key], grains=copy.deepcopy(grains_data)).get(key)
         if not isinstance(ret, dict):
             continue
         if grains_deep_merge:
@@ -384,7 +542,7 @@ def grains(opts, force_refresh=False):
 
     grains_data.update(opts["grains"])
     # Write cache if enabled
-    if opts.get("grains_cache", False):
+    if opts.get("grains_cache", False) or opts.get("grains_warm_start", False):
         with hubblestack.utils.files.set_umask(0o077):
             try:
                 if hubblestack.utils.platform.is_windows():
@@ -416,6 +574,56 @@ def grains(opts, force_refresh=False):
     return hubblestack.utils.data.decode(grains_data, preserve_tuples=True)
 
 
+def cached_grains(opts):
+    """
+    Return the grains saved to ``grains.cache.p`` by an earlier :func:`grains`
+    call, or None if there is no usable cache.
+
+    The volatile grains (the grain functions named in ``grains_volatile``:
+    hostnames, fqdn, IP addresses) are always recomputed and laid over the
+    cached values, so host identity is never reported from a stale cache.
+    Caches older than ``grains_warm_start_max_age`` seconds are ignored.
+
+    This is what lets the daemon start on the last known grains (see
+    ``grains_warm_start``) while the full refresh runs in the background.
+    """
+    if opts.get("skip_grains", False):
+        return None
+    cfn = os.path.join(opts["cachedir"], "grains.cache.p")
+    try:
+        age = time.time() - os.path.getmtime(cfn)
+    except OSError:
+        log.debug("No grains cache found at %s", cfn)
+        return None
+    max_age = opts.get("grains_warm_start_max_age", 604800)
+    if max_age and age > max_age:
+        log.debug("Grains cache %s is too old (%ds), ignoring it", cfn, age)
+        return None
+    try:
+        with hubblestack.utils.files.fopen(cfn, "rb") as fp_:
+            cached = hubblestack.payload.Serial(opts).load(fp_)
+    except Exception as e:
+        log.error("Unable to read the grains cache file %s: %s", cfn, e)
+        return None
+    if not isinstance(cached, dict) or not cached:
+        return None
+    cached = hubblestack.utils.data.decode(cached, preserve_tuples=True)
+
+    funcs = grain_funcs(opts)
+    volatile = [key for key in opts.get("grains_volatile", []) if key in funcs]
+    runner = _GrainRunner(funcs, workers=opts.get("grains_worker_threads", 8), timeout=opts.get("grains_timeout", 120))
+    results = runner.run(volatile)
+    missing = [key for key in volatile if key not in results]
+    if missing:
+        log.error("Unable to recompute volatile grains (%s), not using the grains cache", ", ".join(missing))
+        return None
+    for key in volatile:
+        if isinstance(results[key], dict):
+            cached.update(hubblestack.utils.data.decode(results[key], preserve_tuples=True))
+    log.info("Loaded grains from cache %s (%ds old)", cfn, age)
+    return cached
+
+
 def render(opts, functions):
     """
     Returns the render modules
@@ -1419,9 +1627,8 @@ def nova(hubble_dir, opts, modules, context=None):
                 name = pathname[len(mod_dir) :]
                 if filename.endswith(".yaml"):
                     try:
-                        with open(pathname, "r") as fh:
-                            data[name] = yaml.safe_load(fh)
+                        data[name] = hubblestack.utils.profile_cache.load(pathname, opts)
                     except Exception as exc:
                         missing_data[name] = str(exc)
-                        log.exception("Error loading yaml from %s", pathnmame)
+                        log.exception("Error loading yaml from %s", pathname)
     return loader
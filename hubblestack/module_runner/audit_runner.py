@@ -1,16 +1,21 @@
 import os
 import logging
 import fnmatch
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import hubblestack.module_runner.runner
 from hubblestack.module_runner.runner import Caller
 
 import hubblestack.module_runner.comparator
+import hubblestack.module_runner.runner_utils as runner_utils
 
 from hubblestack.exceptions import HubbleCheckVersionIncompatibleError
 from hubblestack.exceptions import HubbleCheckValidationError
 
 log = logging.getLogger(__name__)
+__opts__ = {}
 CHECK_STATUS = {
     'Success': 'Success',
     'Failure': 'Failure',
@@ -34,11 +39,11 @@ class AuditRunner(hubblestack.module_runner.runner.Runner):
         tags = args.get('tags', '*')
         labels = args.get('labels', None)
         verbose = args.get('verbose', None)
-        result_list = []
+        result_list = runner_utils.CheckResultStore()
         boolean_expr_check_list = []
         audit_profile = os.path.splitext(os.path.basename(audit_file))[0]
+        matched_checks = []
         for audit_id, audit_data in audit_data_dict.items():
-            log.debug('Executing check-id: %s in audit profile: %s', audit_id, audit_profile)
             audit_impl = self._get_matched_implementation(audit_id, audit_data, tags, labels)
             if not audit_impl:
                 # no matched impl found
@@ -48,49 +53,120 @@ class AuditRunner(hubblestack.module_runner.runner.Runner):
 
             if not self._validate_audit_data(audit_id, audit_impl):
                 continue
+            matched_checks.append((audit_id, audit_data, audit_impl))
 
-            try:
-                # version check
-                if not self._is_hubble_version_compatible(audit_id, audit_impl):
-                    raise HubbleCheckVersionIncompatibleError('Version not compatible')
-
-                if self._is_boolean_expression(audit_impl):
-                    # Check is boolean expression.
-                    # Gather boolean expressions in separate list and evaluate after evaluating all other checks.
-                    log.debug('Boolean expression found. Gathering it to evaluate later.')
-                    boolean_expr_check_list.append({
-                        'check_unique_id': audit_id,
-                        'check_id': audit_data['tag'],
-                        'audit_impl': audit_impl,
-                        'audit_data': audit_data
-                    })
-                else:
-                    # handover to module
-                    audit_result = self._execute_audit(audit_id, audit_impl, audit_data, verbose, audit_profile)
-                    result_list.append(audit_result)
-            except (HubbleCheckValidationError, HubbleCheckVersionIncompatibleError) as herror:
-                # add into error/skipped section
-                result_list.append({
+        # contact the remote endpoints of all checks at once
+        self._prefetch_audit_probes(matched_checks)
+
+        # run the checks, concurrently with audit_workers; results keep the profile order
+        def _run(audit_id, audit_data, audit_impl):
+            return self._run_check(audit_id, audit_data, audit_impl, verbose, audit_profile)
+
+        for audit_result, boolean_expr in self._map_checks(_run, matched_checks):
+            if boolean_expr:
+                # Gather boolean expressions in separate list and evaluate after evaluating all other checks.
+                boolean_expr_check_list.append(boolean_expr)
+            elif audit_result:
+                result_list.append(audit_result)
+
+        # Evaluate boolean expressions, their results are added to result_list
+        self._evaluate_boolean_expression(boolean_expr_check_list, verbose, audit_profile, result_list)
+
+        # return list of results for a file
+        return list(result_list)
+
+    def _run_check(self, audit_id, audit_data, audit_impl, verbose, audit_profile):
+        """
+        Run one check, returns its result, or the boolean expression to
+        evaluate once all other checks ran
+        """
+        log.debug('Executing check-id: %s in audit profile: %s', audit_id, audit_profile)
+        try:
+            # version check
+            if not self._is_hubble_version_compatible(audit_id, audit_impl):
+                raise HubbleCheckVersionIncompatibleError('Version not compatible')
+
+            if self._is_boolean_expression(audit_impl):
+                # Check is boolean expression.
+                log.debug('Boolean expression found. Gathering it to evaluate later.')
+                return None, {
                     'check_unique_id': audit_id,
-                    'tag': audit_data['tag'],
                     'check_id': audit_data['tag'],
-                    'description': audit_data['description'],
-                    'sub_check': audit_data.get('sub_check', False),
-                    'check_result': CHECK_STATUS['Error'] if isinstance(herror, HubbleCheckValidationError) else
-                    CHECK_STATUS['Skipped'],
-                    'audit_profile': audit_profile
-                })
-                log.error(herror)
-            except Exception as exc:
-                log.error(exc)
-
-        # Evaluate boolean expressions
-        boolean_expr_result_list = self._evaluate_boolean_expression(
-            boolean_expr_check_list, verbose, audit_profile, result_list)
-        result_list = result_list + boolean_expr_result_list
+                    'audit_impl': audit_impl,
+                    'audit_data': audit_data
+                }
+            # handover to module
+            return self._execute_audit(audit_id, audit_impl, audit_data, verbose, audit_profile), None
+        except (HubbleCheckValidationError, HubbleCheckVersionIncompatibleError) as herror:
+            log.error(herror)
+            # add into error/skipped section
+            return {
+                'check_unique_id': audit_id,
+                'tag': audit_data['tag'],
+                'check_id': audit_data['tag'],
+                'description': audit_data['description'],
+                'sub_check': audit_data.get('sub_check', False),
+                'check_result': CHECK_STATUS['Error'] if isinstance(herror, HubbleCheckValidationError) else
+                CHECK_STATUS['Skipped'],
+                'audit_profile': audit_profile
+            }, None
+        except Exception as exc:
+            log.error(exc)
+        return None, None
+
+    def _map_checks(self, func, matched_checks):
+        """
+        Return ``[func(*check) for check in matched_checks]``, running up to
+        ``audit_workers`` checks at a time.
 
-        # return list of results for a file
-        return result_list
+        At most ``audit_module_workers[module]`` checks of a module run at a
+        time, e.g. to keep osquery from oversubscribing the host. While the
+        load average per CPU is above ``audit_max_load``, checks run one at a
+        time: a check only starts once the checks in flight are done.
+        """
+        try:
+            workers = int(__opts__.get('audit_workers', 1) or 1)
+        except (TypeError, ValueError):
+            log.error('audit_workers must be a number, running the checks sequentially')
+            workers = 1
+        if workers <= 1 or len(matched_checks) < 2:
+            return [func(*check) for check in matched_checks]
+
+        module_limits = {}
+        for module, limit in (__opts__.get('audit_module_workers') or {}).items():
+            try:
+                module_limits[module] = threading.BoundedSemaphore(max(int(limit), 1))
+            except (TypeError, ValueError):
+                log.error('Ignoring audit_module_workers limit of module %s: %s', module, limit)
+        max_load = __opts__.get('audit_max_load')
+        # number of checks in flight, to hold new ones back while over budget
+        in_flight = [0]
+        idle = threading.Condition()
+        cpu_count = os.cpu_count() or 1
+
+        def _over_budget():
+            if not max_load or not hasattr(os, 'getloadavg'):
+                return False
+            return os.getloadavg()[0] / cpu_count > max_load
+
+        def _run(check):
+            limit = module_limits.get(check[2].get('module'))
+            with limit if limit else contextlib.nullcontext():
+                with idle:
+                    # the load is sampled again every second, so waiting
+                    # checks start as soon as it drops
+                    while in_flight[0] and _over_budget():
+                        idle.wait(1)
+                    in_flight[0] += 1
+                try:
+                    return func(*check)
+                finally:
+                    with idle:
+                        in_flight[0] -= 1
+                        idle.notify_all()
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(matched_checks)), thread_name_prefix='audit') as pool:
+            return list(pool.map(_run, matched_checks))
 
     # overridden method
     def _validate_yaml_dictionary(self, yaml_dict):
@@ -127,6 +203,24 @@ class AuditRunner(hubblestack.module_runner.runner.Runner):
         log.debug('No target matched for audit_check_id: %s', audit_check_id)
         return None
 
+    def _prefetch_audit_probes(self, matched_checks):
+        """
+        Prefetch the probes of the checks that are going to run their module
+        """
+        checks = []
+        for audit_id, _, audit_impl in matched_checks:
+            if self._is_boolean_expression(audit_impl) or audit_impl.get('return_no_exec', False):
+                continue
+            try:
+                if not self._is_hubble_version_compatible(audit_id, audit_impl):
+                    continue
+            except Exception:
+                continue
+            for audit_check in audit_impl.get('items') or []:
+                if isinstance(audit_check, dict):
+                    checks.append((audit_impl['module'], audit_id, audit_check))
+        self._prefetch_probes(checks)
+
     def _validate_audit_data(self, audit_id, audit_impl):
         if 'module' not in audit_impl:
             log.error('Matched implementation does not have module mentioned, check_id: %s', audit_id)
@@ -262,17 +356,28 @@ class AuditRunner(hubblestack.module_runner.runner.Runner):
         return audit_result
 
     def _evaluate_boolean_expression(self, boolean_expr_check_list, verbose, audit_profile, result_list):
+        """
+        Evaluate the boolean expression checks, each one after the boolean
+        expressions it refers to. Results are added to result_list, where the
+        checks evaluated later find them, and returned.
+        """
         boolean_expr_result_list = []
         if boolean_expr_check_list:
             log.debug("Evaluating boolean expression checks")
-            for boolean_expr in boolean_expr_check_list:
+            ordered, cyclic = self._order_boolean_expressions(boolean_expr_check_list)
+            for boolean_expr in ordered:
                 try:
+                    if boolean_expr['check_unique_id'] in cyclic:
+                        raise HubbleCheckValidationError(
+                            'Boolean expression of check-id: {0} refers to itself through: {1}'.format(
+                                boolean_expr['check_unique_id'], ', '.join(cyclic[boolean_expr['check_unique_id']])))
                     check_result = self._execute_audit(boolean_expr['check_unique_id'], boolean_expr['audit_impl'],
                                                        boolean_expr['audit_data'], verbose, audit_profile, result_list)
                     boolean_expr_result_list.append(check_result)
+                    result_list.append(check_result)
                 except (HubbleCheckValidationError, HubbleCheckVersionIncompatibleError) as herror:
                     # add into error section
-                    boolean_expr_result_list.append({
+                    error_result = {
                         'check_unique_id': boolean_expr['check_unique_id'],
                         'tag': boolean_expr['audit_data']['tag'],
                         'check_id': boolean_expr['audit_data']['tag'],
@@ -281,9 +386,61 @@ class AuditRunner(hubblestack.module_runner.runner.Runner):
                         'check_result': CHECK_STATUS['Error'] if isinstance(herror, HubbleCheckValidationError) else
                         CHECK_STATUS['Skipped'],
                         'audit_profile': audit_profile
-                    })
+                    }
+                    boolean_expr_result_list.append(error_result)
+                    result_list.append(error_result)
                     log.error(herror)
                 except Exception as exc:
                     log.error(exc)
 
         return boolean_expr_result_list
+
+    def _order_boolean_expressions(self, boolean_expr_check_list):
+        """
+        Order the boolean expression checks so that each one comes after the
+        boolean expressions it refers to, keeping the profile order otherwise.
+
+        Returns the ordered list, and the ids of the checks that are part of a
+        cycle (mapped to the ids they wait on), which cannot be evaluated.
+        """
+        by_id = {boolean_expr['check_unique_id']: boolean_expr for boolean_expr in boolean_expr_check_list}
+
+        # edges between boolean expressions only, other checks are already evaluated
+        dependencies = {}
+        dependents = {check_id: [] for check_id in by_id}
+        for check_id, boolean_expr in by_id.items():
+            dependencies[check_id] = set()
+            for item in boolean_expr['audit_impl'].get('items') or []:
+                try:
+                    referred = self._get_referred_checks('bexpr', check_id, item)
+                except Exception as exc:
+                    # the check reports its own error once evaluated
+                    log.debug('Could not get referred checks of check-id: %s, %s', check_id, exc)
+                    continue
+                for referred_id in referred:
+                    if referred_id in by_id and referred_id not in dependencies[check_id]:
+                        dependencies[check_id].add(referred_id)
+                        dependents[referred_id].append(check_id)
+
+        # Kahn's algorithm, taking ready checks in profile order
+        position = {check_id: index for index, check_id in enumerate(by_id)}
+        pending = {check_id: len(referred) for check_id, referred in dependencies.items()}
+        ready = [check_id for check_id, count in pending.items() if not count]
+        ordered_ids = []
+        while ready:
+            check_id = min(ready, key=position.get)
+            ready.remove(check_id)
+            ordered_ids.append(check_id)
+            for dependent in dependents[check_id]:
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+
+        cyclic = {}
+        remaining = [check_id for check_id in by_id if pending[check_id]]
+        for check_id in remaining:
+            cyclic_ids = sorted(referred for referred in dependencies[check_id] if pending[referred])
+            cyclic[check_id] = cyclic_ids
+            log.error('Boolean expression check-id: %s is part of a cycle with: %s', check_id, cyclic_ids)
+
+        return [by_id[check_id] for check_id in ordered_ids + remaining], cyclic
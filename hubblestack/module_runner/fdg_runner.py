@@ -2,13 +2,99 @@ from hubblestack.module_runner.runner import Runner
 from hubblestack.module_runner.runner import Caller
 import hubblestack.module_runner.comparator
 
+import json
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from hubblestack.exceptions import CommandExecutionError
 import hubblestack.loader
 
 log = logging.getLogger(__name__)
 RETURNER_ID_BLOCK = None
+MAX_XPIPE_WORKERS = 16
+_LOCAL = threading.local()
+
+
+def xpipe_map(func, values, workers=1):
+    """
+    Return ``[func(value) for value in values]``, running up to ``workers``
+    (at most MAX_XPIPE_WORKERS) calls at a time on a thread pool. The results
+    are in the order of ``values`` either way.
+
+    xpipes nested in a concurrent one run sequentially in their worker
+    thread, so an xpipe never uses more threads than it asked for.
+    """
+    try:
+        workers = min(int(workers or 1), MAX_XPIPE_WORKERS)
+    except (TypeError, ValueError):
+        log.error('xpipe_workers must be a number, got %s; running sequentially', workers)
+        workers = 1
+    values = list(values)
+    if workers <= 1 or len(values) < 2 or getattr(_LOCAL, 'pooled', False):
+        return [func(value) for value in values]
+
+    def _run(value):
+        _LOCAL.pooled = True
+        try:
+            return func(value)
+        finally:
+            _LOCAL.pooled = False
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(values))) as pool:
+        return list(pool.map(_run, values))
+
+
+def memo_key(block_id, chained, chained_status):
+    """
+    Key of a memoized block result; chained values are usually lists and
+    dicts, so they are keyed by their canonical JSON dump
+    """
+    try:
+        chained = json.dumps(chained, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        chained = repr(chained)
+    return block_id, chained, bool(chained_status)
+
+
+class BlockMemo(object):
+    """
+    Results of the memoized blocks of one fdg run. When concurrent xpipe
+    iterations ask for the same block and chained value, the first one
+    computes it and the others wait for its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def get(self, key, func):
+        """
+        Return the result for ``key``, calling ``func()`` to compute it the
+        first time. If ``func`` raises, the error goes to the callers waiting
+        for it and the next call computes it again.
+        """
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if not owner:
+            log.debug('Reusing the result of fdg block %s for chained value %s', key[0], key[1])
+            return future.result()
+        try:
+            ret = func()
+        except Exception as exc:
+            with self._lock:
+                del self._results[key]
+            future.set_exception(exc)
+            raise
+        future.set_result(ret)
+        return ret
 
 
 class FdgRunner(Runner):
@@ -18,6 +104,8 @@ class FdgRunner(Runner):
 
     def __init__(self):
         super().__init__(Caller.FDG)
+        # results of the blocks with ``memoize: True``, for one run
+        self._memo = BlockMemo()
 
     def _validate_yaml_dictionary(self, yaml_dict):
         if 'main' not in yaml_dict:
@@ -29,6 +117,7 @@ class FdgRunner(Runner):
 
         global RETURNER_ID_BLOCK
         RETURNER_ID_BLOCK = (fdg_file, str(starting_chained))
+        self._memo.clear()
         # Recursive execution of the blocks
         ret = self._fdg_execute('main', yaml_data_dict, chained=starting_chained)
         return RETURNER_ID_BLOCK, ret
@@ -37,6 +126,22 @@ class FdgRunner(Runner):
         """
         Recursive function which executes a block and any blocks chained by that
         block (by calling itself).
+
+        Blocks with ``memoize: True`` are pure functions of their chained
+        value: their result (including the blocks they chain to) is computed
+        once per run for each chained value and status, and reused after that.
+        Their returners only run the first time.
+        """
+        block = block_data.get(block_id)
+        if not block or not block.get('memoize'):
+            return self._fdg_execute_block(block_id, block_data, chained, chained_status)
+
+        return self._memo.get(memo_key(block_id, chained, chained_status),
+                              lambda: self._fdg_execute_block(block_id, block_data, chained, chained_status))
+
+    def _fdg_execute_block(self, block_id, block_data, chained=None, chained_status=True):
+        """
+        Execute a block and the blocks it chains to
         """
         log.debug('Executing fdg block with id %s and chained value %s', block_id, chained)
         block = block_data.get(block_id)
@@ -66,12 +171,13 @@ class FdgRunner(Runner):
         # get the result
         ret = ret if 'result' not in ret else ret['result']
 
+        workers = block.get('xpipe_workers', 1)
         if 'xpipe_on_true' in block and status:
             log.debug('Piping via chaining keyword xpipe_on_true.')
-            return self._xpipe(ret, status, block_data, block['xpipe_on_true'], returner)
+            return self._xpipe(ret, status, block_data, block['xpipe_on_true'], returner, workers)
         elif 'xpipe_on_false' in block and not status:
             log.debug('Piping via chaining keyword xpipe_on_false.')
-            return self._xpipe(ret, status, block_data, block['xpipe_on_false'], returner)
+            return self._xpipe(ret, status, block_data, block['xpipe_on_false'], returner, workers)
         elif 'pipe_on_true' in block and status:
             log.debug('Piping via chaining keyword pipe_on_true.')
             return self._pipe(ret, status, block_data, block['pipe_on_true'], returner)
@@ -80,7 +186,7 @@ class FdgRunner(Runner):
             return self._pipe(ret, status, block_data, block['pipe_on_false'], returner)
         elif 'xpipe' in block:
             log.debug('Piping via chaining keyword xpipe.')
-            return self._xpipe(ret, status, block_data, block['xpipe'], returner)
+            return self._xpipe(ret, status, block_data, block['xpipe'], returner, workers)
         elif 'pipe' in block:
             log.debug('Piping via chaining keyword pipe.')
             return self._pipe(ret, status, block_data, block['pipe'], returner)
@@ -90,16 +196,17 @@ class FdgRunner(Runner):
                 self._return((ret, status), returner)
             return ret, status
 
-    def _xpipe(self, chained, chained_status, block_data, block_id, returner=None):
+    def _xpipe(self, chained, chained_status, block_data, block_id, returner=None, workers=1):
         """
         Iterate over the given value and for each iteration, call the given fdg
-        block by id with the iteration value as the passthrough.
+        block by id with the iteration value as the passthrough. With
+        ``xpipe_workers`` set on the piping block, up to that many iterations
+        run at the same time.
 
-        The results will be returned as a list.
+        The results will be returned as a list, in the order of the iteration.
         """
-        ret = []
-        for value in chained:
-            ret.append(self._fdg_execute(block_id, block_data, value, chained_status))
+        ret = xpipe_map(lambda value: self._fdg_execute(block_id, block_data, value, chained_status),
+                        chained, workers)
         if returner:
             self._return(ret, returner)
         return ret
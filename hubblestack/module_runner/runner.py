@@ -5,16 +5,18 @@ A base class for Audit/FDG module runner.
 """
 import os
 import logging
-import yaml
 from abc import ABC, abstractmethod
 from packaging import version
 import hubblestack.module_runner.comparator
 
 import hubblestack.loader
+import hubblestack.utils.probe
+import hubblestack.utils.profile_cache
 from hubblestack.exceptions import CommandExecutionError
 from hubblestack.exceptions import HubbleCheckValidationError
 
 log = logging.getLogger(__name__)
+__opts__ = {}
 __hmods__ = {}
 __comparator__ = {}
 
@@ -115,7 +117,7 @@ class Runner(ABC):
             acceptable_block_args = {
                 'return', 'module', 'args', 'comparator',
                 'xpipe_on_true', 'xpipe_on_false', 'xpipe', 'pipe',
-                'pipe_on_true', 'pipe_on_false',
+                'pipe_on_true', 'pipe_on_false', 'xpipe_workers', 'memoize',
             }
             for key in module_args:
                 if key not in acceptable_block_args:
@@ -157,6 +159,34 @@ class Runner(ABC):
         failure_reason_method = '{0}.get_failure_reason'.format(module_name)
         return __hmods__[failure_reason_method](profile_id, module_args, {'caller': self._caller})
 
+    def _get_referred_checks(self, module_name, profile_id, module_args):
+        """
+        Helper method to execute a Module's get_referred_checks() method.
+        """
+        referred_checks_method = '{0}.get_referred_checks'.format(module_name)
+        return __hmods__[referred_checks_method](profile_id, module_args, {'caller': self._caller})
+
+    def _prefetch_probes(self, checks):
+        """
+        Contact the remote endpoints of the checks concurrently, before they run.
+        Modules declare the endpoints a check contacts with an optional
+        get_probes() method; the checks then find the results already there.
+        Waits at most ``probe_deadline`` seconds.
+
+        checks is a list of (module_name, profile_id, module_args)
+        """
+        probes = []
+        for module_name, profile_id, module_args in checks:
+            probes_method = '{0}.get_probes'.format(module_name)
+            if probes_method not in __hmods__:
+                continue
+            try:
+                probes.extend(__hmods__[probes_method](profile_id, module_args, {'caller': self._caller}))
+            except Exception as exc:
+                log.debug('Not prefetching the probes of id: %s, %s', profile_id, exc)
+        if probes:
+            hubblestack.utils.probe.prefetch(probes, __opts__.get('probe_deadline', 30))
+
     def _make_file_available(self, file):
         """
         Cache file if path is salt://...
@@ -184,8 +214,7 @@ class Runner(ABC):
 
         yaml_data = None
         try:
-            with open(filepath, 'r') as file_handle:
-                yaml_data = yaml.safe_load(file_handle)
+            yaml_data = hubblestack.utils.profile_cache.load(filepath, __opts__)
         except Exception as exc:
             raise CommandExecutionError('Could not load yaml file: {0}, Exception: {1}'.format(filepath, exc))
 
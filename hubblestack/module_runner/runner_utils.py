@@ -82,4 +82,36 @@ def apply_case_on_string(arg, ignore_case=False):
     """
     if arg and isinstance(arg, str) and ignore_case:
         return arg.lower()
-    return arg
\ No newline at end of file
+    return arg
+
+
+class CheckResultStore(list):
+    """
+    The list of check results of an audit profile, indexed by check_unique_id
+    so that checks (bexpr) referring to other checks find them in O(1).
+    Like a search of the list, the first result of an id wins.
+    """
+
+    def __init__(self, results=()):
+        super().__init__()
+        self._index = {}
+        self.extend(results)
+
+    def append(self, result):
+        super().append(result)
+        if isinstance(result, dict):
+            self._index.setdefault(result.get('check_unique_id', ''), result)
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __iadd__(self, results):
+        self.extend(results)
+        return self
+
+    def find(self, check_unique_id):
+        """
+        Return the result of a check, None if there is none
+        """
+        return self._index.get(check_unique_id)
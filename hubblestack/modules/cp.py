@@ -189,6 +189,9 @@ def cache_dir(
         Files that don't exist int he source location will be automatically
         removed from the destination
 
+    With ``cache_dir_bulk`` (the default) the source hashes are compared to a
+    manifest of the cached copies, so only changed files are fetched; the
+    hashes are looked up on ``cache_dir_workers`` threads.
 
     CLI Examples:
 
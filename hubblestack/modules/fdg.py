@@ -113,6 +113,23 @@ these ``xpipe`` values, same as with the ``pipe`` chaining keywords.
 If there are no chaining keywords that are valid to execute, the fdg execution
 will end and any ``return`` keywords will be evaluated as we move back up the
 call chain.
+
+``xpipe`` iterations run one after the other. A block that xpipes over many
+values (processes, mount points, certificates...) can set ``xpipe_workers``
+to run up to that many iterations at the same time (at most 16). The results
+are still in the order of the iterated value::
+
+    unique_id:
+        module: module_name.function
+        xpipe_workers: 8
+        xpipe:
+            unique_id2
+
+A block whose result only depends on its chained value can set
+``memoize: True``. Its result, including the blocks it chains to, is then
+computed once per fdg run for each chained value and reused, so blocks shared
+by several branches of the routine do not run again. A memoized block's
+``return`` only happens the first time.
 """
 
 import logging
@@ -121,13 +138,17 @@ import os
 import yaml
 
 import hubblestack.module_runner.runner_factory as runner_factory
+from hubblestack.module_runner.fdg_runner import BlockMemo, memo_key, xpipe_map
 from hubblestack.exceptions import CommandExecutionError
 import hubblestack.loader
+import hubblestack.utils.profile_cache
 
 log = logging.getLogger(__name__)
 __fdg__ = None
 __returners__ = None
 RETURNER_ID_BLOCK = None
+# results of the blocks with ``memoize: True``, for one run
+_MEMO = BlockMemo()
 BASE_DIR_FDG_PROFILES = {'fdg_v2':'fdg_v2', 'fdg':'fdg'}
 
 def fdg(fdg_file=None, starting_chained=None, fdg_version='fdg'):
@@ -169,8 +190,7 @@ def fdg(fdg_file=None, starting_chained=None, fdg_version='fdg'):
                                     .format(fdg_file))
 
     try:
-        with open(cached) as handle:
-            block_data = yaml.safe_load(handle)
+        block_data = hubblestack.utils.profile_cache.load(cached, __opts__)
     except Exception as exc:
         raise CommandExecutionError('Could not load fdg_file: {0}'.format(exc))
 
@@ -191,6 +211,7 @@ def fdg(fdg_file=None, starting_chained=None, fdg_version='fdg'):
     # so that we don't have to pass new arguments everywhere
     global RETURNER_ID_BLOCK
     RETURNER_ID_BLOCK = (fdg_file, str(starting_chained))
+    _MEMO.clear()
     # Recursive execution of the blocks
     ret = _fdg_execute('main', block_data, chained=starting_chained)
     return RETURNER_ID_BLOCK, ret
@@ -328,7 +349,20 @@ def _get_top_data(topfile, fdg_version):
 def _fdg_execute(block_id, block_data, chained=None, chained_status=None):
     """
     Recursive function which executes a block and any blocks chained by that
-    block (by calling itself).
+    block (by calling itself). The results of blocks with ``memoize: True``
+    are reused for the rest of the run.
+    """
+    block = block_data.get(block_id)
+    if not block or not block.get('memoize'):
+        return _fdg_execute_block(block_id, block_data, chained, chained_status)
+
+    return _MEMO.get(memo_key(block_id, chained, chained_status),
+                     lambda: _fdg_execute_block(block_id, block_data, chained, chained_status))
+
+
+def _fdg_execute_block(block_id, block_data, chained=None, chained_status=None):
+    """
+    Execute a block and the blocks it chains to
     """
     log.debug('Executing fdg block with id %s and chained value %s', block_id, chained)
     block = block_data.get(block_id)
@@ -346,12 +380,13 @@ def _fdg_execute(block_id, block_data, chained=None, chained_status=None):
     else:
         returner = None
 
+    workers = block.get('xpipe_workers', 1)
     if 'xpipe_on_true' in block and status:
         log.debug('Piping via chaining keyword xpipe_on_true.')
-        return _xpipe(ret, status, block_data, block['xpipe_on_true'], returner)
+        return _xpipe(ret, status, block_data, block['xpipe_on_true'], returner, workers)
     elif 'xpipe_on_false' in block and not status:
         log.debug('Piping via chaining keyword xpipe_on_false.')
-        return _xpipe(ret, status, block_data, block['xpipe_on_false'], returner)
+        return _xpipe(ret, status, block_data, block['xpipe_on_false'], returner, workers)
     elif 'pipe_on_true' in block and status:
         log.debug('Piping via chaining keyword pipe_on_true.')
         return _pipe(ret, status, block_data, block['pipe_on_true'], returner)
@@ -360,7 +395,7 @@ def _fdg_execute(block_id, block_data, chained=None, chained_status=None):
         return _pipe(ret, status, block_data, block['pipe_on_false'], returner)
     elif 'xpipe' in block:
         log.debug('Piping via chaining keyword xpipe.')
-        return _xpipe(ret, status, block_data, block['xpipe'], returner)
+        return _xpipe(ret, status, block_data, block['xpipe'], returner, workers)
     elif 'pipe' in block:
         log.debug('Piping via chaining keyword pipe.')
         return _pipe(ret, status, block_data, block['pipe'], returner)
@@ -391,6 +426,8 @@ def _check_block(block, block_id):
         'pipe_on_false',
         'args',
         'kwargs',
+        'xpipe_workers',
+        'memoize',
     }
     for key in block:
         if key not in acceptable_block_args:
@@ -399,16 +436,16 @@ def _check_block(block, block_id):
                                         .format(block_id, key))
     return True
 
-def _xpipe(chained, chained_status, block_data, block_id, returner=None):
+def _xpipe(chained, chained_status, block_data, block_id, returner=None, workers=1):
     """
     Iterate over the given value and for each iteration, call the given fdg
-    block by id with the iteration value as the passthrough.
+    block by id with the iteration value as the passthrough, up to
+    ``workers`` iterations at the same time.
 
-    The results will be returned as a list.
+    The results will be returned as a list, in the order of the iteration.
     """
-    ret = []
-    for value in chained:
-        ret.append(_fdg_execute(block_id, block_data, value, chained_status))
+    ret = xpipe_map(lambda value: _fdg_execute(block_id, block_data, value, chained_status),
+                    chained, workers)
     if returner:
         _return(ret, returner)
     return ret
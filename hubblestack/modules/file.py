@@ -17,6 +17,7 @@ from collections import namedtuple
 # Import hubble libs
 import hubblestack.utils.files
 import hubblestack.utils.hashutils
+import hubblestack.utils.identity
 import hubblestack.utils.path
 import hubblestack.utils.platform
 import hubblestack.utils.stringutils
@@ -26,12 +27,6 @@ import hubblestack.utils.versions
 from hubblestack.exceptions import CommandExecutionError, HubbleInvocationError
 
 # pylint: enable=import-error,no-name-in-module,redefined-builtin
-try:
-    import grp
-    import pwd
-except ImportError:
-    pass
-
 log = logging.getLogger(__name__)
 
 AttrChanges = namedtuple("AttrChanges", "added,removed")
@@ -50,11 +45,11 @@ def uid_to_user(uid):
 
         salt '*' file.uid_to_user 0
     """
-    try:
-        return pwd.getpwuid(uid).pw_name
-    except (KeyError, NameError):
+    name = hubblestack.utils.identity.user_name(uid)
+    if name is None:
         # If user is not present, fall back to the uid.
         return uid
+    return name
 
 
 def user_to_uid(user):
@@ -72,12 +67,10 @@ def user_to_uid(user):
     """
     if user is None:
         user = hubblestack.utils.user.get_user()
-    try:
-        if isinstance(user, int):
-            return user
-        return pwd.getpwnam(user).pw_uid
-    except KeyError:
-        return ""
+    if isinstance(user, int):
+        return user
+    uid = hubblestack.utils.identity.user_id(user)
+    return "" if uid is None else uid
 
 
 def gid_to_group(gid):
@@ -103,11 +96,11 @@ def gid_to_group(gid):
         # Don't even bother to feed it to grp
         return ""
 
-    try:
-        return grp.getgrgid(gid).gr_name
-    except (KeyError, NameError):
+    name = hubblestack.utils.identity.group_name(gid)
+    if name is None:
         # If group is not present, fall back to the gid.
         return gid
+    return name
 
 
 def group_to_gid(group):
@@ -125,12 +118,10 @@ def group_to_gid(group):
     """
     if group is None:
         return ""
-    try:
-        if isinstance(group, int):
-            return group
-        return grp.getgrnam(group).gr_gid
-    except KeyError:
-        return ""
+    if isinstance(group, int):
+        return group
+    gid = hubblestack.utils.identity.group_id(group)
+    return "" if gid is None else gid
 
 
 def get_user(path, follow_symlinks=True):
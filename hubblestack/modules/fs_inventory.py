@@ -0,0 +1,60 @@
+"""
+Drive the filesystem inventory used by the filesystem-wide CIS checks
+(world writable files, unowned/ungrouped files, ...).
+
+The audit checks only start an update in the background and answer from the
+last complete pass (an error until there is one), so scheduling
+``fs_inventory.update`` builds the index ahead of the audit runs:
+
+.. code-block:: yaml
+
+    schedule:
+      fs_inventory:
+        function: fs_inventory.update
+        seconds: 900
+        splay: 300
+"""
+import time
+import logging
+
+import hubblestack.utils.fs_inventory
+
+log = logging.getLogger(__name__)
+
+
+def __virtual__():
+    return True
+
+
+def update(force=False):
+    """
+    Advance the inventory by at most one budget (fs_inventory_budget)
+
+    force
+        Walk even if the last update or the last complete pass is recent
+    """
+    state = hubblestack.utils.fs_inventory.Inventory(__opts__).update(force=force)
+    return _summary(state)
+
+
+def status():
+    """
+    Describe the inventory index without walking anything
+    """
+    return _summary(hubblestack.utils.fs_inventory.Inventory(__opts__).load())
+
+
+def _summary(state):
+    ret = {'updated': state['updated'], 'complete': None, 'current': None}
+    if state['complete']:
+        ret['complete'] = {
+            'age': int(time.time() - state['complete']['finished']),
+            'hits': {name: len(paths) for name, paths in state['complete']['hits'].items()},
+        }
+    if state['current']:
+        ret['current'] = {
+            'dirs': state['current']['dirs'],
+            'entries': state['current']['entries'],
+            'pending': len(state['current']['pending']),
+        }
+    return ret
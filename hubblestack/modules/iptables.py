@@ -37,8 +37,9 @@ import uuid
 # Import hubble libs
 import hubblestack.utils.args
 import hubblestack.utils.files
+import hubblestack.utils.iptables
 import hubblestack.utils.path
-from hubblestack.exceptions import HubbleException
+from hubblestack.exceptions import CommandExecutionError, HubbleException
 
 log = logging.getLogger(__name__)
 
@@ -788,7 +789,37 @@ def save(filename=None, family="ipv4"):
     return out
 
 
-def check(table="filter", chain=None, rule=None, family="ipv4"):
+def ruleset(family="ipv4"):
+    """
+    Return the in-memory rules from a single iptables-save run, indexed by
+    table, chain and normalized rule (see hubblestack.utils.iptables). Pass
+    the result to ``check`` to test many rules without forking iptables for
+    each one.
+
+    Raises CommandExecutionError when iptables-save fails or prints no table,
+    so that a missing snapshot is not mistaken for a host without rules.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' iptables.ruleset
+
+        IPv6:
+        salt '*' iptables.ruleset family=ipv6
+    """
+    cmd = "{0}-save".format(_iptables_cmd(family))
+    res = __mods__["cmd.run_all"](cmd, output_loglevel="quiet")
+    if res["retcode"] != 0:
+        raise CommandExecutionError(
+            "{0} failed with exit code {1}: {2}".format(cmd, res["retcode"], res["stderr"].strip()))
+    rules = hubblestack.utils.iptables.parse_save(res["stdout"])
+    if not rules:
+        raise CommandExecutionError("{0} returned no tables".format(cmd))
+    return rules
+
+
+def check(table="filter", chain=None, rule=None, family="ipv4", ruleset=None):
     """
     Check for the existence of a rule in the table and chain
 
@@ -797,6 +828,9 @@ def check(table="filter", chain=None, rule=None, family="ipv4"):
         method of creating rules would be irritating at best, and we
         already have a parser that can handle it.
 
+    If ``ruleset`` (the return of ``iptables.ruleset``) is given, the check
+        is answered from it instead of running iptables.
+
     CLI Example:
 
     .. code-block:: bash
@@ -813,6 +847,8 @@ def check(table="filter", chain=None, rule=None, family="ipv4"):
         return "Error: Chain needs to be specified"
     if not rule:
         return "Error: Rule needs to be specified"
+    if ruleset is not None:
+        return hubblestack.utils.iptables.rule_exists(ruleset, table, chain, rule)
     ipt_cmd = _iptables_cmd(family)
 
     if _has_option("--check", family):
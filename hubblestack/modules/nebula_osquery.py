@@ -20,6 +20,32 @@ nebula_osquery:
   day:
     - query_name: rpm_packages
       query: select rpm.*, t.iso_8601 from rpm_packages as rpm join time as t;
+
+Differential results:
+
+Inventory type queries return nearly the same rows every run. A query with
+``differential: True`` (or every query, with the ``nebula_differential``
+option) only returns the rows added or removed since the previous run, like
+the differential mode of osqueryd; each row then has an ``_action`` column,
+``added`` or ``removed``. The full row set, with ``_action: snapshot``, is
+returned on the first run, when the query changes and every
+``nebula_snapshot_interval`` seconds (default: a day). Columns which change on
+every run, such as the time, are left out of the comparison with
+``differential_ignore`` (default: ``[_time]``). The previous rows are stored
+under ``nebula_snapshot_dir`` (default: <cachedir>/nebula_snapshots), so a
+restart does not send the full row sets again.
+
+The rows of a run only replace the stored ones once splunk_nebula_return has
+published them (see :mod:`hubblestack.utils.nebula_snapshots`), so the changes
+of a run that failed to publish are sent again by the next run. With other
+returners the stored rows are never replaced and every run is a full snapshot.
+
+    day:
+      rpm_packages:
+        query: select rpm.*, t.iso_8601 as _time from rpm_packages as rpm join time as t;
+        differential: True
+        differential_ignore:
+          - _time
 """
 
 
@@ -38,7 +64,10 @@ import yaml
 import zlib
 from inspect import getfullargspec
 
+import hubblestack.utils.atomicfile
 import hubblestack.utils.files
+import hubblestack.utils.json
+import hubblestack.utils.nebula_snapshots
 import hubblestack.utils.platform
 
 from hubblestack.exceptions import CommandExecutionError
@@ -50,6 +79,7 @@ from hubblestack.status import HubbleStatus
 log = logging.getLogger(__name__)
 
 CRC_BYTES = 256
+SNAPSHOT_VERSION = 2
 hubble_status = HubbleStatus(__name__, "top", "queries", "osqueryd_monitor", "osqueryd_log_parser")
 
 __virtualname__ = "nebula"
@@ -171,6 +201,9 @@ def queries(
     if mask_passwords:
         _mask_object(ret, topfile_for_mask)
 
+    # after masking, the stored rows are masked too
+    ret = _differential_results(ret, query_data, query_group)
+
     return ret
 
 
@@ -240,7 +273,7 @@ def _run_osqueryi_query(query, query_sql, timing, verbose):
     time_end = time.time()
     timing[query["query_name"]] = time_end - time_start
     if res["retcode"] == 0:
-        query_ret["data"] = json.loads(res["stdout"])
+        query_ret["data"] = hubblestack.utils.json.decode(res["stdout"])
     else:
         if "Timed out" in res["stdout"]:
             # this is really the best way to tell without getting fancy
@@ -301,8 +334,92 @@ def _update_osquery_results(ret):
             for result in query_ret["data"]:
                 for key, value in result.items():
                     if value and isinstance(value, str) and value.startswith("__JSONIFY__"):
-                        result[key] = json.loads(value[len("__JSONIFY__") :])
+                        result[key] = hubblestack.utils.json.decode(value[len("__JSONIFY__") :])
+
+    return ret
+
+
+def _differential_results(ret, query_data, query_group):
+    """
+    Replace the rows of the differential queries with the rows added and
+    removed since their previous run, or with a full snapshot when one is due
+    """
+    default = __opts__.get("nebula_differential", False)
+    interval = __opts__.get("nebula_snapshot_interval", 86400)
+    now = time.time()
+    for data in ret:
+        if "query_result" in data:
+            # verbose results
+            query_name, query_ret = data.get("query_name"), data["query_result"]
+        else:
+            query_name, query_ret = next(iter(data.items()))
+        query = query_data.get(query_name)
+        if not isinstance(query, dict) or not query.get("differential", default):
+            continue
+        if query_ret.get("result") is False or not isinstance(query_ret.get("data"), list):
+            continue
+        path = hubblestack.utils.nebula_snapshots.snapshot_path(__opts__, query_group, query_name)
+        try:
+            query_ret["data"] = _differential_rows(
+                path, query.get("query", ""), query_ret["data"], query.get("differential_ignore", ["_time"]),
+                interval, now
+            )
+        except (IOError, OSError, ValueError, TypeError) as exc:
+            log.error("Could not compute differential results of query %s, returning all rows: %s", query_name, exc)
+    return ret
+
 
+def _differential_rows(path, query_sql, rows, ignore, interval, now):
+    """
+    Compare rows with the snapshot stored in path, write the new snapshot as
+    pending (see hubblestack.utils.nebula_snapshots.commit) and return the
+    rows to report, each with an ``_action`` column
+    """
+    ignore = set(ignore or [])
+    current = {}
+    for row in rows:
+        key = hashlib.sha1(
+            hubblestack.utils.json.encode({k: v for k, v in row.items() if k not in ignore}, sort_keys=True,
+                                          default=str).encode("utf-8")
+        ).hexdigest()
+        if key in current:
+            current[key][1] += 1
+        else:
+            current[key] = [row, 1]
+
+    previous = None
+    try:
+        with open(path, "rb") as fh_:
+            previous = hubblestack.utils.json.decode(zlib.decompress(fh_.read()))
+    except (IOError, OSError):
+        pass
+    except (ValueError, zlib.error):
+        log.warning("Discarding corrupt osquery snapshot %s", path)
+    if not isinstance(previous, dict) or previous.get("version") != SNAPSHOT_VERSION or previous.get(
+        "query"
+    ) != query_sql:
+        previous = None
+
+    if previous is None or (interval and now - previous.get("last_full", 0) >= interval):
+        ret = [dict(row, _action="snapshot") for row in rows]
+        last_full = now
+    else:
+        ret = []
+        previous_rows = previous.get("rows", {})
+        for key, (row, count) in current.items():
+            added = count - previous_rows.get(key, [None, 0])[1]
+            ret.extend(dict(row, _action="added") for _ in range(added))
+        for key, (row, count) in previous_rows.items():
+            removed = count - current.get(key, [None, 0])[1]
+            ret.extend(dict(row, _action="removed") for _ in range(removed))
+        last_full = previous.get("last_full", 0)
+
+    snapshot = {"version": SNAPSHOT_VERSION, "query": query_sql, "last_full": last_full, "rows": current}
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with hubblestack.utils.atomicfile.atomic_open(path + hubblestack.utils.nebula_snapshots.PENDING_SUFFIX,
+                                                  "wb") as fh_:
+        fh_.write(zlib.compress(hubblestack.utils.json.encode(snapshot, default=str).encode("utf-8")))
     return ret
 
 
@@ -511,16 +628,16 @@ def _update_event_data(ret):
 
     n_ret = []
     for event_data in ret:
-        obj = json.loads(event_data)
+        obj = hubblestack.utils.json.decode(event_data)
         if "action" in obj and obj["action"] == "snapshot":
             for result in obj["snapshot"]:
                 for key, value in result.items():
                     if value and isinstance(value, str) and value.startswith("__JSONIFY__"):
-                        result[key] = json.loads(value[len("__JSONIFY__") :])
+                        result[key] = hubblestack.utils.json.decode(value[len("__JSONIFY__") :])
         elif "action" in obj:
             for key, value in obj["columns"].items():
                 if value and isinstance(value, str) and value.startswith("__JSONIFY__"):
-                    obj["columns"][key] = json.loads(value[len("__JSONIFY__") :])
+                    obj["columns"][key] = hubblestack.utils.json.decode(value[len("__JSONIFY__") :])
         n_ret.append(obj)
 
     return n_ret
@@ -1652,7 +1769,7 @@ def query(query):
     cmd = [__grains__["osquerybinpath"], "--read_max", max_file_size, "--json", query]
     res = __mods__["cmd.run_all"](cmd, timeout=600)
     if res["retcode"] == 0:
-        query_ret["data"] = json.loads(res["stdout"])
+        query_ret["data"] = hubblestack.utils.json.decode(res["stdout"])
     else:
         if "Timed out" in res["stdout"]:
             # this is really the best way to tell without getting fancy
@@ -4,6 +4,17 @@ Watch files and translate the changes into salt events
 
 :depends:   - pyinotify Python module >= 0.9.5
 
+Events are read with the lean reader of :mod:`hubblestack.utils.inotify`
+unless ``pulsar_native_inotify`` is False, in which case pyinotify's Notifier
+is used. Queue overflows are counted in the ``inotify_overflow`` status
+counter, and make the next sweep rescan the configured paths.
+
+When ``pulsar_baseline`` is True, the state of the watched paths is kept in the
+sqlite database of :mod:`hubblestack.utils.fim_baseline` (``pulsar_baseline_db``,
+by default ``pulsar_baseline.sqlite`` in the cachedir). The first sweep after a
+start compares it with the filesystem and reports what changed while pulsar
+was not running, as events flagged ``offline``.
+
 :Caution:   Using generic mask options like open, access, ignored, and
             closed_nowrite with reactors can easily cause the reactor
             to loop on itself. To mitigate this behavior, consider
@@ -23,6 +34,8 @@ import time
 
 from hubblestack.exceptions import CommandExecutionError
 import hubblestack.utils.platform
+import hubblestack.utils.inotify
+import hubblestack.utils.fim_baseline
 
 try:
     import pyinotify
@@ -44,12 +57,15 @@ __virtualname__ = 'pulsar'
 SPAM_TIME = 0 # track spammy status message times
 TOP = None
 TOP_STALENESS = 0
+# top level keys of the pulsar config that are options, not paths
+RESERVED_KEYS = ('return', 'checksum', 'stats', 'batch', 'verbose', 'paths', 'refresh_interval',
+                 'contents_size', 'checksum_size')
 
 import logging
 log = logging.getLogger(__name__)
 
 from hubblestack.status import HubbleStatus
-hubble_status = HubbleStatus(__name__, 'top', 'process')
+hubble_status = HubbleStatus(__name__, 'top', 'process', 'inotify_overflow')
 
 def __virtual__():
     if hubblestack.utils.platform.is_windows():
@@ -533,9 +549,93 @@ def _get_notifier():
         __context__['pulsar.queue'] = collections.deque()
         log.info("creating new watch manager")
         wm = PulsarWatchManager()
-        __context__['pulsar.notifier'] = pyinotify.Notifier(wm, _enqueue)
+        if __opts__.get('pulsar_native_inotify', True):
+            __context__['pulsar.notifier'] = hubblestack.utils.inotify.Notifier(wm, _enqueue)
+        else:
+            __context__['pulsar.notifier'] = pyinotify.Notifier(wm, _enqueue)
     return __context__['pulsar.notifier']
 
+def _get_baseline():
+    """
+    Check the context for the FIM baseline and open it if not present; return
+    None when ``pulsar_baseline`` is off or the database can't be opened
+    """
+    if not __opts__.get('pulsar_baseline', False):
+        return None
+    if 'pulsar.baseline' not in __context__:
+        path = __opts__.get('pulsar_baseline_db') or \
+            os.path.join(__opts__.get('cachedir', '/var/cache/hubble'), 'pulsar_baseline.sqlite')
+        try:
+            __context__['pulsar.baseline'] = hubblestack.utils.fim_baseline.Baseline(path)
+        except Exception as exc:
+            log.warning('Could not open the pulsar baseline %s: %s', path, exc)
+            __context__['pulsar.baseline'] = None
+    return __context__['pulsar.baseline']
+
+def _reconcile_baseline(baseline, cm):
+    """
+    Compare the baseline with the configured paths and return the events of
+    what changed since it was last updated
+    """
+    config = cm.config
+    paths = []
+    dirs = set()
+    for path in config:
+        if path in RESERVED_KEYS:
+            continue
+        excludes = lambda x: False
+        rec = False
+        if isinstance(config[path], dict):
+            excludes = _preprocess_excludes(config[path].get('exclude'))
+            rec = config[path].get('recurse', False)
+        paths.append(path)
+        if not os.path.isdir(path):
+            continue
+        for root, dirnames, filenames in os.walk(path):
+            dirs.add(root)
+            dirnames[:] = [name for name in dirnames if not excludes(os.path.join(root, name))]
+            paths.extend(os.path.join(root, name) for name in dirnames + filenames
+                         if not excludes(os.path.join(root, name)))
+            if not rec:
+                break
+
+    if not len(baseline):
+        # nothing to compare with yet, record without hashing everything
+        baseline.reconcile(paths, dirs)
+        log.info('pulsar baseline created with %d paths', len(baseline))
+        return []
+
+    hash_func = None
+    sum_type = config.get('checksum', False)
+    if sum_type:
+        if not isinstance(sum_type, str):
+            sum_type = 'sha256'
+        def hash_func(path):
+            if os.path.getsize(path) < config.get('checksum_size', 104857600):
+                return __mods__['file.get_hash'](path, sum_type)
+            return None
+
+    try:
+        config_path = config['paths'][0]
+        pulsar_config = config_path[config_path.rfind('/') + 1:len(config_path)]
+    except IndexError:
+        pulsar_config = 'unknown'
+    ret = []
+    for change, path, checksum in baseline.reconcile(paths, dirs, hash_func):
+        _, abspath, dirname, basename = cm.format_path(path)
+        sub = { 'change': change,
+                'path': abspath,  # goes to object_path in splunk
+                'tag':  dirname,  # goes to file_path in splunk
+                'name': basename, # goes to file_name in splunk
+                'pulsar_config': pulsar_config,
+                'offline': True}
+        if checksum:
+            sub['checksum'] = checksum
+            sub['checksum_type'] = sum_type
+        ret.append(sub)
+    log.info('pulsar baseline found %d offline changes', len(ret))
+    return ret
+
 def _preprocess_excludes(excludes):
     """
     Wrap excludes in simple decision curry functions.
@@ -737,6 +837,7 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
         log.debug('Pulsar beacon config from pillar:\n{0}'.format(config))
 
     ret = []
+    touched = {}
     notifier = _get_notifier()
     wm = notifier._watch_manager
     update_watches = cm.freshness(2)
@@ -757,8 +858,11 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
         while queue:
             event = queue.popleft()
             if event.maskname == 'IN_Q_OVERFLOW':
-                log.warn('Your inotify queue is overflowing.')
-                log.warn('Fix by increasing /proc/sys/fs/inotify/max_queued_events')
+                log.warning('Your inotify queue is overflowing.')
+                log.warning('Fix by increasing /proc/sys/fs/inotify/max_queued_events')
+                hubble_status.mark('inotify_overflow')
+                # events were lost, rescan the configured paths for what is not watched yet
+                update_watches = True
                 continue
 
             log.debug("queue {0}".format(event)) # shows mask/name/pathname/wd and other things
@@ -827,6 +931,7 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
 
                 if event.mask != pyinotify.IN_IGNORED:
                     ret.append(sub)
+                    touched[pathname] = sub.get('checksum')
 
                 if not event.mask & pyinotify.IN_ISDIR:
                     if event.mask & pyinotify.IN_CREATE:
@@ -849,9 +954,7 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
         # Update existing watches and add new ones
         for path in config:
             excludes = lambda x: False
-            if path in ['return', 'checksum', 'stats', 'batch', 'verbose',
-                        'paths', 'refresh_interval', 'contents_size',
-                        'checksum_size']:
+            if path in RESERVED_KEYS:
                 continue
             if isinstance(config[path], dict):
                 mask = config[path].get('mask', DEFAULT_MASK)
@@ -910,6 +1013,7 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
                         'name': basename, # goes to file_name in splunk
                         'pulsar_config': pulsar_config}
                 ret.append(fake_sub)
+                touched[path] = None
 
             wm.watch(path, mask, rec=rec, auto_add=auto_add, exclude_filter=excludes)
 
@@ -918,6 +1022,19 @@ def process(configfile='salt://hubblestack_pulsar/hubblestack_pulsar_config.yaml
         wm.prune()
         dt.fin()
 
+    baseline = _get_baseline()
+    if baseline is not None:
+        dt.mark('baseline')
+        try:
+            if not __context__.get('pulsar.baseline_reconciled'):
+                __context__['pulsar.baseline_reconciled'] = True
+                ret.extend(_reconcile_baseline(baseline, cm))
+            if touched:
+                baseline.record(touched)
+        except Exception as exc:
+            log.warning('Could not update the pulsar baseline: %s', exc)
+        dt.fin()
+
     if __mods__['config.get']('hubblestack:pulsar:maintenance', False):
         # We're in maintenance mode, throw away findings
         ret = []
@@ -19,12 +19,12 @@ hubblestack:
         sourcetype_nova: hubble_audit
         gelfhttp: https://graylog-gelf-http-input-addr
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-
-
-import json
-import requests
+import hubblestack.utils.http_batch
 
 
 def returner(ret):
@@ -52,6 +52,7 @@ def returner(ret):
                 break
 
     for opts in opts_list:
+        transport = _transport(opts)
         for query in ret['return']:
             for query_name, value in query.items():
                 for query_data in value['data']:
@@ -67,11 +68,19 @@ def returner(ret):
                                'short_message': 'hubblestack',
                                'hubblemsg': event}
 
-                    rdy = json.dumps(payload)
-                    requests.post('{}:{}/gelf'.format(opts['gelfhttp'], opts['port']), rdy)
+                    transport.add(payload)
+        transport.flush()
     return
 
 
+def _transport(opts):
+    """
+    Return the shared batching transport for a graylog config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/gelf'.format(opts['gelfhttp'], opts['port']), opts, fmt='gelf')
+
+
 def _generate_event(custom_fields, args, cloud_details, query_data):
     """
     Helper function that builds and returns the event dict
@@ -112,7 +121,8 @@ def _get_options():
             'http_input_server_ssl': __mods__['config.get'](
                 'hubblestack:nebula:returner:graylog:gelfhttp_ssl', True),
             'proxy': __mods__['config.get']('hubblestack:nebula:returner:graylog:proxy', {}),
-            'timeout': __mods__['config.get']('hubblestack:nebula:returner:graylog:timeout', 9.05)
+            'timeout': __mods__['config.get']('hubblestack:nebula:returner:graylog:timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])
         }
 
     except Exception:
@@ -131,4 +141,5 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_nebula', 'hubble_osquery'),
             'gelfhttp_ssl': opt.get('gelfhttp_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
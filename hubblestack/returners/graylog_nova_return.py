@@ -20,11 +20,14 @@ hubblestack:
         http_event_collector_ssl_verify: True
         gelfhttp: https://graylog-gelf-http-input-addr
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-import json
 import logging
-import requests
+
+import hubblestack.utils.http_batch
 
 log = logging.getLogger(__name__)
 
@@ -61,7 +64,8 @@ def returner(ret):
             event = _generate_event(args=args, cloud_details=cloud_details,
                                     custom_fields=opts['custom_fields'], compliance=True)
             _publish_event(fqdn=args['fqdn'], sourcetype=opts['sourcetype'], event=event,
-                           gelfhttp=opts['gelfhttp'], port=opts['port'])
+                           transport=_transport(opts))
+        _transport(opts).flush()
 
     return
 
@@ -86,7 +90,8 @@ def _get_options():
             'http_input_server_ssl': __mods__['config.get'](
                 'hubblestack:nova:returner:graylog:gelfhttp_ssl', True),
             'proxy': __mods__['config.get']('hubblestack:nova:returner:graylog:proxy', {}),
-            'timeout': __mods__['config.get']('hubblestack:nova:returner:graylog:timeout', 9.05)}
+            'timeout': __mods__['config.get']('hubblestack:nova:returner:graylog:timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])}
 
     except Exception:
         return None
@@ -103,7 +108,8 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_nova', 'hubble_audit'),
             'http_input_server_ssl': opt.get('gelfhttp_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
 
 
 def _generate_event(args, cloud_details, custom_fields, compliance=False, data=None):
@@ -140,17 +146,24 @@ def _generate_event(args, cloud_details, custom_fields, compliance=False, data=N
     return event
 
 
-def _publish_event(fqdn, sourcetype, event, gelfhttp, port):
+def _publish_event(fqdn, sourcetype, event, transport):
     """
-    Helper function that builds the payload and publishes it to graylog using POST
+    Helper function that builds the payload and queues it on the graylog transport
     """
     payload = {'host': fqdn,
                '_sourcetype': sourcetype,
                'short_message': 'hubblestack',
                'hubblemsg': event}
 
-    rdy = json.dumps(payload)
-    requests.post('{}:{}/gelf'.format(gelfhttp, port), rdy)
+    transport.add(payload)
+
+
+def _transport(opts):
+    """
+    Return the shared batching transport for a graylog config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/gelf'.format(opts['gelfhttp'], opts['port']), opts, fmt='gelf')
 
 
 def _build_args(ret):
@@ -188,4 +201,4 @@ def _publish_data(args, checks, check_result, cloud_details, opts):
         event = _generate_event(data=data, args=args, cloud_details=cloud_details,
                                 custom_fields=opts['custom_fields'])
         _publish_event(fqdn=args['fqdn'], sourcetype=opts['sourcetype'], event=event,
-                       gelfhttp=opts['gelfhttp'], port=opts['port'])
+                       transport=_transport(opts))
@@ -19,12 +19,15 @@ hubblestack:
         sourcetype_nova: hubble_audit
         gelfhttp: https://graylog-gelf-http-input-addr
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 from collections import defaultdict
 
-import json
 import os
-import requests
+
+import hubblestack.utils.http_batch
 
 
 def _dedup_list(input_list):
@@ -66,6 +69,7 @@ def returner(ret):
     alerts = _build_alerts(data)
 
     for opts in opts_list:
+        transport = _transport(opts)
         for alert in alerts:
             if 'change' in alert:  # Linux, normal pulsar
                 # The second half of the change will be '|IN_ISDIR' for directories
@@ -91,11 +95,19 @@ def returner(ret):
                        'short_message': 'hubblestack',
                        'hubblemsg': event}
 
-            rdy = json.dumps(payload)
-            requests.post('{}:{}/gelf'.format(opts['gelfhttp'], opts['port']), rdy)
+            transport.add(payload)
+        transport.flush()
     return
 
 
+def _transport(opts):
+    """
+    Return the shared batching transport for a graylog config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/gelf'.format(opts['gelfhttp'], opts['port']), opts, fmt='gelf')
+
+
 def _get_options():
     """
     Function that aggregates the configs for graylog and returns them as a list of dicts.
@@ -119,7 +131,8 @@ def _get_options():
                     'hubblestack:pulsar:returner:graylog:gelfhttp_ssl', True),
                 'proxy': __mods__['config.get']('hubblestack:pulsar:returner:graylog:proxy', {}),
                 'timeout': __mods__['config.get']('hubblestack:pulsar:returner:graylog:timeout',
-                                                  9.05)}
+                                                  9.05),
+                'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])}
 
         except Exception:
             return None
@@ -136,7 +149,8 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_pulsar', 'hubble_fim'),
             'gelfhttp_ssl': opt.get('gelfhttp_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
 
 
 def _build_linux_actions():
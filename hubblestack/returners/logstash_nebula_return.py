@@ -21,11 +21,13 @@ plugin. Required config/pillar settings:
             custom_fields:
               - site
               - product_group
+
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-import json
-import requests
-from requests.auth import HTTPBasicAuth
+import hubblestack.utils.http_batch
 
 
 def returner(ret):
@@ -41,6 +43,7 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     for opts in opts_list:
+        transport = _transport(opts)
         # assign all the things
         fqdn = __grains__['fqdn'] if __grains__['fqdn'] else ret['id']
         try:
@@ -70,12 +73,20 @@ def returner(ret):
                                'sourcetype': opts['sourcetype'],
                                'event': event}
 
-                    rdy = json.dumps(payload)
-                    requests.post('{}:{}/hubble/nebula'.format(opts['indexer'], opts['port']), rdy,
-                                  auth=HTTPBasicAuth(opts['user'], opts['password']))
+                    transport.add(payload)
+        transport.flush()
     return
 
 
+def _transport(opts):
+    """
+    Return the shared batching transport for a logstash config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/hubble/nebula'.format(opts['indexer'], opts['port']), opts,
+        fmt='json_array', auth=(opts['user'], opts['password']))
+
+
 def _get_options():
     if __mods__['config.get']('hubblestack:returner:logstash'):
         returner_opts = __mods__['config.get']('hubblestack:returner:logstash')
@@ -96,7 +107,8 @@ def _get_options():
                 'hubblestack:nebula:returner:logstash:indexer_ssl', True),
             'proxy': __mods__['config.get']('hubblestack:nebula:returner:logstash:proxy', {}),
             'timeout': __mods__['config.get']('hubblestack:nebula:returner:logstash:timeout',
-                                              9.05)}
+                                              9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])}
     except Exception:
         return None
 
@@ -116,7 +128,8 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_nebula', 'hubble_osquery'),
             'indexer_ssl': opt.get('indexer_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
 
 
 def _generate_event(custom_fields, args, cloud_details, query_result):
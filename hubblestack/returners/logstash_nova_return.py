@@ -21,12 +21,15 @@ plugin. Required config/pillar settings:
             custom_fields:
               - site
               - product_group
+
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-import json
 import logging
-import requests
-from requests.auth import HTTPBasicAuth
+
+import hubblestack.utils.http_batch
 
 log = logging.getLogger(__name__)
 
@@ -60,6 +63,7 @@ def returner(ret):
             event = _generate_event(args=args, cloud_details=cloud_details, compliance=True,
                                     custom_fields=opts['custom_fields'])
             _publish_event(opts=opts, fqdn=args['fqdn'], event=event)
+        _transport(opts).flush()
 
     return
 
@@ -86,7 +90,8 @@ def _get_options():
                 'hubblestack:nova:returner:logstash:indexer_ssl', True),
             'proxy': __mods__['config.get']('hubblestack:nova:returner:logstash:proxy', {}),
             'timeout': __mods__['config.get']('hubblestack:nova:returner:logstash:timeout',
-                                              9.05)}
+                                              9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])}
     except Exception:
         return None
 
@@ -106,7 +111,8 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_nova', 'hubble_audit'),
             'http_input_server_ssl': opt.get('indexer_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
 
 
 def _build_args(ret):
@@ -180,13 +186,20 @@ def _publish_data(args, checks, check_result, cloud_details, opts):
 
 def _publish_event(opts, fqdn, event):
     """
-    Helper function that builds the payload and publishes it to logstash using POST
+    Helper function that builds the payload and queues it on the logstash transport
     """
     payload = {'host': fqdn,
                'index': opts['index'],
                'sourcetype': opts['sourcetype'],
                'event': event}
 
-    rdy = json.dumps(payload)
-    requests.post('{}:{}/hubble/nova'.format(opts['indexer'], opts['port']), rdy,
-                  auth=HTTPBasicAuth(opts['user'], opts['password']))
+    _transport(opts).add(payload)
+
+
+def _transport(opts):
+    """
+    Return the shared batching transport for a logstash config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/hubble/nova'.format(opts['indexer'], opts['port']), opts,
+        fmt='json_array', auth=(opts['user'], opts['password']))
@@ -21,13 +21,16 @@ plugin. Required config/pillar settings:
             custom_fields:
               - site
               - product_group
+
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 from collections import defaultdict
 
 import os
-import json
-import requests
-from requests.auth import HTTPBasicAuth
+
+import hubblestack.utils.http_batch
 
 
 def _dedup_list(input_list):
@@ -64,6 +67,7 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     for opts in opts_list:
+        transport = _transport(opts)
         # get the alerts
         alerts = _build_alerts(data)
         for alert in alerts:
@@ -89,12 +93,20 @@ def returner(ret):
                        'sourcetype': opts['sourcetype'],
                        'event': event}
 
-            rdy = json.dumps(payload)
-            requests.post('{}:{}/hubble/pulsar'.format(opts['indexer'], opts['port']), rdy,
-                          auth=HTTPBasicAuth(opts['user'], opts['password']))
+            transport.add(payload)
+        transport.flush()
     return
 
 
+def _transport(opts):
+    """
+    Return the shared batching transport for a logstash config entry
+    """
+    return hubblestack.utils.http_batch.get_transport(
+        '{}:{}/hubble/pulsar'.format(opts['indexer'], opts['port']), opts,
+        fmt='json_array', auth=(opts['user'], opts['password']))
+
+
 def _get_options():
     """
     Function that aggregates the configs for logstasg and returns them as a list of dicts.
@@ -116,7 +128,8 @@ def _get_options():
             'http_input_server_ssl': __mods__['config.get'](
                 'hubblestack:pulsar:returner:logstash:indexer_ssl', True),
             'proxy': __mods__['config.get']('hubblestack:pulsar:returner:logstash:proxy', {}),
-            'timeout': __mods__['config.get']('hubblestack:pulsar:returner:logstash:timeout', 9.05)}
+            'timeout': __mods__['config.get']('hubblestack:pulsar:returner:logstash:timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts({}, __mods__['config.get'])}
     except Exception:
         return None
 
@@ -136,7 +149,8 @@ def _process_opt(opt):
             'sourcetype': opt.get('sourcetype_pulsar', 'hubble_fim'),
             'indexer_ssl': opt.get('indexer_ssl', True),
             'proxy': opt.get('proxy', {}),
-            'timeout': opt.get('timeout', 9.05)}
+            'timeout': opt.get('timeout', 9.05),
+            'transport': hubblestack.utils.http_batch.transport_opts(opt, __mods__['config.get'])}
 
 
 def _build_linux_actions():
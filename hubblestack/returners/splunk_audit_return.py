@@ -41,7 +41,7 @@ gateway is not defined.
 import socket
 
 # Imports for http event forwarder
-import json
+import hubblestack.utils.json
 import logging
 
 from hubblestack.hec import http_event_collector, get_splunk_options, make_hec_args
@@ -66,7 +66,7 @@ def returner(ret):
                                        _nick={'sourcetype_audit': 'sourcetype'})
 
         for opts in opts_list:
-            log.debug('Options: %s', json.dumps(opts))
+            log.debug('Options: %s', hubblestack.utils.json.encode(opts))
             custom_fields = opts['custom_fields']
             # Set up the collector
             args, kwargs = make_hec_args(opts)
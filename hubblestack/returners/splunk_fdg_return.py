@@ -44,7 +44,7 @@ gateway is not defined.
 """
 import socket
 import re
-import json
+import hubblestack.utils.json
 import logging
 from hubblestack.hec import http_event_collector, get_splunk_options, make_hec_args
 
@@ -79,7 +79,7 @@ def returner(ret):
                                        _nick={'sourcetype_fdg': 'sourcetype'})
 
         for opts in opts_list:
-            logging.debug('Options: %s', json.dumps(opts))
+            logging.debug('Options: %s', hubblestack.utils.json.encode(opts))
 
             # Set up the fields to be extracted at index time. The field values must be strings.
             # Note that these fields will also still be available in the event data
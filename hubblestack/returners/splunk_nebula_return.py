@@ -40,7 +40,8 @@ gateway is not defined.
 """
 import socket
 
-import json
+import hubblestack.utils.json
+import hubblestack.utils.nebula_snapshots
 import logging
 import time
 from datetime import datetime
@@ -72,7 +73,7 @@ def returner(ret):
             _nick={"sourcetype_nebula": "sourcetype"},
         )
         for opts in opts_list:
-            logging.debug("Options: %s", json.dumps(opts))
+            logging.debug("Options: %s", hubblestack.utils.json.encode(opts))
 
             # Set up the fields to be extracted at index time. The field values must be strings.
             # Note that these fields will also still be available in the event data
@@ -106,6 +107,8 @@ def returner(ret):
                         event_time = _check_time(query_result)
                         hec.batchEvent(payload, eventtime=event_time)
             hec.flushBatch()
+        # the differential queries compare their next run with this one
+        hubblestack.utils.nebula_snapshots.commit(ret, __opts__)
     except Exception as e:
         log.exception(f"Error ocurred in splunk_nebula_return: {e}")
 
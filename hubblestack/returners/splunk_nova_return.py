@@ -37,14 +37,23 @@ gateway is not defined.
             custom_fields:
               - site
               - product_group
+
+With ``audit_changes_only: True`` in the hubble config, a run only sends the
+checks whose status or output changed since the previous run of the same job,
+plus a full snapshot once every ``audit_full_snapshot_interval`` seconds
+(default: a day), see :mod:`hubblestack.utils.audit_ledger`. Every run then
+also sends a digest event (``check_type: audit_digest``) with the number of
+checks, the number sent, the ids of the checks gone and a hash of all the
+results, which the indexer can use to verify it holds the complete state.
 """
 import socket
 
 # Imports for http event forwarder
-import json
+import hubblestack.utils.json
 import logging
 
 from hubblestack.hec import http_event_collector, get_splunk_options, make_hec_args
+import hubblestack.utils.audit_ledger
 
 log = logging.getLogger(__name__)
 
@@ -63,11 +72,18 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     try:
+        report = None
+        if __opts__.get('audit_changes_only', False):
+            report = hubblestack.utils.audit_ledger.report(ret, __opts__)
+            data = report.data
+            host_args['digest'] = report.digest
+            log.debug('Sending %d of %d audit checks', report.digest['changed_checks'], report.digest['checks'])
+
         opts_list = get_splunk_options(sourcetype='hubble_audit',
                                        _nick={'sourcetype_nova': 'sourcetype'})
 
         for opts in opts_list:
-            log.debug('Options: %s', json.dumps(opts))
+            log.debug('Options: %s', hubblestack.utils.json.encode(opts))
             custom_fields = opts['custom_fields']
             # Set up the collector
             args, kwargs = make_hec_args(opts)
@@ -89,7 +105,15 @@ def returner(ret):
                                         custom_fields=custom_fields, check_type='compliance')
                 _publish_event(fqdn=host_args['fqdn'], event=event, opts=opts, hec=hec)
 
+            # Digest of the run, when only changes are sent
+            if report is not None:
+                event = _generate_event(args=host_args, cloud_details=cloud_details,
+                                        custom_fields=custom_fields, check_type='digest')
+                _publish_event(fqdn=host_args['fqdn'], event=event, opts=opts, hec=hec)
+
             hec.flushBatch()
+        if report is not None:
+            report.commit()
     except Exception:
         log.exception('Error ocurred in splunk_nova_return')
     return
@@ -160,6 +184,9 @@ def _generate_event(args, cloud_details, custom_fields, check_type=None, data=No
     event = {'job_id': args['job_id']}
     if check_type == 'compliance':
         event['compliance_percentage'] = args['Compliance']
+    elif check_type == 'digest':
+        event['check_type'] = 'audit_digest'
+        event.update(args['digest'])
     else:
         event.update({'check_result': args['check_result']})
         event.update({'check_id': args['check_id']})
@@ -40,7 +40,7 @@ gateway is not defined.
 """
 import socket
 
-import json
+import hubblestack.utils.json
 import logging
 import time
 import copy
@@ -70,7 +70,7 @@ def returner(ret):
                                        add_query_to_sourcetype=True,
                                        _nick={'sourcetype_osqueryd': 'sourcetype'})
         for opts in opts_list:
-            logging.debug('Options: %s', json.dumps(opts))
+            logging.debug('Options: %s', hubblestack.utils.json.encode(opts))
             # Set up the collector
             args, kwargs = make_hec_args(opts)
             hec = http_event_collector(*args, **kwargs)
@@ -41,7 +41,7 @@ gateway is not defined.
 import socket
 
 # Imports for http event forwarder
-import json
+import hubblestack.utils.json
 import logging
 import os
 from collections import defaultdict
@@ -73,7 +73,7 @@ def returner(ret):
         opts_list = get_splunk_options(sourcetype='hubble_fim',
                                        _nick={'sourcetype_pulsar': 'sourcetype'})
         for opts in opts_list:
-            logging.debug('Options: %s', json.dumps(opts))
+            logging.debug('Options: %s', hubblestack.utils.json.encode(opts))
             # Set up the fields to be extracted at index time. The field values must be strings.
             # Note that these fields will also still be available in the event data
             index_extracted_fields = []
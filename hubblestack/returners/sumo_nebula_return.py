@@ -16,11 +16,14 @@ hubblestack:
         sumo_pulsar_return: https://yoursumo.sumologic.com/endpointhere
         sumo_nova_return: https://yoursumo.sumologic.com/endpointhere
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-import json
 import logging
-import requests
+
+import hubblestack.utils.http_batch
 
 log = logging.getLogger(__name__)
 
@@ -39,7 +42,8 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     for opts in opts_list:
-        sumo_nebula_return = opts['sumo_nebula_return']
+        transport = hubblestack.utils.http_batch.get_transport(
+            '{}/'.format(opts['sumo_nebula_return']), opts)
         for query in data:
             for query_name, query_results in query.items():
                 if 'data' not in query_results:
@@ -56,11 +60,11 @@ def returner(ret):
                                   'system_uuid': __grains__.get('system_uuid')})
                     event.update(cloud_details)
                     try:
-                        rdy = json.dumps(event)
-                        requests.post('{}/'.format(sumo_nebula_return), rdy)
+                        transport.add(event)
                     except Exception:
                         log.error('Hit an exception trying to send to sumo! continuing')
                         continue
+        transport.flush()
     return
 
 
@@ -76,7 +80,9 @@ def _get_options():
         for opt in returner_opts:
             processed = {'sumo_nebula_return': opt.get('sumo_nebula_return'),
                          'proxy': opt.get('proxy', {}),
-                         'timeout': opt.get('timeout', 9.05)}
+                         'timeout': opt.get('timeout', 9.05),
+                         'transport': hubblestack.utils.http_batch.transport_opts(
+                             opt, __mods__['config.get'])}
             sumo_opts.append(processed)
         return sumo_opts
     try:
@@ -87,7 +93,9 @@ def _get_options():
     sumo_opts = {'sumo_nebula_return': sumo_nebula_return,
                  'proxy': __mods__['config.get']('hubblestack:nebula:returner:sumo:proxy', {}),
                  'timeout': __mods__['config.get']('hubblestack:nebula:returner:sumo:timeout',
-                                                   9.05)}
+                                                   9.05),
+                 'transport': hubblestack.utils.http_batch.transport_opts(
+                     {}, __mods__['config.get'])}
 
     return [sumo_opts]
 
@@ -16,12 +16,15 @@ hubblestack:
         sumo_pulsar_return: https://yoursumo.sumologic.com/endpointhere
         sumo_nova_return: https://yoursumo.sumologic.com/endpointhere
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
-import json
-import requests
 import logging
 
+import hubblestack.utils.http_batch
+
 log = logging.getLogger(__name__)
 
 
@@ -41,18 +44,20 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     for opts in opts_list:
-        sumo_nova_return = opts['sumo_nova_return']
+        transport = hubblestack.utils.http_batch.get_transport(
+            '{}/'.format(opts['sumo_nova_return']), opts)
         # Failure checks
         _publish_data(args=args, checks=data.get('Failure', []), check_result='Failure',
-                      cloud_details=cloud_details, sumo_nova_return=sumo_nova_return)
+                      cloud_details=cloud_details, transport=transport)
         # Success checks
         _publish_data(args=args, checks=data.get('Success', []), check_result='Success',
-                      cloud_details=cloud_details, sumo_nova_return=sumo_nova_return)
+                      cloud_details=cloud_details, transport=transport)
         # Compliance check
         if data.get('Compliance', None):
             args['compliance_percentage'] = data['Compliance']
             event = _generate_event(args=args, cloud_details=cloud_details, compliance=True)
-            _publish_event(event=event, sumo_nova_return=sumo_nova_return)
+            _publish_event(event=event, transport=transport)
+        transport.flush()
 
     return
 
@@ -69,7 +74,9 @@ def _get_options():
         for opt in returner_opts:
             processed = {'sumo_nova_return': opt.get('sumo_nova_return'),
                          'proxy': opt.get('proxy', {}),
-                         'timeout': opt.get('timeout', 9.05)}
+                         'timeout': opt.get('timeout', 9.05),
+                         'transport': hubblestack.utils.http_batch.transport_opts(
+                             opt, __mods__['config.get'])}
             sumo_opts.append(processed)
         return sumo_opts
     try:
@@ -80,7 +87,9 @@ def _get_options():
     sumo_opts = {'sumo_nova_return': sumo_nova_return,
                  'proxy': __mods__['config.get']('hubblestack:nova:returner:sumo:proxy', {}),
                  'timeout': __mods__['config.get']('hubblestack:nova:returner:sumo:timeout',
-                                                   9.05)}
+                                                   9.05),
+                 'transport': hubblestack.utils.http_batch.transport_opts(
+                     {}, __mods__['config.get'])}
 
     return [sumo_opts]
 
@@ -109,15 +118,14 @@ def _generate_event(args, cloud_details, compliance=False, data=None):
     return event
 
 
-def _publish_event(event, sumo_nova_return):
+def _publish_event(event, transport):
     """
-    Publish the event to sumo
+    Queue the event on the sumo transport
     """
-    rdy = json.dumps(event)
-    requests.post('{}/'.format(sumo_nova_return), rdy)
+    transport.add(event)
 
 
-def _publish_data(args, checks, check_result, cloud_details, sumo_nova_return):
+def _publish_data(args, checks, check_result, cloud_details, transport):
     """
     Helper function that goes over the failure/success checks and publishes the event to sumo
     """
@@ -126,7 +134,7 @@ def _publish_data(args, checks, check_result, cloud_details, sumo_nova_return):
         args['check_result'] = check_result
         args['check_id'] = check_id
         event = _generate_event(data=data, args=args, cloud_details=cloud_details)
-        _publish_event(event=event, sumo_nova_return=sumo_nova_return)
+        _publish_event(event=event, transport=transport)
 
 
 def _build_args(ret):
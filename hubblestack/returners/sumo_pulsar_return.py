@@ -16,13 +16,16 @@ hubblestack:
         sumo_pulsar_return: https://yoursumo.sumologic.com/endpointhere
         sumo_nova_return: https://yoursumo.sumologic.com/endpointhere
 
+Events are posted in batches over a persistent connection; see
+:mod:`hubblestack.utils.http_batch` for the batching, retry and disk_queue
+options.
 """
 
 from collections import defaultdict
 
 import os
-import json
-import requests
+
+import hubblestack.utils.http_batch
 
 
 def _dedup_list(input_list):
@@ -60,7 +63,8 @@ def returner(ret):
     cloud_details = __grains__.get('cloud_details', {})
 
     for opts in opts_list:
-        sumo_pulsar_return = opts['sumo_pulsar_return']
+        transport = hubblestack.utils.http_batch.get_transport(
+            '{}/'.format(opts['sumo_pulsar_return']), opts)
         for alert in alerts:
             if 'change' in alert:  # Linux, normal pulsar
                 # The second half of the change will be '|IN_ISDIR' for directories
@@ -76,8 +80,8 @@ def returner(ret):
                           'dest_ip': fqdn_ip4})
             event.update(cloud_details)
             # publish event
-            rdy = json.dumps(event)
-            requests.post('{}/'.format(sumo_pulsar_return), rdy)
+            transport.add(event)
+        transport.flush()
     return
 
 
@@ -93,7 +97,9 @@ def _get_options():
         for opt in returner_opts:
             processed = {'sumo_pulsar_return': opt.get('sumo_pulsar_return'),
                          'proxy': opt.get('proxy', {}),
-                         'timeout': opt.get('timeout', 9.05)}
+                         'timeout': opt.get('timeout', 9.05),
+                         'transport': hubblestack.utils.http_batch.transport_opts(
+                             opt, __mods__['config.get'])}
             sumo_opts.append(processed)
         return sumo_opts
     try:
@@ -104,7 +110,9 @@ def _get_options():
     sumo_opts = {'sumo_pulsar_return': sumo_pulsar_return,
                  'proxy': __mods__['config.get']('hubblestack:pulsar:returner:sumo:proxy', {}),
                  'timeout': __mods__['config.get']('hubblestack:pulsar:returner:sumo:timeout',
-                                                   9.05)}
+                                                   9.05),
+                 'transport': hubblestack.utils.http_batch.transport_opts(
+                     {}, __mods__['config.get'])}
 
     return [sumo_opts]
 
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Job execution for the hubble daemon scheduler
+
+The daemon decides *when* a scheduled job is due; the JobExecutor decides
+*where* it runs. Each job gets one of three concurrency policies:
+
+dedicated
+    The job gets its own worker thread. This is the default for
+    ``pulsar.process`` (and ``win_pulsar.process``), which is scheduled every
+    second and must never wait behind a long audit.
+
+pool
+    The job runs on a shared, bounded pool of ``scheduler_pool_size`` worker
+    threads. This is the default for everything else (audits, nebula, fdg).
+
+inline
+    The job runs in the main loop, the way every job used to run.
+
+The policy can be set per job with the ``concurrency`` key of the schedule
+entry. A job never overlaps with itself: if a job comes due while its
+previous run is still going, that occurrence is skipped and counted as a
+missed deadline.
+
+Per job, the executor tracks the number of runs, the number of missed
+deadlines, the latency (how long after its due time the job actually started)
+and the duration of the last run. The same numbers are marked in
+:mod:`hubblestack.status` so they show up in the status.json dump.
+
+The Scheduler keeps the parsed jobs in a min-heap ordered by their next run
+time (and priority), so the daemon can sleep until exactly the next
+deadline instead of re-walking the whole schedule every half second. Cron
+expressions are turned into croniter iterators once, when the job is
+parsed.
+
+When the daemon falls behind (a suspended VM, a slow fileserver update in
+the main loop), what happens to the runs that were missed is decided by the
+job's ``lateness`` policy:
+
+coalesce
+    Run once, now, for all the missed runs (the default, and how the old
+    scheduler behaved).
+
+skip
+    Don't run at all if the job is more than ``max_lateness`` seconds late
+    (defaults to the job's ``seconds``); wait for the next run time instead.
+
+catch_up
+    Run every missed run, one after the other.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import queue
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+
+from croniter import croniter
+
+import hubblestack.status
+
+log = logging.getLogger(__name__)
+HSS = hubblestack.status.HubbleStatus(__name__)
+
+POLICIES = ("dedicated", "pool", "inline")
+LATENESS_POLICIES = ("coalesce", "skip", "catch_up")
+DEFAULT_DEDICATED_FUNCTIONS = ("pulsar.process", "win_pulsar.process")
+
+
+class _Lane(object):
+    """
+    A priority queue served by ``size`` daemon worker threads
+
+    Daemon threads (rather than concurrent.futures) so that a long audit
+    can't hold up the process exiting on SIGTERM.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self.threads = []
+        for idx in range(max(1, int(size))):
+            thread = threading.Thread(target=self._work, name="{0}-{1}".format(name, idx))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            _, _, item = self.queue.get()
+            if item is None:
+                return
+            try:
+                item()
+            except Exception:
+                log.exception("Unhandled exception in %s worker", self.name)
+
+    def put(self, item, priority=0):
+        """queue a callable for the workers; higher priorities go first"""
+        self.queue.put((-priority, next(self._counter), item))
+
+    def stop(self):
+        """tell the workers to exit once the queue drains"""
+        for _ in self.threads:
+            self.queue.put((float("inf"), next(self._counter), None))
+
+
+class JobStats(object):
+    """Counters for a single scheduled job"""
+
+    def __init__(self):
+        self.runs = 0
+        self.running = False
+        self.missed = 0
+        self.errors = 0
+        self.last_start = None
+        self.last_latency = None
+        self.max_latency = 0
+        self.ema_latency = None
+        self.last_duration = None
+
+    def asdict(self):
+        """return the counters as a dict"""
+        return {
+            "runs": self.runs,
+            "running": self.running,
+            "missed": self.missed,
+            "errors": self.errors,
+            "last_start": self.last_start,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+            "ema_latency": self.ema_latency,
+            "last_duration": self.last_duration,
+        }
+
+
+class JobExecutor(object):
+    """
+    Run scheduled jobs according to their concurrency policy (see the module
+    docstring).
+
+    pool_size
+        Number of worker threads shared by the ``pool`` jobs
+
+    dedicated_functions
+        Functions whose jobs default to the ``dedicated`` policy
+    """
+
+    def __init__(self, pool_size=4, dedicated_functions=DEFAULT_DEDICATED_FUNCTIONS):
+        self.pool_size = max(1, int(pool_size))
+        self.dedicated_functions = set(dedicated_functions or ())
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._dedicated = {}
+
+    def policy(self, jobdata):
+        """return the concurrency policy for the given schedule entry"""
+        policy = jobdata.get("concurrency")
+        if policy in POLICIES:
+            return policy
+        if policy is not None:
+            log.error("Unknown concurrency policy %s, using the default", policy)
+        if jobdata.get("function") in self.dedicated_functions:
+            return "dedicated"
+        return "pool"
+
+    def _lane(self, jobname, policy):
+        if policy == "dedicated":
+            if jobname not in self._dedicated:
+                self._dedicated[jobname] = _Lane("job:{0}".format(jobname), 1)
+            return self._dedicated[jobname]
+        if self._pool is None:
+            self._pool = _Lane("job-pool", self.pool_size)
+        return self._pool
+
+    def stats(self, jobname):
+        """return the JobStats for a job (created on first use)"""
+        with self._lock:
+            if jobname not in self.jobs:
+                self.jobs[jobname] = JobStats()
+                HSS.add_resource(jobname)
+                HSS.add_resource(jobname + ".missed")
+            return self.jobs[jobname]
+
+    def is_running(self, jobname):
+        """True while a run of the job is queued or in progress"""
+        return jobname in self.jobs and self.jobs[jobname].running
+
+    def missed(self, jobname):
+        """record a missed deadline for the job"""
+        self.stats(jobname).missed += 1
+        HSS.mark(jobname + ".missed")
+
+    def submit(self, jobname, jobdata, target, due=None):
+        """
+        Run ``target`` (a callable taking no arguments) for the job named
+        ``jobname``. ``due`` is the time the job was due to run, used for the
+        latency numbers.
+
+        Returns False (and counts a missed deadline) when the previous run of
+        the job hasn't finished yet, True otherwise.
+        """
+        stats = self.stats(jobname)
+        with self._lock:
+            if stats.running:
+                log.warning("Scheduled job %s is still running, skipping this run", jobname)
+                overlapping = True
+            else:
+                stats.running = True
+                overlapping = False
+        if overlapping:
+            self.missed(jobname)
+            return False
+        if due is None:
+            due = time.time()
+
+        def _run():
+            start = time.time()
+            latency = max(0, start - due)
+            stats.last_start = start
+            stats.last_latency = latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.ema_latency = latency if stats.ema_latency is None else 0.5 * stats.ema_latency + 0.5 * latency
+            handle = HSS.mark(jobname)
+            try:
+                target()
+            except Exception:
+                stats.errors += 1
+                log.error(
+                    "Exception in running job: %s; continuing with next job...",
+                    jobname,
+                    exc_info=True,
+                )
+            finally:
+                handle.fin()
+                stats.runs += 1
+                stats.last_duration = time.time() - start
+                stats.running = False
+
+        policy = self.policy(jobdata)
+        if policy == "inline":
+            _run()
+        else:
+            self._lane(jobname, policy).put(_run, priority=int(jobdata.get("priority", 0)))
+        return True
+
+    def report(self):
+        """return the stats of every job, keyed by job name"""
+        return {jobname: stats.asdict() for jobname, stats in self.jobs.items()}
+
+    def shutdown(self):
+        """stop the worker threads once their queues drain"""
+        if self._pool is not None:
+            self._pool.stop()
+            self._pool = None
+        for lane in self._dedicated.values():
+            lane.stop()
+        self._dedicated = {}
+
+
+def getlastrunbybuckets(buckets, seconds):
+    """
+    this function will use the host's ip to place the host in a bucket
+    where each bucket executes hubble processes at a different time
+    """
+    buckets = int(buckets) if int(buckets) != 0 else 256
+    host_ip = socket.gethostbyname(socket.gethostname())
+    ips = host_ip.split(".")
+    bucket_sum = (
+        (int(ips[0]) * 256 * 256 * 256)
+        + (int(ips[1]) * 256 * 256)
+        + (int(ips[2]) * 256)
+        + int(ips[3])
+    )
+    bucket = bucket_sum % buckets
+    log.debug("bucket number is %d out of %d", bucket, buckets)
+    current_time = time.time()
+    base_time = seconds * (math.floor(current_time / seconds))
+    splay = seconds / buckets
+    seconds_between_buckets = splay
+    random_int = random.randint(0, int(splay) - 1) if int(splay) > 0 else 0
+    bucket_execution_time = base_time + (seconds_between_buckets * bucket) + random_int
+    if bucket_execution_time < current_time:
+        last_run = bucket_execution_time
+    else:
+        last_run = bucket_execution_time - seconds
+    return last_run
+
+
+class ScheduledJob(object):
+    """
+    A job from the ``schedule`` config, parsed and validated once.
+
+    Raises ValueError when the job can't be scheduled.
+    """
+
+    def __init__(self, name, jobdata, now=None):
+        if now is None:
+            now = time.time()
+        if not jobdata or not isinstance(jobdata, dict):
+            raise ValueError("Scheduled job {0} does not have valid data".format(name))
+        if "function" not in jobdata or "seconds" not in jobdata:
+            raise ValueError("Scheduled job {0} is missing a ``function`` or ``seconds`` argument".format(name))
+        self.name = name
+        self.jobdata = jobdata
+        self.function = jobdata["function"]
+        try:
+            self.seconds = int(jobdata["seconds"])
+            self.splay = int(jobdata.get("splay", 0))
+            self.min_splay = int(jobdata.get("min_splay", 0))
+            self.priority = int(jobdata.get("priority", 0))
+            self.max_lateness = float(jobdata.get("max_lateness", self.seconds))
+        except (TypeError, ValueError):
+            raise ValueError("Scheduled job {0} has an invalid value for seconds or splay.".format(name))
+        self.lateness = jobdata.get("lateness", "coalesce")
+        if self.lateness not in LATENESS_POLICIES:
+            log.error("Scheduled job %s has an unknown lateness policy %s, using coalesce", name, self.lateness)
+            self.lateness = "coalesce"
+
+        self.args = jobdata.get("args", [])
+        if not isinstance(self.args, list):
+            log.error("Scheduled job %s has args not formed as a list: %s", name, self.args)
+        self.kwargs = jobdata.get("kwargs", {})
+        if not isinstance(self.kwargs, dict):
+            log.error("Scheduled job %s has kwargs not formed as a dict: %s", name, self.kwargs)
+        self.returners = jobdata.get("returner", [])
+        if not isinstance(self.returners, list):
+            self.returners = [self.returners]
+
+        self.cron = None
+        self.cron_offset = 0
+        if "cron" in jobdata:
+            try:
+                self.cron = croniter(jobdata["cron"], datetime.fromtimestamp(now))
+            except Exception:
+                raise ValueError("Scheduled job {0} has an invalid cron expression.".format(name))
+            if self.splay:
+                # fixed for the life of the daemon, like the interval splay
+                self.cron_offset = random.randint(self.min_splay, self.splay)
+        elif self.seconds <= 0:
+            raise ValueError("Scheduled job {0} has an invalid value for seconds or splay.".format(name))
+
+        self.next_run = self._first_run(now)
+        self.token = 0
+
+    def _first_run(self, now):
+        if self.jobdata.get("run_on_start", False):
+            if self.splay:
+                return now + random.randint(self.min_splay, self.splay)
+            return now
+        if self.cron is not None:
+            return self._next_cron()
+        if self.splay:
+            return now + random.randint(self.min_splay, self.splay) + self.seconds
+        if "buckets" in self.jobdata:
+            last_run = getlastrunbybuckets(self.jobdata["buckets"], self.seconds)
+            log.debug("last_run according to bucket is %s", last_run)
+            return last_run + self.seconds
+        return now + self.seconds
+
+    def _next_cron(self):
+        return self.cron.get_next(float) + self.cron_offset
+
+    def following(self, due):
+        """return the run time that comes after the run due at ``due``"""
+        if self.cron is not None:
+            nxt = self._next_cron()
+            while nxt <= due:
+                nxt = self._next_cron()
+            return nxt
+        return due + self.seconds
+
+
+class Scheduler(object):
+    """
+    A min-heap of the scheduled jobs, keyed on next run time and priority.
+
+    ``sync`` (re)parses the schedule config when it changes, ``next_deadline``
+    says how long the daemon may sleep and ``due_jobs`` pops the jobs whose
+    time has come, applying their lateness policy.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._config_ids = None
+
+    def _push(self, job, when):
+        job.token += 1
+        heapq.heappush(self._heap, (when, -job.priority, next(self._counter), job.token, job))
+
+    def sync(self, schedule_config, now=None):
+        """
+        (Re)build the heap from the schedule config. Jobs whose config didn't
+        change keep their place (and their splay) in the schedule.
+        """
+        config_ids = {name: id(jobdata) for name, jobdata in schedule_config.items()}
+        if config_ids == self._config_ids:
+            return
+        self._config_ids = config_ids
+        if now is None:
+            now = time.time()
+        jobs = {}
+        for name, jobdata in schedule_config.items():
+            if name in self.jobs and self.jobs[name].jobdata is jobdata:
+                jobs[name] = self.jobs[name]
+                continue
+            try:
+                jobs[name] = ScheduledJob(name, jobdata, now=now)
+            except ValueError as exc:
+                log.error("%s", exc)
+        self.jobs = jobs
+        self._heap = []
+        for job in jobs.values():
+            self._push(job, job.next_run)
+
+    def next_deadline(self):
+        """return the time the next job is due (None if there are no jobs)"""
+        while self._heap and self._heap[0][3] != self._heap[0][4].token:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return self._heap[0][0]
+
+    def due_jobs(self, now=None):
+        """
+        Pop the jobs that are due. Returns a list of ``(job, due, run,
+        missed)`` tuples in priority order; ``run`` is False when the
+        lateness policy says to skip this run and ``missed`` counts the runs
+        that were skipped or folded into this one.
+
+        Each job is returned at most once per call; a catch_up job that is
+        still behind comes due again right away.
+        """
+        if now is None:
+            now = time.time()
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, _, token, job = heapq.heappop(self._heap)
+            if token != job.token or self.jobs.get(job.name) is not job:
+                continue
+            due = job.next_run
+            nxt = job.following(due)
+            missed = 0
+            if job.lateness != "catch_up":
+                while nxt <= now:
+                    missed += 1
+                    nxt = job.following(nxt)
+            run = True
+            if job.lateness == "skip" and now - due > job.max_lateness:
+                run = False
+                missed += 1
+            job.next_run = nxt
+            job.token += 1  # invalidate any other entry until we re-push
+            ready.append((job, due, run, missed))
+        for job, _, _, _ in ready:
+            self._push(job, job.next_run)
+        ready.sort(key=lambda item: -item[0].priority)
+        return ready
+
+    def retry(self, job, due, delay=1, now=None):
+        """put the run due at ``due`` back on the heap, ``delay`` seconds from now"""
+        if now is None:
+            now = time.time()
+        job.next_run = due
+        self._push(job, now + delay)
@@ -245,11 +245,12 @@ class HubbleStatus(object):
                 ret.update({'dur': self.dur, 'ema_dur': self.ema_dur})
             return ret
 
-        def mark(self, timestamp=None):
+        def mark(self, timestamp=None, count=1):
             """ mark a counter (ie, increment the count, mark the last_t =
                 time.time(), and update the ema_dt)
 
                 optional param "t": integer timestamp of mark
+                optional param "count": how much to increment the count by
             """
             if timestamp is None:
                 timestamp = time.time()
@@ -264,7 +265,7 @@ class HubbleStatus(object):
                     self.last_t = timestamp
             if not self.first_t:
                 self.first_t = timestamp
-            self.count += 1
+            self.count += count
             last_mark = self.dt
             self.last_t = timestamp
             self.ema_dt = last_mark if self.ema_dt is None else 0.5 * self.ema_dt + 0.5 * last_mark
@@ -349,11 +350,11 @@ class HubbleStatus(object):
             nb_list[-1].next = None
             self.dat[resource] = nb_list[0]
 
-    def mark(self, resource, timestamp=None):
+    def mark(self, resource, timestamp=None, count=1):
         """ mark the named resource `resource` — meaning increment the counters,
-         update the last_t, etc """
+         update the last_t, etc; `count` marks several events at once """
         resource = self._checkmark(resource)
-        ret = self.dat[resource].mark(timestamp=timestamp)
+        ret = self.dat[resource].mark(timestamp=timestamp, count=count)
         self._check_depth(resource)
         return ret
 
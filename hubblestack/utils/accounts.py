@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Parsed snapshot of the local account databases (passwd, group, shadow)
+
+The user and group audit checks used to re-read and re-split these files (or
+fork ``egrep``/``stat``) once per check. :func:`snapshot` parses them once
+into indexed structures and hands the same object to every check of an audit
+run. A snapshot is rebuilt when one of the files changes or when it is older
+than ``max_age`` seconds, so consecutive audit runs still see fresh data.
+"""
+
+import collections
+import logging
+import os
+import stat
+import threading
+import time
+
+import hubblestack.utils.identity
+
+log = logging.getLogger(__name__)
+
+PASSWD_FILE = "/etc/passwd"
+GROUP_FILE = "/etc/group"
+SHADOW_FILE = "/etc/shadow"
+
+_PASSWD_FIELDS = ("name", "passwd", "uid", "gid", "gecos", "home", "shell")
+_GROUP_FIELDS = ("name", "passwd", "gid", "members")
+_SHADOW_FIELDS = ("name", "passwd", "lastchg", "min", "max", "warn", "inactive", "expire", "flag")
+
+_SNAPSHOT = None
+_LOCK = threading.Lock()
+
+
+class PasswdEntry(collections.namedtuple("PasswdEntry", _PASSWD_FIELDS + ("line",))):
+    """
+    One line of /etc/passwd. Fields are kept as the raw strings so checks
+    can still report malformed values; ``line`` is the unparsed line.
+    """
+
+    __slots__ = ()
+
+    @property
+    def nis(self):
+        """
+        True for NIS compat entries (``+user``, ``-user``, ``+``)
+        """
+        return self.name[:1] in ("+", "-")
+
+
+GroupEntry = collections.namedtuple("GroupEntry", _GROUP_FIELDS + ("line",))
+ShadowEntry = collections.namedtuple("ShadowEntry", _SHADOW_FIELDS + ("line",))
+
+
+def _parse(path, entry_class, nfields):
+    ret = []
+    with open(path, "r") as fh_:
+        for line in fh_:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            fields = line.split(":", nfields - 1)
+            fields += [""] * (nfields - len(fields))
+            ret.append(entry_class(*fields, line=line))
+    return ret
+
+
+def _index(entries, field):
+    ret = collections.OrderedDict()
+    for entry in entries:
+        ret.setdefault(getattr(entry, field), []).append(entry)
+    return ret
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class AccountDB(object):
+    """
+    Indexed view of passwd, group and shadow.
+
+    passwd and group are parsed up front. shadow is parsed on first use, so
+    checks that never look at it do not need read access to it; a read error
+    is raised to the caller on each access, like a plain ``open`` would.
+    """
+
+    def __init__(self, passwd_file=None, group_file=None, shadow_file=None):
+        passwd_file = passwd_file or PASSWD_FILE
+        group_file = group_file or GROUP_FILE
+        self.files = (passwd_file, group_file, shadow_file or SHADOW_FILE)
+        self.signature = tuple(_signature(path) for path in self.files)
+        self.created = time.time()
+        self.passwd = _parse(passwd_file, PasswdEntry, len(_PASSWD_FIELDS))
+        self.group = _parse(group_file, GroupEntry, len(_GROUP_FIELDS))
+        self.users_by_name = _index(self.passwd, "name")
+        self.users_by_uid = _index(self.passwd, "uid")
+        self.users_by_home = _index(self.passwd, "home")
+        self.groups_by_name = _index(self.group, "name")
+        self.groups_by_gid = _index(self.group, "gid")
+        self._shadow = None
+        self._home_stats = {}
+
+    @property
+    def shadow(self):
+        """
+        Parsed /etc/shadow entries
+        """
+        if self._shadow is None:
+            self._shadow = _parse(self.files[2], ShadowEntry, len(_SHADOW_FIELDS))
+        return self._shadow
+
+    def current(self, max_age):
+        """
+        True if the files are unchanged and the snapshot is younger than max_age
+        """
+        if time.time() - self.created > max_age:
+            return False
+        return self.signature == tuple(_signature(path) for path in self.files)
+
+    def home_stat(self, path):
+        """
+        ``os.stat`` of a home directory (following symlinks, like ``stat -L``),
+        done once per path and snapshot; None if it cannot be stat'd
+        """
+        if path not in self._home_stats:
+            try:
+                self._home_stats[path] = os.stat(path)
+            except (OSError, ValueError):
+                self._home_stats[path] = None
+        return self._home_stats[path]
+
+    def is_valid_home(self, path, check_slash_home=False):
+        """
+        True if path is an existing directory (and not ``/`` when
+        check_slash_home is set)
+        """
+        path = None if path is None else path.strip()
+        if not path:
+            return False
+        home = self.home_stat(path)
+        if home is None or not stat.S_ISDIR(home.st_mode):
+            return False
+        return not (check_slash_home and path == "/")
+
+    def owner_name(self, uid):
+        """
+        Name of the first passwd entry with the given numeric uid, or the uid
+        itself as a string (what ``stat -c %U`` prints for unknown owners)
+        """
+        entries = self.users_by_uid.get(str(uid))
+        if entries:
+            return entries[0].name
+        name = hubblestack.utils.identity.user_name(uid)
+        return str(uid) if name is None else name
+
+    @staticmethod
+    def duplicates(index):
+        """
+        Keys of an index that map to more than one entry
+        """
+        return [key for key, entries in index.items() if len(entries) > 1]
+
+
+def snapshot(max_age=60):
+    """
+    Return the shared AccountDB, rebuilding it if the account files changed
+    or it is older than max_age seconds
+    """
+    global _SNAPSHOT  # pylint: disable=global-statement
+    with _LOCK:
+        if _SNAPSHOT is None or not _SNAPSHOT.current(max_age):
+            _SNAPSHOT = AccountDB()
+        return _SNAPSHOT
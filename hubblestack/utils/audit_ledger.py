@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Change-only reporting of audit results
+
+Every scheduled ``hubble.audit`` run returns the result of every check, and
+most of them are the same as in the previous run. The ledger keeps, per host
+and per scheduled job, a digest of the status and output of every check of
+the last reported run. A report then holds only the checks whose status or
+output changed, or which are new, plus:
+
+- a full snapshot of all the checks when the job was never reported, or once
+  every ``audit_full_snapshot_interval`` seconds
+- a digest of the whole run (a hash of every check's digest, counts, and the
+  ids of the checks gone since the previous run), which lets the indexer
+  verify that the latest events it holds for the host are complete
+
+The ledger is only updated with :meth:`Report.commit`, once the report was
+published, so that a failed publish is sent again by the next run.
+
+Options::
+
+    audit_changes_only: False
+    audit_full_snapshot_interval: 86400   # seconds, 0 for no periodic snapshot
+    audit_ledger: <cachedir>/audit_ledger.json
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import hubblestack.utils.atomicfile
+import hubblestack.utils.json
+
+log = logging.getLogger(__name__)
+
+LEDGER_VERSION = 2
+STATUSES = ('Failure', 'Success')
+
+_LOCK = threading.Lock()
+
+
+def _check_id(entry):
+    """
+    Return the check id of an audit result entry, a single key dict
+    """
+    if isinstance(entry, dict) and len(entry) == 1:
+        return str(next(iter(entry)))
+    return hubblestack.utils.json.encode(entry, sort_keys=True, default=str)
+
+
+def _digest(*data):
+    return hashlib.sha1(hubblestack.utils.json.encode(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def stream_id(ret):
+    """
+    Return the id of the ledger of a job return; runs of the same function
+    with the same arguments are compared with each other
+    """
+    return _digest(ret.get('fun', ''), ret.get('fun_args', []))[:16]
+
+
+class Report(object):
+    """
+    The checks of a run to report, and the digest event of the run
+    """
+
+    def __init__(self, ledger, stream, data, digest, state):
+        self.ledger = ledger
+        self.stream = stream
+        self.data = data
+        self.digest = digest
+        self._state = state
+
+    def commit(self):
+        """
+        Record the run as reported
+        """
+        self.ledger.save(self.stream, self._state)
+
+
+class Ledger(object):
+    """
+    The last reported audit results of the host, stored in ``path``
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as fh_:
+                ledger = hubblestack.utils.json.decode(fh_.read())
+        except (IOError, OSError):
+            return {}
+        except ValueError:
+            log.warning('Discarding corrupt audit ledger %s', self.path)
+            return {}
+        if not isinstance(ledger, dict) or ledger.get('version') != LEDGER_VERSION:
+            return {}
+        return ledger.get('streams', {})
+
+    def save(self, stream, state):
+        """
+        Store the state of a stream, leaving the other streams alone
+        """
+        with _LOCK:
+            streams = self._load()
+            streams[stream] = state
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with hubblestack.utils.atomicfile.atomic_open(self.path, 'w') as fh_:
+                fh_.write(hubblestack.utils.json.encode({'version': LEDGER_VERSION, 'streams': streams}))
+
+    def report(self, stream, data, full_interval=86400, now=None):
+        """
+        Compare the results of an audit run with the last reported run of the
+        same stream and return the :class:`Report` of the run
+
+        data
+            the return of ``hubble.audit``; ``Success`` and ``Failure`` are
+            lists of ``{check_id: output}`` dicts, other keys are passed on
+        """
+        now = time.time() if now is None else now
+        with _LOCK:
+            previous = self._load().get(stream)
+
+        full = (previous is None or
+                (full_interval and now - previous.get('last_full', 0) >= full_interval))
+        previous_checks = {} if previous is None else previous.get('checks', {})
+
+        # a check id may have several entries, they are compared as a whole
+        entries = {}
+        for status in STATUSES:
+            for entry in data.get(status, []) or []:
+                entries.setdefault(_check_id(entry), []).append((status, entry))
+        checks = {check_id: _digest(sorted(_digest(*item) for item in items))
+                  for check_id, items in entries.items()}
+
+        ret = dict((key, value) for key, value in data.items() if key not in STATUSES)
+        for status in STATUSES:
+            ret[status] = []
+        changed = 0
+        for check_id, items in entries.items():
+            if full or previous_checks.get(check_id) != checks[check_id]:
+                changed += 1
+                for status, entry in items:
+                    ret[status].append(entry)
+
+        digest = {
+            'audit_digest': _digest(sorted(checks.items())),
+            'full_snapshot': bool(full),
+            'checks': len(checks),
+            'changed_checks': changed,
+            'removed_checks': sorted(set(previous_checks) - set(checks)),
+        }
+        for status in STATUSES:
+            digest[status.lower()] = len(data.get(status, []) or [])
+        state = {'checks': checks,
+                 'last_full': now if full else previous.get('last_full', 0),
+                 'updated': now}
+        return Report(self, stream, ret, digest, state)
+
+
+def get_ledger(opts):
+    """
+    Return the ledger configured in opts
+    """
+    path = opts.get('audit_ledger') or os.path.join(opts.get('cachedir', '/var/cache/hubble'),
+                                                     'audit_ledger.json')
+    return Ledger(path)
+
+
+def report(ret, opts):
+    """
+    Return the :class:`Report` of a ``hubble.audit`` job return, see
+    :meth:`Ledger.report`
+    """
+    return get_ledger(opts).report(stream_id(ret), ret['return'],
+                                   full_interval=opts.get('audit_full_snapshot_interval', 86400))
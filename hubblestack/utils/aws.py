@@ -10,6 +10,7 @@ This is a base library used by a number of AWS services.
 '''
 
 # Import Python libs
+import functools
 import time
 from datetime import datetime
 import hashlib
@@ -60,11 +61,15 @@ def _sign(key, msg):
     return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
 
 
+@functools.lru_cache(maxsize=32)
 def _sig_key(key, date_stamp, regionName, serviceName):
     '''
     Get a signature key. See:
 
     http://docs.aws.amazon.com/general/latest/gr/signature-v4-examples.html#signature-v4-examples-python
+
+    The key only depends on the secret, the day, the region and the service,
+    so it is derived once and reused for every request signed that day.
     '''
     kDate = _sign(('AWS4' + key).encode('utf-8'), date_stamp)
     if regionName:
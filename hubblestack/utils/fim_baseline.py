@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent baseline of the paths watched by pulsar
+
+Pulsar only sees the changes made while it is watching; whatever changes while
+hubble is stopped, upgraded or crashed goes unnoticed. The baseline is a sqlite
+database of the inode, size, mtime, mode, owner and (when known) checksum of
+every watched path. Pulsar keeps it up to date from its events and, when it
+starts, reconciles it with the filesystem: paths are compared with cheap stat
+calls, only the files whose metadata changed are hashed again, and the
+differences are reported as changes.
+
+Change names follow the inotify events pulsar reports:
+
+- ``IN_CREATE``: the path is not in the baseline
+- ``IN_DELETE``: the path is in the baseline but is gone
+- ``IN_MODIFY``: the content changed, or may have (the type, inode, size or
+  mtime changed and there is no checksum to tell otherwise)
+- ``IN_ATTRIB``: only the mode, owner or mtime changed (changes of the
+  entries of a directory are reported for the entries only)
+"""
+
+import logging
+import os
+import sqlite3
+import stat
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+
+def stat_entry(path):
+    """
+    Return the ``(inode, size, mtime_ns, mode, uid, gid)`` of a path, None if
+    it does not exist
+    """
+    try:
+        st_ = os.lstat(path)
+    except OSError:
+        return None
+    return st_.st_ino, st_.st_size, st_.st_mtime_ns, st_.st_mode, st_.st_uid, st_.st_gid
+
+
+def compare(old, new, old_checksum=None, new_checksum=None):
+    """
+    Return the change between two stat entries, None if there is none
+    """
+    if old == new:
+        return None
+    if old is None:
+        return 'IN_CREATE'
+    if new is None:
+        return 'IN_DELETE'
+    ino, size, mtime_ns, mode, uid, gid = old
+    if stat.S_IFMT(mode) != stat.S_IFMT(new[3]):
+        return 'IN_MODIFY'
+    if stat.S_ISDIR(mode):
+        # the size and mtime of a directory change with its entries, which are
+        # reported themselves
+        if (ino, mode, uid, gid) == (new[0],) + new[3:]:
+            return None
+        return 'IN_MODIFY' if ino != new[0] else 'IN_ATTRIB'
+    content = (ino, size, mtime_ns) != new[:3]
+    if content and old_checksum and new_checksum:
+        content = old_checksum != new_checksum
+    return 'IN_MODIFY' if content else 'IN_ATTRIB'
+
+
+class Baseline(object):
+    """
+    The baseline database at ``path``
+    """
+
+    def __init__(self, path):
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.path = path
+        # pulsar sweeps can run on a different pool thread each time; they
+        # never run at once, so the connection needs no locking of its own
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS files')
+            self.conn.execute('PRAGMA user_version={0}'.format(SCHEMA_VERSION))
+        self.conn.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, '
+                          'mtime_ns INTEGER, mode INTEGER, uid INTEGER, gid INTEGER, checksum TEXT)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, path):
+        """
+        Return the ``(stat entry, checksum)`` of a path, ``(None, None)`` if it
+        is not in the baseline
+        """
+        row = self.conn.execute('SELECT inode, size, mtime_ns, mode, uid, gid, checksum FROM files WHERE path=?',
+                                (path,)).fetchone()
+        if row is None:
+            return None, None
+        return tuple(row[:6]), row[6]
+
+    def __len__(self):
+        return self.conn.execute('SELECT count(*) FROM files').fetchone()[0]
+
+    def _put(self, path, entry, checksum):
+        if entry is None:
+            self.conn.execute('DELETE FROM files WHERE path=? OR path LIKE ? ESCAPE ?',
+                              (path, _like_prefix(path), '\\'))
+        else:
+            self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                              (path,) + tuple(entry) + (checksum,))
+
+    def record(self, changes):
+        """
+        Record the current state of the paths; ``changes`` maps each path to
+        its new checksum, None if unknown. Missing paths are removed along
+        with everything under them.
+        """
+        with self.conn:
+            for path, checksum in changes.items():
+                entry = stat_entry(path)
+                if checksum is None and entry is not None:
+                    old_entry, old_checksum = self.get(path)
+                    # the content did not change, the checksum still holds
+                    if old_entry is not None and old_entry[:3] == entry[:3]:
+                        checksum = old_checksum
+                self._put(path, entry, checksum)
+
+    def reconcile(self, paths, dirs, hash_func=None):
+        """
+        Compare the baseline with the filesystem, record the current state and
+        return the changes, as a list of ``(change, path, checksum)``
+
+        paths
+            the watched paths found on the filesystem
+        dirs
+            the directories that were listed; baseline paths in one of them
+            (or listed in ``paths``) that no longer exist are deleted
+        hash_func
+            called with a file path when its content may have changed, returns
+            its checksum or None
+        """
+        ret = []
+        seen = set()
+        with self.conn:
+            for path in paths:
+                seen.add(path)
+                entry = stat_entry(path)
+                old_entry, old_checksum = self.get(path)
+                if entry == old_entry:
+                    continue
+                checksum = None
+                if hash_func is not None and entry is not None and stat.S_ISREG(entry[3]) and (
+                        old_entry is None or old_entry[:3] != entry[:3]):
+                    checksum = hash_func(path)
+                elif old_entry is not None and entry is not None and old_entry[:3] == entry[:3]:
+                    checksum = old_checksum
+                change = compare(old_entry, entry, old_checksum, checksum)
+                self._put(path, entry, checksum)
+                if change:
+                    ret.append((change, path, checksum))
+
+            dirs = set(dirs)
+            gone = [path for (path,) in self.conn.execute('SELECT path FROM files')
+                    if path not in seen and os.path.dirname(path) in dirs and not os.path.lexists(path)]
+            for path in gone:
+                self._put(path, None, None)
+                ret.append(('IN_DELETE', path, None))
+        return ret
+
+
+def _like_prefix(path):
+    """
+    Return the LIKE pattern of the paths under ``path``
+    """
+    path = path.rstrip('/')
+    return path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
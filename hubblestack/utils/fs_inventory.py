@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+Single pass filesystem inventory
+
+Several CIS controls (world writable files, unowned and ungrouped files,
+sticky bit on world writable directories, SUID/SGID binaries) need to look at
+every inode on the local filesystems. Running a ``find`` per control walks the
+disk once per check, which is why those checks used to be disabled.
+
+This module walks the local filesystems once with ``os.scandir``, evaluates
+every registered predicate against each entry and stores the matching paths in
+a compressed index under the cachedir. Audit modules query the index instead of
+walking the disk themselves.
+
+The walk is budgeted. Each call to :meth:`Inventory.update` stops after
+``fs_inventory_budget`` seconds of wall time or ``fs_inventory_cpu_budget``
+seconds of CPU time, whichever comes first, and saves the directories it still
+has to visit so the next call resumes where this one stopped. The walk runs in
+its own thread at ``fs_inventory_nice`` and, on Linux, in the idle IO class.
+
+Checks never wait for the walk: :meth:`Inventory.query` answers from the
+index as it is and starts an update in the background when one is due
+(scheduling ``fs_inventory.update`` builds it ahead of the audit runs too).
+Until a pass has covered every directory, the answer is an error rather than
+a pass or a failure based on part of the filesystem.
+
+Options (all optional)::
+
+    fs_inventory_index: <cachedir>/fs_inventory.idx
+    fs_inventory_roots: ['/']
+    fs_inventory_exclude: []          # globs of directories not descended into
+    fs_inventory_skip_fstypes: []     # added to the built-in remote/pseudo list
+    fs_inventory_budget: 60           # wall seconds per update
+    fs_inventory_cpu_budget: 30       # CPU seconds per update
+    fs_inventory_interval: 600        # minimum seconds between two updates
+    fs_inventory_max_age: 86400       # a complete pass older than this is redone
+    fs_inventory_nice: 19
+    fs_inventory_ionice: True
+"""
+
+import ctypes
+import fnmatch
+import grp
+import logging
+import os
+import platform
+import pwd
+import stat
+import threading
+import time
+import zlib
+
+import msgpack
+
+import hubblestack.utils.atomicfile
+import hubblestack.utils.identity
+from hubblestack.exceptions import CommandExecutionError
+
+log = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# filesystems that are never walked: network filesystems (the CIS "local
+# filesystems only" rule) and kernel pseudo filesystems
+SKIP_FSTYPES = frozenset((
+    "9p", "afs", "autofs", "binfmt_misc", "bpf", "ceph", "cgroup", "cgroup2",
+    "cifs", "coda", "configfs", "davfs", "debugfs", "devpts", "devtmpfs",
+    "efivarfs", "fuse.gcsfuse", "fuse.glusterfs", "fuse.rclone", "fuse.s3fs",
+    "fuse.sshfs", "fusectl", "glusterfs", "gpfs", "hugetlbfs", "lustre",
+    "mqueue", "ncpfs", "nfs", "nfs4", "nfsd", "nsfs", "proc", "pstore",
+    "rpc_pipefs", "securityfs", "selinuxfs", "smb3", "smbfs", "sshfs",
+    "sysfs", "tracefs",
+))
+
+# ioprio_set(2) syscall numbers; there is no libc wrapper for it
+_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "s390x": 282,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+PREDICATES = {}
+
+_LOCK = threading.Lock()
+# the background update started by Inventory.refresh, if any
+_UPDATER = None
+_UPDATER_LOCK = threading.Lock()
+
+
+def predicate(name):
+    """
+    Register a predicate evaluated against every entry of the walk. The
+    decorated function receives the ``os.stat_result`` of the entry (not
+    following symlinks) and an :class:`Identities` object and returns a truthy
+    value when the entry should be recorded under ``name``.
+    """
+
+    def _register(func):
+        PREDICATES[name] = func
+        return func
+
+    return _register
+
+
+@predicate("world_writable")
+def _world_writable(st, ids):
+    return stat.S_ISREG(st.st_mode) and st.st_mode & stat.S_IWOTH
+
+
+@predicate("world_writable_dir_no_sticky")
+def _world_writable_dir_no_sticky(st, ids):
+    mode = st.st_mode
+    return stat.S_ISDIR(mode) and mode & stat.S_IWOTH and not mode & stat.S_ISVTX
+
+
+@predicate("nouser")
+def _nouser(st, ids):
+    return not ids.has_uid(st.st_uid)
+
+
+@predicate("nogroup")
+def _nogroup(st, ids):
+    return not ids.has_gid(st.st_gid)
+
+
+@predicate("suid")
+def _suid(st, ids):
+    return stat.S_ISREG(st.st_mode) and st.st_mode & stat.S_ISUID
+
+
+@predicate("sgid")
+def _sgid(st, ids):
+    return stat.S_ISREG(st.st_mode) and st.st_mode & stat.S_ISGID
+
+
+class Identities(object):
+    """
+    Known uids and gids. Everything enumerable is loaded up front; ids that
+    are not (e.g. directory users that are not enumerated) are looked up once
+    and remembered.
+    """
+
+    def __init__(self):
+        self.uids = {ent.pw_uid: True for ent in pwd.getpwall()}
+        self.gids = {ent.gr_gid: True for ent in grp.getgrall()}
+
+    def has_uid(self, uid):
+        if uid not in self.uids:
+            self.uids[uid] = hubblestack.utils.identity.user_name(uid) is not None
+        return self.uids[uid]
+
+    def has_gid(self, gid):
+        if gid not in self.gids:
+            self.gids[gid] = hubblestack.utils.identity.group_name(gid) is not None
+        return self.gids[gid]
+
+
+def _unescape_mount(path):
+    """
+    /proc/mounts escapes space, tab, newline and backslash as octal
+    """
+    for esc, char in ((b"\\040", b" "), (b"\\011", b"\t"), (b"\\012", b"\n"), (b"\\134", b"\\")):
+        path = path.replace(esc, char)
+    return path
+
+
+def mount_types(mounts_file="/proc/self/mounts"):
+    """
+    Return {mountpoint: fstype} from the kernel mount table, or None if the
+    table cannot be read
+    """
+    ret = {}
+    try:
+        with open(mounts_file, "rb") as fh_:
+            for line in fh_:
+                fields = line.split()
+                if len(fields) >= 3:
+                    ret[_unescape_mount(fields[1])] = fields[2].decode("ascii", "replace")
+    except (OSError, IOError):
+        return None
+    return ret
+
+
+def _lower_priority(nice, ionice):
+    """
+    Lower the CPU and IO priority of the calling thread only
+    """
+    get_tid = getattr(threading, "get_native_id", None)
+    if get_tid is None:
+        return
+    tid = get_tid()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, max(nice, os.getpriority(os.PRIO_PROCESS, tid)))
+    except (AttributeError, OSError) as exc:
+        log.debug("unable to renice inventory thread: %s", exc)
+    syscall_nr = _IOPRIO_SET.get(platform.machine())
+    if ionice and syscall_nr and platform.system() == "Linux":
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            if libc.syscall(syscall_nr, _IOPRIO_WHO_PROCESS, tid,
+                            _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT) != 0:
+                log.debug("ioprio_set failed: %s", os.strerror(ctypes.get_errno()))
+        except (AttributeError, OSError) as exc:
+            log.debug("unable to ionice inventory thread: %s", exc)
+
+
+class Inventory(object):
+    """
+    Budgeted, resumable inventory of the local filesystems.
+
+    The on-disk index is a zlib compressed msgpack document::
+
+        {'version': 1,
+         'updated': <time of the last update>,
+         'complete': {'started': ..., 'finished': ..., 'hits': {name: [path, ...]}},
+         'current': {'started': ..., 'pending': [[dir, st_dev], ...],
+                     'hits': {name: [path, ...]}, 'dirs': N, 'entries': N}}
+
+    ``complete`` is the last finished pass and ``current`` the pass in
+    progress, if any. Paths are stored as bytes.
+    """
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.path = opts.get("fs_inventory_index") or os.path.join(opts["cachedir"], "fs_inventory.idx")
+        self.roots = [os.fsencode(root) for root in opts.get("fs_inventory_roots", ["/"])]
+        self.exclude = [os.fsencode(pat) for pat in opts.get("fs_inventory_exclude", [])]
+        self.skip_fstypes = SKIP_FSTYPES.union(opts.get("fs_inventory_skip_fstypes", []))
+        self.budget = opts.get("fs_inventory_budget", 60)
+        self.cpu_budget = opts.get("fs_inventory_cpu_budget", 30)
+        self.interval = opts.get("fs_inventory_interval", 600)
+        self.max_age = opts.get("fs_inventory_max_age", 86400)
+        self.nice = opts.get("fs_inventory_nice", 19)
+        self.ionice = opts.get("fs_inventory_ionice", True)
+
+    def load(self):
+        """
+        Read the index; a missing, unreadable or outdated index yields an empty one
+        """
+        try:
+            with open(self.path, "rb") as fh_:
+                state = msgpack.unpackb(zlib.decompress(fh_.read()), raw=False)
+            if state.get("version") == INDEX_VERSION:
+                return state
+            log.info("ignoring fs inventory index %s with version %s", self.path, state.get("version"))
+        except (OSError, IOError):
+            pass
+        except Exception as exc:  # pylint: disable=broad-except
+            log.warning("ignoring unreadable fs inventory index %s: %s", self.path, exc)
+        return {"version": INDEX_VERSION, "updated": 0, "complete": None, "current": None}
+
+    def save(self, state):
+        """
+        Atomically replace the index
+        """
+        cache_dir = os.path.dirname(self.path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        data = zlib.compress(msgpack.packb(state, use_bin_type=True))
+        with hubblestack.utils.atomicfile.atomic_open(self.path, "wb") as fh_:
+            fh_.write(data)
+
+    def update(self, force=False):
+        """
+        Advance the inventory by at most one budget and return the index.
+
+        Nothing is walked when the last update is more recent than
+        ``fs_inventory_interval`` or when the last complete pass is younger
+        than ``fs_inventory_max_age``, unless ``force`` is set.
+        """
+        with _LOCK:
+            state = self.load()
+            now = time.time()
+            current = state["current"]
+            complete = state["complete"]
+            if not force:
+                if now - state["updated"] < self.interval:
+                    return state
+                if current is None and complete and now - complete["finished"] < self.max_age:
+                    return state
+            if current is None:
+                current = state["current"] = self._new_pass(now)
+
+            walker = threading.Thread(target=self._walk, args=(current,), name="fs-inventory")
+            walker.start()
+            walker.join()
+
+            state["updated"] = time.time()
+            if not current["pending"]:
+                state["complete"] = {
+                    "started": current["started"],
+                    "finished": state["updated"],
+                    "hits": current["hits"],
+                }
+                state["current"] = None
+                log.info("fs inventory pass finished: %d directories, %d entries",
+                         current["dirs"], current["entries"])
+            else:
+                log.debug("fs inventory paused with %d directories pending", len(current["pending"]))
+            self.save(state)
+            return state
+
+    def refresh(self):
+        """
+        Start :meth:`update` in a background thread, unless one is still
+        running. Returns at once; True if an update was started.
+        """
+        global _UPDATER
+        with _UPDATER_LOCK:
+            if _UPDATER is not None and _UPDATER.is_alive():
+                return False
+            _UPDATER = threading.Thread(target=self._update_in_background, name="fs-inventory-update")
+            _UPDATER.daemon = True
+            _UPDATER.start()
+        return True
+
+    def _update_in_background(self):
+        try:
+            self.update()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("fs inventory update failed")
+
+    def _new_pass(self, now):
+        pending = []
+        for root in self.roots:
+            try:
+                pending.append([root, os.lstat(root).st_dev])
+            except OSError as exc:
+                log.warning("skipping fs inventory root %s: %s", os.fsdecode(root), exc)
+        # stack order: the first root is visited first
+        pending.reverse()
+        return {"started": now, "pending": pending, "hits": {name: [] for name in PREDICATES},
+                "dirs": 0, "entries": 0}
+
+    def _excluded(self, path):
+        return any(fnmatch.fnmatch(path, pat) for pat in self.exclude)
+
+    def _walk(self, current):
+        """
+        Visit pending directories until they run out or the budget is spent.
+        Runs in its own thread so the priority changes die with it.
+        """
+        _lower_priority(self.nice, self.ionice)
+        deadline = time.monotonic() + self.budget
+        cpu_deadline = time.thread_time() + self.cpu_budget
+        ids = Identities()
+        mounts = mount_types()
+        predicates = list(PREDICATES.items())
+        hits = {}
+        for name, paths in current["hits"].items():
+            hits[name] = set(paths)
+        for name, _ in predicates:
+            hits.setdefault(name, set())
+        pending = current["pending"]
+
+        while pending:
+            if time.monotonic() > deadline or time.thread_time() > cpu_deadline:
+                break
+            dirpath, dev = pending.pop()
+            try:
+                scan = os.scandir(dirpath)
+            except OSError as exc:
+                log.debug("fs inventory cannot list %s: %s", os.fsdecode(dirpath), exc)
+                continue
+            current["dirs"] += 1
+            with scan:
+                for entry in scan:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    current["entries"] += 1
+                    for name, func in predicates:
+                        if func(st, ids):
+                            hits[name].add(entry.path)
+                    if not stat.S_ISDIR(st.st_mode) or self._excluded(entry.path):
+                        continue
+                    if st.st_dev != dev:
+                        # a mount point: without a mount table, stay on this device
+                        if mounts is None or mounts.get(entry.path, "") in self.skip_fstypes:
+                            continue
+                    pending.append([entry.path, st.st_dev])
+
+        current["hits"] = {name: sorted(paths) for name, paths in hits.items()}
+
+    def query(self, name):
+        """
+        Return the paths recorded under the predicate ``name`` by the last
+        complete pass.
+
+        The index is read as it is; an update is started in the background
+        when one is due (see :meth:`refresh`). Recorded paths are re-checked
+        so files fixed or removed since the walk are dropped. Until a pass
+        completes, CommandExecutionError is raised: the budget cut the walk
+        short and neither an empty nor a partial answer would be reliable.
+        """
+        if name not in PREDICATES:
+            raise CommandExecutionError("unknown fs inventory predicate {0}".format(name))
+        state = self.load()
+        self.refresh()
+        if not state["complete"]:
+            current = state["current"] or {"hits": {}, "dirs": 0, "pending": []}
+            found = current["hits"].get(name, [])
+            raise CommandExecutionError(
+                "filesystem inventory is not complete yet ({0} directories scanned, {1} pending, "
+                "{2} matching paths found so far)".format(current["dirs"], len(current["pending"]), len(found)))
+        paths = state["complete"]["hits"].get(name, [])
+        func = PREDICATES[name]
+        ids = Identities()
+        ret = []
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if func(st, ids):
+                ret.append(os.fsdecode(path))
+        return ret
+
+
+def query(opts, name):
+    """
+    Shorthand for ``Inventory(opts).query(name)``
+    """
+    return Inventory(opts).query(name)
+
+
+def check(opts, name):
+    """
+    Answer a filesystem-wide audit check from the inventory instead of walking
+    the disk: True if no path matches the predicate ``name``, else the
+    offending paths as a failure reason
+    """
+    paths = query(opts, name)
+    return True if not paths else format_hits(paths)
+
+
+def format_hits(paths, limit=100):
+    """
+    Render a list of offending paths as a failure reason, truncated to
+    ``limit`` entries
+    """
+    if len(paths) <= limit:
+        return str(paths)
+    return "{0} ... and {1} more".format(paths[:limit], len(paths) - limit)
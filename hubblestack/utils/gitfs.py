@@ -4,19 +4,21 @@ Classes which provide the shared base for GitFS, git_pillar, and winrepo
 '''
 
 # Import python libs
+import concurrent.futures
 import copy
 import contextlib
 import errno
 import fnmatch
 import glob
 import hashlib
-import io
 import logging
 import os
+import posixpath
 import shlex
 import shutil
 import stat
 import subprocess
+import threading
 import time
 import tornado.ioloop
 import weakref
@@ -56,6 +58,12 @@ GLOBAL_ONLY = ()
 
 SYMLINK_RECURSE_DEPTH = 100
 
+# Remotes fetched at once, unless <role>_fetch_workers is set
+FETCH_WORKERS = 4
+# Tree indexes kept per remote; one per env is enough, as long as the refs of
+# the envs do not all move at once
+TREE_INDEX_CACHE_SIZE = 32
+
 # Auth support (auth params can be global or per-remote, too)
 AUTH_PROVIDERS = ('pygit2',)
 AUTH_PARAMS = ('user', 'password', 'pubkey', 'privkey', 'passphrase',
@@ -207,6 +215,98 @@ def failhard(role):
     raise FileserverConfigError('Failed to load {0}'.format(role))
 
 
+class TreeIndex(object):
+    '''
+    The files, symlinks and directories of a git tree, resolved once so that
+    finding and listing files does not walk the tree again. A tree never
+    changes; a new commit on a ref gets a new index.
+
+    files
+        maps the path of each file (relative to the top of the repo) to its
+        ``(blob id, mode, size)``
+    links
+        maps the path of each symlink to its target
+    dirs
+        the paths of the directories
+    '''
+    def __init__(self, tree_id, entries):
+        '''
+        entries is an iterable of ``(path, mode, blob id, size, link target)``,
+        where the blob id, size and link target are None for directories
+        '''
+        self.tree_id = tree_id
+        self.files = {}
+        self.links = {}
+        self.dirs = set()
+        for path, mode, oid, size, link_tgt in entries:
+            if stat.S_ISDIR(mode):
+                self.dirs.add(path)
+                continue
+            self.files[path] = (oid, mode, size)
+            if link_tgt is not None:
+                self.links[path] = link_tgt
+        self._lists = {}
+        self._lock = threading.Lock()
+
+    def find(self, path):
+        '''
+        Return the ``(path, blob id, mode, size)`` of a file, following
+        symlinks, or None if there is no such file
+        '''
+        for _ in range(SYMLINK_RECURSE_DEPTH):
+            entry = self.files.get(path)
+            if entry is None:
+                return None
+            if path not in self.links:
+                return (path,) + entry
+            path = posixpath.normpath(
+                posixpath.join(posixpath.dirname(path), self.links[path]))
+        return None
+
+    def lists(self, root, mountpoint):
+        '''
+        Return the files, symlinks and directories under root, as seen from
+        the mountpoint. The lists are computed once per root and mountpoint;
+        callers get copies.
+        '''
+        key = (root, mountpoint)
+        with self._lock:
+            if key not in self._lists:
+                self._lists[key] = self._make_lists(root, mountpoint)
+            files, symlinks, dirs = self._lists[key]
+        return set(files), dict(symlinks), set(dirs)
+
+    def _make_lists(self, root, mountpoint):
+        files = set()
+        symlinks = {}
+        dirs = set()
+        root = root.strip('/')
+        if root:
+            if root not in self.dirs:
+                return files, symlinks, dirs
+            prefix = root + '/'
+            relpath = lambda path: path[len(prefix):] \
+                if path.startswith(prefix) else None
+        else:
+            relpath = lambda path: path
+        add_mountpoint = lambda path: hubblestack.utils.path.join(
+            mountpoint, path, use_posixpath=True)
+        for path in self.files:
+            rel = relpath(path)
+            if rel is None:
+                continue
+            files.add(add_mountpoint(rel))
+            if path in self.links:
+                symlinks[add_mountpoint(rel)] = self.links[path]
+        for path in self.dirs:
+            rel = relpath(path)
+            if rel:
+                dirs.add(add_mountpoint(rel))
+        if mountpoint:
+            dirs.add(mountpoint)
+        return files, symlinks, dirs
+
+
 class GitProvider(object):
     '''
     Base class for gitfs/git_pillar provider classes. Should never be used
@@ -219,6 +319,14 @@ class GitProvider(object):
                  override_params, cache_root, role='gitfs'):
         self.opts = opts
         self.role = role
+        # Serializes fetches of this remote within the process; the update
+        # lock file does the same across processes
+        self.fetch_lock = threading.Lock()
+        # Serializes reads of the repo object, which is not thread-safe
+        # (GitPython keeps a persistent git cat-file process per repo)
+        self.repo_lock = threading.RLock()
+        self._tree_indexes = OrderedDict()
+        self._tree_index_lock = threading.Lock()
         self.global_saltenv = hubblestack.utils.data.repack_dictlist(
             self.opts.get('{0}_saltenv'.format(self.role), []),
             strict=True,
@@ -753,7 +861,7 @@ class GitProvider(object):
         sub-class.
         '''
         try:
-            with self.gen_lock(lock_type='update'):
+            with self.fetch_lock, self.gen_lock(lock_type='update'):
                 log.debug('Fetching %s remote \'%s\'', self.role, self.id)
                 # Run provider-specific fetch code
                 return self._fetch()
@@ -941,9 +1049,13 @@ class GitProvider(object):
 
     def dir_list(self, tgt_env):
         '''
-        This function must be overridden in a sub-class
+        Get a list of directories for the target environment
         '''
-        raise NotImplementedError()
+        with self.repo_lock:
+            index = self.get_tree_index(tgt_env)
+        if index is None:
+            return set()
+        return index.lists(self.root(tgt_env), self.mountpoint(tgt_env))[2]
 
     def env_is_exposed(self, tgt_env):
         '''
@@ -971,13 +1083,37 @@ class GitProvider(object):
 
     def file_list(self, tgt_env):
         '''
-        This function must be overridden in a sub-class
+        Get file list for the target environment
         '''
-        raise NotImplementedError()
+        with self.repo_lock:
+            index = self.get_tree_index(tgt_env)
+        if index is None:
+            # Not found, return empty objects
+            return set(), {}
+        files, symlinks, _ = index.lists(self.root(tgt_env), self.mountpoint(tgt_env))
+        return files, symlinks
 
     def find_file(self, path, tgt_env):
         '''
-        This function must be overridden in a sub-class
+        Find the specified file in the specified environment. Returns the
+        blob, its hex SHA and its mode, or a tuple of Nones if the file is not
+        found.
+        '''
+        with self.repo_lock:
+            index = self.get_tree_index(tgt_env)
+            if index is None:
+                # Branch/tag/SHA not found in repo
+                return None, None, None
+            found = index.find(path)
+            if found is None:
+                return None, None, None
+            path, oid, mode, _ = found
+            return self.get_blob(oid, mode, path), oid, mode
+
+    def get_blob(self, oid, mode, path):
+        '''
+        Return the blob with the given hex SHA. This function must be
+        overridden in a sub-class.
         '''
         raise NotImplementedError()
 
@@ -1027,6 +1163,49 @@ class GitProvider(object):
         # No matches found
         return None
 
+    def get_tree_index(self, tgt_env):
+        '''
+        Return the TreeIndex of the tree for the specified environment, None
+        if there is no such tree. Indexes are built on first use and kept
+        until TREE_INDEX_CACHE_SIZE newer ones push them out.
+        '''
+        tree = self.get_tree(tgt_env)
+        if not tree:
+            return None
+        tree_id = self.tree_id(tree)
+        with self._tree_index_lock:
+            index = self._tree_indexes.get(tree_id)
+            if index is not None:
+                self._tree_indexes.move_to_end(tree_id)
+                return index
+        start = time.time()
+        index = TreeIndex(tree_id, self.walk_tree(tree))
+        log.debug(
+            'Indexed tree %s of %s remote \'%s\' (%d files) in %.3fs',
+            tree_id[:7], self.role, self.id, len(index.files),
+            time.time() - start
+        )
+        with self._tree_index_lock:
+            self._tree_indexes[tree_id] = index
+            while len(self._tree_indexes) > TREE_INDEX_CACHE_SIZE:
+                self._tree_indexes.popitem(last=False)
+        return index
+
+    def tree_id(self, tree):
+        '''
+        Return the hex SHA of a tree object. This function must be overridden
+        in a sub-class.
+        '''
+        raise NotImplementedError()
+
+    def walk_tree(self, tree):
+        '''
+        Yield the ``(path, mode, blob id, size, link target)`` of everything
+        in a tree object, skipping submodules. This function must be
+        overridden in a sub-class.
+        '''
+        raise NotImplementedError()
+
     def get_url(self):
         '''
         Examine self.id and assign self.url (and self.branch, for git_pillar)
@@ -1202,31 +1381,6 @@ class GitPython(GitProvider):
 
         return new
 
-    def dir_list(self, tgt_env):
-        '''
-        Get list of directories for the target environment using GitPython
-        '''
-        ret = set()
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            return ret
-        if self.root(tgt_env):
-            try:
-                tree = tree / self.root(tgt_env)
-            except KeyError:
-                return ret
-            relpath = lambda path: os.path.relpath(path, self.root(tgt_env))
-        else:
-            relpath = lambda path: path
-        add_mountpoint = lambda path: hubblestack.utils.path.join(
-            self.mountpoint(tgt_env), path, use_posixpath=True)
-        for blob in tree.traverse():
-            if isinstance(blob, git.Tree):
-                ret.add(add_mountpoint(relpath(blob.path)))
-        if self.mountpoint(tgt_env):
-            ret.add(self.mountpoint(tgt_env))
-        return ret
-
     def envs(self):
         '''
         Check the refs and return a list of the ones which can be used as salt
@@ -1273,82 +1427,32 @@ class GitPython(GitProvider):
         cleaned = self.clean_stale_refs()
         return True if (new_objs or cleaned) else None
 
-    def file_list(self, tgt_env):
+    def get_blob(self, oid, mode, path):
         '''
-        Get file list for the target environment using GitPython
+        Return a git.Blob object from its hex SHA
         '''
-        files = set()
-        symlinks = {}
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            # Not found, return empty objects
-            return files, symlinks
-        if self.root(tgt_env):
-            try:
-                tree = tree / self.root(tgt_env)
-            except KeyError:
-                return files, symlinks
-            relpath = lambda path: os.path.relpath(path, self.root(tgt_env))
-        else:
-            relpath = lambda path: path
-        add_mountpoint = lambda path: hubblestack.utils.path.join(
-            self.mountpoint(tgt_env), path, use_posixpath=True)
-        for file_blob in tree.traverse():
-            if not isinstance(file_blob, git.Blob):
-                continue
-            file_path = add_mountpoint(relpath(file_blob.path))
-            files.add(file_path)
-            if stat.S_ISLNK(file_blob.mode):
-                stream = io.StringIO()
-                file_blob.stream_data(stream)
-                stream.seek(0)
-                link_tgt = stream.read()
-                stream.close()
-                symlinks[file_path] = link_tgt
-        return files, symlinks
+        return git.Blob(self.repo, bytes.fromhex(oid), mode, path)
 
-    def find_file(self, path, tgt_env):
+    def tree_id(self, tree):
         '''
-        Find the specified file in the specified environment
+        Return the hex SHA of a git.Tree object
         '''
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            # Branch/tag/SHA not found in repo
-            return None, None, None
-        blob = None
-        depth = 0
-        while True:
-            depth += 1
-            if depth > SYMLINK_RECURSE_DEPTH:
-                blob = None
-                break
-            try:
-                file_blob = tree / path
-                if stat.S_ISLNK(file_blob.mode):
-                    # Path is a symlink. The blob data corresponding to
-                    # this path's object ID will be the target of the
-                    # symlink. Follow the symlink and set path to the
-                    # location indicated in the blob data.
-                    stream = io.StringIO()
-                    file_blob.stream_data(stream)
-                    stream.seek(0)
-                    link_tgt = stream.read()
-                    stream.close()
-                    path = hubblestack.utils.path.join(
-                        os.path.dirname(path), link_tgt, use_posixpath=True)
-                else:
-                    blob = file_blob
-                    if isinstance(blob, git.Tree):
-                        # Path is a directory, not a file.
-                        blob = None
-                    break
-            except KeyError:
-                # File not found or repo_path points to a directory
-                blob = None
-                break
-        if isinstance(blob, git.Blob):
-            return blob, blob.hexsha, blob.mode
-        return None, None, None
+        return tree.hexsha
+
+    def walk_tree(self, tree):
+        '''
+        Yield the ``(path, mode, blob id, size, link target)`` of everything
+        in a git.Tree object
+        '''
+        for obj in tree.traverse():
+            if isinstance(obj, git.Tree):
+                yield obj.path, obj.mode, None, None, None
+            elif isinstance(obj, git.Blob):
+                link_tgt = None
+                if stat.S_ISLNK(obj.mode):
+                    link_tgt = hubblestack.utils.stringutils.to_unicode(
+                        obj.data_stream.read())
+                yield obj.path, obj.mode, obj.hexsha, obj.size, link_tgt
 
     def get_tree_from_branch(self, ref):
         '''
@@ -1651,57 +1755,6 @@ class Pygit2(GitProvider):
 
         return new
 
-    def dir_list(self, tgt_env):
-        '''
-        Get a list of directories for the target environment using pygit2
-        '''
-        def _traverse(tree, blobs, prefix):
-            '''
-            Traverse through a pygit2 Tree object recursively, accumulating all
-            the empty directories within it in the "blobs" list
-            '''
-            for entry in iter(tree):
-                if entry.oid not in self.repo:
-                    # Entry is a submodule, skip it
-                    continue
-                blob = self.repo[entry.oid]
-                if not isinstance(blob, pygit2.Tree):
-                    continue
-                blobs.append(
-                    hubblestack.utils.path.join(prefix, entry.name, use_posixpath=True)
-                )
-                if len(blob):
-                    _traverse(
-                        blob, blobs, hubblestack.utils.path.join(
-                            prefix, entry.name, use_posixpath=True)
-                    )
-
-        ret = set()
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            return ret
-        if self.root(tgt_env):
-            try:
-                oid = tree[self.root(tgt_env)].oid
-                tree = self.repo[oid]
-            except KeyError:
-                return ret
-            if not isinstance(tree, pygit2.Tree):
-                return ret
-            relpath = lambda path: os.path.relpath(path, self.root(tgt_env))
-        else:
-            relpath = lambda path: path
-        blobs = []
-        if len(tree):
-            _traverse(tree, blobs, self.root(tgt_env))
-        add_mountpoint = lambda path: hubblestack.utils.path.join(
-            self.mountpoint(tgt_env), path, use_posixpath=True)
-        for blob in blobs:
-            ret.add(add_mountpoint(relpath(blob)))
-        if self.mountpoint(tgt_env):
-            ret.add(self.mountpoint(tgt_env))
-        return ret
-
     def envs(self):
         '''
         Check the refs and return a list of the ones which can be used as salt
@@ -1775,102 +1828,46 @@ class Pygit2(GitProvider):
             if (received_objects or refs_pre != refs_post or cleaned) \
             else None
 
-    def file_list(self, tgt_env):
+    def get_blob(self, oid, mode, path):
         '''
-        Get file list for the target environment using pygit2
+        Return a pygit2.Blob object from its hex SHA
         '''
-        def _traverse(tree, blobs, prefix):
-            '''
-            Traverse through a pygit2 Tree object recursively, accumulating all
-            the file paths and symlink info in the "blobs" dict
-            '''
-            for entry in iter(tree):
-                if entry.oid not in self.repo:
-                    # Entry is a submodule, skip it
-                    continue
-                obj = self.repo[entry.oid]
-                if isinstance(obj, pygit2.Blob):
-                    repo_path = hubblestack.utils.path.join(
-                        prefix, entry.name, use_posixpath=True)
-                    blobs.setdefault('files', []).append(repo_path)
-                    if stat.S_ISLNK(tree[entry.name].filemode):
-                        link_tgt = self.repo[tree[entry.name].oid].data
-                        blobs.setdefault('symlinks', {})[repo_path] = link_tgt
-                elif isinstance(obj, pygit2.Tree):
-                    _traverse(
-                        obj, blobs, hubblestack.utils.path.join(
-                            prefix, entry.name, use_posixpath=True)
-                    )
+        return self.repo[oid]
 
-        files = set()
-        symlinks = {}
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            # Not found, return empty objects
-            return files, symlinks
-        if self.root(tgt_env):
-            try:
-                # This might need to be changed to account for a root that
-                # spans more than one directory
-                oid = tree[self.root(tgt_env)].oid
-                tree = self.repo[oid]
-            except KeyError:
-                return files, symlinks
-            if not isinstance(tree, pygit2.Tree):
-                return files, symlinks
-            relpath = lambda path: os.path.relpath(path, self.root(tgt_env))
-        else:
-            relpath = lambda path: path
-        blobs = {}
-        if len(tree):
-            _traverse(tree, blobs, self.root(tgt_env))
-        add_mountpoint = lambda path: hubblestack.utils.path.join(
-            self.mountpoint(tgt_env), path, use_posixpath=True)
-        for repo_path in blobs.get('files', []):
-            files.add(add_mountpoint(relpath(repo_path)))
-        for repo_path, link_tgt in blobs.get('symlinks', {}).items():
-            symlinks[add_mountpoint(relpath(repo_path))] = link_tgt
-        return files, symlinks
+    def tree_id(self, tree):
+        '''
+        Return the hex SHA of a pygit2.Tree object
+        '''
+        return str(tree.id)
 
-    def find_file(self, path, tgt_env):
+    def walk_tree(self, tree):
         '''
-        Find the specified file in the specified environment
+        Yield the ``(path, mode, blob id, size, link target)`` of everything
+        in a pygit2.Tree object
         '''
-        tree = self.get_tree(tgt_env)
-        if not tree:
-            # Branch/tag/SHA not found in repo
-            return None, None, None
-        blob = None
-        mode = None
-        depth = 0
-        while True:
-            depth += 1
-            if depth > SYMLINK_RECURSE_DEPTH:
-                blob = None
-                break
-            try:
-                entry = tree[path]
-                mode = entry.filemode
-                if stat.S_ISLNK(mode):
-                    # Path is a symlink. The blob data corresponding to this
-                    # path's object ID will be the target of the symlink. Follow
-                    # the symlink and set path to the location indicated
-                    # in the blob data.
-                    link_tgt = self.repo[entry.oid].data
-                    path = hubblestack.utils.path.join(
-                        os.path.dirname(path), link_tgt, use_posixpath=True)
-                else:
-                    blob = self.repo[entry.oid]
-                    if isinstance(blob, pygit2.Tree):
-                        # Path is a directory, not a file.
-                        blob = None
-                    break
-            except KeyError:
-                blob = None
-                break
-        if isinstance(blob, pygit2.Blob):
-            return blob, blob.hex, mode
-        return None, None, None
+        try:
+            read_header = self.repo.odb.read_header
+        except AttributeError:
+            # older pygit2 releases have no Odb.read_header
+            read_header = lambda oid: (None, self.repo[oid].size)
+        pending = [('', tree)]
+        while pending:
+            prefix, tree = pending.pop()
+            for entry in tree:
+                if entry.id not in self.repo:
+                    # Entry is a submodule, skip it
+                    continue
+                path = prefix + entry.name
+                if stat.S_ISDIR(entry.filemode):
+                    yield path, int(entry.filemode), None, None, None
+                    pending.append((path + '/', self.repo[entry.id]))
+                    continue
+                link_tgt = None
+                if stat.S_ISLNK(entry.filemode):
+                    link_tgt = hubblestack.utils.stringutils.to_unicode(
+                        self.repo[entry.id].data)
+                yield (path, int(entry.filemode), str(entry.id),
+                       read_header(entry.id)[1], link_tgt)
 
     def get_tree_from_branch(self, ref):
         '''
@@ -2119,6 +2116,8 @@ class GitBase(object):
                                                    self.role)
             self.remote_root = hubblestack.utils.path.join(self.cache_root, 'remotes')
         self.env_cache = hubblestack.utils.path.join(self.cache_root, 'envs.p')
+        # (stat signature, envs) of the last env cache file read
+        self._env_cache_memo = None
         self.hash_cachedir = hubblestack.utils.path.join(self.cache_root, 'hash')
         self.file_list_cachedir = hubblestack.utils.path.join(
             self.opts['cachedir'], 'file_lists', self.role)
@@ -2336,6 +2335,8 @@ class GitBase(object):
         '''
         Fetch all remotes and return a boolean to let the calling function know
         whether or not any remotes were updated in the process of fetching
+
+        Up to <role>_fetch_workers remotes are fetched at once.
         '''
         if remotes is None:
             remotes = []
@@ -2346,26 +2347,35 @@ class GitBase(object):
             )
             remotes = []
 
-        changed = False
-        for repo in self.remotes:
-            name = getattr(repo, 'name', None)
-            if not remotes or (repo.id, name) in remotes:
-                try:
-                    if repo.fetch():
-                        # We can't just use the return value from repo.fetch()
-                        # because the data could still have changed if old
-                        # remotes were cleared above. Additionally, we're
-                        # running this in a loop and later remotes without
-                        # changes would override this value and make it
-                        # incorrect.
-                        changed = True
-                except Exception as exc:
-                    log.error(
-                        'Exception caught while fetching %s remote \'%s\': %s',
-                        self.role, repo.id, exc,
-                        exc_info=True
-                    )
-        return changed
+        selected = [repo for repo in self.remotes
+                    if not remotes or (repo.id, getattr(repo, 'name', None)) in remotes]
+        if not selected:
+            return False
+        workers = max(1, min(len(selected), int(self.opts.get(
+            '{0}_fetch_workers'.format(self.role), FETCH_WORKERS))))
+        if workers == 1:
+            results = [self._fetch_remote(repo) for repo in selected]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='{0}-fetch'.format(self.role)) as pool:
+                results = list(pool.map(self._fetch_remote, selected))
+        # Changes in any one remote are changes to the fileserver
+        return any(results)
+
+    def _fetch_remote(self, repo):
+        '''
+        Fetch one remote, return True if it was updated
+        '''
+        try:
+            return bool(repo.fetch())
+        except Exception as exc:
+            log.error(
+                'Exception caught while fetching %s remote \'%s\': %s',
+                self.role, repo.id, exc,
+                exc_info=True
+            )
+            return False
 
     def lock(self, remote=None):
         '''
@@ -2711,11 +2721,22 @@ class GitFS(GitBase):
         Return a list of refs that can be used as environments
         '''
         if not ignore_cache:
+            # The env cache file is only read again when it was rewritten
+            try:
+                st_ = os.stat(self.env_cache)
+                signature = (st_.st_ino, st_.st_size, st_.st_mtime_ns)
+            except OSError:
+                signature = None
+            memo = self._env_cache_memo
+            if signature is not None and memo is not None and memo[0] == signature:
+                return list(memo[1])
             cache_match = hubblestack.fileserver.check_env_cache(
                 self.opts,
                 self.env_cache
             )
             if cache_match is not None:
+                if signature is not None:
+                    self._env_cache_memo = (signature, list(cache_match))
                 return cache_match
         ret = set()
         for repo in self.remotes:
@@ -2748,20 +2769,14 @@ class GitFS(GitBase):
                                      '{0}.lk'.format(path))
         destdir = os.path.dirname(dest)
         hashdir = os.path.dirname(blobshadest)
-        if not os.path.isdir(destdir):
+        # several cache_dir workers can get here at once
+        for dirname in (destdir, hashdir):
             try:
-                os.makedirs(destdir)
-            except OSError:
-                # Path exists and is a file, remove it and retry
-                os.remove(destdir)
-                os.makedirs(destdir)
-        if not os.path.isdir(hashdir):
-            try:
-                os.makedirs(hashdir)
-            except OSError:
+                os.makedirs(dirname, exist_ok=True)
+            except FileExistsError:
                 # Path exists and is a file, remove it and retry
-                os.remove(hashdir)
-                os.makedirs(hashdir)
+                os.remove(dirname)
+                os.makedirs(dirname, exist_ok=True)
 
         for repo in self.remotes:
             if repo.mountpoint(tgt_env) \
@@ -2810,7 +2825,8 @@ class GitFS(GitBase):
                 except Exception:
                     pass
             # Write contents of file to their destination in the FS cache
-            repo.write_file(blob, dest)
+            with repo.repo_lock:
+                repo.write_file(blob, dest)
             with hubblestack.utils.files.fopen(blobshadest, 'w+') as fp_:
                 fp_.write(blob_hexsha)
             try:
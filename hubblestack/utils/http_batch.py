@@ -0,0 +1,274 @@
+# -*- encoding: utf-8 -*-
+"""
+Batched, pooled HTTP transport for the sumo, logstash and graylog returners
+
+Those returners used to call ``requests.post`` once per event: a new
+connection (and TLS handshake) per event, no compression, and nothing kept
+when the endpoint was down. A :class:`Transport` instead
+
+- keeps one ``requests.Session`` per endpoint for the life of the process,
+  so connections are reused between events and between returner calls
+- collects events and posts them together, up to ``batch_max_events``
+  events, ``batch_max_bytes`` bytes or ``batch_max_wait`` seconds
+- gzips the request bodies (``compress``)
+- retries connection errors and 429/5xx answers with exponential backoff
+  (``retries``, ``retry_backoff``)
+- spools batches it could not deliver to a disk queue (``disk_queue``, as for
+  the Splunk HEC returners) and replays them after the next successful post
+
+Bodies are built according to the endpoint:
+
+ndjson
+    One JSON document per line (Sumo Logic HTTP sources)
+json_array
+    A JSON array of documents; the Logstash http input json codec turns each
+    element into an event
+gelf
+    GELF HTTP messages. Graylog only accepts one message per request unless
+    bulk receiving is enabled on the input, so batching (newline delimited
+    messages) is off unless ``gelf_bulk`` is set
+
+The options can be set on each returner config entry:
+
+.. code-block:: yaml
+
+    hubblestack:
+      returner:
+        sumo:
+          - sumo_nova_return: https://yoursumo.sumologic.com/endpointhere
+            batch_max_events: 500
+            batch_max_bytes: 1000000
+            batch_max_wait: 5
+            compress: True
+            retries: 2
+            disk_queue: /var/cache/hubble/http_queue
+
+``disk_queue``, ``disk_queue_size``, ``disk_queue_compression`` and
+``disk_queue_codec`` (see :mod:`hubblestack.hec.dq`) default to
+the top level config values, like they do for the Splunk returners.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import hubblestack.utils.json
+from hubblestack.hec.dq import DiskQueue, NoQueue, QueueCapacityError
+from hubblestack.utils.encoding import encode_something_to_bytes
+from hubblestack.version import __version__
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "json_array", "gelf")
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+DEFAULTS = {
+    "batch_max_events": 500,
+    "batch_max_bytes": 1000000,
+    "batch_max_wait": 5,
+    "compress": True,
+    "retries": 2,
+    "retry_backoff": 0.5,
+    "outage_recheck_time": 60,
+    "gelf_bulk": False,
+    "disk_queue": False,
+    "disk_queue_size": 100 * (1024 ** 2),
+    "disk_queue_compression": 5,
+    "disk_queue_codec": None,
+}
+
+_TRANSPORTS = {}
+_LOCK = threading.Lock()
+
+
+def transport_opts(opt, config_get=None):
+    """
+    Pick the transport options out of a returner config entry. The disk_queue
+    options fall back to the top level config when ``config_get`` (i.e.
+    ``__mods__['config.get']``) is given; everything else to :data:`DEFAULTS`.
+    """
+    ret = {}
+    for key, default in DEFAULTS.items():
+        if config_get is not None and key.startswith("disk_queue"):
+            default = config_get(key, default)
+        ret[key] = opt.get(key, default)
+    return ret
+
+
+class Transport(object):
+    """
+    Batching HTTP client for one endpoint. Use :func:`get_transport` to share
+    one instance between returner calls; instances are thread safe.
+    """
+
+    def __init__(self, url, fmt="ndjson", auth=None, proxy=None, timeout=9.05, **kwargs):
+        if fmt not in FORMATS:
+            raise ValueError("unknown batch format {0}".format(fmt))
+        opts = dict(DEFAULTS)
+        opts.update(kwargs)
+        self.url = url
+        self.fmt = fmt
+        self.timeout = timeout
+        self.compress = opts["compress"]
+        self.max_bytes = opts["batch_max_bytes"]
+        self.max_events = opts["batch_max_events"]
+        self.max_wait = opts["batch_max_wait"]
+        self.outage_recheck_time = opts["outage_recheck_time"]
+        if fmt == "gelf" and not opts["gelf_bulk"]:
+            self.max_events = 1
+
+        self.session = requests.Session()
+        retry = Retry(
+            total=opts["retries"],
+            backoff_factor=opts["retry_backoff"],
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=None,  # POST is not retried by default
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": "hubble/{0}".format(__version__),
+            "Content-Type": "application/json",
+        })
+        if self.compress:
+            self.session.headers["Content-Encoding"] = "gzip"
+        if auth:
+            self.session.auth = auth
+        if proxy:
+            # the returner configs give proxies in the requests format
+            self.session.proxies.update(proxy)
+
+        if opts["disk_queue"]:
+            try:
+                md5 = hashlib.md5(usedforsecurity=False)
+            except TypeError:
+                md5 = hashlib.md5()
+            md5.update(encode_something_to_bytes(url))
+            directory = os.path.join(opts["disk_queue"], md5.hexdigest())
+            log.debug("disk_queue for %s: %s", url, directory)
+            self.queue = DiskQueue(directory, size=opts["disk_queue_size"],
+                                   compression=opts["disk_queue_compression"],
+                                   codec=opts["disk_queue_codec"])
+        else:
+            self.queue = NoQueue()
+
+        self.outage = None
+        self._events = []
+        self._bytes = 0
+        self._first = None
+        self._lock = threading.RLock()
+
+    def add(self, event):
+        """
+        Add an event (a dict, or an already serialized JSON string) to the
+        batch; posts the batch when it reaches one of its limits
+        """
+        if not isinstance(event, str):
+            event = hubblestack.utils.json.encode(event)
+        with self._lock:
+            if self._events and self._bytes + len(event) + 1 > self.max_bytes:
+                self._flush()
+            self._events.append(event)
+            self._bytes += len(event) + 1
+            if self._first is None:
+                self._first = time.time()
+            if len(self._events) >= self.max_events or time.time() - self._first >= self.max_wait:
+                self._flush()
+
+    def flush(self):
+        """
+        Post whatever is batched. Returns False if the batch could not be
+        delivered (it is spooled to the disk queue, if there is one).
+        """
+        with self._lock:
+            return self._flush()
+
+    def _body(self, events):
+        if self.fmt == "json_array":
+            return "[" + ",".join(events) + "]"
+        return "\n".join(events)
+
+    def _flush(self):
+        if not self._events:
+            return True
+        body = self._body(self._events)
+        self._events = []
+        self._bytes = 0
+        self._first = None
+
+        if self.outage is not None and time.time() - self.outage < self.outage_recheck_time:
+            log.debug("%s is flagged as down, spooling without trying", self.url)
+            self._spool(body)
+            return False
+        if not self._post(body):
+            self.outage = time.time()
+            self._spool(body)
+            return False
+        self.outage = None
+        self._replay()
+        return True
+
+    def _post(self, body):
+        """
+        Send one body; True if it was handled (accepted, or refused for good),
+        False if it is worth sending again later
+        """
+        data = body.encode("utf-8")
+        if self.compress:
+            data = gzip.compress(data)
+        try:
+            res = self.session.post(self.url, data=data, timeout=self.timeout)
+        except requests.RequestException as exc:
+            log.error("posting %d octets to %s failed: %s", len(data), self.url, exc)
+            return False
+        if res.status_code < 400:
+            return True
+        if res.status_code in RETRY_STATUS or res.status_code in (401, 403, 408):
+            log.error("%s refused the batch for now (%d %s)", self.url, res.status_code, res.reason)
+            return False
+        log.error("%s rejected the batch, dropping it (%d %s)", self.url, res.status_code, res.reason)
+        return True
+
+    def _spool(self, body):
+        if not self.queue:
+            log.error("dropping %d octets for %s, no disk_queue configured", len(body), self.url)
+            return
+        try:
+            self.queue.put(body)
+        except QueueCapacityError:
+            log.error("disk queue is full, dropping %d octets for %s", len(body), self.url)
+
+    def _replay(self):
+        while self.queue.cn > 0:
+            item = self.queue.peek()
+            if item is None:
+                break
+            if not self._post(item[0]):
+                self.outage = time.time()
+                break
+            self.queue.pop()
+
+
+def get_transport(url, opts, fmt="ndjson", auth=None):
+    """
+    Return the shared :class:`Transport` for an endpoint, creating it on first
+    use. ``opts`` is a processed returner config entry: ``proxy``, ``timeout``
+    and ``transport`` (from :func:`transport_opts`).
+    """
+    kwargs = opts.get("transport") or {}
+    proxy = opts.get("proxy") or None
+    timeout = opts.get("timeout", 9.05)
+    key = (url, fmt, auth, hubblestack.utils.json.encode([proxy, timeout, kwargs], sort_keys=True))
+    with _LOCK:
+        if key not in _TRANSPORTS:
+            _TRANSPORTS[key] = Transport(url, fmt=fmt, auth=auth, proxy=proxy, timeout=timeout, **kwargs)
+        return _TRANSPORTS[key]
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide cache of user and group lookups
+
+File metadata (``file.stats`` for pulsar, the audit, nova and FDG stat checks)
+turns the uid and gid of every file into names. On hosts where accounts come
+from NSS services (sssd, LDAP) each ``pwd``/``grp`` lookup can be a round trip
+to a daemon or a directory server, so the answers, including "no such user",
+are remembered here:
+
+- by id and by name, for users and for groups
+- for ``TTL`` seconds, ``NEGATIVE_TTL`` seconds for ids and names that don't
+  exist
+- until ``/etc/passwd`` (users) or ``/etc/group`` (groups) changes; the files
+  are checked at most every ``CHECK_INTERVAL`` seconds
+
+Hits and misses are counted in the ``hit`` and ``miss`` HubbleStatus
+counters, updated every ``CHECK_INTERVAL`` seconds rather than on every lookup
+(marking a counter costs more than a cache hit).
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import grp
+    import pwd
+except ImportError:
+    grp = pwd = None
+
+from hubblestack.status import HubbleStatus
+
+log = logging.getLogger(__name__)
+hubble_status = HubbleStatus(__name__, 'hit', 'miss')
+
+TTL = 600
+NEGATIVE_TTL = 60
+CHECK_INTERVAL = 1
+SOURCES = {'passwd': '/etc/passwd', 'group': '/etc/group'}
+# the lookups answered by each source
+_LOOKUPS = {'passwd': ('uid', 'user'), 'group': ('gid', 'group')}
+
+
+class IdentityCache(object):
+    """
+    Cached ``pwd`` and ``grp`` lookups; the module functions use a shared
+    instance
+    """
+
+    def __init__(self, ttl=TTL, negative_ttl=NEGATIVE_TTL, check_interval=CHECK_INTERVAL, sources=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.check_interval = check_interval
+        self.sources = SOURCES if sources is None else sources
+        # lookup: {key: (value, expires)}
+        self._entries = {'uid': {}, 'user': {}, 'gid': {}, 'group': {}}
+        self._signatures = {}
+        self._checked = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self._reported = (0, 0)
+
+    def clear(self):
+        for entries in self._entries.values():
+            entries.clear()
+
+    def _signature(self, source):
+        try:
+            st_ = os.stat(self.sources[source])
+        except OSError:
+            return None
+        return st_.st_ino, st_.st_size, st_.st_mtime_ns
+
+    def check(self, now=None):
+        """
+        Forget the entries of the account databases that changed, and report
+        the hit and miss counts
+        """
+        with self._lock:
+            self._checked = time.time() if now is None else now
+            for source, lookups in _LOOKUPS.items():
+                signature = self._signature(source)
+                if source in self._signatures and self._signatures[source] != signature:
+                    log.debug('%s changed, forgetting its cached entries', self.sources[source])
+                    for lookup in lookups:
+                        self._entries[lookup].clear()
+                self._signatures[source] = signature
+            hits, misses = self.hits, self.misses
+            if hits > self._reported[0]:
+                hubble_status.mark('hit', count=hits - self._reported[0])
+            if misses > self._reported[1]:
+                hubble_status.mark('miss', count=misses - self._reported[1])
+            self._reported = (hits, misses)
+
+    def _lookup(self, lookup, key, func, value_of):
+        """
+        Return the cached answer of ``value_of(func(key))``, None for a
+        KeyError
+        """
+        now = time.time()
+        if now - self._checked >= self.check_interval:
+            self.check(now)
+        entries = self._entries[lookup]
+        entry = entries.get(key)
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        try:
+            ent = func(key)
+        except KeyError:
+            entries[key] = (None, now + self.negative_ttl)
+            return None
+        value = value_of(ent)
+        entries[key] = (value, now + self.ttl)
+        return value
+
+    def user_name(self, uid):
+        """ the name of the user with id ``uid``, None if there is none """
+        if pwd is None:
+            return None
+        return self._lookup('uid', uid, pwd.getpwuid, lambda ent: ent.pw_name)
+
+    def user_id(self, name):
+        """ the id of the user ``name``, None if there is none """
+        if pwd is None:
+            return None
+        return self._lookup('user', name, pwd.getpwnam, lambda ent: ent.pw_uid)
+
+    def group_name(self, gid):
+        """ the name of the group with id ``gid``, None if there is none """
+        if grp is None:
+            return None
+        return self._lookup('gid', gid, grp.getgrgid, lambda ent: ent.gr_name)
+
+    def group_id(self, name):
+        """ the id of the group ``name``, None if there is none """
+        if grp is None:
+            return None
+        return self._lookup('group', name, grp.getgrnam, lambda ent: ent.gr_gid)
+
+
+_CACHE = IdentityCache()
+
+
+def user_name(uid):
+    """ the name of the user with id ``uid``, None if there is none """
+    return _CACHE.user_name(uid)
+
+
+def user_id(name):
+    """ the id of the user ``name``, None if there is none """
+    return _CACHE.user_id(name)
+
+
+def group_name(gid):
+    """ the name of the group with id ``gid``, None if there is none """
+    return _CACHE.group_name(gid)
+
+
+def group_id(name):
+    """ the id of the group ``name``, None if there is none """
+    return _CACHE.group_id(name)
+
+
+def clear():
+    """ forget every cached lookup """
+    _CACHE.clear()
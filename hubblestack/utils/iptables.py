@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Parse iptables-save output into an index of normalized rules
+
+``iptables -C`` asks the kernel whether a rule exists, which costs a fork (and
+the xtables lock) per rule and per family. When many rules have to be checked
+it is much cheaper to take one ``iptables-save`` snapshot and answer the
+checks in-process. iptables-save prints rules in a canonical form, while
+rules written by hand or by ``iptables.build_rule`` need not be, so both sides
+are reduced to the same key first:
+
+- long options and their aliases become the short/common spelling
+  (``--protocol`` -> ``-p``, ``--destination-port`` -> ``--dport``, ...)
+- protocol numbers become names, ``-p all`` is dropped
+- addresses get a prefix length (``10.0.0.1`` -> ``10.0.0.1/32``)
+- service names in ports become numbers
+- state lists, tcp flag lists and limit units are put in one spelling
+- implicit protocol matches (``-m tcp`` next to ``-p tcp``) are dropped,
+  as are target options iptables-save prints with their default value
+- ``--syn`` becomes the ``--tcp-flags`` it stands for
+- clauses are sorted, so option order does not matter
+"""
+
+import ipaddress
+import logging
+import shlex
+import socket
+
+log = logging.getLogger(__name__)
+
+_ALIASES = {
+    "--append": "-A",
+    "--protocol": "-p",
+    "--source": "-s",
+    "--src": "-s",
+    "--destination": "-d",
+    "--dst": "-d",
+    "--jump": "-j",
+    "--goto": "-g",
+    "--in-interface": "-i",
+    "--out-interface": "-o",
+    "--match": "-m",
+    "--fragment": "-f",
+    "--destination-port": "--dport",
+    "--source-port": "--sport",
+    "--destination-ports": "--dports",
+    "--source-ports": "--sports",
+}
+
+_PROTOCOLS = {
+    "1": "icmp",
+    "6": "tcp",
+    "17": "udp",
+    "47": "gre",
+    "50": "esp",
+    "51": "ah",
+    "58": "ipv6-icmp",
+    "132": "sctp",
+    "icmpv6": "ipv6-icmp",
+}
+
+# match modules iptables loads by itself for "-p <proto>"
+_IMPLICIT_MATCHES = frozenset(("tcp", "udp", "udplite", "icmp", "icmp6", "icmpv6", "sctp", "dccp", "esp", "ah", "mh"))
+
+_PORT_OPTIONS = frozenset(("--dport", "--sport", "--dports", "--sports"))
+_LIST_OPTIONS = frozenset(("--state", "--ctstate", "--ctstatus"))
+_LIMIT_UNITS = {
+    "s": "sec", "sec": "sec", "second": "sec",
+    "m": "min", "min": "min", "minute": "min",
+    "h": "hour", "hour": "hour",
+    "d": "day", "day": "day",
+}
+
+# target options iptables-save prints even when they were left at their default
+_DEFAULT_CLAUSES = frozenset((
+    ("--reject-with", "icmp-port-unreachable", False),
+    ("--reject-with", "icmp6-port-unreachable", False),
+))
+
+_SYN_FLAGS = "ACK,FIN,RST,SYN SYN"
+
+
+def _port(value):
+    if value.isdigit() or not value:
+        return value
+    try:
+        return str(socket.getservbyname(value))
+    except OSError:
+        return value
+
+
+def _ports(value):
+    ret = []
+    for item in value.split(","):
+        if ":" in item:
+            low, high = item.split(":", 1)
+            ret.append("{0}:{1}".format(_port(low) or "0", _port(high) or "65535"))
+        else:
+            ret.append(_port(item))
+    return ",".join(ret)
+
+
+def _address(value):
+    ret = []
+    for item in value.split(","):
+        try:
+            net = ipaddress.ip_network(item, strict=False)
+        except ValueError:
+            # host names are resolved by iptables, keep them as they are
+            ret.append(item)
+            continue
+        ret.append(str(net))
+    return ",".join(ret)
+
+
+def _normalize_value(option, value):
+    if option == "-p":
+        value = value.lower()
+        return _PROTOCOLS.get(value, value)
+    if option in ("-s", "-d"):
+        return _address(value)
+    if option in _PORT_OPTIONS:
+        return _ports(value)
+    if option in _LIST_OPTIONS:
+        return ",".join(sorted(value.upper().split(",")))
+    if option == "--tcp-flags":
+        return " ".join(",".join(sorted(flags.upper().split(","))) for flags in value.split())
+    if option == "--limit" and "/" in value:
+        rate, unit = value.split("/", 1)
+        return "{0}/{1}".format(rate, _LIMIT_UNITS.get(unit, unit))
+    return value
+
+
+def parse_rule(rule):
+    """
+    Split a rule (an iptables-save line or the options of an iptables
+    command) into normalized ``(option, value, negated)`` clauses
+    """
+    tokens = shlex.split(rule)
+    clauses = []
+    negate = False
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+        if token == "!":
+            negate = True
+            continue
+        if not token.startswith("-"):
+            continue
+        option = _ALIASES.get(token, token)
+        values = []
+        # old style negation: "-s ! 10.0.0.1"
+        if index + 1 < len(tokens) and tokens[index] == "!" and not tokens[index + 1].startswith("-"):
+            negate = True
+            index += 1
+        while index < len(tokens) and tokens[index] != "!" and not tokens[index].startswith("-"):
+            values.append(tokens[index])
+            index += 1
+        if option == "--syn":
+            option, values = "--tcp-flags", [_SYN_FLAGS]
+        clauses.append((option, _normalize_value(option, " ".join(values)), negate))
+        negate = False
+    return clauses
+
+
+def rule_key(rule):
+    """
+    Return the canonical key of a rule; two rules iptables treats as the
+    same rule have the same key. The chain (``-A CHAIN``) is not part of it.
+    """
+    clauses = []
+    for option, value, negated in parse_rule(rule):
+        if option == "-A":
+            continue
+        if option == "-m" and value in _IMPLICIT_MATCHES:
+            continue
+        if option == "-p" and value == "all" and not negated:
+            continue
+        if (option, value, negated) in _DEFAULT_CLAUSES:
+            continue
+        clauses.append("{0}{1} {2}".format("! " if negated else "", option, value).strip())
+    return " ".join(sorted(clauses))
+
+
+def parse_save(output):
+    """
+    Index iptables-save output::
+
+        {table: {chain: {'policy': 'ACCEPT', 'rules': {rule_key: line}}}}
+
+    User defined chains have the policy ``-``. The structure only holds
+    plain types so it can be returned from an execution module.
+    """
+    ret = {}
+    table = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("*"):
+            table = ret.setdefault(line[1:], {})
+        elif table is None:
+            continue
+        elif line.startswith(":"):
+            fields = line[1:].split()
+            if fields:
+                table[fields[0]] = {"policy": fields[1] if len(fields) > 1 else "-", "rules": {}}
+        elif line.startswith("-A "):
+            chain = line.split(None, 2)[1]
+            rules = table.setdefault(chain, {"policy": "-", "rules": {}})["rules"]
+            rules.setdefault(rule_key(line), line)
+    return ret
+
+
+def rule_exists(ruleset, table, chain, rule):
+    """
+    True if ``rule`` is in ``chain`` of ``table`` of a ruleset built by
+    :func:`parse_save`
+    """
+    chain_data = ruleset.get(table, {}).get(chain)
+    if chain_data is None:
+        return False
+    return rule_key(rule) in chain_data["rules"]
+
+
+def dports(ruleset, table="filter", chain="INPUT"):
+    """
+    Single destination ports (``--dport``, not negated) matched by the rules
+    of a chain, like the ``dpt:`` column of ``iptables -L``
+    """
+    ret = []
+    for line in ruleset.get(table, {}).get(chain, {}).get("rules", {}).values():
+        for option, value, negated in parse_rule(line):
+            if option == "--dport" and not negated and ":" not in value:
+                ret.append(value)
+    return ret
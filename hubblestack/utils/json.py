@@ -1,16 +1,36 @@
 # -*- coding: utf-8 -*-
 """
 Functions to work with JSON
+
+:func:`encode` and :func:`decode` are the codec of the hot paths (HEC
+payloads, the disk queue, osquery results). They use orjson when it is
+installed and the standard library otherwise, with the same output either way:
+compact separators, non-ASCII characters left as is, ``bytes`` decoded as
+UTF-8, sets as lists and dates and times in ISO 8601. Whatever orjson refuses
+(integers over 64 bits, lone surrogates, ``NaN`` in documents to decode) is
+handed to the standard library, so errors are the same too. The one
+difference: orjson encodes ``NaN`` and infinite floats as ``null``.
 """
 
 # Import Python libs
+import datetime
 import json  # future lint: blacklisted-module
 import logging
+import uuid
 
 import hubblestack.utils.stringutils
 
+try:
+    import orjson
+    HAS_ORJSON = True
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS
+except ImportError:
+    HAS_ORJSON = False
+
 log = logging.getLogger(__name__)
 
+BACKEND = "orjson" if HAS_ORJSON else "json"
+
 
 # One to one mappings
 JSONEncoder = json.JSONEncoder
@@ -89,3 +109,60 @@ def dumps(obj, **kwargs):
     if "ensure_ascii" not in kwargs:
         kwargs["ensure_ascii"] = False
     return json_module.dumps(obj, **kwargs)  # future lint: blacklisted-function
+
+
+def _default(obj):
+    """
+    Encode the types the JSON encoders don't know about
+    """
+    if isinstance(obj, (bytes, bytearray)):
+        return bytes(obj).decode("utf-8", "replace")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError("Object of type {0} is not JSON serializable".format(type(obj).__name__))
+
+
+def _chain(default):
+    def _chained(obj):
+        try:
+            return _default(obj)
+        except TypeError:
+            return default(obj)
+    return _chained
+
+
+def encode(obj, sort_keys=False, default=None):
+    """
+    Return the JSON document of ``obj`` as a str
+
+    sort_keys
+        Sort the keys of the objects
+    default
+        Called with the objects that can't be encoded otherwise, returns
+        something that can, as for json.dumps
+    """
+    default = _default if default is None else _chain(default)
+    if BACKEND == "orjson":
+        opts = _ORJSON_OPTS | orjson.OPT_SORT_KEYS if sort_keys else _ORJSON_OPTS
+        try:
+            return orjson.dumps(obj, default=default, option=opts).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False,  # future lint: blacklisted-function
+                      separators=(",", ":"))
+
+
+def decode(data):
+    """
+    Return the object of the JSON document ``data``, a str or bytes
+    """
+    if BACKEND == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Storage of the rows of the differential nebula queries
+
+``nebula.queries`` compares the rows of a differential query with the rows
+stored by its previous run (see :mod:`hubblestack.modules.nebula_osquery`).
+The rows of the current run are written next to them as a pending snapshot,
+which only replaces the stored one with :func:`commit`, once a returner has
+published the run. A run that fails to publish is therefore compared with the
+same stored rows again, and its changes go out with the next run.
+
+Options::
+
+    nebula_snapshot_dir: <cachedir>/nebula_snapshots
+"""
+
+import logging
+import os
+import re
+
+log = logging.getLogger(__name__)
+
+PENDING_SUFFIX = ".pending"
+
+
+def snapshot_path(opts, query_group, query_name):
+    """
+    Return the path of the stored rows of the query ``query_name`` of
+    ``query_group``; the pending rows are kept in the same path with
+    :data:`PENDING_SUFFIX` appended
+    """
+    snapshot_dir = opts.get("nebula_snapshot_dir") or os.path.join(
+        opts.get("cachedir", "/var/cache/hubble"), "nebula_snapshots"
+    )
+    return os.path.join(snapshot_dir, re.sub(r"[^\w-]", "_", str(query_group)),
+                        re.sub(r"[^\w-]", "_", str(query_name)) + ".json.z")
+
+
+def _query_group(fun_args):
+    for arg in fun_args or []:
+        if isinstance(arg, dict):
+            return arg.get("query_group")
+        return arg
+    return None
+
+
+def commit(ret, opts):
+    """
+    Record the pending snapshots of the ``nebula.queries`` run in the returner
+    data ``ret`` as published
+    """
+    if ret.get("fun") != "nebula.queries":
+        return
+    query_group = _query_group(ret.get("fun_args"))
+    if query_group is None:
+        return
+    for data in ret.get("return") or []:
+        if not isinstance(data, dict) or not data:
+            continue
+        query_name = data.get("query_name") if "query_result" in data else next(iter(data))
+        path = snapshot_path(opts, query_group, query_name)
+        try:
+            os.replace(path + PENDING_SUFFIX, path)
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            log.error("Could not store the osquery snapshot %s: %s", path, exc)
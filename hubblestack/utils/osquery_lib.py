@@ -5,7 +5,7 @@ Author - Mudit Agarwal (muagarwa@adobe.com)
 import logging
 import os
 import hubblestack.modules.cmdmod
-import json
+import hubblestack.utils.json
 
 __mods__ = {'cmd.run': hubblestack.modules.cmdmod._run_quiet,
             'cmd.run_all': hubblestack.modules.cmdmod.run_all}
@@ -33,7 +33,7 @@ def query(query_sql='', osquery_path='/opt/osquery/osqueryi', args=None, max_fil
 
     res = __mods__['cmd.run_all'](cmd, timeout=timeout, python_shell=False, output_loglevel=output_loglevel)
     if res['retcode'] == 0:
-      ret = json.loads(res['stdout'])
+      ret = hubblestack.utils.json.decode(res['stdout'])
       return ret
     return None
   except Exception as e:
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+'''
+Inventory of the installed packages
+
+Package audits look up installed packages many times per run, through
+``pkg.version``/``pkg.list_pkgs`` (which copy the whole package list on every
+call) and ``pkg.version_cmp`` (which may run a command per comparison).
+
+The inventory reads the package database once -- the dpkg status file, the
+apk installed database or a single ``rpm -qa`` -- indexes it by package name
+and is reused until the database changes. Package names follow the pkg
+execution modules (``name:arch`` for foreign dpkg architectures, ``name.arch``
+for foreign rpm architectures), versions are listed oldest first.
+
+Versions are compared in process with the rules of the package manager
+(dpkg, rpm EVR, apk), and comparisons are memoized.
+'''
+
+import collections
+import fnmatch
+import functools
+import logging
+import os
+import re
+import subprocess
+import threading
+
+import hubblestack.utils.pkg.rpm
+import hubblestack.utils.stringutils
+import hubblestack.utils.versions
+
+log = logging.getLogger(__name__)
+
+DPKG_STATUS = '/var/lib/dpkg/status'
+APK_INSTALLED = '/lib/apk/db/installed'
+RPM_DBS = ('/var/lib/rpm/rpmdb.sqlite', '/var/lib/rpm/Packages', '/usr/lib/sysimage/rpm/rpmdb.sqlite')
+RPM_QUERYFORMAT = hubblestack.utils.pkg.rpm.QUERYFORMAT.replace('%{REPOID}', '(none)') + '_|-%{SOURCERPM}\n'
+
+Package = collections.namedtuple('Package', ('name', 'version', 'arch', 'source'))
+
+_INVENTORY = {}
+_LOCK = threading.Lock()
+
+
+def _rpm_segments(ver):
+    '''
+    Yield the segments rpmvercmp compares: separators are dropped, ``~`` and
+    ``^`` are kept as segments of their own
+    '''
+    for match in re.finditer(r'(\d+|[a-zA-Z]+|~|\^)', ver):
+        yield match.group(0)
+
+
+def rpmvercmp(ver1, ver2):
+    '''
+    Compare two rpm version (or release) strings like rpm's rpmvercmp.
+    Return -1, 0 or 1.
+    '''
+    if ver1 == ver2:
+        return 0
+    seg1 = list(_rpm_segments(ver1))
+    seg2 = list(_rpm_segments(ver2))
+    for idx in range(max(len(seg1), len(seg2))):
+        one = seg1[idx] if idx < len(seg1) else None
+        two = seg2[idx] if idx < len(seg2) else None
+        # a tilde sorts before everything, even the end of the version
+        if one == '~' or two == '~':
+            if one != '~':
+                return 1
+            if two != '~':
+                return -1
+            continue
+        # a caret sorts after the end of the version, before anything else
+        if one == '^' or two == '^':
+            if one is None:
+                return -1
+            if two is None:
+                return 1
+            if one != '^':
+                return 1
+            if two != '^':
+                return -1
+            continue
+        if one is None or two is None:
+            break
+        if one.isdigit() != two.isdigit():
+            # numeric segments are newer than alpha ones
+            return 1 if one.isdigit() else -1
+        if one.isdigit():
+            one, two = int(one), int(two)
+        if one != two:
+            return 1 if one > two else -1
+    if len(seg1) == len(seg2):
+        return 0
+    return 1 if len(seg1) > len(seg2) else -1
+
+
+def rpm_evr_cmp(ver1, ver2):
+    '''
+    Compare two ``[epoch:]version[-release]`` strings like rpm does. When only
+    one of them has a release, releases are not compared.
+    '''
+    epoch1, version1, release1 = hubblestack.utils.pkg.rpm.version_to_evr(ver1)
+    epoch2, version2, release2 = hubblestack.utils.pkg.rpm.version_to_evr(ver2)
+    if int(epoch1) != int(epoch2):
+        return 1 if int(epoch1) > int(epoch2) else -1
+    ret = rpmvercmp(version1, version2)
+    if ret or not release1 or not release2:
+        return ret
+    return rpmvercmp(release1, release2)
+
+
+def _dpkg_order(char):
+    if char.isdigit():
+        return 0
+    if char.isalpha():
+        return ord(char)
+    if char == '~':
+        return -1
+    return ord(char) + 256
+
+
+def _dpkg_verrevcmp(ver1, ver2):
+    '''
+    Compare two upstream versions or revisions with the dpkg algorithm
+    '''
+    idx1 = idx2 = 0
+    len1, len2 = len(ver1), len(ver2)
+    while idx1 < len1 or idx2 < len2:
+        while (idx1 < len1 and not ver1[idx1].isdigit()) or (idx2 < len2 and not ver2[idx2].isdigit()):
+            order1 = _dpkg_order(ver1[idx1]) if idx1 < len1 else 0
+            order2 = _dpkg_order(ver2[idx2]) if idx2 < len2 else 0
+            if order1 != order2:
+                return 1 if order1 > order2 else -1
+            idx1 += 1
+            idx2 += 1
+        start1 = idx1
+        while idx1 < len1 and ver1[idx1].isdigit():
+            idx1 += 1
+        start2 = idx2
+        while idx2 < len2 and ver2[idx2].isdigit():
+            idx2 += 1
+        num1 = int(ver1[start1:idx1] or 0)
+        num2 = int(ver2[start2:idx2] or 0)
+        if num1 != num2:
+            return 1 if num1 > num2 else -1
+    return 0
+
+
+def _dpkg_split(ver):
+    epoch, _, rest = ver.partition(':') if ':' in ver else ('0', '', ver)
+    upstream, _, revision = rest.rpartition('-') if '-' in rest else (rest, '', '')
+    try:
+        epoch = int(epoch)
+    except ValueError:
+        epoch = 0
+    return epoch, upstream, revision
+
+
+def dpkg_version_cmp(ver1, ver2):
+    '''
+    Compare two ``[epoch:]upstream[-revision]`` strings like
+    ``dpkg --compare-versions``
+    '''
+    epoch1, upstream1, revision1 = _dpkg_split(ver1)
+    epoch2, upstream2, revision2 = _dpkg_split(ver2)
+    if epoch1 != epoch2:
+        return 1 if epoch1 > epoch2 else -1
+    return _dpkg_verrevcmp(upstream1, upstream2) or _dpkg_verrevcmp(revision1, revision2)
+
+
+_APK_VERSION = re.compile(r'^(\d+(?:\.\d+)*)([a-z]?)((?:_[a-z]+\d*)*)(?:-r(\d+))?$')
+_APK_SUFFIXES = {'alpha': -4, 'beta': -3, 'pre': -2, 'rc': -1, 'cvs': 1, 'svn': 2, 'git': 3, 'hg': 4, 'p': 5}
+
+
+def _apk_key(ver):
+    match = _APK_VERSION.match(ver)
+    if not match:
+        return None
+    numbers, letter, suffixes, revision = match.groups()
+    suffix_key = []
+    for suffix in suffixes.split('_')[1:]:
+        name, number = re.match(r'([a-z]+)(\d*)', suffix).groups()
+        if name not in _APK_SUFFIXES:
+            return None
+        suffix_key.append((_APK_SUFFIXES[name], int(number or 0)))
+    # no suffix sorts between the pre-release and the post-release ones
+    suffix_key.append((0, 0))
+    return [int(num) for num in numbers.split('.')], letter, suffix_key, int(revision or 0)
+
+
+def apk_version_cmp(ver1, ver2):
+    '''
+    Compare two apk ``version[_suffix][-rN]`` strings
+    '''
+    key1, key2 = _apk_key(ver1), _apk_key(ver2)
+    if key1 is None or key2 is None:
+        return hubblestack.utils.versions.version_cmp(ver1, ver2)
+    return (key1 > key2) - (key1 < key2)
+
+
+_VERSION_CMP = {
+    'dpkg': dpkg_version_cmp,
+    'rpm': rpm_evr_cmp,
+    'apk': apk_version_cmp,
+}
+
+
+@functools.lru_cache(maxsize=8192)
+def version_cmp(kind, ver1, ver2):
+    '''
+    cmp-style comparison of two versions with the rules of the ``kind``
+    package manager (dpkg, rpm or apk): -1, 0 or 1, None if they cannot be
+    compared
+    '''
+    try:
+        return _VERSION_CMP[kind](str(ver1), str(ver2))
+    except Exception as exc:
+        log.debug('Unable to compare %s versions %s and %s: %s', kind, ver1, ver2, exc)
+        return None
+
+
+class Inventory(object):
+    '''
+    The installed packages, indexed by name
+    '''
+
+    def __init__(self, kind, packages):
+        self.kind = kind
+        self.packages = {}
+        for package in packages:
+            self.packages.setdefault(package.name, []).append(package)
+        cmp_key = functools.cmp_to_key(lambda one, two: self.compare(one.version, two.version) or 0)
+        for pkgs in self.packages.values():
+            pkgs.sort(key=cmp_key)
+
+    def compare(self, ver1, ver2):
+        '''
+        cmp-style comparison of two versions
+        '''
+        return version_cmp(self.kind, ver1, ver2)
+
+    def installed(self, name):
+        '''
+        True if a package matching ``name`` (which may be a glob) is installed
+        '''
+        if '*' in name:
+            return bool(fnmatch.filter(self.packages, name))
+        return name in self.packages
+
+    def versions(self, name):
+        '''
+        The installed versions of a package, oldest first
+        '''
+        return [package.version for package in self.packages.get(name, [])]
+
+    def latest(self, name):
+        '''
+        The newest installed version of a package, None if it is not installed
+        '''
+        pkgs = self.packages.get(name)
+        return pkgs[-1].version if pkgs else None
+
+    def version(self, name):
+        '''
+        Like ``pkg.version``: the comma separated installed versions of a
+        package, '' if it is not installed, and a dict of them if ``name`` is
+        a glob
+        '''
+        if '*' in name:
+            return self.filter(name)
+        return ','.join(self.versions(name))
+
+    def filter(self, pattern):
+        '''
+        Like ``pkg.list_pkgs``, limited to the packages matching the glob
+        '''
+        return {name: ','.join(self.versions(name)) for name in fnmatch.filter(self.packages, pattern)}
+
+    def list_pkgs(self):
+        '''
+        Like ``pkg.list_pkgs``
+        '''
+        return {name: ','.join(self.versions(name)) for name in self.packages}
+
+    def sources(self):
+        '''
+        The binary packages built from each source package, for the source
+        packages with a name of their own
+        '''
+        ret = {}
+        for name, pkgs in sorted(self.packages.items()):
+            source = pkgs[-1].source
+            if source and source != name:
+                ret.setdefault(source, []).append(name)
+        return ret
+
+
+def _paragraphs(path):
+    '''
+    Yield the ``{field: value}`` paragraphs of a dpkg status or apk installed
+    database
+    '''
+    with open(path, encoding='utf-8', errors='replace') as fh_:
+        fields = {}
+        field = None
+        for line in fh_:
+            line = line.rstrip('\n')
+            if not line:
+                if fields:
+                    yield fields
+                fields = {}
+                field = None
+            elif line[0] in ' \t':
+                if field:
+                    fields[field] += '\n' + line.strip()
+            else:
+                field, _, value = line.partition(':')
+                fields[field] = value.strip()
+        if fields:
+            yield fields
+
+
+def _load_dpkg(osarch=None):
+    packages = []
+    for fields in _paragraphs(DPKG_STATUS):
+        status = fields.get('Status', '').split()
+        if len(status) != 3 or status[0] not in ('install', 'hold') or status[2] != 'installed':
+            continue
+        name = fields.get('Package')
+        arch = fields.get('Architecture', '')
+        if not name:
+            continue
+        # same naming as the aptpkg module
+        if arch != 'all' and osarch == 'amd64' and arch != osarch:
+            name += ':{0}'.format(arch)
+        source = fields.get('Source', '').split(' ', 1)[0] or fields['Package']
+        packages.append(Package(name, fields.get('Version', ''), arch, source))
+    return packages
+
+
+def _load_apk(osarch=None):
+    return [Package(fields['P'], fields.get('V', ''), fields.get('A', ''), fields.get('o', fields['P']))
+            for fields in _paragraphs(APK_INSTALLED) if fields.get('P')]
+
+
+def _load_rpm(osarch=None):
+    out = subprocess.run(['rpm', '-qa', '--queryformat', RPM_QUERYFORMAT],
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    if osarch is None:
+        osarch = hubblestack.utils.pkg.rpm.get_osarch()
+    packages = []
+    for line in hubblestack.utils.stringutils.to_str(out).splitlines():
+        line, _, source = line.rpartition('_|-')
+        pkginfo = hubblestack.utils.pkg.rpm.parse_pkginfo(line, osarch=osarch)
+        if pkginfo is None:
+            continue
+        # bash-5.1-2.el9.src.rpm
+        source = source.rsplit('-', 2)[0] if source.endswith('.rpm') else None
+        packages.append(Package(pkginfo.name, pkginfo.version, pkginfo.arch, source))
+    return packages
+
+
+def _rpm_db():
+    for path in RPM_DBS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _database(grains):
+    '''
+    Return the kind of package database of the system and its path, (None,
+    None) if it is not supported
+    '''
+    os_family = grains.get('os_family', '')
+    if os_family == 'Debian' and os.path.isfile(DPKG_STATUS):
+        return 'dpkg', DPKG_STATUS
+    if os_family == 'Alpine' and os.path.isfile(APK_INSTALLED):
+        return 'apk', APK_INSTALLED
+    if os_family in ('RedHat', 'Suse') and _rpm_db():
+        return 'rpm', _rpm_db()
+    return None, None
+
+
+_LOADERS = {
+    'dpkg': _load_dpkg,
+    'apk': _load_apk,
+    'rpm': _load_rpm,
+}
+
+
+def get(grains):
+    '''
+    Return the package inventory of the system, loading it if the package
+    database changed since it was last loaded; None if the package database
+    of the system is not supported (callers fall back to the pkg module)
+    '''
+    kind, path = _database(grains)
+    if kind is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    osarch = grains.get('osarch')
+    stamp = (path, stat.st_mtime_ns, stat.st_size, osarch)
+    with _LOCK:
+        cached = _INVENTORY.get(kind)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            inventory = Inventory(kind, _LOADERS[kind](osarch))
+        except (OSError, subprocess.CalledProcessError) as exc:
+            log.error('Unable to read the %s package database: %s', kind, exc)
+            return None
+        log.debug('Loaded %d %s packages', len(inventory.packages), kind)
+        _INVENTORY[kind] = (stamp, inventory)
+        return inventory
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent probing of remote endpoints
+
+The ssl_certificate, curl and time_sync modules contact remote endpoints;
+one endpoint at a time, every unreachable host costs its full timeout. Here
+they share probes, identified by a key:
+
+- :func:`fetch` runs a probe, unless the same probe is already running, was
+  prefetched or is still cached, in which case its result is reused
+- :func:`prefetch` starts many probes at once and waits for them up to a
+  global deadline. The audit runner prefetches the probes declared by the
+  ``get_probes`` function of audit modules before it runs a profile's checks
+- :func:`run_all` runs calls concurrently and returns their results in order
+
+A probe result is kept for ``ttl`` seconds after it completes. Failures are
+not kept, they are only shared with concurrent callers. A prefetched result
+with no ``ttl``, or a prefetched failure, is handed out once, to the first
+:func:`fetch` of its key, and dropped after ``PREFETCH_TTL`` seconds if
+nobody claims it.
+"""
+
+import logging
+import socket
+import ssl
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+log = logging.getLogger(__name__)
+
+MAX_WORKERS = 16
+PREFETCH_TTL = 60
+
+_PROBES = {}
+_LOCK = threading.Lock()
+
+
+class _Probe(object):
+    """
+    One probe, its result is a Future so that callers can wait on a probe
+    that is still running
+    """
+
+    def __init__(self, ttl, prefetched):
+        self.future = Future()
+        self.ttl = ttl or 0
+        self.prefetched = prefetched
+        self.done_at = None
+
+    def run(self, func, args):
+        try:
+            self.future.set_result(func(*args))
+        except Exception as exc:
+            self.future.set_exception(exc)
+        self.done_at = time.time()
+
+    def failed(self):
+        return self.future.done() and self.future.exception() is not None
+
+    def one_shot(self):
+        return self.prefetched and (not self.ttl or self.failed())
+
+    def valid(self, now):
+        if self.done_at is None:
+            return True
+        keep = 0 if self.failed() else self.ttl
+        if self.prefetched:
+            keep = max(keep, PREFETCH_TTL)
+        return now < self.done_at + keep
+
+
+def _get(key, now):
+    """
+    Return the valid probe for ``key``, None if there is none; call with
+    _LOCK held
+    """
+    probe = _PROBES.get(key)
+    if probe is not None and not probe.valid(now):
+        del _PROBES[key]
+        probe = None
+    return probe
+
+
+def fetch(key, func, *args, ttl=0):
+    """
+    Return ``func(*args)``, or the result of the probe ``key`` if it is
+    running, prefetched or cached. Exceptions are raised to every caller
+    sharing the probe.
+
+    ttl
+        seconds to keep the result for later calls, 0 shares it only with
+        concurrent callers
+    """
+    now = time.time()
+    with _LOCK:
+        probe = _get(key, now)
+        owner = probe is None
+        if owner:
+            probe = _PROBES[key] = _Probe(ttl, False)
+        elif probe.one_shot():
+            # a one-shot prefetched result goes to its first taker
+            del _PROBES[key]
+    if owner:
+        probe.run(func, args)
+        if not ttl or probe.failed():
+            with _LOCK:
+                if _PROBES.get(key) is probe:
+                    del _PROBES[key]
+    return probe.future.result()
+
+
+def prefetch(probes, deadline=None):
+    """
+    Start the probes that are not running or cached yet, concurrently, and
+    wait for them up to ``deadline`` seconds. Probes still running after the
+    deadline are left to finish, later calls to :func:`fetch` wait for them.
+    Returns the number of probes started.
+
+    probes
+        list of ``(key, func, args, ttl)`` tuples
+    """
+    now = time.time()
+    todo = []
+    with _LOCK:
+        for key in list(_PROBES):
+            _get(key, now)
+        for key, func, args, ttl in probes:
+            if _get(key, now) is not None:
+                continue
+            probe = _PROBES[key] = _Probe(ttl, True)
+            todo.append((probe, func, args))
+    if not todo:
+        return 0
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(todo)), thread_name_prefix='probe')
+    for probe, func, args in todo:
+        executor.submit(probe.run, func, args)
+    executor.shutdown(wait=False)
+    _, pending = wait([probe.future for probe, _, _ in todo], timeout=deadline)
+    if pending:
+        log.warning('%d of %d probes did not complete within %ss', len(pending), len(todo), deadline)
+    return len(todo)
+
+
+def run_all(calls, deadline=None, default=None):
+    """
+    Run the calls concurrently and return their results in order; calls that
+    raise or are not done within ``deadline`` seconds return ``default``
+
+    calls
+        list of ``(func, args)`` tuples
+    """
+    if not calls:
+        return []
+    if len(calls) == 1:
+        func, args = calls[0]
+        try:
+            return [func(*args)]
+        except Exception:
+            log.error('probe failed', exc_info=True)
+            return [default]
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(calls)), thread_name_prefix='probe')
+    futures = [executor.submit(func, *args) for func, args in calls]
+    executor.shutdown(wait=False)
+    wait(futures, timeout=deadline)
+    ret = []
+    for future in futures:
+        if not future.done():
+            log.warning('probe did not complete within %ss', deadline)
+            ret.append(default)
+        elif future.exception() is not None:
+            log.error('probe failed', exc_info=future.exception())
+            ret.append(default)
+        else:
+            ret.append(future.result())
+    return ret
+
+
+def get_certificate(host, port=443, timeout=3):
+    """
+    Return the PEM encoded certificate served on ``host:port``. Unlike
+    ``ssl.get_server_certificate`` with ``socket.setdefaulttimeout``, the
+    timeout applies to this connection only, so it is safe to call from
+    concurrent threads.
+    """
+    # from python 3.10 on, the stdlib takes a timeout for the connection
+    if sys.version_info >= (3, 10):
+        return ssl.get_server_certificate((str(host), int(port)), timeout=timeout)
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    with socket.create_connection((str(host), int(port)), timeout=timeout) as sock:
+        with context.wrap_socket(sock, server_hostname=str(host)) as ssl_sock:
+            cert = ssl_sock.getpeercert(True)
+    return ssl.DER_cert_to_PEM_cert(cert)
+
+
+def clear():
+    """
+    Forget all probe results
+    """
+    with _LOCK:
+        _PROBES.clear()
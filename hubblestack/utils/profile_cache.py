@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of parsed yaml profiles
+
+The audit and FDG runners and the nova loader parse every profile on every
+scheduled run, although profiles rarely change. :func:`load` parses a profile
+once per content: the parsed data is cached in memory, keyed by the sha256 of
+the file, and optionally on disk, packed with msgpack, so that a restart does
+not parse the profiles again either.
+
+A file whose size, mtime and inode did not change since it was last loaded is
+not even read again. When ``cp.cache_file`` delivers a new version of a file,
+its mtime changes; the new content is hashed, and parsed only if no other
+file or earlier version had the same content.
+
+Every call returns a fresh copy of the data, callers are free to modify it.
+
+Options::
+
+    profile_cache: True           # False parses the file on every call
+    profile_cache_size: 256       # parsed profiles kept in memory
+    profile_cache_disk: False     # also keep them under <cachedir>/profile_cache
+"""
+
+import collections
+import copy
+import hashlib
+import logging
+import os
+import threading
+
+import msgpack
+import yaml
+
+import hubblestack.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+_CACHE = collections.OrderedDict()
+_STATS = {}
+_LOCK = threading.Lock()
+
+
+def _stat_key(stat):
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _pack(data):
+    """
+    Pack the data with msgpack, which unpacks much faster than a deepcopy;
+    data msgpack cannot represent (dates, sets) is kept as is
+    """
+    try:
+        packed = msgpack.packb(data, use_bin_type=True)
+    except (TypeError, ValueError, OverflowError):
+        return data
+    # e.g. tuples come back as lists
+    if _unpack(packed) != data:
+        return data
+    return packed
+
+
+def _unpack(entry):
+    if isinstance(entry, bytes):
+        return msgpack.unpackb(entry, raw=False, strict_map_key=False)
+    return copy.deepcopy(entry)
+
+
+def _disk_path(digest, opts):
+    return os.path.join(opts.get('cachedir', '/var/cache/hubble'), 'profile_cache', digest + '.mp')
+
+
+def _load_disk(digest, opts):
+    if not opts.get('profile_cache_disk', False):
+        return None
+    try:
+        with open(_disk_path(digest, opts), 'rb') as fh_:
+            entry = fh_.read()
+        _unpack(entry)
+        return entry
+    except (IOError, OSError):
+        return None
+    except Exception:
+        log.warning('Discarding corrupt cached profile %s', _disk_path(digest, opts))
+        return None
+
+
+def _save_disk(digest, entry, opts):
+    if not opts.get('profile_cache_disk', False) or not isinstance(entry, bytes):
+        return
+    path = _disk_path(digest, opts)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with hubblestack.utils.atomicfile.atomic_open(path, 'wb') as fh_:
+            fh_.write(entry)
+    except (IOError, OSError) as exc:
+        log.warning('Could not cache profile %s: %s', path, exc)
+
+
+def load(path, opts=None):
+    """
+    Return the data of the yaml file at ``path``, like ``yaml.safe_load``;
+    raises the same exceptions (``OSError``, ``yaml.YAMLError``)
+    """
+    opts = opts or {}
+    if not opts.get('profile_cache', True):
+        with open(path, 'r') as fh_:
+            return yaml.safe_load(fh_)
+
+    stat_key = _stat_key(os.stat(path))
+    with _LOCK:
+        known = _STATS.get(path)
+        if known is not None and known[0] == stat_key and known[1] in _CACHE:
+            _CACHE.move_to_end(known[1])
+            return _unpack(_CACHE[known[1]])
+
+    with open(path, 'rb') as fh_:
+        content = fh_.read()
+    digest = hashlib.sha256(content).hexdigest()
+    with _LOCK:
+        entry = _CACHE.get(digest)
+    if entry is None:
+        entry = _load_disk(digest, opts)
+    if entry is None:
+        log.debug('Parsing profile %s', path)
+        entry = _pack(yaml.safe_load(content))
+        _save_disk(digest, entry, opts)
+
+    with _LOCK:
+        _CACHE[digest] = entry
+        _CACHE.move_to_end(digest)
+        _STATS[path] = (stat_key, digest)
+        while len(_CACHE) > max(opts.get('profile_cache_size', 256), 1):
+            _CACHE.popitem(last=False)
+    return _unpack(entry)
+
+
+def clear():
+    """
+    Forget all parsed profiles held in memory
+    """
+    with _LOCK:
+        _CACHE.clear()
+        _STATS.clear()
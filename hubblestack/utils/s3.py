@@ -3,18 +3,31 @@
 Connection library for Amazon S3
 
 :depends: requests
+
+Requests go through one ``requests.Session`` per thread, so connections to
+the S3 endpoint are kept alive and reused between queries. Downloads to a
+local file are streamed through a temporary file and only replace the local
+file once they are complete and match their Content-Length and MD5.
 """
 
 
+import functools
+import hashlib
 import logging
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
     HAS_REQUESTS = True  # pylint: disable=W0612
 except ImportError:
     HAS_REQUESTS = False  # pylint: disable=W0612
 
 import os
+import hubblestack.utils.atomicfile
 import hubblestack.utils.aws
 import hubblestack.utils.files
 import hubblestack.utils.hashutils
@@ -26,9 +39,41 @@ from hubblestack.exceptions import CommandExecutionError
 
 log = logging.getLogger(__name__)
 
+POOL_MAXSIZE = 10  # connections kept alive per thread and host
+BATCH_WORKERS = 8  # concurrent downloads in batch_get
+_MD5_RE = re.compile(r'^[0-9a-f]{32}$')
+_LOCAL = threading.local()
+
+
+def _session():
+    """
+    Return the requests session of the current thread. Sessions are not
+    shared between threads; each one keeps its own pool of connections.
+    """
+    session = getattr(_LOCAL, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _LOCAL.session = session
+    return session
+
+
+def _md5():
+    try:
+        return hashlib.md5(usedforsecurity=False)
+    except TypeError:
+        return hashlib.md5()
+
+
 def thirty_second_memoize(f):
     memo = dict()
+    @functools.wraps(f)
     def inner(*a, **kw):
+        if kw.get('local_file') and kw.get('method', 'GET') == 'GET':
+            # downloads write to disk, a memoized result would skip that
+            return f(*a, **kw)
         k = '-'.join([ str(x) for x in a ] + [ str(kw[x]) for x in sorted(kw) ])
         now = time.time()
         if k in memo:
@@ -47,8 +92,8 @@ def query(key, keyid, method='GET', params=None, headers=None,
           requesturl=None, return_url=False, bucket=None, service_url=None,
           path='', return_bin=False, action=None, local_file=None,
           verify_ssl=True, full_headers=False, kms_keyid=None,
-          location=None, role_arn=None, chunk_size=16384, path_style=False,
-          https_enable=True):
+          location=None, role_arn=None, chunk_size=65536, path_style=False,
+          https_enable=True, expected_md5=None):
     """
     Perform a query against an S3-like API. This function requires that a
     secret key and the id for that key are passed in. For instance:
@@ -96,6 +141,11 @@ def query(key, keyid, method='GET', params=None, headers=None,
 
     If region is not specified, an attempt to fetch the region from EC2 IAM
     metadata service will be made. Failing that, default is us-east-1
+
+    When ``local_file`` is given with a GET, the object is saved there. If
+    ``expected_md5`` is given (or else the ETag is a plain MD5) the download
+    is checked against it and CommandExecutionError is raised on a mismatch,
+    leaving ``local_file`` as it was.
     """
     if not HAS_REQUESTS:
         log.error('There was an error: requests is required for s3 access')
@@ -166,33 +216,19 @@ def query(key, keyid, method='GET', params=None, headers=None,
     if not data:
         data = None
 
+    # downloads to a file are streamed, the rest is read whole
+    stream = method == 'PUT' or (method == 'GET' and bool(local_file) and not return_bin)
     try:
-        if method == 'PUT':
-            if local_file:
-                fh = hubblestack.utils.files.fopen(local_file, 'rb')  # pylint: disable=resource-leakage
-                data = fh.read()  # pylint: disable=resource-leakage
-            result = requests.request(method,
-                                      requesturl,
-                                      headers=headers,
-                                      data=data,
-                                      verify=verify_ssl,
-                                      stream=True,
-                                      timeout=300)
-        elif method == 'GET' and local_file and not return_bin:
-            result = requests.request(method,
-                                      requesturl,
-                                      headers=headers,
-                                      data=data,
-                                      verify=verify_ssl,
-                                      stream=True,
-                                      timeout=300)
-        else:
-            result = requests.request(method,
-                                      requesturl,
-                                      headers=headers,
-                                      data=data,
-                                      verify=verify_ssl,
-                                      timeout=300)
+        if method == 'PUT' and local_file:
+            fh = hubblestack.utils.files.fopen(local_file, 'rb')  # pylint: disable=resource-leakage
+            data = fh.read()  # pylint: disable=resource-leakage
+        result = _session().request(method,
+                                    requesturl,
+                                    headers=headers,
+                                    data=data,
+                                    verify=verify_ssl,
+                                    stream=stream,
+                                    timeout=300)
     finally:
         if fh is not None:
             fh.close()
@@ -270,9 +306,7 @@ def query(key, keyid, method='GET', params=None, headers=None,
                 'Failed to get file=%s. {0}: {1}'.format(path, err_code, err_msg))
 
         log.debug('Saving to local file: %s', local_file)
-        with hubblestack.utils.files.fopen(local_file, 'wb') as out:
-            for chunk in result.iter_content(chunk_size=chunk_size):
-                out.write(chunk)
+        _save_to_file(result, local_file, chunk_size, expected_md5)
         return 'Saved to local file: {0}'.format(local_file)
 
     if result.status_code < 200 or result.status_code >= 300:
@@ -306,3 +340,75 @@ def query(key, keyid, method='GET', params=None, headers=None,
                 ret['headers'].append(header.strip())
 
     return ret
+
+
+def _save_to_file(result, local_file, chunk_size, expected_md5=None):
+    """
+    Stream the body of a GET response into ``local_file``, through a
+    temporary file that only replaces it once the body is complete and
+    checked
+    """
+    etag = result.headers.get('ETag', '').strip('"')
+    if expected_md5 is None and _MD5_RE.match(etag):
+        # the ETag is not the MD5 of the object with KMS or customer keys
+        encryption = result.headers.get('x-amz-server-side-encryption', '')
+        if not encryption.startswith('aws:kms') \
+                and 'x-amz-server-side-encryption-customer-algorithm' not in result.headers:
+            expected_md5 = etag
+    expected_size = result.headers.get('Content-Length')
+    # the MD5 and the size are those of the stored bytes, the file gets the
+    # decoded content
+    encoding = result.headers.get('Content-Encoding', '').strip().lower()
+    decoder = None
+    decode_content = False
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        # gzip or zlib header
+        decoder = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    elif encoding not in ('', 'identity'):
+        # let urllib3 decode it; the stored bytes can't be checked then
+        decode_content = True
+        expected_md5 = expected_size = None
+
+    md5 = _md5()
+    size = 0
+    try:
+        with hubblestack.utils.atomicfile.atomic_open(local_file, 'wb') as out:
+            for chunk in result.raw.stream(chunk_size, decode_content=decode_content):
+                md5.update(chunk)
+                size += len(chunk)
+                out.write(decoder.decompress(chunk) if decoder is not None else chunk)
+            if decoder is not None:
+                out.write(decoder.flush())
+            if expected_size is not None and size != int(expected_size):
+                raise CommandExecutionError(
+                    'Incomplete download of {0}: {1} of {2} octets'.format(local_file, size, expected_size))
+            if expected_md5 and md5.hexdigest() != expected_md5:
+                raise CommandExecutionError(
+                    'Download of {0} does not match its MD5 {1}'.format(local_file, expected_md5))
+    finally:
+        result.close()
+
+
+def batch_get(items, workers=BATCH_WORKERS, **kwargs):
+    """
+    Download several objects concurrently. ``items`` is a list of dicts of
+    :func:`query` arguments (``bucket``, ``path``, ``local_file``,
+    ``expected_md5``...), each one added to the common ``kwargs``.
+
+    Returns the results of the queries in the order of ``items``; a query
+    that raised has the exception as its result.
+    """
+    def _get(item):
+        args = dict(kwargs)
+        args.update(item)
+        args['method'] = 'GET'
+        try:
+            return query(**args)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error('Failed to get %s from bucket %s: %s', args.get('path'), args.get('bucket'), exc)
+            return exc
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+        return list(pool.map(_get, items))
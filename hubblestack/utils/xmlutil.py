@@ -26,7 +26,7 @@ def _to_dict(xmltree):
     '''
     # If this object has no children, the for..loop below will return nothing
     # for it, so just return a single dict representing it.
-    if len(xmltree.getchildren()) < 1:
+    if len(xmltree) < 1:
         name = _conv_name(xmltree.tag)
         return {name: xmltree.text}
 
@@ -35,7 +35,7 @@ def _to_dict(xmltree):
         name = _conv_name(item.tag)
 
         if name not in xmldict:
-            if len(item.getchildren()) > 0:
+            if len(item) > 0:
                 xmldict[name] = _to_dict(item)
             else:
                 xmldict[name] = item.text
@@ -58,7 +58,7 @@ def _to_full_dict(xmltree):
     for attrName, attrValue in xmltree.attrib.items():
         xmldict[attrName] = attrValue
 
-    if len(xmltree.getchildren()) < 1:
+    if len(xmltree) < 1:
         if len(xmldict) == 0:
             # If we don't have attributes, we should return the value as a string
             # ex: <entry>test</entry>
@@ -7,6 +7,7 @@ import uuid
 
 # Import Hubble Libs
 import hubblestack.modules.iptables as iptables
+from hubblestack.exceptions import CommandExecutionError
 
 # Import Hubble Testing Libs
 from tests.support.mixins import LoaderModuleMockMixin
@@ -454,6 +455,60 @@ class IptablesTestCase(TestCase, LoaderModuleMockMixin):
                         )
                     )
 
+    # 'ruleset' function tests: 1
+
+    def test_ruleset(self):
+        """
+        Test that rules are checked against one iptables-save snapshot
+        """
+        save = (
+            "*filter\n"
+            ":INPUT DROP [0:0]\n"
+            ":FORWARD ACCEPT [0:0]\n"
+            "-A INPUT -p tcp -m state --state RELATED,ESTABLISHED -m tcp --dport 22 -j ACCEPT\n"
+            "-A INPUT -s 10.0.0.1/32 -p icmp -j REJECT --reject-with icmp-port-unreachable\n"
+            "COMMIT\n"
+        )
+        mock_cmd = MagicMock(return_value={"retcode": 0, "stdout": save, "stderr": ""})
+        with patch.object(iptables, "_iptables_cmd", MagicMock(return_value="iptables")):
+            with patch.dict(iptables.__mods__, {"cmd.run_all": mock_cmd}):
+                ruleset = iptables.ruleset()
+        mock_cmd.assert_called_once_with("iptables-save", output_loglevel="quiet")
+        self.assertEqual(ruleset["filter"]["INPUT"]["policy"], "DROP")
+
+        with patch.dict(iptables.__mods__, {"cmd.run": MagicMock(side_effect=AssertionError)}):
+            self.assertTrue(
+                iptables.check(
+                    table="filter",
+                    chain="INPUT",
+                    rule="-m state --state ESTABLISHED,RELATED -p tcp --dport ssh -j ACCEPT",
+                    ruleset=ruleset,
+                )
+            )
+            self.assertTrue(
+                iptables.check(
+                    table="filter", chain="INPUT", rule="-p 1 --source 10.0.0.1 -j REJECT", ruleset=ruleset
+                )
+            )
+            self.assertFalse(
+                iptables.check(table="filter", chain="INPUT", rule="-p tcp --dport 23 -j ACCEPT", ruleset=ruleset)
+            )
+            self.assertFalse(
+                iptables.check(table="filter", chain="OUTPUT", rule="-p tcp --dport 22 -j ACCEPT", ruleset=ruleset)
+            )
+
+    def test_ruleset_failed_dump(self):
+        """
+        Test that a failed or empty iptables-save is an error, not an empty ruleset
+        """
+        failed = {"retcode": 1, "stdout": "", "stderr": "iptables-save: Permission denied\n"}
+        with patch.object(iptables, "_iptables_cmd", MagicMock(return_value="iptables")):
+            with patch.dict(iptables.__mods__, {"cmd.run_all": MagicMock(return_value=failed)}):
+                self.assertRaisesRegex(CommandExecutionError, "Permission denied", iptables.ruleset)
+            empty = {"retcode": 0, "stdout": "", "stderr": ""}
+            with patch.dict(iptables.__mods__, {"cmd.run_all": MagicMock(return_value=empty)}):
+                self.assertRaisesRegex(CommandExecutionError, "no tables", iptables.ruleset)
+
     # 'check_chain' function tests: 1
 
     def test_check_chain(self):
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import hubblestack.module_runner.comparator
+import hubblestack.module_runner.runner
+from hubblestack.audit import bexpr
+from hubblestack.module_runner.audit_runner import AuditRunner
+from hubblestack.module_runner.runner_utils import CheckResultStore
+
+
+@pytest.fixture(autouse=True)
+def hmods(monkeypatch):
+    hmods = {'bexpr.{0}'.format(name): getattr(bexpr, name)
+             for name in ('validate_params', 'execute', 'get_filtered_params_to_log', 'get_failure_reason',
+                          'get_referred_checks')}
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__hmods__', hmods, raising=False)
+    monkeypatch.setattr(hubblestack.module_runner.comparator, 'run',
+                        lambda check_id, comparator, result, status: (status and result['result'], 'not matched'))
+    return hmods
+
+
+def _check(audit_id, result):
+    return {'check_unique_id': audit_id, 'check_result': result}
+
+
+def _bexpr(audit_id, expr):
+    return {'check_unique_id': audit_id,
+            'check_id': audit_id,
+            'audit_data': {'tag': audit_id, 'description': audit_id},
+            'audit_impl': {'module': 'bexpr', 'filter': {}, 'items': [{'args': {'expr': expr}, 'comparator': {}}]}}
+
+
+def _results(result_list):
+    return [(result['check_unique_id'], result['check_result']) for result in result_list]
+
+
+def test_check_result_store():
+    store = CheckResultStore([_check('a', 'Success'), _check('a', 'Failure')])
+    store += [_check('b', 'Failure')]
+    store.append(_check('c', 'Error'))
+    assert len(store) == 4
+    assert store.find('a')['check_result'] == 'Success'
+    assert store.find('b')['check_result'] == 'Failure'
+    assert store.find('c')['check_result'] == 'Error'
+    assert store.find('d') is None
+
+
+def test_bexpr_referred_checks():
+    assert bexpr.get_referred_checks('x', {'args': {'expr': 'a AND (NOT b OR c)'}}) == ['a', 'b', 'c']
+    with pytest.raises(Exception):
+        # every referred check is looked up, not only the last one
+        bexpr.execute('x', {'args': {'expr': 'missing AND a'}}, {'extra_args': [_check('a', 'Success')]})
+
+
+def test_nested_boolean_expressions():
+    result_list = CheckResultStore([_check('a', 'Success'), _check('b', 'Failure')])
+    # referring to boolean expressions defined later in the profile
+    checks = [_bexpr('top', 'both OR either'),
+              _bexpr('both', 'a AND b'),
+              _bexpr('either', 'a OR b'),
+              _bexpr('last', 'NOT top')]
+    ret = AuditRunner()._evaluate_boolean_expression(checks, False, 'profile', result_list)
+    assert _results(ret) == [('both', 'Failure'), ('either', 'Success'), ('top', 'Success'),
+                             ('last', 'Failure')]
+    assert _results(result_list)[2:] == _results(ret)
+
+
+def test_boolean_expression_cycle():
+    result_list = CheckResultStore([_check('a', 'Success')])
+    checks = [_bexpr('x', 'a AND y'),
+              _bexpr('y', 'x'),
+              _bexpr('z', 'a'),
+              _bexpr('w', 'x OR a')]
+    ret = AuditRunner()._evaluate_boolean_expression(checks, False, 'profile', result_list)
+    assert _results(ret) == [('z', 'Success'), ('x', 'Error'), ('y', 'Error'), ('w', 'Error')]
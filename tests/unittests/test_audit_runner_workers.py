@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+
+import hubblestack.module_runner.audit_runner as audit_runner
+import hubblestack.module_runner.comparator
+import hubblestack.module_runner.runner
+from hubblestack.audit import bexpr
+from hubblestack.module_runner.audit_runner import AuditRunner
+
+DELAY = 0.2
+
+
+class Running(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.now = {}
+        self.peak = {}
+        self.started = 0
+        # checks in flight when each check started
+        self.in_flight = []
+        # called by every check once it is running
+        self.gate = lambda: None
+
+    def __call__(self, module):
+        def execute(block_id, block_dict, extra_args=None):
+            with self.lock:
+                self.started += 1
+                self.in_flight.append(sum(self.now.values()))
+                self.now[module] = self.now.get(module, 0) + 1
+                self.peak[module] = max(self.peak.get(module, 0), self.now[module])
+            self.gate()
+            time.sleep(DELAY)
+            with self.lock:
+                self.now[module] -= 1
+            return True, {'result': block_dict['args']['result']}
+        return execute
+
+
+@pytest.fixture
+def running(monkeypatch):
+    running = Running()
+    hmods = {}
+    for module in ('command', 'osquery'):
+        hmods[module + '.validate_params'] = lambda *args: None
+        hmods[module + '.execute'] = running(module)
+        hmods[module + '.get_filtered_params_to_log'] = lambda *args: {}
+        hmods[module + '.get_failure_reason'] = lambda *args: 'failed'
+    for name in ('validate_params', 'execute', 'get_filtered_params_to_log', 'get_failure_reason',
+                 'get_referred_checks'):
+        hmods['bexpr.' + name] = getattr(bexpr, name)
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__hmods__', hmods)
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__grains__', {'hubble_version': '4.0.0'}, raising=False)
+    monkeypatch.setattr(audit_runner, '__mods__', {'match.compound': lambda target: True}, raising=False)
+    monkeypatch.setattr(audit_runner, '__opts__', {})
+    monkeypatch.setattr(hubblestack.module_runner.comparator, 'run',
+                        lambda check_id, comparator, result, status: (status and result['result'], 'not matched'))
+    return running
+
+
+def _check(module, result, hubble_version=''):
+    return {'description': 'check', 'tag': 'TAG',
+            'implementations': [{'filter': {'grains': '*'}, 'module': module, 'hubble_version': hubble_version,
+                                 'items': [{'args': {'result': result}, 'comparator': {'type': 'boolean'}}]}]}
+
+
+def _profile():
+    profile = {}
+    for i in range(6):
+        profile['command{0}'.format(i)] = _check('command', i % 2 == 0)
+    profile['old'] = _check('command', True, '<1.0')
+    for i in range(3):
+        profile['osquery{0}'.format(i)] = _check('osquery', True)
+    profile['all'] = {'description': 'bexpr', 'tag': 'TAG',
+                      'implementations': [{'filter': {'grains': '*'}, 'module': 'bexpr',
+                                           'items': [{'args': {'expr': 'command0 AND osquery2'},
+                                                      'comparator': {'type': 'boolean'}}]}]}
+    return profile
+
+
+def _results(ret):
+    return [(result['check_unique_id'], result['check_result']) for result in ret]
+
+
+def test_sequential_and_parallel_results_match(running):
+    start = time.time()
+    expected = _results(AuditRunner()._execute(_profile(), 'profile.yaml', {}))
+    assert time.time() - start >= DELAY * 9
+    assert running.peak == {'command': 1, 'osquery': 1}
+    assert expected[6] == ('old', 'Skipped')
+    assert expected[-1] == ('all', 'Success')
+
+    audit_runner.__opts__.update({'audit_workers': 8, 'audit_module_workers': {'osquery': 2}})
+    running.peak.clear()
+    start = time.time()
+    assert _results(AuditRunner()._execute(_profile(), 'profile.yaml', {})) == expected
+    assert time.time() - start < DELAY * 4
+    assert running.peak['command'] > 2
+    assert running.peak['osquery'] == 2
+
+
+def test_load_budget(running, monkeypatch):
+    audit_runner.__opts__.update({'audit_workers': 8, 'audit_max_load': 0.5})
+    monkeypatch.setattr(audit_runner.os, 'getloadavg', lambda: (1000.0, 0, 0), raising=False)
+    AuditRunner()._execute(_profile(), 'profile.yaml', {})
+    assert running.peak == {'command': 1, 'osquery': 1}
+
+
+def test_load_budget_waits_for_checks_in_flight(running, monkeypatch):
+    audit_runner.__opts__.update({'audit_workers': 4, 'audit_max_load': 0.5})
+    # the host goes over budget once the first four checks are all running
+    over = threading.Event()
+    first = threading.Barrier(4, action=over.set)
+    def gate():
+        if not over.is_set():
+            first.wait(5)
+    running.gate = gate
+    monkeypatch.setattr(audit_runner.os, 'getloadavg',
+                        lambda: (1000.0 if over.is_set() else 0.0, 0, 0), raising=False)
+    AuditRunner()._execute(_profile(), 'profile.yaml', {})
+    assert len(running.in_flight) == 9
+    # the checks started after that waited for the first ones to finish
+    assert running.in_flight[4:] == [0] * 5
@@ -0,0 +1,88 @@
+# coding: utf-8
+
+import threading
+import time
+
+import pytest
+
+import hubblestack.module_runner.runner
+import hubblestack.modules.fdg
+from hubblestack.module_runner.fdg_runner import FdgRunner, xpipe_map
+
+BLOCKS = {
+    'main': {'module': 'fake', 'args': {'value': [3, 1, 2, 3, 1]}, 'xpipe_workers': 4, 'xpipe': 'double'},
+    'double': {'module': 'fake', 'args': {'double': True}, 'memoize': True},
+}
+
+
+class Calls(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chained = []
+        self.active = 0
+        self.most_active = 0
+
+    def run(self, args, chained):
+        with self.lock:
+            self.chained.append(chained)
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        try:
+            if args.get('double'):
+                # slow enough for the iterations to overlap
+                time.sleep(0.05)
+                return True, chained * 2
+            return True, args['value']
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def calls():
+    return Calls()
+
+
+def test_fdg_runner_xpipe_workers(calls, monkeypatch):
+    def execute(block_id, block, extra_args):
+        chaining_args = extra_args['chaining_args']
+        status, ret = calls.run(block['args'], chaining_args['result'] if chaining_args else None)
+        return status, {'result': ret}
+
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__hmods__',
+                        {'fake.validate_params': lambda *args: None, 'fake.execute': execute}, raising=False)
+    _, ret = FdgRunner()._execute(BLOCKS, 'test.fdg', {})
+    assert ret == [(6, True), (2, True), (4, True), (6, True), (2, True)]
+    # the memoized block ran once per distinct chained value, concurrently
+    assert sorted(calls.chained[1:]) == [1, 2, 3]
+    assert calls.most_active > 1
+
+
+def test_fdg_legacy_xpipe_workers(calls, monkeypatch):
+    legacy = {name: {k: v for k, v in block.items() if k != 'args'} for name, block in BLOCKS.items()}
+    for name, block in BLOCKS.items():
+        legacy[name]['kwargs'] = block['args']
+        legacy[name]['module'] = 'fake.run'
+
+    def run(chained=None, chained_status=None, **kwargs):
+        return calls.run(kwargs, chained)
+
+    monkeypatch.setattr(hubblestack.modules.fdg, '__fdg__', {'fake.run': run})
+    ret = hubblestack.modules.fdg._fdg_execute('main', legacy)
+    assert ret == [(6, True), (2, True), (4, True), (6, True), (2, True)]
+    assert sorted(calls.chained[1:]) == [1, 2, 3]
+
+
+def test_xpipe_map():
+    threads = set()
+
+    def func(value):
+        threads.add(threading.current_thread().name)
+        # nested xpipes run in the worker thread
+        return value, xpipe_map(lambda _: threading.current_thread().name, range(3), 4)
+
+    ret = xpipe_map(func, range(6), 3)
+    assert [value for value, _ in ret] == list(range(6))
+    assert all(len(set(names)) == 1 for _, names in ret)
+    assert len(threads) <= 3
+    assert xpipe_map(str, [1, 2], 'many') == ['1', '2']
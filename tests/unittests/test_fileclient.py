@@ -0,0 +1,72 @@
+# coding: utf-8
+
+import os
+
+import pytest
+
+import hubblestack.fileclient
+import hubblestack.utils.hashutils
+
+
+@pytest.fixture
+def roots_client(__opts__, tmp_path):
+    root = tmp_path / 'root'
+    (root / 'prof' / 'sub').mkdir(parents=True)
+    for name in ('prof/a.yaml', 'prof/sub/b.yaml', 'other.txt'):
+        (root / name).write_text(name)
+    __opts__.update(cachedir=str(tmp_path / 'cache'), file_roots={'base': [str(root)]},
+                    file_client='local', fileserver_backend=['roots'], fileserver_list_cache_time=0,
+                    cache_dir_workers=2)
+    cache = tmp_path / 'cache' / 'files' / 'base'
+
+    def client():
+        return hubblestack.fileclient.get_file_client(__opts__)
+    return root, cache, client
+
+
+def test_cache_dir_bulk(roots_client, monkeypatch):
+    root, cache, client = roots_client
+    ret = client().cache_dir('salt://prof')
+    assert sorted(ret) == [str(cache / 'prof' / 'a.yaml'), str(cache / 'prof' / 'sub' / 'b.yaml')]
+    assert not (cache / 'other.txt').exists()
+
+    (root / 'prof' / 'a.yaml').write_text('changed')
+    (root / 'prof' / 'sub' / 'b.yaml').unlink()
+    (root / 'prof' / 'c.yaml').write_text('new')
+
+    fetched = []
+    hashed = []
+    real_get_file = hubblestack.fileclient.RemoteClient.get_file
+    real_get_hash = hubblestack.utils.hashutils.get_hash
+
+    def get_file(self, path, *args, **kwargs):
+        fetched.append(path)
+        return real_get_file(self, path, *args, **kwargs)
+
+    def get_hash(path, *args, **kwargs):
+        hashed.append(path)
+        return real_get_hash(path, *args, **kwargs)
+
+    monkeypatch.setattr(hubblestack.fileclient.RemoteClient, 'get_file', get_file)
+    monkeypatch.setattr(hubblestack.utils.hashutils, 'get_hash', get_hash)
+
+    ret = client().cache_dir('salt://prof')
+    assert sorted(ret) == [str(cache / 'prof' / 'a.yaml'), str(cache / 'prof' / 'c.yaml')]
+    assert sorted(fetched) == ['salt://prof/a.yaml', 'salt://prof/c.yaml']
+    assert (cache / 'prof' / 'a.yaml').read_text() == 'changed'
+    assert not (cache / 'prof' / 'sub' / 'b.yaml').exists()
+
+    # unchanged cached copies are trusted from the manifest, not re-hashed
+    del fetched[:]
+    del hashed[:]
+    client().cache_dir('salt://prof')
+    assert fetched == []
+    assert not [path for path in hashed if path.startswith(str(cache))]
+
+
+def test_cache_dir_bulk_repairs_local_edits(roots_client):
+    root, cache, client = roots_client
+    client().cache_dir('salt://prof')
+    (cache / 'prof' / 'a.yaml').write_text('tampered with')
+    client().cache_dir('salt://prof')
+    assert (cache / 'prof' / 'a.yaml').read_text() == 'prof/a.yaml'
@@ -3,7 +3,7 @@
 import pytest
 import os
 
-from hubblestack.hec.dq import DiskQueue
+from hubblestack.hec.dq import DiskQueue, BATCH_MAGIC, _BATCH_HEADER, available_codecs
 from hubblestack.hec.dq import QueueTypeError, QueueCapacityError
 
 TEST_DQ_DIR = os.environ.get('TEST_DQ_DIR', '/tmp/dq.{0}'.format(os.getuid()))
@@ -77,3 +77,65 @@ def test_disk_queue_put_estimator(dq):
         dq._count()
         more = dq.cn, dq.sz
         assert post == more
+
+@pytest.mark.parametrize('codec', available_codecs())
+def test_disk_queue_codecs(codec, tmp_path):
+    directory = str(tmp_path / 'dq')
+    dq = DiskQueue(directory, codec=codec, batch_size=38)
+    items = ['{{"event": "item-{0}"}}'.format(i) for i in range(10)]
+    for i, item in enumerate(items):
+        dq.put(item, seq=i)
+    # 10 items, compacted every 2 of them
+    assert dq.cn == 10
+    assert len(list(dq.files)) == 5
+    assert all(open(fname, 'rb').read().startswith(BATCH_MAGIC) for fname in dq.files)
+
+    assert dq.peek() == (items[0], {'seq': 0})
+    assert dq.get() == (items[0], {'seq': 0})
+    dq.pop()
+    assert dq.cn == 8
+    assert dq.getz(len(items[2]) * 3 + 2) == (' '.join(items[2:5]), {'seq': 4})
+
+    # what was taken out of a batch stays out after a restart
+    dq = DiskQueue(directory, codec=codec, batch_size=38)
+    assert dq.cn == 5
+    assert [ dat.decode() for dat, _ in dq.iter_peek() ] == items[5:]
+    assert dq.getz() == (' '.join(items[5:]), {'seq': 9})
+    assert dq.cn == dq.sz == 0
+    assert list(dq.files) == []
+
+def test_disk_queue_codec_reads_old_queues(tmp_path):
+    directory = str(tmp_path / 'dq')
+    dq = DiskQueue(directory, compression=9)
+    dq.put('one', seq=1)
+    dq.put('two', seq=2)
+    dq = DiskQueue(directory, codec='zlib', batch_size=1)
+    dq.put('three', seq=3)
+    assert dq.cn == 3
+    assert dq.getz() == ('one two three', {'seq': 3})
+
+def test_disk_queue_unreadable_batch(tmp_path):
+    directory = str(tmp_path / 'dq')
+    dq = DiskQueue(directory, codec='zlib', batch_size=1)
+    dq.put('one')
+    dq.put('two')
+    first = next(dq.files)
+    with open(first, 'r+b') as fh:
+        fh.seek(_BATCH_HEADER.size)
+        fh.write(b'garbage')
+    assert dq.get() == ('two', {})
+    assert os.path.isfile(first + '.bad')
+    assert dq.cn == 0
+
+def test_disk_queue_seq_survives_restart(tmp_path):
+    directory = str(tmp_path / 'dq')
+    dq = DiskQueue(directory)
+    for item in ('one', 'two', 'three'):
+        dq.put(item)
+    dq.get()
+    dq.get()
+    dq = DiskQueue(directory)
+    assert dq.cn == 1
+    assert dq._seq == 3
+    dq.put('four')
+    assert dq.getz() == ('three four', {})
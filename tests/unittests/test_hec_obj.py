@@ -38,3 +38,13 @@ def test_queue_things_with_compression(mock_send, __opts__, __mods__):
     cat_gz = ' '.join(gz)
 
     assert cat_rez == cat_gz
+
+def test_hec__send_non_ascii():
+    hec = HEC('token', 'index', 'server', host='test-host')
+    with mock.patch.object(hec.pool_manager, 'request') as request:
+        request.return_value = mock.Mock(status=200)
+        hec._send(json.dumps({'event': {'test': 'caf\xe9 \u4e2d'}}, ensure_ascii=False))
+    body = request.call_args.kwargs['body']
+    assert isinstance(body, bytes)
+    assert json.loads(body.decode('utf-8'))['event']['test'] == 'caf\xe9 \u4e2d'
+    assert 'charset=utf-8' in request.call_args.kwargs['headers']['Content-Type']
@@ -216,7 +216,7 @@ def _both_platforms(opts, for_real=False):
     assert opts['file_client'] == 'local'
     assert opts['fileserver_update_frequency'] == 43200  # 12 hours
     assert opts['grains_refresh_frequency'] == 3600  # 1 hour
-    assert opts['scheduler_sleep_frequency'] == 0.5
+    assert 'scheduler_sleep_frequency' not in opts
     assert opts['default_include'] == 'hubble.d/*.conf'
     assert opts['logfile_maxbytes'] == 100000000  # 100MB
     assert opts['logfile_backups'] == 1  # maximum rotated logs
@@ -274,3 +274,10 @@ def test_linux_for_real_kindof():
     assert opts['osquerylog_backupdir'] == '/var/log/hubble_osquery/backuplogs'
 
     _both_platforms(opts, for_real=True)
+
+def test_scheduler_sleep_frequency_is_ignored():
+    with mock.patch.object(hubblestack.config, 'log') as config_log:
+        opts = hubblestack.config.apply_config({'scheduler_sleep_frequency': 0.5}, minion_id='test-minion')
+    assert opts['scheduler_max_sleep'] == 60
+    warnings = [call[0][0] for call in config_log.warning.call_args_list]
+    assert any("'scheduler_sleep_frequency' config option is no longer used" in msg for msg in warnings)
@@ -34,3 +34,135 @@ def test_can_find_hubblestack_module_file(module_dirs):
 
 def test_can_find_hubblestack_module(__mods__):
     assert 'pulsar.canary' in __mods__
+
+def test_grain_runner_runs_concurrently_and_times_out():
+    import time
+
+    def slow():
+        time.sleep(0.5)
+        return {'slow': True}
+
+    def hung():
+        time.sleep(30)
+        return {'hung': True}
+
+    funcs = {'a.slow': slow, 'b.slow': slow, 'c.hung': hung}
+    runner = L._GrainRunner(funcs, workers=4, timeout=1)
+    t0 = time.time()
+    ret = runner.run(['a.slow', 'b.slow', 'c.hung'])
+    assert time.time() - t0 < 5
+    assert ret == {'a.slow': {'slow': True}, 'b.slow': {'slow': True}}
+
+def test_grain_runner_ttl_cache():
+    calls = []
+
+    def counted():
+        calls.append(1)
+        return {'counted': len(calls)}
+
+    L.GRAINS_TTL_CACHE.clear()
+    runner = L._GrainRunner({'x.counted': counted, 'y.counted': counted},
+        ttls={'x.*': 3600})
+    assert runner.run(['x.counted'])['x.counted'] == {'counted': 1}
+    assert runner.run(['x.counted'])['x.counted'] == {'counted': 1}
+    assert runner.run(['y.counted'])['y.counted'] == {'counted': 2}
+    assert runner.run(['y.counted'])['y.counted'] == {'counted': 3}
+    L.GRAINS_TTL_CACHE.clear()
+
+def test_grain_runner_skips_hung_grains():
+    import threading
+
+    calls = []
+    release = threading.Event()
+
+    def hung(grains):
+        calls.append(1)
+        release.wait(30)
+        return {'hung': True}
+
+    grains = {'core': 1}
+    runner = L._GrainRunner({'h.hung': hung}, timeout=0.2)
+    assert runner.run(['h.hung'], grains=grains) == {}
+    assert runner.run(['h.hung'], grains=grains) == {}
+    assert len(calls) == 1
+    job = L.GRAINS_ABANDONED['h.hung']
+    release.set()
+    job.join(5)
+    assert runner.run(['h.hung'], grains={}) == {'h.hung': {'hung': True}}
+    assert len(calls) == 2
+    assert 'h.hung' not in L.GRAINS_ABANDONED
+
+def test_grain_runner_passes_kwargs():
+    def needs_grains(grains):
+        return {'seen': grains['core']}
+
+    runner = L._GrainRunner({'d.needs_grains': needs_grains})
+    assert runner.run(['d.needs_grains'], grains={'core': 1}) == {'d.needs_grains': {'seen': 1}}
+
+def test_dependent_grains_see_each_other(__opts__, tmp_path, monkeypatch):
+    def core():
+        return {'core': 1}
+
+    def first(grains):
+        return {'first': grains['core'] + 1}
+
+    def second(grains):
+        return {'second': grains.get('first')}
+
+    __opts__['cachedir'] = str(tmp_path)
+    monkeypatch.setattr(L, 'grain_funcs', lambda opts: {
+        'core.core': core, 'a.first': first, 'b.second': second})
+    ret = L.grains(__opts__)
+    assert (ret['core'], ret['first'], ret['second']) == (1, 2, 2)
+
+def test_dependent_grains_get_a_copy(__opts__, tmp_path, monkeypatch):
+    def core():
+        return {'core': 1}
+
+    def meddler(grains):
+        grains['core'] = 'changed'
+        raise RuntimeError('failed after touching the grains')
+
+    __opts__['cachedir'] = str(tmp_path)
+    monkeypatch.setattr(L, 'grain_funcs', lambda opts: {'core.core': core, 'm.meddler': meddler})
+    assert L.grains(__opts__)['core'] == 1
+
+def test_cached_grains(__opts__, tmp_path):
+    import hubblestack.payload
+
+    __opts__['cachedir'] = str(tmp_path)
+    __opts__['grains_volatile'] = ['hubble_process.grains']
+    assert L.cached_grains(__opts__) is None
+
+    with open(os.path.join(str(tmp_path), 'grains.cache.p'), 'wb') as fh:
+        hubblestack.payload.Serial(__opts__).dump({'id': 'cached-id', 'pid': -1}, fh)
+    cached = L.cached_grains(__opts__)
+    assert cached['id'] == 'cached-id'
+    assert cached['pid'] == os.getpid()
+
+    __opts__['grains_warm_start_max_age'] = 1
+    os.utime(os.path.join(str(tmp_path), 'grains.cache.p'), (0, 0))
+    assert L.cached_grains(__opts__) is None
+
+def test_background_grains_refresh_starts_once(monkeypatch):
+    import threading
+
+    release = threading.Event()
+    calls = []
+
+    def slow_grains(opts):
+        calls.append(1)
+        release.wait(10)
+        return {'fresh': True}
+
+    monkeypatch.setattr(L, 'grains', slow_grains)
+    D.BACKGROUND_GRAINS.clear()
+    assert D._start_background_grains_refresh()
+    thread = D.BACKGROUND_GRAINS['thread']
+    assert not D._start_background_grains_refresh()
+    assert D._take_background_grains() == (None, False)
+    release.set()
+    thread.join(10)
+    assert D._take_background_grains() == ({'fresh': True}, False)
+    assert D.BACKGROUND_GRAINS == {}
+    assert len(calls) == 1
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import hubblestack.modules.nebula_osquery as nebula_osquery
+import hubblestack.utils.nebula_snapshots as nebula_snapshots
+
+
+@pytest.fixture
+def opts(tmp_path, monkeypatch):
+    opts = {'cachedir': str(tmp_path), 'nebula_snapshot_interval': 100}
+    monkeypatch.setattr(nebula_osquery, '__opts__', opts, raising=False)
+    return opts
+
+
+QUERY_DATA = {
+    'packages': {'query': 'select name, version from deb_packages', 'differential': True},
+    'uptime': {'query': 'select * from uptime'},
+}
+
+
+def _run(rows, now, query_data=None, verbose=False, published=True):
+    if verbose:
+        ret = [{'query_name': 'packages', 'query_result': {'result': True, 'data': rows}}]
+    else:
+        ret = [{'packages': {'result': True, 'data': rows}}, {'uptime': {'result': True, 'data': [{'s': now}]}}]
+    time_ = nebula_osquery.time.time
+    nebula_osquery.time.time = lambda: now
+    try:
+        ret = nebula_osquery._differential_results(ret, query_data or QUERY_DATA, 'day')
+    finally:
+        nebula_osquery.time.time = time_
+    if published:
+        nebula_snapshots.commit({'fun': 'nebula.queries', 'fun_args': ['day'], 'return': ret},
+                                nebula_osquery.__opts__)
+    if verbose:
+        return ret[0]['query_result']['data']
+    assert ret[1]['uptime']['data'] == [{'s': now}]
+    return sorted((row['_action'], row['name'], row['version']) for row in ret[0]['packages']['data'])
+
+
+def _pkg(name, version, time_='t'):
+    return {'name': name, 'version': version, '_time': time_}
+
+
+def test_differential_rows(opts):
+    rows = [_pkg('bash', '5.0'), _pkg('curl', '7.1'), _pkg('curl', '7.1')]
+    assert _run(rows, 1000) == [('snapshot', 'bash', '5.0'), ('snapshot', 'curl', '7.1'),
+                                ('snapshot', 'curl', '7.1')]
+    assert os.path.isfile(os.path.join(opts['cachedir'], 'nebula_snapshots', 'day', 'packages.json.z'))
+
+    # the _time column is ignored
+    assert _run([_pkg('bash', '5.0', 'later'), _pkg('curl', '7.1'), _pkg('curl', '7.1')], 1010) == []
+
+    assert _run([_pkg('bash', '5.1'), _pkg('curl', '7.1'), _pkg('vim', '8')], 1020) == [
+        ('added', 'bash', '5.1'), ('added', 'vim', '8'), ('removed', 'bash', '5.0'), ('removed', 'curl', '7.1')]
+
+    # periodic snapshot
+    assert [row[0] for row in _run([_pkg('bash', '5.1')], 1100)] == ['snapshot']
+
+
+def test_differential_unpublished_run_is_sent_again(opts):
+    _run([_pkg('bash', '5.0')], 1000)
+    path = os.path.join(opts['cachedir'], 'nebula_snapshots', 'day', 'packages.json.z')
+    assert not os.path.exists(path + nebula_snapshots.PENDING_SUFFIX)
+    assert _run([_pkg('bash', '5.1')], 1010, published=False) == [('added', 'bash', '5.1'), ('removed', 'bash', '5.0')]
+    assert os.path.isfile(path + nebula_snapshots.PENDING_SUFFIX)
+    assert _run([_pkg('bash', '5.1')], 1020) == [('added', 'bash', '5.1'), ('removed', 'bash', '5.0')]
+    assert _run([_pkg('bash', '5.1')], 1030) == []
+
+
+def test_commit_by_keyword_query_group(opts):
+    ret = [{'packages': {'result': True, 'data': [_pkg('bash', '5.0')]}}]
+    nebula_osquery._differential_results(ret, QUERY_DATA, 'day')
+    path = nebula_snapshots.snapshot_path(opts, 'day', 'packages')
+    nebula_snapshots.commit({'fun': 'nebula.osqueryd_monitor', 'fun_args': ['day'], 'return': ret}, opts)
+    assert not os.path.exists(path)
+    nebula_snapshots.commit({'fun': 'nebula.queries', 'fun_args': [{'query_group': 'day'}], 'return': ret}, opts)
+    assert os.path.isfile(path)
+
+
+def test_differential_query_changed(opts):
+    _run([_pkg('bash', '5.0')], 1000)
+    assert _run([_pkg('bash', '5.0')], 1010) == []
+    query_data = {'packages': dict(QUERY_DATA['packages'], query='select * from deb_packages')}
+    assert _run([_pkg('bash', '5.0')], 1020, query_data) == [('snapshot', 'bash', '5.0')]
+
+
+def test_differential_verbose_and_default(opts):
+    opts['nebula_snapshot_interval'] = 0
+    assert _run([_pkg('bash', '5.0')], 1000, verbose=True)[0]['_action'] == 'snapshot'
+    assert _run([_pkg('bash', '5.0')], 999999, verbose=True) == []
+
+    # not differential unless configured
+    query_data = {'packages': {'query': 'select 1'}}
+    ret = [{'packages': {'result': True, 'data': [_pkg('bash', '5.0')]}}]
+    assert nebula_osquery._differential_results(ret, query_data, 'day')[0]['packages']['data'] == [
+        _pkg('bash', '5.0')]
+    opts['nebula_differential'] = True
+    assert nebula_osquery._differential_results(ret, query_data, 'day')[0]['packages']['data'][0][
+        '_action'] == 'snapshot'
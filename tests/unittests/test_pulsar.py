@@ -558,3 +558,41 @@ class TestPulsar2(object):
 
         assert set4 == set([self.atfile])
         assert levents4 == 3
+
+    @skipIf(not hubblestack.utils.platform.is_linux(), "System is not Linux")
+    def test_offline_changes(self):
+        baseline_db = self.tdir + '.baseline'
+        if os.path.exists(baseline_db):
+            os.unlink(baseline_db)
+        self.reset(**{self.atdir: {}})
+        pulsar.__opts__.update({'pulsar_baseline': True, 'pulsar_baseline_db': baseline_db})
+        os.mkdir(self.tdir)
+        self.mk_more_files(2)
+        self.process()
+        assert self.get_clear_events() == []
+
+        with open(self.more_fname(0), 'a') as fh:
+            fh.write('supz\n')
+        self.process()
+        assert self.get_clear_events() == ['IN_MODIFY({})'.format(os.path.abspath(self.more_fname(0)))]
+
+        # changes made while hubble is stopped
+        pulsar.__context__['pulsar.baseline'].close()
+        pulsar.__context__ = {}
+        with open(self.more_fname(0), 'a') as fh:
+            fh.write('supz\n')
+        os.unlink(self.more_fname(1))
+        self.mk_tdir_and_write_tfile()
+        pulsar._get_notifier()
+        self.process()
+        assert sorted(self.get_clear_events()) == [
+            'IN_CREATE({})'.format(self.atfile),
+            'IN_DELETE({})'.format(os.path.abspath(self.more_fname(1))),
+            'IN_MODIFY({})'.format(os.path.abspath(self.more_fname(0))),
+        ]
+        self.process()
+        assert self.get_clear_events() == []
+
+        pulsar.__context__['pulsar.baseline'].close()
+        os.unlink(baseline_db)
+        self.nuke_tdir()
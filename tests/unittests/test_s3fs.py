@@ -0,0 +1,240 @@
+# coding: utf-8
+
+import gzip
+import hashlib
+import http.server
+import os
+import pickle
+import threading
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+import pytest
+
+import hubblestack.fileserver.s3fs as hs_s3fs
+import hubblestack.utils.hashutils
+import hubblestack.utils.s3
+import hubblestack.utils.signing
+
+PAGE_SIZE = 2
+
+
+class FakeS3(http.server.ThreadingHTTPServer):
+    """
+    Just enough of a path style S3 endpoint for s3fs: paged ListObjects,
+    HEAD and GET of objects
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.requests = []
+        self.etags = {}
+        self.encodings = {}
+        self.connections = set()
+        super().__init__(('127.0.0.1', 0), FakeS3Handler)
+
+
+class FakeS3Handler(http.server.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    protocol_version = 'HTTP/1.1'
+
+    def _object(self):
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        self.server.requests.append((self.command, bucket, key))
+        self.server.connections.add(self.client_address)
+        return url, bucket, key
+
+    def _send(self, status, body=b'', etag=None, encoding=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', '"{0}"'.format(etag))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_object(self, bucket, key):
+        data = self.server.buckets.get(bucket, {}).get(key)
+        if data is None:
+            self._send(404)
+        else:
+            self._send(200, data, self.server.etags.get(key, hashlib.md5(data).hexdigest()),
+                       self.server.encodings.get(key))
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        _, bucket, key = self._object()
+        self._send_object(bucket, key)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url, bucket, key = self._object()
+        if key:
+            self._send_object(bucket, key)
+            return
+        marker = parse_qs(url.query).get('marker', [''])[0]
+        keys = sorted(k for k in self.server.buckets[bucket] if k > marker)
+        contents = ''.join(
+            '<Contents><Key>{0}</Key><LastModified>2020-01-01T00:00:00.000Z</LastModified>'
+            '<ETag>"{1}"</ETag><Size>{2}</Size></Contents>'.format(
+                escape(k), hashlib.md5(self.server.buckets[bucket][k]).hexdigest(),
+                len(self.server.buckets[bucket][k]))
+            for k in keys[:PAGE_SIZE])
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                '<Name>{0}</Name><Marker>{1}</Marker><IsTruncated>{2}</IsTruncated>{3}'
+                '</ListBucketResult>').format(bucket, escape(marker),
+                                              'true' if len(keys) > PAGE_SIZE else 'false', contents)
+        self._send(200, body.encode())
+
+
+@pytest.fixture
+def s3(__opts__, tmp_path, monkeypatch):
+    server = FakeS3({
+        'b1': {'base/top.sls': b'top', 'base/prof/a.yaml': b'a', 'base/prof/b.yaml': b'b',
+               'base/empty/': b'', 'dev/x.yaml': b'x'},
+        'b2': {'base/prof/c.yaml': b'c'},
+    })
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    __opts__.update({
+        'cachedir': str(tmp_path),
+        's3.buckets': ['b1', 'b2'],
+        's3.service_url': '127.0.0.1:{0}'.format(server.server_address[1]),
+        's3.path_style': True,
+        's3.https_enable': False,
+        's3.keyid': 'AKIDEXAMPLE',
+        's3.key': 'secret',
+        's3.location': 'us-east-1',
+    })
+    monkeypatch.setattr(hs_s3fs, '__opts__', __opts__, raising=False)
+    monkeypatch.setattr(hs_s3fs, '__utils__', {'s3.query': hubblestack.utils.s3.query,
+                                               's3.batch_get': hubblestack.utils.s3.batch_get}, raising=False)
+    monkeypatch.setattr(hs_s3fs, '_METADATA', {})
+    monkeypatch.setattr(hs_s3fs, '_VERIFIED', {})
+    # nothing here is signed
+    monkeypatch.setattr(hubblestack.utils.signing.Options, 'require_verify', False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_s3fs_index(s3, tmp_path):
+    assert sorted(hs_s3fs.envs()) == ['base', 'dev']
+    listings = sorted(bucket for method, bucket, key in s3.requests if not key)
+    assert listings == ['b1', 'b1', 'b1', 'b2']
+
+    with open(hs_s3fs._get_buckets_cache_filename(), 'rb') as fh:
+        cache = pickle.load(fh)
+    assert cache['version'] == hs_s3fs.S3_CACHE_VERSION
+    assert sorted(cache['metadata']['base']['b1']) == ['base/empty/', 'base/prof/a.yaml', 'base/prof/b.yaml',
+                                                       'base/top.sls']
+    assert cache['metadata']['base']['b2']['base/prof/c.yaml']['ETag'] == hashlib.md5(b'c').hexdigest()
+
+    assert sorted(hs_s3fs.file_list({'saltenv': 'base'})) == ['prof/a.yaml', 'prof/b.yaml', 'prof/c.yaml', 'top.sls']
+    assert sorted(set(hs_s3fs.dir_list({'saltenv': 'base'}))) == ['empty', 'prof']
+
+    fnd = hs_s3fs.find_file('prof/c.yaml', 'base')
+    assert fnd['bucket'] == 'b2'
+    with open(fnd['cpath'], 'rb') as fh:
+        assert fh.read() == b'c'
+    assert hs_s3fs.find_file('prof/nope.yaml', 'base')['path'] is None
+
+    # the cache file is read once, not on every lookup
+    del s3.requests[:]
+    assert hs_s3fs._init() is hs_s3fs._init()
+    assert s3.requests == []
+
+
+def test_s3fs_verified_cache(s3, monkeypatch):
+    hs_s3fs.update()
+    gets = [key for method, bucket, key in s3.requests if method == 'GET' and key]
+    assert sorted(gets) == ['base/prof/a.yaml', 'base/prof/b.yaml', 'base/prof/c.yaml', 'base/top.sls',
+                            'dev/x.yaml']
+    assert os.path.isfile(hs_s3fs._get_verified_filename())
+
+    hashed = []
+    real_get_hash = hubblestack.utils.hashutils.get_hash
+
+    def get_hash(path, *args, **kwargs):
+        hashed.append(path)
+        return real_get_hash(path, *args, **kwargs)
+
+    monkeypatch.setattr(hubblestack.utils.hashutils, 'get_hash', get_hash)
+
+    # a new process picks up the record from disk
+    monkeypatch.setattr(hs_s3fs, '_VERIFIED', {})
+    del s3.requests[:]
+    hs_s3fs.update()
+    assert hashed == []
+    assert [r for r in s3.requests if r[2]] == []
+
+    cpath = hs_s3fs._get_cached_file_name('b1', 'base', 'base/prof/a.yaml')
+    fnd = {'bucket': 'b1', 'path': 'base/prof/a.yaml'}
+    assert hs_s3fs.file_hash({'saltenv': 'base'}, fnd)['hsum'] == hashlib.md5(b'a').hexdigest()
+    assert hashed == []
+
+    # local changes are noticed, and repaired
+    with open(cpath, 'wb') as fh:
+        fh.write(b'tampered')
+    hs_s3fs.update()
+    assert hashed == [cpath]
+    with open(cpath, 'rb') as fh:
+        assert fh.read() == b'a'
+    del hashed[:]
+    hs_s3fs.update()
+    assert hashed == []
+
+
+def _query_kwargs(s3):
+    return {'key': 'secret', 'keyid': 'AKIDEXAMPLE', 'location': 'us-east-1', 'path_style': True,
+            'https_enable': False, 'service_url': '127.0.0.1:{0}'.format(s3.server_address[1])}
+
+
+def test_s3_batch_get(s3, tmp_path):
+    items = [{'bucket': 'b1', 'path': key, 'local_file': str(tmp_path / key.replace('/', '_'))}
+             for key in ('base/top.sls', 'base/prof/a.yaml', 'base/prof/b.yaml', 'dev/x.yaml', 'base/nope')]
+    ret = hubblestack.utils.s3.batch_get(items, workers=2, **_query_kwargs(s3))
+    assert [isinstance(r, Exception) for r in ret] == [False] * 4 + [True]
+    assert (tmp_path / 'dev_x.yaml').read_bytes() == b'x'
+    # keep-alive, at most one connection per worker thread
+    assert len(s3.connections) <= 2
+
+
+def test_s3_query_checks_downloads(s3, tmp_path):
+    local_file = tmp_path / 'a.yaml'
+    local_file.write_bytes(b'old')
+    s3.etags['base/prof/a.yaml'] = hashlib.md5(b'something else').hexdigest()
+    with pytest.raises(hubblestack.utils.s3.CommandExecutionError):
+        hubblestack.utils.s3.query(bucket='b1', path='base/prof/a.yaml', local_file=str(local_file),
+                                   **_query_kwargs(s3))
+    assert local_file.read_bytes() == b'old'
+    assert [p.name for p in tmp_path.iterdir()] == ['a.yaml']
+
+    with pytest.raises(hubblestack.utils.s3.CommandExecutionError):
+        hubblestack.utils.s3.query(bucket='b1', path='base/prof/b.yaml', local_file=str(local_file),
+                                   expected_md5=hashlib.md5(b'not b').hexdigest(), **_query_kwargs(s3))
+
+    del s3.etags['base/prof/a.yaml']
+    assert hubblestack.utils.s3.query(bucket='b1', path='base/prof/a.yaml', local_file=str(local_file),
+                                      **_query_kwargs(s3))
+    assert local_file.read_bytes() == b'a'
+
+
+def test_s3_query_content_encoding(s3, tmp_path):
+    local_file = tmp_path / 'c.yaml'
+    # stored compressed, the ETag is the MD5 of the compressed bytes
+    s3.buckets['b1']['base/prof/c.yaml'] = gzip.compress(b'c: 1\n')
+    s3.encodings['base/prof/c.yaml'] = 'gzip'
+    assert hubblestack.utils.s3.query(bucket='b1', path='base/prof/c.yaml', local_file=str(local_file),
+                                      **_query_kwargs(s3))
+    assert local_file.read_bytes() == b'c: 1\n'
+
+    s3.etags['base/prof/c.yaml'] = hashlib.md5(b'c: 1\n').hexdigest()
+    with pytest.raises(hubblestack.utils.s3.CommandExecutionError):
+        hubblestack.utils.s3.query(bucket='b1', path='base/prof/c.yaml', local_file=str(local_file),
+                                   **_query_kwargs(s3))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import threading
+import time
+
+import hubblestack.scheduler as S
+
+
+def test_policy():
+    executor = S.JobExecutor()
+    assert executor.policy({'function': 'pulsar.process'}) == 'dedicated'
+    assert executor.policy({'function': 'hubble.audit'}) == 'pool'
+    assert executor.policy({'function': 'hubble.audit', 'concurrency': 'inline'}) == 'inline'
+    assert executor.policy({'function': 'pulsar.process', 'concurrency': 'bogus'}) == 'dedicated'
+
+def test_inline_job_and_stats():
+    executor = S.JobExecutor()
+    ran = []
+    assert executor.submit('job1', {'concurrency': 'inline'}, lambda: ran.append(1), due=time.time() - 2)
+    stats = executor.report()['job1']
+    assert ran == [1]
+    assert stats['runs'] == 1
+    assert stats['running'] is False
+    assert stats['last_latency'] >= 2
+
+def test_no_overlap_and_slow_job_does_not_block_pulsar():
+    executor = S.JobExecutor(pool_size=2)
+    release = threading.Event()
+    pulsar_ran = threading.Event()
+    assert executor.submit('audit', {'function': 'hubble.audit'}, release.wait)
+    assert not executor.submit('audit', {'function': 'hubble.audit'}, release.wait)
+    assert executor.submit('pulsar', {'function': 'pulsar.process'}, pulsar_ran.set)
+    assert pulsar_ran.wait(5)
+    assert executor.is_running('audit')
+    release.set()
+    for _ in range(50):
+        if not executor.is_running('audit'):
+            break
+        time.sleep(0.1)
+    report = executor.report()
+    assert report['audit']['missed'] == 1
+    assert report['audit']['runs'] == 1
+    executor.shutdown()
+
+def test_failing_job_is_counted():
+    executor = S.JobExecutor()
+    def boom():
+        raise RuntimeError('boom')
+    executor.submit('bad', {'concurrency': 'inline'}, boom)
+    assert executor.report()['bad']['errors'] == 1
+    assert not executor.is_running('bad')
+
+def test_first_run_semantics():
+    now = 1000000.0
+    job = S.ScheduledJob('a', {'function': 'f', 'seconds': 60, 'run_on_start': True}, now=now)
+    assert job.next_run == now
+    job = S.ScheduledJob('a', {'function': 'f', 'seconds': 60}, now=now)
+    assert job.next_run == now + 60
+    job = S.ScheduledJob('a', {'function': 'f', 'seconds': 60, 'splay': 10, 'min_splay': 5}, now=now)
+    assert now + 65 <= job.next_run <= now + 70
+    job = S.ScheduledJob('a', {'function': 'f', 'seconds': 60, 'splay': 10, 'run_on_start': True}, now=now)
+    assert now <= job.next_run <= now + 10
+
+def test_invalid_jobs_are_dropped():
+    scheduler = S.Scheduler()
+    scheduler.sync({'nofunc': {'seconds': 1}, 'badsec': {'function': 'f', 'seconds': 'x'},
+        'nodata': None, 'good': {'function': 'f', 'seconds': 1}}, now=0)
+    assert list(scheduler.jobs) == ['good']
+
+def test_heap_order_and_priority():
+    scheduler = S.Scheduler()
+    now = 1000.0
+    scheduler.sync({
+        'low': {'function': 'f', 'seconds': 10, 'run_on_start': True},
+        'high': {'function': 'f', 'seconds': 10, 'run_on_start': True, 'priority': 5},
+        'later': {'function': 'f', 'seconds': 30},
+    }, now=now)
+    assert scheduler.next_deadline() == now
+    ready = scheduler.due_jobs(now=now)
+    assert [job.name for job, _, _, _ in ready] == ['high', 'low']
+    assert scheduler.next_deadline() == now + 10
+    assert scheduler.due_jobs(now=now + 5) == []
+    ready = scheduler.due_jobs(now=now + 30)
+    assert sorted(job.name for job, _, _, _ in ready) == ['high', 'later', 'low']
+
+def test_lateness_policies():
+    now = 1000.0
+    scheduler = S.Scheduler()
+    scheduler.sync({
+        'coalesce': {'function': 'f', 'seconds': 10},
+        'skip': {'function': 'f', 'seconds': 10, 'lateness': 'skip', 'max_lateness': 5},
+        'catch_up': {'function': 'f', 'seconds': 10, 'lateness': 'catch_up'},
+    }, now=now)
+    # fall 35s behind: the runs due at 1010, 1020, 1030 (and 1040 for catch_up) were missed
+    ready = {job.name: (due, run, missed) for job, due, run, missed in scheduler.due_jobs(now=now + 45)}
+    assert ready['coalesce'] == (now + 10, True, 3)
+    assert ready['skip'] == (now + 10, False, 4)
+    assert ready['catch_up'] == (now + 10, True, 0)
+    assert scheduler.jobs['coalesce'].next_run == now + 50
+    assert scheduler.jobs['catch_up'].next_run == now + 20
+    ready = scheduler.due_jobs(now=now + 45)
+    assert [(job.name, due) for job, due, _, _ in ready] == [('catch_up', now + 20)]
+
+def test_retry():
+    scheduler = S.Scheduler()
+    scheduler.sync({'a': {'function': 'f', 'seconds': 10, 'run_on_start': True}}, now=0)
+    job, due, _, _ = scheduler.due_jobs(now=0)[0]
+    scheduler.retry(job, due, delay=1, now=0)
+    assert scheduler.next_deadline() == 1
+    assert scheduler.due_jobs(now=1)[0][1] == 0
+    assert job.next_run == 10
+
+def test_cron():
+    import datetime
+    now = time.mktime(datetime.datetime(2021, 1, 1, 0, 7).timetuple())
+    scheduler = S.Scheduler()
+    scheduler.sync({'c': {'function': 'f', 'seconds': 900, 'cron': '*/15 * * * *'}}, now=now)
+    assert scheduler.next_deadline() == now + 8 * 60
+    ready = scheduler.due_jobs(now=now + 8 * 60)
+    assert len(ready) == 1
+    assert scheduler.next_deadline() == now + 23 * 60
+
+def test_sync_keeps_unchanged_jobs():
+    scheduler = S.Scheduler()
+    config = {'a': {'function': 'f', 'seconds': 10, 'splay': 100}}
+    scheduler.sync(config, now=0)
+    job = scheduler.jobs['a']
+    config['b'] = {'function': 'f', 'seconds': 10}
+    scheduler.sync(config, now=5)
+    assert scheduler.jobs['a'] is job
+    assert scheduler.jobs['b'].next_run == 15
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for hubblestack.utils.accounts
+'''
+
+import os
+import shutil
+import tempfile
+
+from tests.support.unit import TestCase, skipIf
+from tests.support.mock import patch
+
+import hubblestack.utils.accounts as accounts
+
+try:
+    import hubblestack.audit.misc as audit_misc
+
+    HAS_AUDIT_MISC = True
+except ImportError:
+    HAS_AUDIT_MISC = False
+
+PASSWD = '''root:x:0:0:root:/root:/bin/bash
+daemon:x:1:1:daemon:/usr/sbin:/usr/sbin/nologin
+toor:x:0:0::/root:/bin/bash
+alice:x:1000:1000::{home}:/bin/bash
+alice:x:1001:4242::/nonexistent:/bin/bash
++::::::
+'''
+
+GROUP = '''root:x:0:
+daemon:x:1:
+alice:x:1000:
+wheel:x:1000:alice
+'''
+
+SHADOW = '''root:$6$abc:18000:0:99999:7:::
+alice::18000:0:120:7:::
+daemon:*:18000:0:99999:7:::
+'''
+
+
+class AccountDBTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.home = os.path.join(self.tmp, 'alice')
+        os.mkdir(self.home)
+        os.chmod(self.home, 0o777)
+        self.files = {}
+        for name, text in (('passwd', PASSWD), ('group', GROUP), ('shadow', SHADOW)):
+            self.files[name] = os.path.join(self.tmp, name)
+            with open(self.files[name], 'w') as fh_:
+                fh_.write(text.format(home=self.home))
+        patcher = patch.multiple(accounts, PASSWD_FILE=self.files['passwd'], GROUP_FILE=self.files['group'],
+                                 SHADOW_FILE=self.files['shadow'], _SNAPSHOT=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _db(self):
+        return accounts.AccountDB(self.files['passwd'], self.files['group'], self.files['shadow'])
+
+    def test_indexes(self):
+        db = self._db()
+        self.assertEqual(len(db.passwd), 6)
+        self.assertEqual([e.name for e in db.users_by_uid['0']], ['root', 'toor'])
+        self.assertEqual(db.duplicates(db.users_by_name), ['alice'])
+        self.assertEqual(db.duplicates(db.groups_by_gid), ['1000'])
+        self.assertEqual(db.groups_by_name['wheel'][0].members, 'alice')
+        self.assertTrue(db.passwd[-1].nis)
+        self.assertEqual(db.passwd[-1].shell, '')
+        self.assertEqual(db.shadow[1].max, '120')
+
+    def test_owner_name(self):
+        db = self._db()
+        self.assertEqual(db.owner_name(1000), 'alice')
+        # not in the snapshot, looked up through NSS
+        with patch('hubblestack.utils.identity.user_name', return_value='nssuser') as user_name:
+            self.assertEqual(db.owner_name(2000), 'nssuser')
+        user_name.assert_called_once_with(2000)
+        # unknown everywhere
+        with patch('hubblestack.utils.identity.user_name', return_value=None):
+            self.assertEqual(db.owner_name(987654), '987654')
+
+    def test_home_stat_once(self):
+        db = self._db()
+        with patch('os.stat', wraps=os.stat) as mock_stat:
+            self.assertTrue(db.is_valid_home(self.home))
+            self.assertTrue(db.is_valid_home(self.home + '\n'))
+            self.assertFalse(db.is_valid_home('/nonexistent'))
+            self.assertFalse(db.is_valid_home('/', True))
+        self.assertEqual(mock_stat.call_count, 3)
+
+    def test_snapshot_reused_until_files_change(self):
+        first = accounts.snapshot()
+        self.assertIs(accounts.snapshot(), first)
+        with open(self.files['group'], 'a') as fh_:
+            fh_.write('extra:x:5000:\n')
+        second = accounts.snapshot()
+        self.assertIsNot(second, first)
+        self.assertIn('extra', second.groups_by_name)
+        self.assertIsNot(accounts.snapshot(max_age=-1), second)
+
+    @skipIf(not HAS_AUDIT_MISC, 'audit misc module requires pystemd')
+    def test_audit_checks(self):
+        self.assertEqual(audit_misc._check_duplicate_uids('id', {}, {}), "['0']")
+        self.assertEqual(audit_misc._root_is_only_uid_0_account('id', {}, {}), False)
+        self.assertTrue(audit_misc._default_group_for_root('id', {}, {}))
+        self.assertIn('4242', audit_misc._check_groups_validity('id', {}, {}))
+        self.assertEqual(audit_misc._check_password_fields_not_empty('id', {}, {}),
+                         'alice does not have a password \n')
+
+    @skipIf(not HAS_AUDIT_MISC, 'audit misc module requires pystemd')
+    def test_audit_home_checks(self):
+        block = {'args': {'max_system_uid': 1000}}
+        ret = audit_misc._check_users_own_their_home('id', block, {})
+        self.assertIn('/nonexistent of user alice is invalid', ret)
+        self.assertIn('The home directory {0} of user alice is owned by {1}'.format(
+            self.home, accounts.snapshot().owner_name(os.geteuid())), ret)
+        ret = audit_misc._check_all_users_home_directory('id', block, {})
+        self.assertIn('/nonexistent', ret)
+        self.assertNotIn(self.home, ret)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import hubblestack.returners.splunk_nova_return as splunk_nova_return
+from hubblestack.utils.audit_ledger import Ledger
+
+
+def _data(**checks):
+    data = {'Success': [], 'Failure': [], 'Compliance': '50%'}
+    for check_id, (status, output) in checks.items():
+        data[status].append({check_id: output})
+    return data
+
+
+def _sent(rep):
+    return sorted(list(entry)[0] for status in ('Success', 'Failure') for entry in rep.data[status])
+
+
+def test_ledger_changes(tmp_path):
+    ledger = Ledger(str(tmp_path / 'ledger.json'))
+    data = _data(a=('Success', 'desc a'), b=('Failure', {'description': 'b', 'tag': 'B'}),
+                 c=('Success', 'desc c'))
+    rep = ledger.report('job', data, full_interval=100, now=1000)
+    assert _sent(rep) == ['a', 'b', 'c']
+    assert rep.data['Compliance'] == '50%'
+    assert rep.digest['full_snapshot'] and rep.digest['checks'] == 3
+    assert rep.digest['success'] == 2 and rep.digest['failure'] == 1
+
+    # not committed, sent again
+    assert _sent(ledger.report('job', data, full_interval=100, now=1010)) == ['a', 'b', 'c']
+    rep.commit()
+    rep = ledger.report('job', data, full_interval=100, now=1010)
+    assert _sent(rep) == [] and not rep.digest['full_snapshot']
+    assert rep.digest['changed_checks'] == 0
+    digest = rep.digest['audit_digest']
+
+    # status and output changes, new and removed checks
+    rep = ledger.report('job', _data(a=('Failure', 'desc a'), b=('Failure', {'description': 'b2', 'tag': 'B'}),
+                                     d=('Success', 'desc d')), full_interval=100, now=1020)
+    assert _sent(rep) == ['a', 'b', 'd']
+    assert rep.digest['removed_checks'] == ['c']
+    assert rep.digest['audit_digest'] != digest
+
+    # other jobs have their own stream
+    assert _sent(ledger.report('other', data, full_interval=100, now=1020)) == ['a', 'b', 'c']
+
+    # periodic full snapshot
+    rep = ledger.report('job', data, full_interval=100, now=1100)
+    assert _sent(rep) == ['a', 'b', 'c'] and rep.digest['full_snapshot']
+    assert rep.digest['audit_digest'] == digest
+
+
+def test_ledger_corrupt(tmp_path):
+    path = tmp_path / 'ledger.json'
+    path.write_text('{not json')
+    rep = Ledger(str(path)).report('job', _data(a=('Success', 'a')))
+    assert rep.digest['full_snapshot']
+    rep.commit()
+    assert not Ledger(str(path)).report('job', _data(a=('Success', 'a'))).digest['full_snapshot']
+
+
+def test_nova_returner_changes_only(tmp_path, monkeypatch):
+    batches = []
+
+    class Collector(object):
+        def __init__(self, *args, **kwargs):
+            self.events = []
+            batches.append(self.events)
+
+        def batchEvent(self, payload):  # pylint: disable=invalid-name
+            self.events.append(payload['event'])
+
+        def flushBatch(self):  # pylint: disable=invalid-name
+            pass
+
+    opts = {'audit_changes_only': True, 'audit_ledger': str(tmp_path / 'ledger.json')}
+    grains = {'fqdn': 'host.example.com', 'local_ip4': '10.0.0.1', 'ipv4': ['10.0.0.1'], 'system_uuid': 'uuid'}
+    monkeypatch.setattr(splunk_nova_return, '__opts__', opts, raising=False)
+    monkeypatch.setattr(splunk_nova_return, '__grains__', grains, raising=False)
+    monkeypatch.setattr(splunk_nova_return, 'http_event_collector', Collector)
+    monkeypatch.setattr(splunk_nova_return, 'make_hec_args', lambda opts: ((), {}))
+    monkeypatch.setattr(splunk_nova_return, 'get_splunk_options',
+                        lambda **kwargs: [{'custom_fields': [], 'sourcetype': 'hubble_audit', 'index': 'hubble'}])
+
+    ret = {'id': 'host', 'jid': '1', 'fun': 'hubble.audit', 'fun_args': [],
+           'return': _data(a=('Success', 'desc a'), b=('Failure', 'desc b'))}
+    for _ in range(2):
+        splunk_nova_return.returner(ret)
+    first, second = batches
+    assert sorted(event.get('check_id') for event in first if 'check_id' in event) == ['a', 'b']
+    assert [event for event in second if 'check_id' in event] == []
+    digest = [event for event in second if event.get('check_type') == 'audit_digest']
+    assert len(digest) == 1 and digest[0]['checks'] == 2 and digest[0]['changed_checks'] == 0
+    assert any('compliance_percentage' in event for event in second)
+
+    # a check changed
+    ret['return'] = _data(a=('Failure', 'desc a'), b=('Failure', 'desc b'))
+    splunk_nova_return.returner(ret)
+    assert [(event['check_id'], event['check_result']) for event in batches[2] if 'check_id' in event] == \
+        [('a', 'Failure')]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from hubblestack.utils.fim_baseline import Baseline
+
+
+def _walk(root):
+    paths = [str(root)]
+    dirs = set()
+    for dirname, dirnames, filenames in os.walk(str(root)):
+        dirs.add(dirname)
+        paths.extend(os.path.join(dirname, name) for name in dirnames + filenames)
+    return paths, dirs
+
+
+def _hash(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'etc'
+    (root / 'conf.d').mkdir(parents=True)
+    (root / 'passwd').write_text('root:x:0:0')
+    (root / 'hosts').write_text('127.0.0.1 localhost')
+    (root / 'conf.d' / 'a.conf').write_text('a')
+    return root
+
+
+def test_reconcile(tmp_path, tree):
+    baseline = Baseline(str(tmp_path / 'cache' / 'baseline.sqlite'))
+    assert baseline.reconcile(*_walk(tree))[0] == ('IN_CREATE', str(tree), None)
+    assert len(baseline) == 5
+    assert baseline.reconcile(*_walk(tree), hash_func=_hash) == []
+
+    # changes while not watching
+    hashed = []
+    def hash_func(path):
+        hashed.append(path)
+        return _hash(path)
+    (tree / 'passwd').write_text('root:x:0:1')
+    os.chmod(str(tree / 'hosts'), 0o600)
+    (tree / 'conf.d' / 'a.conf').unlink()
+    (tree / 'conf.d' / 'b.conf').write_text('b')
+    changes = baseline.reconcile(*_walk(tree), hash_func=hash_func)
+    assert sorted(change[:2] for change in changes) == [
+        ('IN_ATTRIB', str(tree / 'hosts')),
+        ('IN_CREATE', str(tree / 'conf.d' / 'b.conf')),
+        ('IN_DELETE', str(tree / 'conf.d' / 'a.conf')),
+        ('IN_MODIFY', str(tree / 'passwd')),
+    ]
+    # only the files whose content may have changed are hashed
+    assert sorted(hashed) == [str(tree / 'conf.d' / 'b.conf'), str(tree / 'passwd')]
+
+    # a rewrite of the same content is only an attribute change
+    (tree / 'passwd').write_text('root:x:0:1')
+    os.utime(str(tree / 'passwd'), ns=(0, 0))
+    assert baseline.reconcile(*_walk(tree), hash_func=_hash) == [
+        ('IN_ATTRIB', str(tree / 'passwd'), _hash(str(tree / 'passwd')))]
+
+    # the baseline survives a restart
+    baseline.close()
+    baseline = Baseline(str(tmp_path / 'cache' / 'baseline.sqlite'))
+    assert baseline.reconcile(*_walk(tree)) == []
+
+
+def test_record(tmp_path, tree):
+    baseline = Baseline(str(tmp_path / 'baseline.sqlite'))
+    baseline.reconcile(*_walk(tree))
+    checksum = _hash(str(tree / 'hosts'))
+    baseline.record({str(tree / 'hosts'): checksum})
+    assert baseline.get(str(tree / 'hosts'))[1] == checksum
+
+    # an event without a checksum keeps the one of unchanged content
+    os.chmod(str(tree / 'hosts'), 0o600)
+    baseline.record({str(tree / 'hosts'): None})
+    assert baseline.get(str(tree / 'hosts'))[1] == checksum
+
+    # removed directories take what they held with them
+    (tree / 'conf.d' / 'a.conf').unlink()
+    (tree / 'conf.d').rmdir()
+    baseline.record({str(tree / 'conf.d'): None})
+    assert baseline.get(str(tree / 'conf.d' / 'a.conf')) == (None, None)
+    assert len(baseline) == 3
+    assert baseline.reconcile(*_walk(tree)) == []
+
+
+def test_other_thread(tmp_path, tree):
+    baseline = Baseline(str(tmp_path / 'baseline.sqlite'))
+    baseline.reconcile(*_walk(tree))
+    ret = []
+    thread = threading.Thread(target=lambda: ret.append(baseline.reconcile(*_walk(tree))))
+    thread.start()
+    thread.join()
+    assert ret == [[]]
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for hubblestack.utils.fs_inventory
+'''
+
+import os
+import shutil
+import stat
+import tempfile
+
+from tests.support.unit import TestCase, skipIf
+
+import hubblestack.utils.fs_inventory as fs_inventory
+from hubblestack.exceptions import CommandExecutionError
+
+
+class FsInventoryTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'root')
+        self.cachedir = os.path.join(self.tmp, 'cache')
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        os.makedirs(os.path.join(self.root, 'skipme'))
+        self.ww_file = self._touch('a', 'b', 'ww.txt', mode=0o666)
+        self.ok_file = self._touch('a', 'ok.txt', mode=0o644)
+        self.suid_file = self._touch('a', 'suid', mode=0o4755)
+        self._touch('skipme', 'ww.txt', mode=0o666)
+        self.ww_dir = os.path.join(self.root, 'a', 'open')
+        os.mkdir(self.ww_dir)
+        os.chmod(self.ww_dir, 0o777)
+        self.tmp_dir = os.path.join(self.root, 'a', 'tmp')
+        os.mkdir(self.tmp_dir)
+        os.chmod(self.tmp_dir, 0o1777)
+
+    def tearDown(self):
+        self._join_updater()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _touch(self, *parts, mode):
+        path = os.path.join(self.root, *parts)
+        with open(path, 'w') as fh_:
+            fh_.write('x')
+        os.chmod(path, mode)
+        return path
+
+    @staticmethod
+    def _join_updater():
+        if fs_inventory._UPDATER is not None:
+            fs_inventory._UPDATER.join()
+
+    def _opts(self, **kwargs):
+        opts = {'cachedir': self.cachedir,
+                'fs_inventory_roots': [self.root],
+                'fs_inventory_exclude': [os.path.join(self.root, 'skipme')],
+                'fs_inventory_interval': 0}
+        opts.update(kwargs)
+        return opts
+
+    def test_single_pass_evaluates_all_predicates(self):
+        inv = fs_inventory.Inventory(self._opts())
+        state = inv.update()
+        self.assertIsNone(state['current'])
+        self.assertTrue(os.path.isfile(inv.path))
+        self.assertEqual(inv.query('world_writable'), [self.ww_file])
+        self.assertEqual(inv.query('world_writable_dir_no_sticky'), [self.ww_dir])
+        self.assertEqual(inv.query('suid'), [self.suid_file])
+        self.assertEqual(inv.query('sgid'), [])
+
+    @skipIf(os.geteuid() != 0, 'chown requires root')
+    def test_unowned_and_ungrouped(self):
+        os.chown(self.ok_file, 54321, 54322)
+        inv = fs_inventory.Inventory(self._opts())
+        inv.update()
+        self.assertEqual(inv.query('nouser'), [self.ok_file])
+        self.assertEqual(inv.query('nogroup'), [self.ok_file])
+
+    def test_resumes_across_updates(self):
+        inv = fs_inventory.Inventory(self._opts(fs_inventory_budget=-1))
+        state = inv.update()
+        self.assertIsNotNone(state['current'])
+        self.assertTrue(state['current']['pending'])
+        with self.assertRaises(CommandExecutionError):
+            inv.query('world_writable')
+        self._join_updater()
+
+        inv = fs_inventory.Inventory(self._opts())
+        state = inv.update()
+        self.assertIsNone(state['current'])
+        self.assertEqual(state['complete']['hits']['world_writable'], [os.fsencode(self.ww_file)])
+
+    def test_partial_pass_is_not_an_answer(self):
+        inv = fs_inventory.Inventory(self._opts(fs_inventory_budget=-1))
+        state = inv.load()
+        state['current'] = {'started': 0, 'pending': [[os.fsencode(self.root), os.lstat(self.root).st_dev]], 'dirs': 3,
+                            'hits': {'world_writable': [os.fsencode(self.ww_file)]}}
+        inv.save(state)
+        with self.assertRaises(CommandExecutionError) as exc:
+            inv.query('world_writable')
+        self.assertIn('1 matching paths found so far', str(exc.exception))
+
+    def test_query_updates_in_background(self):
+        inv = fs_inventory.Inventory(self._opts())
+        with self.assertRaises(CommandExecutionError):
+            inv.query('world_writable')
+        self._join_updater()
+        self.assertEqual(fs_inventory._UPDATER.name, 'fs-inventory-update')
+        self.assertEqual(inv.query('world_writable'), [self.ww_file])
+
+    def test_check(self):
+        opts = self._opts()
+        fs_inventory.Inventory(opts).update()
+        self.assertEqual(fs_inventory.check(opts, 'world_writable'), "['{0}']".format(self.ww_file))
+        self.assertTrue(fs_inventory.check(opts, 'sgid'))
+
+    def test_fresh_pass_is_not_redone(self):
+        inv = fs_inventory.Inventory(self._opts())
+        finished = inv.update()['complete']['finished']
+        self.assertEqual(inv.update()['complete']['finished'], finished)
+        self.assertNotEqual(inv.update(force=True)['complete']['finished'], finished)
+
+    def test_query_drops_fixed_paths(self):
+        inv = fs_inventory.Inventory(self._opts())
+        inv.update()
+        os.chmod(self.ww_file, 0o644)
+        self.assertEqual(inv.query('world_writable'), [])
+
+    def test_unknown_predicate(self):
+        with self.assertRaises(CommandExecutionError):
+            fs_inventory.Inventory(self._opts()).query('nope')
+
+    def test_mount_types(self):
+        mounts = os.path.join(self.tmp, 'mounts')
+        with open(mounts, 'w') as fh_:
+            fh_.write('/dev/sda1 / ext4 rw 0 0\n'
+                      'srv:/x /mnt/my\\040share nfs4 rw 0 0\n')
+        self.assertEqual(fs_inventory.mount_types(mounts),
+                         {b'/': 'ext4', b'/mnt/my share': 'nfs4'})
+        self.assertIsNone(fs_inventory.mount_types(os.path.join(self.tmp, 'missing')))
+
+    def test_format_hits(self):
+        self.assertEqual(fs_inventory.format_hits(['/a']), "['/a']")
+        self.assertEqual(fs_inventory.format_hits(['/a', '/b', '/c'], limit=1), "['/a'] ... and 2 more")
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import copy
+import os
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+import hubblestack.utils.gitfs
+from hubblestack.config import DEFAULT_OPTS
+from hubblestack.fileserver.gitfs import PER_REMOTE_ONLY, PER_REMOTE_OVERRIDES
+from hubblestack.utils.gitfs import GitFS
+
+PROVIDERS = [
+    pytest.param('pygit2', marks=pytest.mark.skipif(
+        hubblestack.utils.gitfs.PYGIT2_VERSION is None, reason='pygit2 is not installed')),
+    pytest.param('gitpython', marks=pytest.mark.skipif(
+        hubblestack.utils.gitfs.GITPYTHON_VERSION is None, reason='GitPython is not installed')),
+]
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+
+
+def _git(cwd, *args):
+    subprocess.check_call(('git', '-c', 'user.name=hubble', '-c', 'user.email=hubble@example.com') + args,
+                          cwd=str(cwd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _commit(src, files):
+    for path, data in files.items():
+        dest = src / path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, tuple):
+            os.symlink(data[0], str(dest))
+        else:
+            dest.write_text(data)
+    _git(src, 'add', '-A')
+    _git(src, 'commit', '-qm', 'update')
+    _git(src, 'push', '-q', 'origin', 'master')
+
+
+def _remote(tmp_path, name, files):
+    bare = tmp_path / (name + '.git')
+    src = tmp_path / name
+    _git(tmp_path, 'init', '-q', '--bare', str(bare))
+    _git(tmp_path, 'clone', '-q', str(bare), str(src))
+    _git(src, 'checkout', '-q', '-b', 'master')
+    _commit(src, files)
+    return 'file://' + str(bare), src
+
+
+def _gitfs(tmp_path, provider, remotes, **opts):
+    GitFS.instance_map.clear()
+    __opts__ = copy.deepcopy(DEFAULT_OPTS)
+    __opts__.update({'cachedir': str(tmp_path / 'cache'), '__role': 'minion', 'gitfs_provider': provider})
+    __opts__.update(opts)
+    return GitFS(__opts__, remotes, per_remote_overrides=PER_REMOTE_OVERRIDES, per_remote_only=PER_REMOTE_ONLY)
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_tree_index(tmp_path, provider):
+    url, src = _remote(tmp_path, 'profiles', {
+        'hubblestack_nova/cis.yaml': 'cis',
+        'hubblestack_nova/sub/ssh.yaml': 'ssh',
+        'hubblestack_nova/latest.yaml': ('sub/ssh.yaml',),
+        'top.nova': 'top',
+    })
+    gitfs = _gitfs(tmp_path, provider, [{url: [{'root': 'hubblestack_nova'}, {'mountpoint': 'salt://nova'}]}])
+    gitfs.update()
+    repo = gitfs.remotes[0]
+
+    files, symlinks = repo.file_list('base')
+    assert files == {'nova/cis.yaml', 'nova/sub/ssh.yaml', 'nova/latest.yaml'}
+    assert symlinks == {'nova/latest.yaml': 'sub/ssh.yaml'}
+    assert repo.dir_list('base') == {'nova', 'nova/sub'}
+
+    blob, sha, _ = repo.find_file('hubblestack_nova/latest.yaml', 'base')
+    assert sha == repo.find_file('hubblestack_nova/sub/ssh.yaml', 'base')[1]
+    assert repo.find_file('hubblestack_nova/sub', 'base') == (None, None, None)
+    assert repo.find_file('missing.yaml', 'base') == (None, None, None)
+    fnd = gitfs.find_file('nova/latest.yaml')
+    with open(fnd['path']) as fh:
+        assert fh.read() == 'ssh'
+
+    # the index is built once per tree
+    index = repo.get_tree_index('base')
+    assert repo.get_tree_index('base') is index
+
+    # and again when the branch moves on
+    _commit(src, {'hubblestack_nova/new.yaml': 'new'})
+    assert gitfs.fetch_remotes()
+    assert repo.get_tree_index('base') is not index
+    assert 'nova/new.yaml' in repo.file_list('base')[0]
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_fetch_concurrently(tmp_path, provider):
+    remotes = [_remote(tmp_path, 'profiles{0}'.format(i), {'top.nova': str(i)}) for i in range(3)]
+    gitfs = _gitfs(tmp_path, provider, [url for url, _ in remotes], gitfs_fetch_workers=3)
+    assert not gitfs.fetch_remotes()
+
+    fetching = []
+    def _fetch(repo, fetch=hubblestack.utils.gitfs.GitProvider.fetch):
+        fetching.append(threading.current_thread().name)
+        return fetch(repo)
+    _commit(remotes[1][1], {'top.nova': 'changed'})
+    for repo in gitfs.remotes:
+        repo.fetch = lambda repo=repo: _fetch(repo)
+    assert gitfs.fetch_remotes()
+    assert len(fetching) == 3
+    assert all(name.startswith('gitfs-fetch') for name in fetching)
+    assert [repo.find_file('top.nova', 'base')[0] is not None for repo in gitfs.remotes] == [True] * 3
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_find_file_from_threads(tmp_path, provider):
+    files = {'prof/{0}/check{1}.yaml'.format(i % 3, i): str(i) for i in range(24)}
+    url, _ = _remote(tmp_path, 'profiles', files)
+    gitfs = _gitfs(tmp_path, provider, [url])
+    gitfs.update()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        found = list(pool.map(gitfs.find_file, sorted(files)))
+    for path, fnd in zip(sorted(files), found):
+        with open(fnd['path']) as fh:
+            assert fh.read() == files[path]
+
+
+def test_env_cache_memo(tmp_path):
+    url, _ = _remote(tmp_path, 'profiles', {'top.nova': 'top'})
+    provider = 'pygit2' if hubblestack.utils.gitfs.PYGIT2_VERSION is not None else 'gitpython'
+    gitfs = _gitfs(tmp_path, provider, [url])
+    gitfs.update()
+    assert gitfs.envs() == ['base']
+    memo = gitfs._env_cache_memo
+    assert memo is not None
+    assert gitfs.envs() == ['base']
+    assert gitfs._env_cache_memo is memo
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for hubblestack.utils.http_batch
+'''
+
+import gzip
+import json
+import shutil
+import tempfile
+
+import requests
+
+from tests.support.unit import TestCase
+from tests.support.mock import MagicMock, patch
+
+import hubblestack.utils.http_batch as http_batch
+
+
+def _response(status=200):
+    res = MagicMock()
+    res.status_code = status
+    res.reason = 'whatever'
+    return res
+
+
+class TransportTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.posts = []
+        self.answers = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _post(self, url, data=None, timeout=None):
+        self.posts.append(gzip.decompress(data).decode('utf-8'))
+        answer = self.answers.pop(0) if self.answers else _response()
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def _transport(self, fmt='ndjson', **kwargs):
+        transport = http_batch.Transport('https://collector.example/', fmt=fmt, **kwargs)
+        patcher = patch.object(transport.session, 'post', side_effect=self._post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return transport
+
+    def test_batches_by_count(self):
+        transport = self._transport(batch_max_events=2)
+        for idx in range(3):
+            transport.add({'n': idx})
+        self.assertEqual(self.posts, ['{"n":0}\n{"n":1}'])
+        self.assertTrue(transport.flush())
+        self.assertEqual(self.posts[1], '{"n":2}')
+        self.assertEqual(transport.session.headers['Content-Encoding'], 'gzip')
+
+    def test_batches_by_size(self):
+        transport = self._transport(batch_max_bytes=20)
+        transport.add({'a': 'x' * 5})
+        transport.add({'b': 'y' * 5})
+        self.assertEqual(len(self.posts), 1)
+        transport.flush()
+        self.assertEqual([json.loads(body) for body in self.posts], [{'a': 'xxxxx'}, {'b': 'yyyyy'}])
+
+    def test_formats(self):
+        transport = self._transport(fmt='json_array')
+        transport.add({'n': 1})
+        transport.add({'n': 2})
+        transport.flush()
+        self.assertEqual(json.loads(self.posts[0]), [{'n': 1}, {'n': 2}])
+
+        transport = self._transport(fmt='gelf')
+        transport.add({'short_message': 'a'})
+        transport.add({'short_message': 'b'})
+        self.assertEqual(len(self.posts), 3)
+
+    def test_spools_and_replays(self):
+        transport = self._transport(disk_queue=self.tmp, disk_queue_compression=0)
+        self.answers = [requests.ConnectionError('down')]
+        transport.add({'n': 1})
+        self.assertFalse(transport.flush())
+        self.assertEqual(transport.queue.cn, 1)
+
+        # the endpoint is flagged down, so the next batch is spooled untried
+        transport.add({'n': 2})
+        self.assertFalse(transport.flush())
+        self.assertEqual(len(self.posts), 1)
+        self.assertEqual(transport.queue.cn, 2)
+
+        transport.outage = None
+        transport.add({'n': 3})
+        self.assertTrue(transport.flush())
+        self.assertEqual(transport.queue.cn, 0)
+        self.assertEqual(self.posts[1:], ['{"n":3}', '{"n":1}', '{"n":2}'])
+
+    def test_rejected_batch_is_dropped(self):
+        transport = self._transport(disk_queue=self.tmp)
+        self.answers = [_response(400)]
+        transport.add({'n': 1})
+        self.assertTrue(transport.flush())
+        self.assertEqual(transport.queue.cn, 0)
+
+    def test_shared_transport(self):
+        opts = {'proxy': {}, 'timeout': 5, 'transport': http_batch.transport_opts({'batch_max_events': 7})}
+        first = http_batch.get_transport('https://collector.example/a', opts)
+        self.assertIs(http_batch.get_transport('https://collector.example/a', dict(opts)), first)
+        self.assertIsNot(http_batch.get_transport('https://collector.example/b', opts), first)
+        self.assertEqual(first.max_events, 7)
+        self.assertEqual(first.timeout, 5)
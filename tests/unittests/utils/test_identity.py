@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import hubblestack.utils.identity
+from hubblestack.utils.identity import IdentityCache
+
+
+class Lookup(object):
+    def __init__(self, known):
+        self.known = known
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        return self.known[key]
+
+
+def test_lookup_and_negative_cache():
+    cache = IdentityCache(check_interval=3600)
+    func = Lookup({0: 'root'})
+    assert cache._lookup('uid', 0, func, str) == 'root'
+    assert cache._lookup('uid', 0, func, str) == 'root'
+    assert cache._lookup('uid', 4242, func, str) is None
+    assert cache._lookup('uid', 4242, func, str) is None
+    assert func.calls == [0, 4242]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_ttl():
+    cache = IdentityCache(ttl=0, negative_ttl=0, check_interval=3600)
+    func = Lookup({0: 'root'})
+    cache._lookup('uid', 0, func, str)
+    cache._lookup('uid', 0, func, str)
+    cache._lookup('uid', 1, func, str)
+    cache._lookup('uid', 1, func, str)
+    assert func.calls == [0, 0, 1, 1]
+
+
+def test_invalidation(tmp_path):
+    passwd = tmp_path / 'passwd'
+    passwd.write_text('root:x:0:0::/root:/bin/sh\n')
+    group = tmp_path / 'group'
+    group.write_text('root:x:0:\n')
+    cache = IdentityCache(check_interval=0, sources={'passwd': str(passwd), 'group': str(group)})
+    users, groups = Lookup({0: 'root'}), Lookup({0: 'root'})
+    cache._lookup('uid', 0, users, str)
+    cache._lookup('gid', 0, groups, str)
+
+    # a changed passwd only forgets the users
+    passwd.write_text('root:x:0:0::/root:/bin/sh\nbin:x:1:1::/bin:/sbin/nologin\n')
+    cache._lookup('uid', 0, users, str)
+    cache._lookup('gid', 0, groups, str)
+    assert users.calls == [0, 0]
+    assert groups.calls == [0]
+
+
+def test_status(monkeypatch):
+    marked = []
+    monkeypatch.setattr(hubblestack.utils.identity.hubble_status, 'mark',
+                        lambda resource, count=1: marked.append((resource, count)))
+    cache = IdentityCache(check_interval=3600)
+    func = Lookup({0: 'root'})
+    for _ in range(3):
+        cache._lookup('uid', 0, func, str)
+    cache.check()
+    cache.check()
+    assert sorted(marked) == [('hit', 2), ('miss', 1)]
+
+
+def test_module_functions():
+    hubblestack.utils.identity.clear()
+    assert hubblestack.utils.identity.user_name(os.getuid()) is not None
+    assert hubblestack.utils.identity.user_id(hubblestack.utils.identity.user_name(0)) == 0
+    assert hubblestack.utils.identity.group_id(hubblestack.utils.identity.group_name(0)) == 0
+    assert hubblestack.utils.identity.user_id('no-such-user-hopefully') is None
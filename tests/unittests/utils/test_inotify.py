@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+
+import pytest
+
+import hubblestack.utils.inotify as inotify
+import hubblestack.utils.platform
+
+pyinotify = pytest.importorskip('pyinotify')
+pytestmark = pytest.mark.skipif(not hubblestack.utils.platform.is_linux(), reason='inotify is linux only')
+
+
+def _raw(wd, mask, name=b''):
+    if name:
+        name += b'\0' * (16 - len(name) % 16)
+    return struct.pack('iIII', wd, mask, 0, len(name)) + name
+
+
+@pytest.fixture
+def notifier():
+    events = []
+    watch_manager = pyinotify.WatchManager()
+    notifier = inotify.Notifier(watch_manager, events.append)
+    notifier.events = events
+    yield notifier
+    notifier.stop()
+
+
+def _read(notifier):
+    assert notifier.check_events(1000)
+    notifier.read_events()
+    notifier.process_events()
+    ret = [(event.maskname, event.pathname) for event in notifier.events]
+    del notifier.events[:]
+    return ret
+
+
+def test_decode():
+    data = _raw(1, inotify.IN_CREATE | inotify.IN_ISDIR, b'dir') + _raw(2, 0x2) + _raw(-1, inotify.IN_Q_OVERFLOW)
+    assert inotify.decode(data) == [(1, inotify.IN_CREATE | inotify.IN_ISDIR, 0, 'dir'), (2, 0x2, 0, ''),
+                                    (-1, inotify.IN_Q_OVERFLOW, 0, '')]
+    for mask in (0x100, 0x40000100, 0x8000, 0x4000, 0x40000400):
+        assert inotify.maskname(mask) == pyinotify.EventsCodes.maskname(mask)
+    # pyinotify has no name for combined events
+    assert inotify.maskname(0x402) == 'IN_MODIFY|IN_DELETE_SELF'
+
+
+def test_events(notifier, tmp_path):
+    mask = pyinotify.IN_CREATE | pyinotify.IN_DELETE | pyinotify.IN_MODIFY
+    notifier._watch_manager.add_watch(str(tmp_path), mask, auto_add=True)
+    (tmp_path / 'file').write_text('data')
+    assert _read(notifier) == [('IN_CREATE', str(tmp_path / 'file')), ('IN_MODIFY', str(tmp_path / 'file'))]
+
+    # new directories are watched, what they hold is announced
+    os.makedirs(str(tmp_path / 'a' / 'b'))
+    assert _read(notifier) == [('IN_CREATE|IN_ISDIR', str(tmp_path / 'a')),
+                               ('IN_CREATE|IN_ISDIR', str(tmp_path / 'a' / 'b'))]
+    (tmp_path / 'a' / 'b' / 'file').write_text('')
+    assert _read(notifier) == [('IN_CREATE', str(tmp_path / 'a' / 'b' / 'file'))]
+
+    # removed watches are dropped
+    wd = notifier._watch_manager.get_wd(str(tmp_path / 'a' / 'b'))
+    os.unlink(str(tmp_path / 'a' / 'b' / 'file'))
+    os.rmdir(str(tmp_path / 'a' / 'b'))
+    assert ('IN_IGNORED', str(tmp_path / 'a' / 'b')) in _read(notifier)
+    assert wd not in notifier._watch_manager.watches
+
+
+def test_overflow(notifier):
+    notifier._raw.extend(inotify.decode(_raw(-1, inotify.IN_Q_OVERFLOW)))
+    notifier.process_events()
+    assert notifier.overflows == 1
+    assert notifier.events[0].maskname == 'IN_Q_OVERFLOW'
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for hubblestack.utils.iptables
+'''
+
+from tests.support.unit import TestCase
+
+import hubblestack.utils.iptables as iptables
+
+
+class RuleKeyTestCase(TestCase):
+
+    def assertSameRule(self, first, second):
+        self.assertEqual(iptables.rule_key(first), iptables.rule_key(second))
+
+    def test_equivalent_spellings(self):
+        self.assertSameRule('-A INPUT -p tcp -m tcp --dport 22 -j ACCEPT',
+                            '--protocol tcp --destination-port ssh --jump ACCEPT')
+        self.assertSameRule('-A INPUT -s 192.168.0.0/16 -p udp -j DROP',
+                            '-p 17 -s 192.168.1.1/255.255.0.0 -j DROP')
+        self.assertSameRule('-A INPUT -m state --state RELATED,ESTABLISHED -j ACCEPT',
+                            '-m state --state ESTABLISHED,RELATED -j ACCEPT')
+        self.assertSameRule('-A INPUT -p tcp -m tcp ! --tcp-flags FIN,SYN,RST,ACK SYN -m state --state NEW -j DROP',
+                            '-p tcp ! --syn -m state --state NEW -j DROP')
+        self.assertSameRule('-A INPUT -i lo -j ACCEPT', '-p all -i lo -j ACCEPT')
+        self.assertSameRule('-A INPUT -p tcp -m multiport --dports 80,443 -m comment --comment "web in" -j ACCEPT',
+                            "-p tcp -m multiport --dports http,https -m comment --comment 'web in' -j ACCEPT")
+        self.assertSameRule('-A INPUT -m limit --limit 5/min -j LOG', '-m limit --limit 5/minute -j LOG')
+
+    def test_negation(self):
+        self.assertSameRule('-A INPUT ! -s 10.0.0.1/32 -j DROP', '-s ! 10.0.0.1 -j DROP')
+        self.assertNotEqual(iptables.rule_key('! -s 10.0.0.1 -j DROP'), iptables.rule_key('-s 10.0.0.1 -j DROP'))
+
+    def test_different_rules(self):
+        self.assertNotEqual(iptables.rule_key('-p tcp --dport 22 -j ACCEPT'),
+                            iptables.rule_key('-p tcp --dport 22 -j DROP'))
+        self.assertNotEqual(iptables.rule_key('-p tcp --dport 22 -j ACCEPT'),
+                            iptables.rule_key('-p udp --dport 22 -j ACCEPT'))
+
+    def test_parse_save(self):
+        ruleset = iptables.parse_save(
+            '# Generated by iptables-save\n'
+            '*nat\n'
+            ':PREROUTING ACCEPT [0:0]\n'
+            'COMMIT\n'
+            '*filter\n'
+            ':INPUT ACCEPT [10:200]\n'
+            ':custom - [0:0]\n'
+            '-A INPUT -p tcp -m tcp --dport 22 -j ACCEPT\n'
+            '-A INPUT -p tcp -m tcp --dport 1000:2000 -j ACCEPT\n'
+            '-A custom -j RETURN\n'
+            'COMMIT\n')
+        self.assertEqual(sorted(ruleset), ['filter', 'nat'])
+        self.assertEqual(ruleset['filter']['custom']['policy'], '-')
+        self.assertTrue(iptables.rule_exists(ruleset, 'filter', 'custom', '-j RETURN'))
+        self.assertFalse(iptables.rule_exists(ruleset, 'nat', 'INPUT', '-j RETURN'))
+        self.assertEqual(iptables.dports(ruleset), ['22'])
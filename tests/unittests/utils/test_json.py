@@ -4,14 +4,17 @@ Tests for hubblestack.utils.json
 """
 # Import Python libs
 
+import datetime
 import textwrap
+import uuid
 import hubblestack.utils.files
 import hubblestack.utils.json
 import hubblestack.utils.stringutils
 
 # Import Salt Testing libs
 from tests.support.helpers import with_tempfile
-from tests.support.unit import TestCase
+from tests.support.mock import patch
+from tests.support.unit import TestCase, skipIf
 
 
 class JSONTestCase(TestCase):
@@ -86,3 +89,50 @@ class JSONTestCase(TestCase):
             ret = hubblestack.utils.json.loads(hubblestack.utils.stringutils.to_unicode(fp_.read()))
             # Loading should be equal to the original data
             self.assertEqual(ret, self.data)
+
+
+class CodecTestCase(TestCase):
+    data = {
+        "спам": "яйца",
+        "bytes": b"caf\xc3\xa9 \xff",
+        "set": {"one"},
+        "tuple": (1, 2.5, None),
+        "when": datetime.datetime(2021, 3, 4, 5, 6, 7, 8, tzinfo=datetime.timezone.utc),
+        "day": datetime.date(2021, 3, 4),
+        "id": uuid.UUID(int=1),
+        "big": 2 ** 70,
+        1: True,
+    }
+
+    serialized = (
+        '{"спам":"яйца","bytes":"café \ufffd","set":["one"],"tuple":[1,2.5,null],'
+        '"when":"2021-03-04T05:06:07.000008+00:00","day":"2021-03-04",'
+        '"id":"00000000-0000-0000-0000-000000000001","big":1180591620717411303424,"1":true}'
+    )
+
+    def _backends(self):
+        yield "json"
+        if hubblestack.utils.json.HAS_ORJSON:
+            yield "orjson"
+
+    def test_encode(self):
+        for backend in self._backends():
+            with patch.object(hubblestack.utils.json, "BACKEND", backend):
+                self.assertEqual(hubblestack.utils.json.encode(self.data), self.serialized)
+                self.assertEqual(hubblestack.utils.json.encode({"b": 1, "a": [{"d": 2, "c": 3}]}, sort_keys=True),
+                                 '{"a":[{"c":3,"d":2}],"b":1}')
+                self.assertEqual(hubblestack.utils.json.encode({"x": object}, default=lambda obj: "obj"),
+                                 '{"x":"obj"}')
+                with self.assertRaises(TypeError):
+                    hubblestack.utils.json.encode({"x": object})
+
+    def test_decode(self):
+        for backend in self._backends():
+            with patch.object(hubblestack.utils.json, "BACKEND", backend):
+                for doc in (self.serialized, self.serialized.encode("utf-8")):
+                    ret = hubblestack.utils.json.decode(doc)
+                    self.assertEqual(ret["спам"], "яйца")
+                    self.assertEqual(ret["big"], 2 ** 70)
+                self.assertNotEqual(hubblestack.utils.json.decode("[NaN]")[0], 0.0)
+                with self.assertRaises(ValueError):
+                    hubblestack.utils.json.decode('{"a": ')
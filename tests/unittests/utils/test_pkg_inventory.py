@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import hubblestack.files.hubblestack_nova.pkg
+import hubblestack.utils.pkg.inventory as inventory
+
+DPKG_CASES = [
+    ('1.0', '1.0', 0),
+    ('1.0', '1.0-0', 0),
+    ('1.0', '1.1', -1),
+    ('1.0~rc1', '1.0', -1),
+    ('1.0~rc1', '1.0~', 1),
+    ('1.0+b1', '1.0', 1),
+    ('1.0a', '1.0+', -1),
+    ('1:0.9', '2.0', 1),
+    ('2.30-1ubuntu1', '2.30-1ubuntu10', -1),
+    ('1.2.3-1', '1.2.3.0-1', -1),
+    ('0010', '9', 1),
+    ('7.6p2-4', '7.6-0', 1),
+]
+
+RPM_CASES = [
+    ('1.0', '1.0', 0),
+    ('1.0', '2.0', -1),
+    ('2.0.1', '2.0.1a', -1),
+    ('1.0a', '1.0.1', -1),
+    ('5.5p1', '5.5p10', -1),
+    ('10xyz', '10.1xyz', -1),
+    ('1.0010', '1.9', 1),
+    ('1.0~rc1', '1.0', -1),
+    ('1.0~rc1', '1.0~rc1~git', 1),
+    ('1.0^', '1.0', 1),
+    ('1.0^git1', '1.0.1', -1),
+    ('1:1.0', '2.0', 1),
+    ('1.0-1', '1.0', 0),
+    ('1.0-2', '1.0-10', -1),
+    ('1.0-1.el7', '1.0-1.el7_9', -1),
+]
+
+APK_CASES = [
+    ('1.0', '1.0', 0),
+    ('1.0_rc1', '1.0', -1),
+    ('1.0', '1.0_p1', -1),
+    ('1.0_alpha1', '1.0_beta1', -1),
+    ('1.0-r1', '1.0-r10', -1),
+    ('1.2a', '1.2', 1),
+    ('1.2', '1.2.1', -1),
+]
+
+DPKG_STATUS = '''\
+Package: bash
+Status: install ok installed
+Architecture: amd64
+Version: 5.0-6ubuntu1.1
+Description: GNU Bourne Again SHell
+ Bash is an sh-compatible command language interpreter.
+
+Package: libc6
+Status: install ok installed
+Architecture: i386
+Source: glibc
+Version: 2.31-0ubuntu9.2
+
+Package: libc6
+Status: install ok installed
+Architecture: amd64
+Source: glibc (2.31-0ubuntu9)
+Version: 2.31-0ubuntu9.2
+
+Package: telnet
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 0.17-41.2build1
+
+Package: tzdata
+Status: hold ok installed
+Architecture: all
+Version: 2021a-0ubuntu0.20.04
+'''
+
+
+@pytest.mark.parametrize('kind,cases', [('dpkg', DPKG_CASES), ('rpm', RPM_CASES), ('apk', APK_CASES)])
+def test_version_cmp(kind, cases):
+    for ver1, ver2, expected in cases:
+        assert inventory.version_cmp(kind, ver1, ver2) == expected, (ver1, ver2)
+        assert inventory.version_cmp(kind, ver2, ver1) == -expected, (ver2, ver1)
+
+
+@pytest.mark.skipif(not shutil.which('dpkg'), reason='dpkg is not installed')
+def test_dpkg_version_cmp_matches_dpkg():
+    for ver1, ver2, _ in DPKG_CASES:
+        for oper, expected in (('lt', -1), ('eq', 0), ('gt', 1)):
+            if subprocess.call(['dpkg', '--compare-versions', ver1, oper, ver2]) == 0:
+                break
+        assert inventory.dpkg_version_cmp(ver1, ver2) == expected, (ver1, ver2)
+
+
+@pytest.fixture
+def dpkg_status(tmp_path, monkeypatch):
+    status = tmp_path / 'status'
+    status.write_text(DPKG_STATUS)
+    monkeypatch.setattr(inventory, 'DPKG_STATUS', str(status))
+    monkeypatch.setattr(inventory, '_INVENTORY', {})
+    return status
+
+
+GRAINS = {'os_family': 'Debian', 'osarch': 'amd64', 'osfinger': 'Ubuntu-20.04'}
+
+
+def test_dpkg_inventory(dpkg_status):
+    inv = inventory.get(GRAINS)
+    assert inv.kind == 'dpkg'
+    assert sorted(inv.packages) == ['bash', 'libc6', 'libc6:i386', 'tzdata']
+    assert inv.version('bash') == '5.0-6ubuntu1.1'
+    assert inv.version('telnet') == ''
+    assert inv.installed('libc*') and not inv.installed('telnet')
+    assert inv.filter('libc6*') == {'libc6': '2.31-0ubuntu9.2', 'libc6:i386': '2.31-0ubuntu9.2'}
+    assert inv.sources() == {'glibc': ['libc6', 'libc6:i386']}
+
+    # loaded once, until the database changes
+    assert inventory.get(GRAINS) is inv
+    with open(str(dpkg_status), 'a') as fh_:
+        fh_.write('\nPackage: telnet\nStatus: install ok installed\nArchitecture: amd64\nVersion: 0.17-42\n')
+    os.utime(str(dpkg_status), ns=(0, 0))
+    assert inventory.get(GRAINS).version('telnet') == '0.17-42'
+
+    assert inventory.get({'os_family': 'Windows'}) is None
+
+
+def test_nova_pkg_audit(dpkg_status, monkeypatch):
+    nova_pkg = hubblestack.files.hubblestack_nova.pkg
+    monkeypatch.setattr(nova_pkg, '__grains__', GRAINS, raising=False)
+    monkeypatch.setattr(nova_pkg, '__mods__', {}, raising=False)
+
+    def whitelist(tag, pkg, version):
+        return {tag: {'data': {'Ubuntu-20.04': [{pkg: {'tag': tag, 'version': version}}]}, 'description': tag}}
+
+    data = {'pkg': {'blacklist': {'telnet': {'data': {'*': [{'telnet': 'telnet'}]}, 'description': 'telnet'}},
+                    'whitelist': {}}}
+    for tag, version in (('bash-min', '>=5.0-6'), ('bash-max', '<=5.0~rc1'), ('bash-eq', '5.0-6ubuntu1.1')):
+        data['pkg']['whitelist'].update(whitelist(tag, 'bash', version))
+    ret = nova_pkg.audit([('profile', data)], '*', [])
+    assert sorted(tag['tag'] for tag in ret['Success']) == ['bash-eq', 'bash-min', 'telnet']
+    # LooseVersion would have it the other way around
+    assert [tag['tag'] for tag in ret['Failure']] == ['bash-max']
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+import http.server
+import socket
+import socketserver
+import ssl
+import threading
+import time
+
+import ntplib
+import OpenSSL
+import pytest
+
+import hubblestack.audit.curl
+import hubblestack.audit.ssl_certificate
+import hubblestack.audit.time_sync
+import hubblestack.module_runner.runner
+import hubblestack.utils.probe
+from hubblestack.module_runner.audit_runner import AuditRunner
+
+# other tests replace it with a mock
+GET_SERVER_CERTIFICATE = ssl.get_server_certificate
+DELAY = 0.3
+
+
+@pytest.fixture(autouse=True)
+def probes(__opts__, monkeypatch):
+    monkeypatch.setattr(ssl, 'get_server_certificate', GET_SERVER_CERTIFICATE)
+    monkeypatch.setattr(hubblestack.audit.ssl_certificate, '__opts__', __opts__, raising=False)
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__opts__', __opts__, raising=False)
+    hubblestack.utils.probe.clear()
+    yield
+    hubblestack.utils.probe.clear()
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def tls_server(tmp_path):
+    key = OpenSSL.crypto.PKey()
+    key.generate_key(OpenSSL.crypto.TYPE_RSA, 2048)
+    cert = OpenSSL.crypto.X509()
+    cert.get_subject().CN = 'localhost'
+    cert.set_serial_number(1)
+    cert.gmtime_adj_notBefore(0)
+    cert.gmtime_adj_notAfter(86400)
+    cert.set_issuer(cert.get_subject())
+    cert.set_pubkey(key)
+    cert.sign(key, 'sha256')
+    pem = OpenSSL.crypto.dump_certificate(OpenSSL.crypto.FILETYPE_PEM, cert)
+    (tmp_path / 'cert.pem').write_bytes(pem + OpenSSL.crypto.dump_privatekey(OpenSSL.crypto.FILETYPE_PEM, key))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(tmp_path / 'cert.pem'))
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            self.server.connections += 1
+            time.sleep(DELAY)
+            try:
+                with context.wrap_socket(self.request, server_side=True) as tls:
+                    tls.recv(1)
+            except (OSError, ssl.SSLError):
+                pass
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.pem = pem.decode()
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_server():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            self.server.paths.append(self.path)
+            time.sleep(DELAY)
+            body = b'{"path": "%s"}' % self.path.encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.paths = []
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def ntp_server():
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            data, sock = self.request
+            received = ntplib.system_to_ntp_time(time.time())
+            request = ntplib.NTPPacket()
+            request.from_data(data)
+            time.sleep(DELAY)
+            reply = ntplib.NTPPacket(version=3, mode=4, tx_timestamp=ntplib.system_to_ntp_time(time.time()))
+            reply.stratum = 2
+            reply.orig_timestamp = request.tx_timestamp
+            reply.recv_timestamp = received
+            sock.sendto(reply.to_data(), self.client_address)
+
+    try:
+        server = socketserver.ThreadingUDPServer(('127.0.0.1', 123), Handler)
+    except OSError as exc:
+        pytest.skip('cannot listen on the ntp port: {0}'.format(exc))
+    server.daemon_threads = True
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_certificate(tls_server):
+    port = tls_server.server_address[1]
+    pem = hubblestack.utils.probe.get_certificate('127.0.0.1', port, 5)
+    assert ssl.PEM_cert_to_DER_cert(pem) == ssl.PEM_cert_to_DER_cert(tls_server.pem)
+    assert socket.getdefaulttimeout() is None
+
+
+def test_ssl_certificate_cached(tls_server, __opts__):
+    port = tls_server.server_address[1]
+    block = {'args': {'host_ip': '127.0.0.1', 'host_port': port, 'ssl_timeout': 5}}
+    for _ in range(3):
+        ret = hubblestack.audit.ssl_certificate.execute('cert', block)
+        assert ret[0] is True
+        assert ret[1]['result']['ssl_subject_common_name'] == 'localhost'
+    assert tls_server.connections == 1
+
+    # nothing is cached with a ttl of 0
+    __opts__['probe_cert_ttl'] = 0
+    hubblestack.utils.probe.clear()
+    hubblestack.audit.ssl_certificate.execute('cert', block)
+    hubblestack.audit.ssl_certificate.execute('cert', block)
+    assert tls_server.connections == 3
+
+    # and failures are not cached
+    calls = []
+
+    def get_certificate(*args):
+        calls.append(args)
+        raise OSError('unreachable')
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            hubblestack.utils.probe.fetch(('ssl_certificate', 'nowhere', 443), get_certificate, ttl=300)
+    assert len(calls) == 2
+
+
+def test_audit_runner_prefetches(tls_server, http_server, __opts__, monkeypatch):
+    tls_port = tls_server.server_address[1]
+    url = 'http://127.0.0.1:{0}/'.format(http_server.server_address[1])
+    checks = [('ssl_certificate', 'cert{0}'.format(i), {'args': {'host_ip': '127.0.0.1', 'host_port': tls_port}})
+              for i in range(2)]
+    checks += [('curl', 'curl{0}'.format(i), {'args': {'url': url + str(i)}}) for i in range(4)]
+    # requests with side effects are not prefetched
+    checks.append(('curl', 'put', {'args': {'url': url + 'put', 'function': 'PUT'}}))
+    hmods = {'ssl_certificate.get_probes': hubblestack.audit.ssl_certificate.get_probes,
+             'curl.get_probes': hubblestack.audit.curl.get_probes}
+    monkeypatch.setattr(hubblestack.module_runner.runner, '__hmods__', hmods)
+
+    start = time.time()
+    AuditRunner()._prefetch_probes(checks)
+    # all endpoints were contacted at once
+    assert time.time() - start < DELAY * 3
+    assert sorted(http_server.paths) == ['/0', '/1', '/2', '/3']
+    assert tls_server.connections == 1
+
+    # the checks find their results there
+    start = time.time()
+    for module, check_id, block in checks[:-1]:
+        ret = getattr(hubblestack.audit, module).execute(check_id, block)
+        assert ret[0] is True
+    assert time.time() - start < DELAY
+    assert len(http_server.paths) == 4
+    assert tls_server.connections == 1
+
+    # a prefetched response is used once
+    assert hubblestack.audit.curl.execute('curl0', checks[2][2])[1]['result']['response'] == {'path': '/0'}
+    assert len(http_server.paths) == 5
+
+
+def test_prefetch_deadline():
+    event = threading.Event()
+    start = time.time()
+    assert hubblestack.utils.probe.prefetch([('slow', event.wait, (5,), 0), ('fast', str, (1,), 0)], 0.2) == 2
+    assert time.time() - start < 1
+    assert hubblestack.utils.probe.fetch('fast', str, 2) == '1'
+    # a late probe is waited for, not run again
+    event.set()
+    assert hubblestack.utils.probe.fetch('slow', lambda: 'again') is True
+
+
+def test_run_all():
+    def call(value):
+        time.sleep(DELAY)
+        if value == 2:
+            raise ValueError(value)
+        return value
+
+    start = time.time()
+    assert hubblestack.utils.probe.run_all([(call, (i,)) for i in range(4)]) == [0, 1, None, 3]
+    assert time.time() - start < DELAY * 3
+    assert hubblestack.utils.probe.run_all([(time.sleep, (1,)), (call, (1,))], deadline=DELAY * 2,
+                                           default='late') == ['late', 1]
+
+
+def test_time_sync_concurrent(ntp_server):
+    block = {'args': {'ntp_servers': ['127.0.0.1'] * 4}}
+    start = time.time()
+    ret = hubblestack.audit.time_sync.execute('ntp', block)
+    assert time.time() - start < DELAY * 3
+    assert [server['replied'] for server in ret[1]['result']] == [True] * 4
+    assert all(abs(server['offset']) < 1 for server in ret[1]['result'])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+
+import pytest
+import yaml
+
+import hubblestack.utils.profile_cache as profile_cache
+
+PROFILE = '''
+check1:
+  description: sample
+  tag: CIS-1
+  implementations:
+    - filter:
+        grains: 'G@os:*'
+      module: grep
+      items:
+        - args:
+            path: /etc/ssh/sshd_config
+            pattern: '^PermitRootLogin'
+          comparator:
+            type: string
+            match: 'no'
+'''
+
+
+@pytest.fixture(autouse=True)
+def parses(monkeypatch):
+    profile_cache.clear()
+    calls = []
+    safe_load = yaml.safe_load
+
+    def counting_safe_load(stream):
+        calls.append(stream)
+        return safe_load(stream)
+
+    monkeypatch.setattr(profile_cache.yaml, 'safe_load', counting_safe_load)
+    yield calls
+    profile_cache.clear()
+
+
+def test_parsed_once_per_content(tmp_path, parses):
+    path = tmp_path / 'profile.yaml'
+    path.write_text(PROFILE)
+    data = profile_cache.load(str(path))
+    assert data == yaml.load(PROFILE, Loader=yaml.SafeLoader)
+
+    # copies are handed out
+    data['check1']['tag'] = 'changed'
+    assert profile_cache.load(str(path))['check1']['tag'] == 'CIS-1'
+    assert len(parses) == 1
+
+    # a new version of the file, with the same content
+    path.write_text(PROFILE)
+    os.utime(str(path), ns=(0, 0))
+    other = tmp_path / 'other.yaml'
+    other.write_text(PROFILE)
+    profile_cache.load(str(path))
+    profile_cache.load(str(other))
+    assert len(parses) == 1
+
+    # a new content
+    path.write_text(PROFILE.replace('CIS-1', 'CIS-2'))
+    os.utime(str(path), ns=(1, 1))
+    assert profile_cache.load(str(path))['check1']['tag'] == 'CIS-2'
+    assert len(parses) == 2
+
+    # disabled
+    profile_cache.load(str(path), {'profile_cache': False})
+    assert len(parses) == 3
+
+
+def test_disk_cache(tmp_path, parses):
+    opts = {'cachedir': str(tmp_path / 'cache'), 'profile_cache_disk': True}
+    path = tmp_path / 'profile.yaml'
+    path.write_text(PROFILE)
+    data = profile_cache.load(str(path), opts)
+    assert len(os.listdir(str(tmp_path / 'cache' / 'profile_cache'))) == 1
+
+    # a restart
+    profile_cache.clear()
+    assert profile_cache.load(str(path), opts) == data
+    assert len(parses) == 1
+
+
+def test_unpackable_data(tmp_path):
+    path = tmp_path / 'dates.yaml'
+    path.write_text('day: 2021-01-01\nids: !!set {a, b}\n1: one\n')
+    for _ in range(2):
+        data = profile_cache.load(str(path), {'profile_cache_size': 1})
+        assert data == {'day': datetime.date(2021, 1, 1), 'ids': {'a', 'b'}, 1: 'one'}
+        data['ids'].add('c')